@@ -0,0 +1,98 @@
+"""
+Caché del contexto calculado de cada dashboard.
+
+Cada sección (recepción, gerencia y un tablero por técnico) tiene un número de
+"generación" guardado en el caché. La llave del contexto incluye esa
+generación, así que invalidar una sección es sólo incrementar su contador:
+las entradas viejas dejan de leerse y expiran solas por TTL.
+Las señales de OrdenServicio y BitacoraOrden (dashboard/signals.py) invalidan
+únicamente las secciones afectadas por cada cambio, al confirmarse la
+transacción.
+
+El contexto se calcula en la primaria aunque la vista lea de la réplica: justo
+después de invalidar, una réplica atrasada aún no tiene el cambio y lo que se
+guardara con la generación nueva lo verían todos hasta que expire el TTL.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from sistema_crm_pacscomputacion.replicas import en_primaria
+
+# Tope de antigüedad para datos que dependen de la hora (cerradas hoy, alertas
+# de retraso) o de tablas que no invalidan (ej. el nombre de un cliente).
+TTL_CONTEXTO = getattr(settings, 'DASHBOARD_CACHE_TTL', 300)
+
+SECCION_RECEPCION = 'recepcion'
+SECCION_GERENTE = 'gerente'
+
+
+def seccion_tecnico(tecnico_id):
+    return f'tecnico:{tecnico_id}'
+
+
+def _llave_generacion(seccion):
+    return f'dashboard:gen:{seccion}'
+
+
+def _incrementar(llave):
+    # incr() falla si la llave no existe; add() no pisa un valor existente
+    cache.add(llave, 0, timeout=None)
+    try:
+        return cache.incr(llave)
+    except ValueError:
+        # Expulsada entre add() e incr() (ej. locmem lleno)
+        cache.set(llave, 1, timeout=None)
+        return 1
+
+
+def _registrar(rol, resultado):
+    _incrementar(f'dashboard:stats:{rol}:{resultado}')
+
+
+def obtener_contexto(seccion, calcular, rol, variante=''):
+    """
+    Devuelve el contexto cacheado de la sección o lo calcula con `calcular()`.
+    `rol` agrupa las estadísticas de aciertos; `variante` distingue contextos
+    de la misma sección (ej. el día, para "cerradas hoy").
+    """
+    generacion = cache.get(_llave_generacion(seccion), 0)
+    llave = f'dashboard:ctx:{seccion}:{generacion}:{variante}'
+    contexto = cache.get(llave)
+    if contexto is None:
+        _registrar(rol, 'miss')
+        with en_primaria():
+            contexto = calcular()
+        cache.set(llave, contexto, TTL_CONTEXTO)
+    else:
+        _registrar(rol, 'hit')
+    return contexto
+
+
+def invalidar(*secciones):
+    for seccion in secciones:
+        _incrementar(_llave_generacion(seccion))
+
+
+def invalidar_al_confirmar(*secciones):
+    """
+    Invalida al confirmarse la transacción en curso (de inmediato si no hay
+    una). Antes, otra petición aún lee los datos anteriores y los guardaría
+    con la generación nueva hasta que expire el TTL.
+    """
+    transaction.on_commit(lambda: invalidar(*secciones))
+
+
+def estadisticas(roles=('recepcion', 'tecnico', 'gerente')):
+    """Aciertos y fallos del caché por rol, para monitoreo."""
+    resultado = {}
+    for rol in roles:
+        hits = cache.get(f'dashboard:stats:{rol}:hit', 0)
+        misses = cache.get(f'dashboard:stats:{rol}:miss', 0)
+        total = hits + misses
+        resultado[rol] = {
+            'hits': hits,
+            'misses': misses,
+            'ratio': round(hits / total, 3) if total else None,
+        }
+    return resultado
@@ -0,0 +1,125 @@
+"""
+Canal de eventos en vivo para los dashboards (feed de bitácora y cambios de
+estado de órdenes).
+
+Es un pub/sub en memoria del proceso: las señales de los modelos publican
+(desde el hilo que atiende la petición, ver dashboard/signals.py) y cada
+conexión SSE o long-poll suscrita espera en una asyncio.Queue de su propio
+event loop. Una conexión inactiva no ocupa hilos, sólo una corrutina
+suspendida, así que un worker ASGI sostiene cientos de dashboards abiertos.
+
+Cada evento lleva un id creciente; los últimos se conservan en un buffer para
+que un cliente que se reconecta (Last-Event-ID) o el long-poll (?desde=) no
+pierdan lo publicado entre dos peticiones.
+
+Limitación: sólo llegan los eventos publicados en el mismo proceso. Con varios
+workers hay que usar un solo worker ASGI para estas rutas o un broker externo.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+
+TAMANO_BUFFER = 200
+TAMANO_COLA = 100  # eventos pendientes por suscriptor antes de desconectarlo
+
+
+class Evento:
+    __slots__ = ('id', 'tipo', 'datos')
+
+    def __init__(self, id, tipo, datos):
+        self.id = id
+        self.tipo = tipo
+        self.datos = datos
+
+    def como_dict(self):
+        return {'id': self.id, 'tipo': self.tipo, 'datos': self.datos}
+
+    def como_sse(self):
+        datos = json.dumps(self.datos, ensure_ascii=False)
+        return f'id: {self.id}\nevent: {self.tipo}\ndata: {datos}\n\n'
+
+
+class Suscripcion:
+    """Cola de eventos de una conexión. Se usa con `async with canal.suscribir()`."""
+
+    def __init__(self, canal):
+        self.canal = canal
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=TAMANO_COLA)
+        self.saturada = False
+
+    def _entregar(self, evento):
+        # Corre dentro del loop del suscriptor (call_soon_threadsafe)
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente que no consume: se le cierra la conexión
+            self.saturada = True
+
+    async def siguiente(self, timeout):
+        """El próximo evento, o None si pasan `timeout` segundos sin eventos."""
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.canal.desuscribir(self)
+
+
+class CanalEventos:
+
+    def __init__(self, tamano_buffer=TAMANO_BUFFER):
+        self._lock = threading.Lock()
+        self._suscripciones = set()
+        self._buffer = deque(maxlen=tamano_buffer)
+        self._ultimo_id = 0
+
+    @property
+    def ultimo_id(self):
+        return self._ultimo_id
+
+    @property
+    def conexiones(self):
+        return len(self._suscripciones)
+
+    def publicar(self, tipo, datos):
+        """Publica un evento. Se puede llamar desde cualquier hilo."""
+        with self._lock:
+            self._ultimo_id += 1
+            evento = Evento(self._ultimo_id, tipo, datos)
+            self._buffer.append(evento)
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion._entregar, evento)
+            except RuntimeError:
+                # Loop ya cerrado: la conexión murió sin desuscribirse
+                self.desuscribir(suscripcion)
+        return evento
+
+    def suscribir(self):
+        suscripcion = Suscripcion(self)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def posteriores(self, desde):
+        """Eventos del buffer con id mayor a `desde`."""
+        with self._lock:
+            return [evento for evento in self._buffer if evento.id > desde]
+
+
+canal = CanalEventos()
+
+
+def publicar(tipo, datos):
+    return canal.publicar(tipo, datos)
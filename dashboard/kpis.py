@@ -0,0 +1,108 @@
+"""
+Mantenimiento del snapshot de KPIs (ResumenKpi) para el dashboard gerencial.
+
+Cada orden "aporta" +1 a un conjunto de contadores según su estado y técnico.
+Al guardar o eliminar una orden se resta lo que aportaba antes y se suma lo
+que aporta ahora, así el dashboard lee unas cuantas filas en lugar de agregar
+toda la tabla de órdenes.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from gestion_ordenes.models import OrdenServicio
+from .models import ResumenKpi
+
+ESTADOS_CERRADOS = [OrdenServicio.ESTADO_ENTREGADA, OrdenServicio.ESTADO_CANCELADA]
+
+
+def contribuciones(estado, tecnico_id):
+    """Contadores (dimension, clave) a los que suma una orden con estos valores."""
+    claves = [
+        (ResumenKpi.DIMENSION_TOTAL, ''),
+        (ResumenKpi.DIMENSION_ESTADO, estado),
+    ]
+    if estado not in ESTADOS_CERRADOS:
+        if tecnico_id:
+            claves.append((ResumenKpi.DIMENSION_TECNICO, str(tecnico_id)))
+        else:
+            claves.append((ResumenKpi.DIMENSION_SIN_ASIGNAR, ''))
+    return claves
+
+
+def aplicar_deltas(deltas):
+    """Suma a cada contador su delta ({(dimension, clave): delta}) con UPDATE atómicos."""
+    with transaction.atomic():
+        for (dimension, clave), delta in deltas.items():
+            if not delta:
+                continue
+            actualizados = ResumenKpi.objects.filter(dimension=dimension, clave=clave).update(total=F('total') + delta)
+            if not actualizados:
+                ResumenKpi.objects.get_or_create(dimension=dimension, clave=clave)
+                ResumenKpi.objects.filter(dimension=dimension, clave=clave).update(total=F('total') + delta)
+
+
+def registrar_cambio(anterior, actual):
+    """
+    Ajusta el snapshot por el cambio de una orden. `anterior` y `actual` son
+    tuplas (estado, tecnico_id), o None si la orden no existía / ya no existe.
+    """
+    deltas = Counter()
+    if anterior is not None:
+        deltas.subtract(contribuciones(*anterior))
+    if actual is not None:
+        deltas.update(contribuciones(*actual))
+    aplicar_deltas(deltas)
+
+
+def desasignar_tecnico(tecnico_id, abiertas):
+    """
+    Ajusta el snapshot cuando se borra un técnico: Django pone en NULL el
+    técnico de sus órdenes con un UPDATE masivo (SET_NULL) que no dispara
+    señales. Sus `abiertas` órdenes abiertas pasan a "sin asignar".
+    """
+    if abiertas:
+        aplicar_deltas({
+            (ResumenKpi.DIMENSION_TECNICO, str(tecnico_id)): -abiertas,
+            (ResumenKpi.DIMENSION_SIN_ASIGNAR, ''): abiertas,
+        })
+
+
+def agregacion_en_vivo():
+    """Los mismos contadores que el snapshot, calculados sobre OrdenServicio."""
+    conteos = Counter()
+    filas = OrdenServicio.objects.order_by().values('estado', 'tecnico_asignado_id').annotate(n=Count('id'))
+    for fila in filas:
+        for clave in contribuciones(fila['estado'], fila['tecnico_asignado_id']):
+            conteos[clave] += fila['n']
+    return conteos
+
+
+def snapshot_actual():
+    return Counter({
+        (r.dimension, r.clave): r.total for r in ResumenKpi.objects.all()
+    })
+
+
+def diferencias():
+    """{(dimension, clave): (snapshot, en_vivo)} para los contadores que no cuadran."""
+    snapshot = snapshot_actual()
+    vivo = agregacion_en_vivo()
+    return {
+        clave: (snapshot[clave], vivo[clave])
+        for clave in set(snapshot) | set(vivo)
+        if snapshot[clave] != vivo[clave]
+    }
+
+
+def reconstruir():
+    """Reemplaza el snapshot completo por la agregación en vivo."""
+    vivo = agregacion_en_vivo()
+    with transaction.atomic():
+        ResumenKpi.objects.all().delete()
+        ResumenKpi.objects.bulk_create([
+            ResumenKpi(dimension=dimension, clave=clave, total=total)
+            for (dimension, clave), total in vivo.items()
+        ])
+    return len(vivo)
@@ -0,0 +1,97 @@
+"""
+Mide los contadores del dashboard gerencial con 1M de órdenes: leídos del
+snapshot ResumenKpi contra agregados en vivo sobre OrdenServicio (el
+GROUP BY estado, técnico que hacía el dashboard en cada carga).
+
+- snapshot: kpis.snapshot_actual() (unas cuantas filas de ResumenKpi).
+- en vivo: kpis.agregacion_en_vivo() (recorre toda la tabla de órdenes).
+- dashboard_gerente: la vista completa con el caché de dashboards frío.
+
+Las órdenes se agregan con bulk_create (sin señales) y el snapshot se
+reconstruye una vez, todo dentro de una transacción que se revierte: la base
+queda igual.
+
+    python manage.py benchmark_kpis --ordenes 1000000
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+
+from dashboard import kpis
+from gestion_clientes.models import Cliente, Equipo
+from gestion_ordenes.models import OrdenServicio
+
+LOTE = 5000
+
+
+class Command(BaseCommand):
+    help = "Mide p50/p95 de los contadores del dashboard: snapshot contra agregación en vivo (transacción revertida)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ordenes', type=int, default=1000000)
+        parser.add_argument('--tecnicos', type=int, default=20)
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"motor: {connection.vendor}")
+        with transaction.atomic():
+            try:
+                tecnicos = [
+                    User.objects.create_user(f'benchmark kpis {i}', first_name=f'Técnico {i}')
+                    for i in range(options['tecnicos'])
+                ]
+                self._llenar(options['ordenes'], tecnicos, random.Random(options['semilla']))
+                kpis.reconstruir()
+                self._medir(options['repeticiones'])
+            finally:
+                transaction.set_rollback(True)
+
+    def _llenar(self, cantidad, tecnicos, azar):
+        cliente = Cliente.objects.create(nombre_completo='Cliente Benchmark KPIs', telefono='0000000004')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='Marca', modelo='Modelo')
+        estados = [estado for estado, _ in OrdenServicio.ESTADO_OPCIONES]
+        for inicio in range(0, cantidad, LOTE):
+            OrdenServicio.objects.bulk_create(
+                OrdenServicio(
+                    cliente=cliente, equipo=equipo, descripcion_falla="Falla de prueba",
+                    estado=azar.choice(estados),
+                    tecnico_asignado=azar.choice(tecnicos + [None]),
+                )
+                for _ in range(min(LOTE, cantidad - inicio))
+            )
+
+    def _medir(self, repeticiones):
+        usuario = User.objects.create_user('benchmark kpis gerente', is_superuser=True)
+        navegador = Client(HTTP_HOST='localhost')
+        navegador.force_login(usuario)
+        url = reverse('dashboard_gerente')
+        assert kpis.diferencias() == {}, "el snapshot no cuadra con la agregación en vivo"
+        self.stdout.write(f"{OrdenServicio.objects.count()} órdenes")
+
+        def vista():
+            cache.clear()
+            respuesta = navegador.get(url)
+            assert respuesta.status_code == 200, respuesta.status_code
+
+        for nombre, medir in [('snapshot', kpis.snapshot_actual),
+                              ('en vivo', kpis.agregacion_en_vivo),
+                              ('dashboard_gerente', vista)]:
+            medir()
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                medir()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            tiempos.sort()
+            self.stdout.write(
+                f"{nombre:<18} p50 {statistics.median(tiempos):9.2f} ms | "
+                f"p95 {tiempos[int(len(tiempos) * 0.95) - 1]:9.2f} ms"
+            )
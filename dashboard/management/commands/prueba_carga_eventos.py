@@ -0,0 +1,247 @@
+"""
+Prueba de carga del feed en vivo (dashboard/eventos.py).
+
+Por defecto corre la aplicación ASGI dentro del mismo proceso: abre N
+conexiones SSE simuladas, publica eventos desde otro hilo (como lo hacen las
+señales en una vista síncrona) y mide cuánto tarda cada evento en llegar a
+todas las conexiones, además de los hilos usados.
+
+Con --url se conecta por HTTP a un servidor ASGI real (uvicorn, daphne) y
+comprueba que, con N conexiones inactivas abiertas, las páginas normales
+siguen respondiendo sin esperar por un hilo libre.
+"""
+import asyncio
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from dashboard import eventos
+
+
+def cookie_de_sesion(usuario):
+    """Crea una sesión autenticada real (en la base de sesiones) y devuelve la cookie."""
+    cliente = Client()
+    cliente.force_login(usuario)
+    return f'{settings.SESSION_COOKIE_NAME}={cliente.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+class LectorSSE:
+    """Separa los fragmentos del stream en eventos y anota cuándo llega cada id."""
+
+    def __init__(self):
+        self.pendiente = ''
+        self.recibidos = {}
+        self.latidos = 0
+        self.conectada = asyncio.Event()
+
+    def alimentar(self, fragmento):
+        self.pendiente += fragmento.decode()
+        while '\n\n' in self.pendiente:
+            bloque, self.pendiente = self.pendiente.split('\n\n', 1)
+            self.conectada.set()
+            for linea in bloque.splitlines():
+                if linea.startswith(':'):
+                    self.latidos += 1
+                elif linea.startswith('id: '):
+                    self.recibidos[int(linea[4:])] = time.perf_counter()
+
+
+class ConexionASGI:
+    """Una petición SSE contra la aplicación ASGI, sin pasar por la red."""
+
+    def __init__(self, app, path, cookie, numero):
+        self.app = app
+        self.scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode()), (b'accept', b'text/event-stream')],
+            'client': ('127.0.0.1', 10000 + numero), 'server': ('localhost', 80),
+        }
+        self.lector = LectorSSE()
+        self.status = None
+        self._peticion_enviada = False
+        self._cerrar = asyncio.Event()
+        self.tarea = None
+
+    async def _receive(self):
+        if not self._peticion_enviada:
+            self._peticion_enviada = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self._cerrar.wait()
+        return {'type': 'http.disconnect'}
+
+    async def _send(self, mensaje):
+        if mensaje['type'] == 'http.response.start':
+            self.status = mensaje['status']
+            if self.status != 200:
+                self.lector.conectada.set()
+        elif mensaje['type'] == 'http.response.body':
+            self.lector.alimentar(mensaje.get('body', b''))
+
+    def abrir(self):
+        self.tarea = asyncio.create_task(self.app(self.scope, self._receive, self._send))
+
+    async def cerrar(self):
+        self._cerrar.set()
+        try:
+            await asyncio.wait_for(self.tarea, 5)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self.tarea.cancel()
+
+
+class ConexionHTTP:
+    """Una petición SSE real por socket a un servidor externo."""
+
+    def __init__(self, url, cookie):
+        partes = urlsplit(url)
+        self.host = partes.hostname
+        self.puerto = partes.port or 80
+        self.peticion = (
+            f'GET {partes.path or "/"} HTTP/1.1\r\nHost: {partes.netloc}\r\n'
+            f'Cookie: {cookie}\r\nAccept: text/event-stream\r\n\r\n'
+        ).encode()
+        self.lector = LectorSSE()
+        self.status = None
+        self.tarea = None
+
+    async def _leer(self):
+        reader, writer = await asyncio.open_connection(self.host, self.puerto)
+        writer.write(self.peticion)
+        await writer.drain()
+        encabezados = await reader.readuntil(b'\r\n\r\n')
+        self.status = int(encabezados.split(b' ', 2)[1])
+        self.lector.conectada.set()
+        try:
+            while fragmento := await reader.read(4096):
+                # Sin decodificar chunked: sólo nos interesan latidos e ids
+                self.lector.alimentar(fragmento)
+        finally:
+            writer.close()
+
+    def abrir(self):
+        self.tarea = asyncio.create_task(self._leer())
+
+    async def cerrar(self):
+        self.tarea.cancel()
+        await asyncio.gather(self.tarea, return_exceptions=True)
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+class Command(BaseCommand):
+    help = "Prueba de carga del feed SSE de dashboards: cientos de conexiones inactivas en un worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conexiones', type=int, default=500)
+        parser.add_argument('--eventos', type=int, default=20, help="Eventos a publicar (modo en proceso).")
+        parser.add_argument('--usuario', help="Usuario para la sesión (por defecto, el primer superusuario).")
+        parser.add_argument('--url', help="Base de un servidor ASGI real, ej. http://127.0.0.1:8000")
+        parser.add_argument('--duracion', type=float, default=20, help="Segundos con las conexiones abiertas (modo --url).")
+
+    def handle(self, *args, **options):
+        usuario = self._usuario(options['usuario'])
+        cookie = cookie_de_sesion(usuario)
+        if options['url']:
+            asyncio.run(self._contra_servidor(options, cookie))
+        else:
+            asyncio.run(self._en_proceso(options, cookie))
+
+    def _usuario(self, username):
+        User = get_user_model()
+        usuario = User.objects.filter(username=username).first() if username else \
+            User.objects.filter(is_superuser=True).order_by('pk').first()
+        if usuario is None:
+            raise CommandError("No hay usuario para la sesión: usa --usuario o crea un superusuario.")
+        return usuario
+
+    async def _abrir_todas(self, conexiones, timeout=60):
+        inicio = time.perf_counter()
+        for conexion in conexiones:
+            conexion.abrir()
+        await asyncio.wait_for(asyncio.gather(*(c.lector.conectada.wait() for c in conexiones)), timeout)
+        rechazadas = [c for c in conexiones if c.status != 200]
+        if rechazadas:
+            raise CommandError(f"{len(rechazadas)} conexiones rechazadas (HTTP {rechazadas[0].status}).")
+        self.stdout.write(f"{len(conexiones)} conexiones abiertas en {time.perf_counter() - inicio:.2f} s")
+
+    async def _en_proceso(self, options, cookie):
+        from sistema_crm_pacscomputacion.asgi import application
+
+        path = reverse('dashboard_eventos')
+        hilos_antes = threading.active_count()
+        conexiones = [ConexionASGI(application, path, cookie, i) for i in range(options['conexiones'])]
+        await self._abrir_todas(conexiones)
+        self.stdout.write(f"Hilos: {hilos_antes} antes, {threading.active_count()} con todas las conexiones abiertas")
+
+        loop = asyncio.get_running_loop()
+        latencias = []
+        perdidos = 0
+        for i in range(options['eventos']):
+            inicio = time.perf_counter()
+            # Igual que una señal: se publica desde un hilo ajeno al loop
+            evento = await loop.run_in_executor(None, eventos.publicar, 'prueba', {'n': i})
+            limite = inicio + 5
+            while time.perf_counter() < limite and not all(evento.id in c.lector.recibidos for c in conexiones):
+                await asyncio.sleep(0.001)
+            for conexion in conexiones:
+                llegada = conexion.lector.recibidos.get(evento.id)
+                if llegada is None:
+                    perdidos += 1
+                else:
+                    latencias.append((llegada - inicio) * 1000)
+
+        await asyncio.gather(*(c.cerrar() for c in conexiones))
+        await asyncio.sleep(0)
+
+        self.stdout.write(
+            f"Entregas: {len(latencias)} (perdidas: {perdidos}) | latencia ms "
+            f"p50={statistics.median(latencias):.1f} p99={percentil(latencias, 0.99):.1f} max={max(latencias):.1f}"
+        )
+        self.stdout.write(f"Suscripciones abiertas tras cerrar: {eventos.canal.conexiones}")
+        if perdidos or eventos.canal.conexiones:
+            raise CommandError("Hubo eventos perdidos o suscripciones sin liberar.")
+        self.stdout.write(self.style.SUCCESS("OK"))
+
+    async def _contra_servidor(self, options, cookie):
+        base = options['url'].rstrip('/')
+        conexiones = [ConexionHTTP(base + reverse('dashboard_eventos'), cookie) for _ in range(options['conexiones'])]
+        await self._abrir_todas(conexiones)
+
+        # Con todas las conexiones inactivas abiertas, una página normal debe
+        # responder igual de rápido: ningún hilo está ocupado esperando.
+        sonda = ConexionHTTP(base + reverse('dashboard_recepcion'), cookie)
+        tiempos = []
+        fin = time.perf_counter() + options['duracion']
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            reader, writer = await asyncio.open_connection(sonda.host, sonda.puerto)
+            writer.write(sonda.peticion.replace(b'Accept: text/event-stream', b'Connection: close'))
+            await writer.drain()
+            await reader.read()
+            writer.close()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            await asyncio.sleep(0.5)
+
+        vivas = sum(1 for c in conexiones if not c.tarea.done())
+        latidos = sum(c.lector.latidos for c in conexiones)
+        await asyncio.gather(*(c.cerrar() for c in conexiones))
+
+        self.stdout.write(f"Conexiones vivas al final: {vivas}/{len(conexiones)} | latidos recibidos: {latidos}")
+        self.stdout.write(
+            f"Página de recepción con las conexiones abiertas: {len(tiempos)} peticiones, "
+            f"p50={statistics.median(tiempos):.1f} ms max={max(tiempos):.1f} ms"
+        )
+        if vivas < len(conexiones):
+            raise CommandError("El servidor cerró conexiones SSE durante la prueba.")
+        self.stdout.write(self.style.SUCCESS("OK"))
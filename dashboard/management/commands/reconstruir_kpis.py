@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from dashboard import kpis
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero el snapshot de KPIs del dashboard gerencial (reparación de desfases)."
+
+    def handle(self, *args, **options):
+        total = kpis.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Snapshot reconstruido: {total} contadores."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import kpis
+
+
+class Command(BaseCommand):
+    help = "Compara el snapshot de KPIs contra la agregación en vivo de OrdenServicio."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reparar', action='store_true', help="Reconstruye el snapshot si encuentra diferencias.")
+
+    def handle(self, *args, **options):
+        diferencias = kpis.diferencias()
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("El snapshot de KPIs coincide con los datos en vivo."))
+            return
+
+        for (dimension, clave), (snapshot, vivo) in sorted(diferencias.items()):
+            self.stdout.write(self.style.WARNING(f"{dimension} [{clave}]: snapshot={snapshot} en vivo={vivo}"))
+
+        if options['reparar']:
+            kpis.reconstruir()
+            self.stdout.write(self.style.SUCCESS("Snapshot reconstruido."))
+        else:
+            raise CommandError(f"{len(diferencias)} contador(es) desfasados. Usa --reparar o reconstruir_kpis.")
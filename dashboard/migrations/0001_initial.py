@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:05
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def llenar_snapshot(apps, schema_editor):
+    OrdenServicio = apps.get_model('gestion_ordenes', 'OrdenServicio')
+    ResumenKpi = apps.get_model('dashboard', 'ResumenKpi')
+    conteos = Counter()
+    filas = OrdenServicio.objects.order_by().values('estado', 'tecnico_asignado_id').annotate(n=Count('id'))
+    for fila in filas:
+        conteos[('total', '')] += fila['n']
+        conteos[('estado', fila['estado'])] += fila['n']
+        if fila['estado'] not in ('Entregada', 'Cancelada'):
+            if fila['tecnico_asignado_id']:
+                conteos[('tecnico_activas', str(fila['tecnico_asignado_id']))] += fila['n']
+            else:
+                conteos[('sin_asignar', '')] += fila['n']
+    ResumenKpi.objects.bulk_create([
+        ResumenKpi(dimension=dimension, clave=clave, total=total)
+        for (dimension, clave), total in conteos.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('gestion_ordenes', '0006_indice_paginacion_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenKpi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('total', 'Total histórico'), ('estado', 'Órdenes por estado'), ('tecnico_activas', 'Órdenes activas por técnico'), ('sin_asignar', 'Órdenes activas sin asignar')], max_length=30)),
+                ('clave', models.CharField(blank=True, default='', max_length=100)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumen KPI',
+                'verbose_name_plural': 'Resúmenes KPI',
+                'unique_together': {('dimension', 'clave')},
+            },
+        ),
+        migrations.RunPython(llenar_snapshot, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,31 @@
 from django.db import models
 
-# Create your models here.
+
+class ResumenKpi(models.Model):
+    """
+    Contadores precalculados de órdenes para el dashboard gerencial.
+    Se mantienen al día con señales de OrdenServicio (ver dashboard/kpis.py)
+    y se pueden reconstruir con el comando reconstruir_kpis.
+    """
+    DIMENSION_TOTAL = 'total'                 # Histórico completo (clave vacía)
+    DIMENSION_ESTADO = 'estado'               # Por estado (clave = estado)
+    DIMENSION_TECNICO = 'tecnico_activas'     # Activas por técnico (clave = id del técnico)
+    DIMENSION_SIN_ASIGNAR = 'sin_asignar'     # Activas sin técnico (clave vacía)
+    DIMENSION_OPCIONES = [
+        (DIMENSION_TOTAL, 'Total histórico'),
+        (DIMENSION_ESTADO, 'Órdenes por estado'),
+        (DIMENSION_TECNICO, 'Órdenes activas por técnico'),
+        (DIMENSION_SIN_ASIGNAR, 'Órdenes activas sin asignar'),
+    ]
+
+    dimension = models.CharField(max_length=30, choices=DIMENSION_OPCIONES)
+    clave = models.CharField(max_length=100, blank=True, default='')
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Resumen KPI"
+        verbose_name_plural = "Resúmenes KPI"
+        unique_together = [['dimension', 'clave']]
+
+    def __str__(self):
+        return f"{self.get_dimension_display()} [{self.clave}]: {self.total}"
@@ -0,0 +1,159 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from gestion_ordenes.models import OrdenServicio, BitacoraOrden
+from gestion_ordenes.signals import bitacora_creada_en_bloque, ordenes_actualizadas_en_bloque
+from . import cache_dashboards, eventos, kpis
+
+# Entradas de bitácora de una acción en bloque que se anuncian en vivo: las
+# que caben en el feed de recepción. Con cientos se saturaría la cola de cada
+# suscriptor (eventos.TAMANO_COLA) y se le cerraría la conexión.
+EVENTOS_BITACORA_EN_BLOQUE = 8
+
+
+def _kpi_anterior(instance):
+    """(estado, técnico) antes del save() en curso; lo lee gestion_ordenes en pre_save."""
+    anterior = getattr(instance, '_anterior', None)
+    return (anterior['estado'], anterior['tecnico_asignado_id']) if anterior else None
+
+
+@receiver(post_save, sender=OrdenServicio)
+def actualizar_kpis(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = _kpi_anterior(instance)
+    actual = (instance.estado, instance.tecnico_asignado_id)
+    if anterior != actual:
+        kpis.registrar_cambio(anterior, actual)
+
+
+@receiver(post_delete, sender=OrdenServicio)
+def descontar_kpis(sender, instance, **kwargs):
+    kpis.registrar_cambio((instance.estado, instance.tecnico_asignado_id), None)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def contar_ordenes_del_usuario(sender, instance, **kwargs):
+    # Antes de que SET_NULL desasigne sus órdenes (índice orden_tecnico_estado_idx)
+    instance._kpi_abiertas = OrdenServicio.objects.abiertas().filter(tecnico_asignado=instance).count()
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def descontar_kpis_por_usuario(sender, instance, **kwargs):
+    # Sólo los usuarios con órdenes abiertas asignadas mueven contadores
+    abiertas = getattr(instance, '_kpi_abiertas', 0)
+    if abiertas:
+        kpis.desasignar_tecnico(instance.pk, abiertas)
+        cache_dashboards.invalidar_al_confirmar(cache_dashboards.SECCION_RECEPCION, cache_dashboards.SECCION_GERENTE)
+
+
+# --- INVALIDACIÓN DEL CACHÉ DE DASHBOARDS ---
+
+@receiver(post_save, sender=OrdenServicio)
+@receiver(post_delete, sender=OrdenServicio)
+def invalidar_dashboards_orden(sender, instance, **kwargs):
+    secciones = {cache_dashboards.SECCION_RECEPCION, cache_dashboards.SECCION_GERENTE}
+    # El técnico actual y, si cambió, el anterior
+    anterior = _kpi_anterior(instance)
+    for tecnico_id in (instance.tecnico_asignado_id, anterior[1] if anterior else None):
+        if tecnico_id:
+            secciones.add(cache_dashboards.seccion_tecnico(tecnico_id))
+    cache_dashboards.invalidar_al_confirmar(*secciones)
+
+
+@receiver(post_save, sender=BitacoraOrden)
+@receiver(post_delete, sender=BitacoraOrden)
+def invalidar_dashboards_bitacora(sender, instance, **kwargs):
+    # Sólo recepción muestra el feed de actividad
+    cache_dashboards.invalidar_al_confirmar(cache_dashboards.SECCION_RECEPCION)
+
+
+# --- EVENTOS EN VIVO (SSE / long-poll) ---
+# Se publican al confirmar la transacción para no anunciar cambios revertidos.
+
+@receiver(post_save, sender=BitacoraOrden)
+def publicar_bitacora(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    datos = _datos_bitacora(instance)
+    transaction.on_commit(lambda: eventos.publicar('bitacora', datos))
+
+
+def _datos_bitacora(entrada):
+    return {
+        'orden_id': entrada.orden_id,
+        'usuario': entrada.usuario.username if entrada.usuario_id else None,
+        'descripcion': entrada.descripcion[:200],
+        'fecha_hora': entrada.fecha_hora.isoformat(),
+    }
+
+
+@receiver(post_save, sender=OrdenServicio)
+def publicar_cambio_orden(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = _kpi_anterior(instance)
+    actual = (instance.estado, instance.tecnico_asignado_id)
+    if anterior == actual:
+        return  # Sólo interesan altas, cambios de estado y de técnico
+    datos = {
+        'orden_id': instance.pk,
+        'estado': instance.estado,
+        'estado_anterior': anterior[0] if anterior else None,
+        'tecnico_id': instance.tecnico_asignado_id,
+        'creada': created,
+    }
+    transaction.on_commit(lambda: eventos.publicar('orden', datos))
+
+
+@receiver(post_delete, sender=OrdenServicio)
+def publicar_orden_eliminada(sender, instance, **kwargs):
+    datos = {'orden_id': instance.pk, 'eliminada': True}
+    transaction.on_commit(lambda: eventos.publicar('orden', datos))
+
+
+# --- ACCIONES EN BLOQUE (gestion_ordenes.acciones_masivas) ---
+# Lo mismo que las señales de arriba, una vez por bloque.
+
+@receiver(ordenes_actualizadas_en_bloque, sender=OrdenServicio)
+def actualizar_kpis_en_bloque(sender, cambios, **kwargs):
+    deltas = Counter()
+    for cambio in cambios:
+        if cambio.anterior != cambio.actual:
+            deltas.subtract(kpis.contribuciones(*cambio.anterior))
+            deltas.update(kpis.contribuciones(*cambio.actual))
+    kpis.aplicar_deltas(deltas)
+
+
+@receiver(ordenes_actualizadas_en_bloque, sender=OrdenServicio)
+def invalidar_dashboards_en_bloque(sender, cambios, **kwargs):
+    secciones = {cache_dashboards.SECCION_RECEPCION, cache_dashboards.SECCION_GERENTE}
+    for cambio in cambios:
+        for tecnico_id in (cambio.anterior[1], cambio.actual[1]):
+            if tecnico_id:
+                secciones.add(cache_dashboards.seccion_tecnico(tecnico_id))
+    cache_dashboards.invalidar_al_confirmar(*secciones)
+
+
+@receiver(ordenes_actualizadas_en_bloque, sender=OrdenServicio)
+def publicar_cambio_en_bloque(sender, cambios, **kwargs):
+    # Un solo evento: los dashboards sólo recargan sus paneles
+    orden_ids = [cambio.orden_id for cambio in cambios if cambio.anterior != cambio.actual]
+    if orden_ids:
+        datos = {'orden_ids': orden_ids, 'en_bloque': True}
+        transaction.on_commit(lambda: eventos.publicar('orden', datos))
+
+
+@receiver(bitacora_creada_en_bloque, sender=BitacoraOrden)
+def publicar_bitacora_en_bloque(sender, entradas, **kwargs):
+    cache_dashboards.invalidar_al_confirmar(cache_dashboards.SECCION_RECEPCION)
+    recientes = [_datos_bitacora(entrada) for entrada in entradas[-EVENTOS_BITACORA_EN_BLOQUE:]]
+
+    def publicar():
+        for datos in recientes:
+            eventos.publicar('bitacora', datos)
+    transaction.on_commit(publicar)
@@ -1,3 +1,232 @@
+import asyncio
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from gestion_clientes.models import Cliente, Equipo
+from gestion_ordenes.models import OrdenServicio
+
+from . import cache_dashboards, eventos, kpis, views
+from .models import ResumenKpi
+
+
+class DashboardTecnicoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tecnico = User.objects.create_user('tecnico', password='x')
+        cls.tecnico.groups.add(Group.objects.create(name='Técnico'))
+        cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+
+        estados = [
+            OrdenServicio.ESTADO_NUEVA,
+            OrdenServicio.ESTADO_ESPERANDO_REFACCION,
+            OrdenServicio.ESTADO_EN_REPARACION,
+            OrdenServicio.ESTADO_ENTREGADA,  # cerrada: no cuenta
+        ]
+        prioridades = [
+            OrdenServicio.PRIORIDAD_BAJA,
+            OrdenServicio.PRIORIDAD_ALTA,
+            OrdenServicio.PRIORIDAD_NORMAL,
+        ]
+        for i in range(12):
+            OrdenServicio.objects.create(
+                cliente=cliente, equipo=equipo, descripcion_falla=f'Falla {i}',
+                estado=estados[i % len(estados)], prioridad=prioridades[i % len(prioridades)],
+                tecnico_asignado=cls.tecnico,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.tecnico)
+
+    def test_numero_de_consultas_constante(self):
+        # sesión + usuario + agregación de KPIs + lista de órdenes
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('dashboard_tecnico'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_kpis_y_orden_por_prioridad(self):
+        response = self.client.get(reverse('dashboard_tecnico'))
+        ordenes = response.context['mis_ordenes']
+
+        self.assertEqual(response.context['stats'], {
+            'total': 9,
+            'detenidas': 3,
+            'por_diagnosticar': 3,
+            'criticas': 3,
+        })
+        pesos = [orden.prioridad_peso for orden in ordenes]
+        self.assertEqual(pesos, sorted(pesos))
+        self.assertEqual(ordenes[0].prioridad, OrdenServicio.PRIORIDAD_ALTA)
+
+    def test_peso_se_actualiza_con_la_prioridad(self):
+        orden = OrdenServicio.objects.filter(prioridad=OrdenServicio.PRIORIDAD_BAJA).first()
+        orden.prioridad = OrdenServicio.PRIORIDAD_ALTA
+        orden.save(update_fields=['prioridad'])
+        orden.refresh_from_db()
+        self.assertEqual(orden.prioridad_peso, OrdenServicio.PRIORIDAD_PESOS[OrdenServicio.PRIORIDAD_ALTA])
+
+        OrdenServicio.objects.filter(pk=orden.pk).update(prioridad=OrdenServicio.PRIORIDAD_BAJA)
+        orden.refresh_from_db()
+        self.assertEqual(orden.prioridad_peso, OrdenServicio.PRIORIDAD_PESOS[OrdenServicio.PRIORIDAD_BAJA])
+
+
+class SnapshotKpiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tecnico = User.objects.create_user('tecnico', password='x')
+        cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        cls.equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+        cls.cliente = cliente
+
+    def _orden(self, **campos):
+        return OrdenServicio.objects.create(
+            cliente=self.cliente, equipo=self.equipo, descripcion_falla='Falla', **campos)
+
+    def test_una_sola_lectura_de_la_fila_anterior(self):
+        orden = self._orden(tecnico_asignado=self.tecnico)
+        orden.estado = OrdenServicio.ESTADO_EN_REPARACION
+        with CaptureQueriesContext(connection) as consultas:
+            orden.save()
+        tabla = OrdenServicio._meta.db_table
+        lecturas = [c['sql'] for c in consultas.captured_queries
+                    if c['sql'].startswith('SELECT') and f'FROM "{tabla}"' in c['sql']]
+        self.assertEqual(len(lecturas), 1, lecturas)
+        self.assertEqual(kpis.diferencias(), {})
+
+    def test_borrar_tecnico_con_ordenes_abiertas(self):
+        self._orden(tecnico_asignado=self.tecnico)
+        self._orden(tecnico_asignado=self.tecnico, estado=OrdenServicio.ESTADO_ENTREGADA)
+        self._orden()
+        self.tecnico.delete()
+        self.assertEqual(kpis.diferencias(), {})
+        self.assertEqual(kpis.snapshot_actual()[(ResumenKpi.DIMENSION_SIN_ASIGNAR, '')], 2)
+
+    def test_borrar_usuario_sin_ordenes_no_reconstruye(self):
+        self._orden(tecnico_asignado=self.tecnico)
+        usuario = User.objects.create_user('recepcion', password='x')
+        with mock.patch.object(kpis, 'reconstruir') as reconstruir, \
+                mock.patch.object(kpis, 'aplicar_deltas') as aplicar_deltas:
+            usuario.delete()
+        reconstruir.assert_not_called()
+        aplicar_deltas.assert_not_called()
+        self.assertEqual(kpis.diferencias(), {})
+
+
+class InvalidacionCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tecnico = User.objects.create_user('tecnico', password='x')
+        cls.gerente = User.objects.create_user('gerente', password='x', is_superuser=True)
+        cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+        cls.orden = OrdenServicio.objects.create(cliente=cliente, equipo=equipo, descripcion_falla='Falla')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.gerente)
+
+    def test_invalida_al_confirmar(self):
+        self.assertEqual(self.client.get(reverse('dashboard_gerente')).context['kpi_sin_asignar'], 1)
+        secciones = [cache_dashboards.SECCION_GERENTE, cache_dashboards.seccion_tecnico(self.tecnico.pk)]
+        generaciones = [cache.get(cache_dashboards._llave_generacion(s), 0) for s in secciones]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.orden.tecnico_asignado = self.tecnico
+            self.orden.save()
+            # Sin confirmar: la generación no cambia todavía
+            self.assertEqual([cache.get(cache_dashboards._llave_generacion(s), 0) for s in secciones], generaciones)
+
+        self.assertEqual([cache.get(cache_dashboards._llave_generacion(s), 0) for s in secciones],
+                         [g + 1 for g in generaciones])
+        self.assertEqual(self.client.get(reverse('dashboard_gerente')).context['kpi_sin_asignar'], 0)
+
+
+class EventosEnVivoTests(TestCase):
+    """SSE y long-poll con un canal propio (el del proceso lo comparten todas las pruebas)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('recepcion', password='x')
+
+    def setUp(self):
+        self.canal = eventos.CanalEventos()
+        parche = mock.patch.object(eventos, 'canal', self.canal)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def _publicar(self, cantidad):
+        for i in range(cantidad):
+            self.canal.publicar('bitacora', {'n': i})
+
+    async def _sse(self, **headers):
+        await self.async_client.aforce_login(self.usuario)
+        response = await self.async_client.get(reverse('dashboard_eventos'), headers=headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return response.streaming_content
+
+    async def _ids_sse(self, flujo, cantidad):
+        ids = []
+        for _ in range(cantidad):
+            bloque = await asyncio.wait_for(anext(flujo), 1)
+            ids.append(int(bloque.split(b'\n')[0].removeprefix(b'id: ')))
+        return ids
+
+    async def _espera(self, **params):
+        await self.async_client.aforce_login(self.usuario)
+        response = await self.async_client.get(reverse('dashboard_eventos_espera'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    async def test_sse_reenvia_lo_perdido(self):
+        self._publicar(3)
+        flujo = await self._sse(last_event_id='1')
+        self.assertTrue((await anext(flujo)).startswith(b'retry:'))
+        self.assertEqual(await self._ids_sse(flujo, 2), [2, 3])
+        self._publicar(1)
+        self.assertEqual(await self._ids_sse(flujo, 1), [4])
+        await flujo.aclose()
+
+    async def test_sse_id_de_antes_del_reinicio(self):
+        # El cliente vio hasta el 500 de otro proceso; éste reinició el contador
+        self._publicar(2)
+        flujo = await self._sse(last_event_id='500')
+        await anext(flujo)
+        self.assertEqual(await self._ids_sse(flujo, 2), [1, 2])
+        self._publicar(1)
+        self.assertEqual(await self._ids_sse(flujo, 1), [3])
+        await flujo.aclose()
+
+    async def test_espera_responde_con_lo_posterior(self):
+        self._publicar(3)
+        datos = await self._espera(desde=1)
+        self.assertEqual([evento['id'] for evento in datos['eventos']], [2, 3])
+        self.assertEqual(datos['ultimo_id'], 3)
+
+    async def test_espera_hasta_que_llega_un_evento(self):
+        self._publicar(1)
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, self._publicar, 1)
+        datos = await self._espera(desde=1)
+        self.assertEqual([evento['id'] for evento in datos['eventos']], [2])
+
+    async def test_espera_id_de_antes_del_reinicio(self):
+        self._publicar(2)
+        datos = await self._espera(desde=500)
+        self.assertEqual([evento['id'] for evento in datos['eventos']], [1, 2])
+        self.assertEqual(datos['ultimo_id'], 2)
 
-# Create your tests here.
+        with mock.patch.object(views, 'ESPERA_LONG_POLL', 0.05):
+            self.canal = eventos.CanalEventos()
+            with mock.patch.object(eventos, 'canal', self.canal):
+                datos = await self._espera(desde=500)
+        self.assertEqual(datos, {'ultimo_id': 0, 'eventos': []})
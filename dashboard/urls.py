@@ -9,4 +9,14 @@ urlpatterns = [
     path('recepcion/', views.dashboard_recepcion, name='dashboard_recepcion'),
     path('tecnico/', views.dashboard_tecnico, name='dashboard_tecnico'),
     path('gerencia/', views.dashboard_gerente, name='dashboard_gerente'),
+
+    # Actividad en vivo (SSE y long-poll de respaldo)
+    path('eventos/', views.eventos_stream, name='dashboard_eventos'),
+    path('eventos/espera/', views.eventos_espera, name='dashboard_eventos_espera'),
+
+    # Monitoreo del caché de dashboards (staff)
+    path('cache/estadisticas/', views.estadisticas_cache, name='dashboard_cache_estadisticas'),
+
+    # Consultas SQL y tiempos por vista (staff)
+    path('peticiones/estadisticas/', views.estadisticas_peticiones, name='dashboard_estadisticas_peticiones'),
 ]
\ No newline at end of file
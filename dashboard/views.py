@@ -1,11 +1,22 @@
+import asyncio
+
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.contrib.auth.decorators import login_required
-from django.db.models import Case, When, Value, IntegerField, Count
+from django.http import JsonResponse, StreamingHttpResponse
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.models import User
+from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
 
+from sistema_crm_pacscomputacion import metricas
+from sistema_crm_pacscomputacion.metricas import presupuesto_consultas
+from sistema_crm_pacscomputacion.replicas import lectura_en_replica
+
 # Importamos modelos necesarios de otras apps
 from gestion_ordenes.models import OrdenServicio, BitacoraOrden
+from .models import ResumenKpi
+from . import cache_dashboards, eventos
 
 @login_required
 def dashboard_home(request):
@@ -31,10 +42,20 @@ def dashboard_home(request):
         return redirect('dashboard_recepcion')
 
 @login_required
+@lectura_en_replica
+@presupuesto_consultas(10)
 def dashboard_recepcion(request):
     """
     UI-DASH-01: Centro de comando para recepción.
     """
+    # El día forma parte de la llave: "Cerradas hoy" cambia a medianoche
+    hoy = timezone.localdate().isoformat()
+    context = cache_dashboards.obtener_contexto(
+        cache_dashboards.SECCION_RECEPCION, _contexto_recepcion, rol='recepcion', variante=hoy
+    )
+    return render(request, 'dashboard/dash_recepcion.html', context)
+
+def _contexto_recepcion():
     # 1. Definir el rango exacto de "HOY" en hora local
     # Esto evita problemas de desfase UTC en la base de datos
     now_local = timezone.localtime()
@@ -42,12 +63,7 @@ def dashboard_recepcion(request):
     fin_dia = now_local.replace(hour=23, minute=59, second=59, microsecond=999999)
 
     # 2. KPI: Total Órdenes Activas
-    total_abiertas = OrdenServicio.objects.exclude(
-        estado__in=[
-            OrdenServicio.ESTADO_ENTREGADA, 
-            OrdenServicio.ESTADO_CANCELADA
-        ]
-    ).count()
+    total_abiertas = OrdenServicio.objects.abiertas().count()
     
     # 3. KPI: Cerradas Hoy (SOLUCIÓN IMPLEMENTADA)
     # Usamos __range con las horas exactas. Django convierte esto a UTC automáticamente al consultar.
@@ -69,32 +85,33 @@ def dashboard_recepcion(request):
     # 6. Feed de Actividad Reciente
     ultimas_bitacoras = BitacoraOrden.objects.select_related('orden', 'usuario').order_by('-fecha_hora')[:8]
 
-    context = {
+    # Listas ya evaluadas: el contexto se guarda en caché
+    return {
         'kpi_abiertas': total_abiertas,
         'kpi_cerradas_hoy': cerradas_hoy,
-        'ordenes_para_entrega': ordenes_para_entrega,
-        'ordenes_sin_asignar': ordenes_sin_asignar,
-        'feed_actividad': ultimas_bitacoras,
+        'ordenes_para_entrega': list(ordenes_para_entrega),
+        'ordenes_sin_asignar': list(ordenes_sin_asignar),
+        'feed_actividad': list(ultimas_bitacoras),
     }
-    return render(request, 'dashboard/dash_recepcion.html', context)
 
 @login_required
+@lectura_en_replica
+@presupuesto_consultas(6)
 def dashboard_tecnico(request):
     """
     UI-DASH-02: Dashboard Técnico corregido.
     """
     user = request.user
-    
-    # 1. CORRECCIÓN DE ORDENAMIENTO: Usar 'Normal' en lugar de 'Media'
-    priority_order = Case(
-        When(prioridad='Alta', then=Value(1)),
-        When(prioridad='Normal', then=Value(2)), # Corregido
-        When(prioridad='Baja', then=Value(3)),
-        default=Value(4),
-        output_field=IntegerField(),
+    context = cache_dashboards.obtener_contexto(
+        cache_dashboards.seccion_tecnico(user.id), lambda: _contexto_tecnico(user), rol='tecnico'
     )
+    # El saludo depende de la hora, no se cachea
+    context = dict(context, saludo=timezone.localtime().strftime('%H'))
+    return render(request, 'dashboard/dash_tecnico.html', context)
 
-    # 2. Consulta Maestra
+def _contexto_tecnico(user):
+    # 1. Consulta Maestra: ordenada por el peso de prioridad guardado
+    # (índice orden_tecnico_prioridad_idx), urgentes y más antiguas primero
     mis_ordenes = OrdenServicio.objects.filter(
         tecnico_asignado=user
     ).exclude(
@@ -103,82 +120,99 @@ def dashboard_tecnico(request):
             OrdenServicio.ESTADO_ENTREGADA,
             OrdenServicio.ESTADO_CANCELADA
         ]
-    ).select_related('cliente', 'equipo').annotate(
-        prio_weight=priority_order
-    ).order_by('prio_weight', 'fecha_creacion')
+    ).select_related('cliente', 'equipo').order_by('prioridad_peso', 'fecha_creacion')
 
-    # 3. KPIs Corregidos
-    detenidas_refaccion = mis_ordenes.filter(estado=OrdenServicio.ESTADO_ESPERANDO_REFACCION).count()
-    
-    # CORRECCIÓN KPI: Solo contar "Nuevas" como pendientes de tocar.
-    # Si ya está "En diagnóstico", el técnico ya la tomó, así que sale de este contador.
-    pendientes_inicio = mis_ordenes.filter(estado=OrdenServicio.ESTADO_NUEVA).count()
-
-    criticas = mis_ordenes.filter(prioridad='Alta').count()
-
-    context = {
-        'mis_ordenes': mis_ordenes,
-        'stats': {
-            'total': mis_ordenes.count(),
-            'detenidas': detenidas_refaccion,
-            'por_diagnosticar': pendientes_inicio, # Variable renombrada lógicamente, aunque en template usaremos la misma key o adaptamos
-            'criticas': criticas,
-        },
-        'saludo': timezone.localtime().strftime('%H')
+    # 2. KPIs en una sola pasada (agregación condicional)
+    # "Por diagnosticar" cuenta sólo las "Nuevas": si ya está "En diagnóstico",
+    # el técnico ya la tomó, así que sale de este contador.
+    stats = mis_ordenes.order_by().aggregate(
+        total=Count('id'),
+        detenidas=Count('id', filter=Q(estado=OrdenServicio.ESTADO_ESPERANDO_REFACCION)),
+        por_diagnosticar=Count('id', filter=Q(estado=OrdenServicio.ESTADO_NUEVA)),
+        criticas=Count('id', filter=Q(prioridad=OrdenServicio.PRIORIDAD_ALTA)),
+    )
+
+    return {
+        'mis_ordenes': list(mis_ordenes),
+        'stats': stats,
     }
-    
-    return render(request, 'dashboard/dash_tecnico.html', context)
 
 @login_required
+@lectura_en_replica
+@presupuesto_consultas(10)
 def dashboard_gerente(request):
     """
     UI-DASH-03: Dashboard Gerencial.
     Se envían listas de Python puras para ser serializadas seguramente en el template.
+    Los contadores salen del snapshot ResumenKpi (mantenido por señales),
+    no de agregar toda la tabla de órdenes en cada carga.
     """
-    # 1. Consultas Base (Activas)
-    qs_activas = OrdenServicio.objects.exclude(
-        estado__in=[OrdenServicio.ESTADO_ENTREGADA, OrdenServicio.ESTADO_CANCELADA]
+    context = cache_dashboards.obtener_contexto(
+        cache_dashboards.SECCION_GERENTE, _contexto_gerente, rol='gerente'
     )
+    return render(request, 'dashboard/dash_gerente.html', context)
+
+def _contexto_gerente():
+    # 1. Consultas Base (Activas)
+    qs_activas = OrdenServicio.objects.abiertas()
+
+    # 2. KPIs (snapshot precalculado)
+    resumen = {}
+    for fila in ResumenKpi.objects.all():
+        resumen.setdefault(fila.dimension, {})[fila.clave] = fila.total
 
-    # 2. KPIs
-    total_historico = OrdenServicio.objects.count()
-    total_activas = qs_activas.count()
+    por_estado = resumen.get(ResumenKpi.DIMENSION_ESTADO, {})
+    por_tecnico = resumen.get(ResumenKpi.DIMENSION_TECNICO, {})
+
+    total_historico = resumen.get(ResumenKpi.DIMENSION_TOTAL, {}).get('', 0)
+    total_activas = sum(
+        total for estado, total in por_estado.items()
+        if estado not in (OrdenServicio.ESTADO_ENTREGADA, OrdenServicio.ESTADO_CANCELADA)
+    )
+    total_sin_asignar = resumen.get(ResumenKpi.DIMENSION_SIN_ASIGNAR, {}).get('', 0)
     
     fecha_limite = timezone.now() - timedelta(days=3)
     alertas_qs = qs_activas.filter(
         prioridad=OrdenServicio.PRIORIDAD_ALTA,
         fecha_creacion__lte=fecha_limite
-    ).select_related('cliente', 'tecnico_asignado')[:10]
-    
-    total_sin_asignar = qs_activas.filter(tecnico_asignado__isnull=True).count()
+    ).select_related('cliente', 'equipo', 'tecnico_asignado')[:10]
 
     # 3. PREPARACIÓN DE DATOS (Listas Python Puras)
     
-    # A) Gráfico de Estados
-    raw_estados = qs_activas.values('estado').annotate(count=Count('id')).order_by('-count')
-    chart_estado_labels = [item['estado'] for item in raw_estados]
-    chart_estado_data = [item['count'] for item in raw_estados]
+    # A) Gráfico de Estados (sólo activas, de mayor a menor)
+    raw_estados = sorted(
+        ((estado, total) for estado, total in por_estado.items()
+         if total > 0 and estado not in (OrdenServicio.ESTADO_ENTREGADA, OrdenServicio.ESTADO_CANCELADA)),
+        key=lambda item: -item[1]
+    )
+    chart_estado_labels = [estado for estado, _ in raw_estados]
+    chart_estado_data = [total for _, total in raw_estados]
 
     # B) Gráfico de Técnicos
-    raw_tecnicos = qs_activas.exclude(tecnico_asignado__isnull=True).values(
-        'tecnico_asignado__first_name', 
-        'tecnico_asignado__username'
-    ).annotate(count=Count('id')).order_by('-count')
+    raw_tecnicos = sorted(
+        ((int(tecnico_id), total) for tecnico_id, total in por_tecnico.items() if total > 0),
+        key=lambda item: -item[1]
+    )
+    tecnicos = User.objects.in_bulk([tecnico_id for tecnico_id, _ in raw_tecnicos])
     
     chart_tecnico_labels = []
-    for item in raw_tecnicos:
+    chart_tecnico_data = []
+    for tecnico_id, total in raw_tecnicos:
+        tecnico = tecnicos.get(tecnico_id)
+        if tecnico is None:
+            continue
         # Usar nombre real si existe, sino el usuario
-        nombre = item['tecnico_asignado__first_name'] or item['tecnico_asignado__username']
-        chart_tecnico_labels.append(nombre)
-        
-    chart_tecnico_data = [item['count'] for item in raw_tecnicos]
+        chart_tecnico_labels.append(tecnico.first_name or tecnico.username)
+        chart_tecnico_data.append(total)
 
-    context = {
+    alertas_retraso = list(alertas_qs)
+
+    return {
         'kpi_total': total_historico,
         'kpi_activas': total_activas,
-        'kpi_retraso': alertas_qs.count(),
+        'kpi_retraso': len(alertas_retraso),
         'kpi_sin_asignar': total_sin_asignar,
-        'alertas_retraso': alertas_qs,
+        'alertas_retraso': alertas_retraso,
         
         # Enviamos las listas directamente
         'chart_estado_labels': chart_estado_labels,
@@ -186,4 +220,100 @@ def dashboard_gerente(request):
         'chart_tecnico_labels': chart_tecnico_labels,
         'chart_tecnico_data': chart_tecnico_data,
     }
-    return render(request, 'dashboard/dash_gerente.html', context)
\ No newline at end of file
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def estadisticas_cache(request):
+    """Aciertos/fallos del caché de dashboards por rol (monitoreo, sólo staff)."""
+    return JsonResponse(cache_dashboards.estadisticas())
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def estadisticas_peticiones(request):
+    """Consultas SQL y tiempos por vista de este proceso (monitoreo, sólo staff). Ver metricas.py."""
+    return JsonResponse(metricas.estadisticas())
+
+# --- EVENTOS EN VIVO ---
+# Vistas asíncronas: servidas por ASGI (asgi.py) cada conexión abierta es una
+# corrutina en espera, no un hilo. Ver dashboard/eventos.py.
+
+# Comentario SSE periódico: mantiene viva la conexión a través de proxies
+INTERVALO_LATIDO = getattr(settings, 'DASHBOARD_SSE_LATIDO', 15)
+ESPERA_LONG_POLL = getattr(settings, 'DASHBOARD_LONG_POLL_ESPERA', 25)
+REINTENTO_MS = 3000
+
+
+def _id_evento(valor):
+    try:
+        return max(int(valor), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _punto_de_partida(desde):
+    """
+    Id después del cual se envían eventos: `desde`, o el último publicado si
+    el cliente no trae uno. Un id mayor al último publicado es de antes de
+    reiniciar el proceso (los ids vuelven a empezar en 1): se parte de 0 y se
+    le envía todo el buffer, que el cliente no vio; si no, con un id fijo en
+    500 no recibiría nada hasta que el contador lo alcanzara.
+    """
+    ultimo_id = eventos.canal.ultimo_id
+    if desde is None:
+        return ultimo_id
+    return 0 if desde > ultimo_id else desde
+
+
+async def _flujo_sse(desde):
+    async with eventos.canal.suscribir() as suscripcion:
+        yield f'retry: {REINTENTO_MS}\n\n'
+        # Suscritos primero y luego el buffer: nada se pierde entre ambos pasos
+        ultimo = _punto_de_partida(desde)
+        for evento in eventos.canal.posteriores(ultimo):
+            ultimo = evento.id
+            yield evento.como_sse()
+
+        while not suscripcion.saturada:
+            evento = await suscripcion.siguiente(INTERVALO_LATIDO)
+            if evento is None:
+                yield ': latido\n\n'
+            elif evento.id > ultimo:
+                ultimo = evento.id
+                yield evento.como_sse()
+
+
+@login_required
+async def eventos_stream(request):
+    """
+    Server-Sent Events con la actividad del sistema (nuevas entradas de
+    bitácora y cambios de estado de órdenes). El navegador se reconecta solo
+    enviando Last-Event-ID, y se le reenvía lo que se perdió.
+    """
+    desde = _id_evento(request.headers.get('Last-Event-ID') or request.GET.get('desde'))
+    response = StreamingHttpResponse(_flujo_sse(desde), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: no acumular el stream
+    return response
+
+
+@login_required
+async def eventos_espera(request):
+    """
+    Alternativa long-poll para clientes sin EventSource (o detrás de proxies
+    que cortan streams): responde en cuanto hay eventos posteriores a
+    ?desde=<id>, o vacío tras ESPERA_LONG_POLL segundos.
+    """
+    async with eventos.canal.suscribir() as suscripcion:
+        desde = _punto_de_partida(_id_evento(request.GET.get('desde')))
+        pendientes = eventos.canal.posteriores(desde)
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + ESPERA_LONG_POLL
+        while not pendientes and loop.time() < limite:
+            evento = await suscripcion.siguiente(limite - loop.time())
+            if evento is not None and evento.id > desde:
+                pendientes = eventos.canal.posteriores(desde)
+
+    return JsonResponse({
+        'ultimo_id': pendientes[-1].id if pendientes else desde,
+        'eventos': [evento.como_dict() for evento in pendientes],
+    })
@@ -1,6 +1,78 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .importacion import COLUMNAS_CLIENTE, COLUMNAS_EQUIPO, importar
 from .models import Cliente, Equipo
 
-# Register your models here.
-admin.site.register(Cliente)
-admin.site.register(Equipo)
\ No newline at end of file
+EXTENSIONES_IMPORTACION = ('.csv', '.xlsx')
+
+
+class ImportacionForm(forms.Form):
+    clientes = forms.FileField(required=False, label="Archivo de clientes (.csv o .xlsx)")
+    equipos = forms.FileField(required=False, label="Archivo de equipos (.csv o .xlsx)")
+    indexar = forms.BooleanField(
+        required=False, initial=True, label="Indexar la búsqueda difusa",
+        help_text="Desmárcalo en importaciones muy grandes y corre después reconstruir_trigramas.",
+    )
+
+    def clean(self):
+        datos = super().clean()
+        if not datos.get('clientes') and not datos.get('equipos'):
+            raise forms.ValidationError("Selecciona al menos un archivo.")
+        for campo in ('clientes', 'equipos'):
+            archivo = datos.get(campo)
+            if archivo and not archivo.name.lower().endswith(EXTENSIONES_IMPORTACION):
+                self.add_error(campo, "Sólo se aceptan archivos .csv o .xlsx.")
+        return datos
+
+
+@admin.register(Cliente)
+class ClienteAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/gestion_clientes/cliente/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('importar/', self.admin_site.admin_view(self.importar_view), name='gestion_clientes_cliente_importar'),
+        ] + super().get_urls()
+
+    def importar_view(self, request):
+        """Carga masiva de clientes y equipos (ver gestion_clientes/importacion.py)."""
+        if not (request.user.has_perm('gestion_clientes.add_cliente') and request.user.has_perm('gestion_clientes.add_equipo')):
+            raise PermissionDenied
+
+        resultado = None
+        form = ImportacionForm(request.POST, request.FILES) if request.method == 'POST' else ImportacionForm()
+        if form.is_bound and form.is_valid():
+            clientes, equipos = form.cleaned_data['clientes'], form.cleaned_data['equipos']
+            resultado = importar(
+                clientes=clientes, equipos=equipos,
+                nombre_clientes=clientes.name if clientes else None,
+                nombre_equipos=equipos.name if equipos else None,
+                indexar=form.cleaned_data['indexar'],
+            )
+            nivel = messages.WARNING if resultado.total_errores else messages.SUCCESS
+            self.message_user(
+                request,
+                f"Importados {resultado.clientes} clientes y {resultado.equipos} equipos; "
+                f"{resultado.total_errores} filas rechazadas ({resultado.duplicados} duplicadas).",
+                nivel,
+            )
+            if not resultado.total_errores:
+                return redirect('admin:gestion_clientes_cliente_changelist')
+
+        return TemplateResponse(request, 'admin/gestion_clientes/cliente/importar.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Importar clientes y equipos",
+            'form': form,
+            'resultado': resultado,
+            'columnas_cliente': COLUMNAS_CLIENTE,
+            'columnas_equipo': COLUMNAS_EQUIPO,
+        })
+
+
+admin.site.register(Equipo)
@@ -0,0 +1,169 @@
+"""
+Búsqueda tipo "typeahead" de clientes para el formulario de nueva orden.
+
+Las coincidencias (nombre, o teléfono si lo tecleado lo parece, que empieza
+con lo tecleado) se resuelven en SQL sobre las columnas normalizadas de
+Cliente, con sus índices, y los resultados recientes se guardan en un caché
+LRU en memoria del proceso.
+
+Cada escritura de Cliente o Equipo (ver gestion_clientes.signals), al
+confirmarse, incrementa un número de generación guardado en el caché de
+Django: con un caché compartido (redis, memcached) todos los workers dejan de
+usar sus entradas anteriores. Además cada entrada vive a lo más TTL_ENTRADAS
+segundos, que acota lo viejo que puede estar un worker si el caché de Django
+no es compartido (locmem).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Cliente, Equipo, es_telefono, filtro_prefijo, normalizar_texto, solo_digitos
+
+LIMITE_RESULTADOS = 15
+LONGITUD_MINIMA = 3
+TTL_ENTRADAS = getattr(settings, 'AUTOCOMPLETADO_CACHE_TTL', 60)
+LLAVE_GENERACION = 'autocompletado:gen'
+
+
+class CacheAutocompletado:
+    """
+    Caché LRU (thread-safe) de búsquedas recientes, indexado por texto
+    normalizado. Una entrada sólo vale con la generación con la que se guardó
+    y durante `ttl` segundos.
+    """
+
+    def __init__(self, max_entradas=256, ttl=TTL_ENTRADAS):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def generacion(self):
+        return cache.get(LLAVE_GENERACION, 0)
+
+    def obtener(self, clave, generacion):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            guardada, expira, valor = entrada
+            if guardada != generacion or expira < time.monotonic():
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, generacion, valor):
+        with self._lock:
+            self._entradas[clave] = (generacion, time.monotonic() + self.ttl, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        """Vacía sólo el caché de este proceso."""
+        with self._lock:
+            self._entradas.clear()
+
+    def invalidar(self):
+        """Invalida las entradas de todos los procesos (nueva generación) y vacía las de éste."""
+        # incr() falla si la llave no existe; add() no pisa un valor existente
+        cache.add(LLAVE_GENERACION, 0, timeout=None)
+        try:
+            cache.incr(LLAVE_GENERACION)
+        except ValueError:
+            cache.set(LLAVE_GENERACION, 1, timeout=None)
+        self.limpiar()
+
+
+cache_autocompletado = CacheAutocompletado()
+
+
+def _coincide(resultado, q_norm, q_digitos):
+    if q_digitos:
+        return resultado['_telefono'].startswith(q_digitos)
+    return resultado['_nombre'].startswith(q_norm)
+
+
+def _consultar(q_norm, q_digitos):
+    # Lo que parece teléfono se busca sólo por teléfono y en su orden: así se
+    # recorre el índice hasta juntar la página, en vez de ordenar por nombre
+    # todas las coincidencias de un prefijo corto como '331'.
+    if q_digitos:
+        condicion = filtro_prefijo('telefono_normalizado', q_digitos)
+        orden = ('telefono_normalizado', 'id')
+    else:
+        condicion = filtro_prefijo('nombre_normalizado', q_norm)
+        orden = ('nombre_normalizado', 'id')
+
+    equipos = Equipo.objects.only('id', 'cliente_id', 'tipo_equipo', 'marca', 'modelo', 'numero_serie')
+    clientes = (
+        Cliente.objects.filter(condicion)
+        .only('id', 'nombre_completo', 'telefono', 'nombre_normalizado', 'telefono_normalizado')
+        .order_by(*orden)
+        .prefetch_related(Prefetch('equipos', queryset=equipos))
+        # Pedimos uno de más para saber si la lista quedó truncada
+        [:LIMITE_RESULTADOS + 1]
+    )
+
+    resultados = []
+    for c in clientes:
+        resultados.append({
+            'id': c.id,
+            'nombre': c.nombre_completo,
+            'telefono': c.telefono,
+            'equipos': [{
+                'id': eq.id,
+                'tipo_equipo': eq.get_tipo_equipo_display(),
+                'marca': eq.marca,
+                'modelo': eq.modelo,
+                'numero_serie': eq.numero_serie
+            } for eq in c.equipos.all()],
+            '_nombre': c.nombre_normalizado,
+            '_telefono': c.telefono_normalizado,
+        })
+    completo = len(resultados) <= LIMITE_RESULTADOS
+    return resultados[:LIMITE_RESULTADOS], completo
+
+
+def buscar_clientes(query):
+    """
+    Devuelve hasta LIMITE_RESULTADOS clientes (con sus equipos) cuyo nombre
+    empieza con el texto buscado, sin distinguir acentos ni mayúsculas; si lo
+    buscado parece teléfono, aquellos cuyo teléfono empieza con esos dígitos.
+    """
+    q_norm = normalizar_texto(query.strip())
+    if len(q_norm) < LONGITUD_MINIMA:
+        return []
+    q_digitos = _digitos(q_norm)
+    clave = (q_norm, q_digitos)
+    generacion = cache_autocompletado.generacion()
+
+    entrada = cache_autocompletado.obtener(clave, generacion)
+    if entrada is None:
+        # Al teclear, cada búsqueda extiende a la anterior: si un prefijo ya
+        # está en caché con la lista completa, basta con filtrarlo en memoria.
+        # (Sólo si ambos se buscaron igual: por teléfono o por nombre.)
+        for i in range(len(q_norm) - 1, LONGITUD_MINIMA - 1, -1):
+            p_digitos = _digitos(q_norm[:i])
+            if bool(p_digitos) != bool(q_digitos):
+                continue
+            previa = cache_autocompletado.obtener((q_norm[:i], p_digitos), generacion)
+            if previa is not None and previa[1]:
+                entrada = ([r for r in previa[0] if _coincide(r, q_norm, q_digitos)], True)
+                break
+        if entrada is None:
+            entrada = _consultar(q_norm, q_digitos)
+        cache_autocompletado.guardar(clave, generacion, entrada)
+
+    resultados, _completo = entrada
+    return [{k: v for k, v in r.items() if not k.startswith('_')} for r in resultados]
+
+
+def _digitos(q_norm):
+    """Dígitos a comparar con el teléfono ('' si lo buscado no parece teléfono)."""
+    return solo_digitos(q_norm) if es_telefono(q_norm) else ''
@@ -0,0 +1,289 @@
+"""
+Búsqueda difusa (tolerante a errores de captura) de clientes y equipos.
+
+Compara trigramas, como pg_trgm: "Gonzales" encuentra "González" y un número
+de serie con un carácter equivocado sigue encontrando su equipo. La medida es
+la "similitud por palabra" de pg_trgm: qué fracción de los trigramas de lo
+buscado aparece en el campo.
+
+Hay dos backends intercambiables:
+- BackendTrigramasSQL: mantiene su propio índice invertido (TrigramaBusqueda),
+  actualizado de forma incremental con señales. Funciona en cualquier base.
+- BackendPgTrgm: en PostgreSQL delega en la extensión pg_trgm y en los
+  índices GIN creados por la migración; no necesita índice propio.
+
+El backend se elige por el motor de la base de datos, o explícitamente con el
+setting BUSQUEDA_DIFUSA_BACKEND (ruta al módulo y clase).
+"""
+import itertools
+import math
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.utils.module_loading import import_string
+
+from .models import Cliente, Equipo, TrigramaBusqueda, normalizar_texto, solo_digitos
+
+# Umbral de pg_trgm para word_similarity (pg_trgm.word_similarity_threshold)
+UMBRAL_SIMILITUD = 0.6
+LIMITE_RESULTADOS = 10
+# Trigramas con más filas que esto en el índice ('  j', 'ez ') no se usan para
+# buscar candidatos si quedan suficientes raros: sólo se cuentan en los
+# candidatos que dieron los demás.
+FRECUENCIA_MAXIMA = 5000
+# Candidatos (objeto, campo) que se evalúan por búsqueda: los que tienen más
+# trigramas raros en común. Con un texto muy común pueden quedar fuera objetos
+# que alcanzarían el umbral al sumar los frecuentes; la búsqueda sólo muestra
+# LIMITE_RESULTADOS, y para afinar se escribe más.
+CANDIDATOS_MAXIMOS = 500
+
+
+def trigramas(texto):
+    """
+    Trigramas de un texto al estilo pg_trgm: cada palabra normalizada se
+    rellena con dos espacios al inicio y uno al final.
+    Ejemplo: 'Ana' -> {'  a', ' an', 'ana', 'na '}
+    """
+    resultado = set()
+    for palabra in re.findall(r'[a-z0-9]+', normalizar_texto(texto)):
+        relleno = f'  {palabra} '
+        for i in range(len(relleno) - 2):
+            resultado.add(relleno[i:i + 3])
+    return resultado
+
+
+def campos_cliente(cliente):
+    return {
+        'nombre_completo': cliente.nombre_completo,
+        'telefono': solo_digitos(cliente.telefono),
+    }
+
+
+def campos_equipo(equipo):
+    return {
+        'numero_serie': equipo.numero_serie,
+        'modelo': equipo.modelo,
+    }
+
+
+class BackendTrigramasSQL:
+    """Índice invertido de trigramas en una tabla normal (SQLite u otros)."""
+
+    def __init__(self, frecuencia_maxima=FRECUENCIA_MAXIMA):
+        self.frecuencia_maxima = frecuencia_maxima
+
+    def _filas(self, entidad, objeto_id, cliente_id, campos):
+        filas = []
+        for campo, valor in campos.items():
+            tris = trigramas(valor)
+            for tri in tris:
+                filas.append(TrigramaBusqueda(
+                    trigrama=tri, entidad=entidad, objeto_id=objeto_id,
+                    cliente_id=cliente_id, campo=campo, total=len(tris),
+                ))
+        return filas
+
+    def indexar_cliente(self, cliente):
+        with transaction.atomic():
+            self.eliminar(TrigramaBusqueda.ENTIDAD_CLIENTE, cliente.pk)
+            TrigramaBusqueda.objects.bulk_create(
+                self._filas(TrigramaBusqueda.ENTIDAD_CLIENTE, cliente.pk, cliente.pk, campos_cliente(cliente))
+            )
+
+    def indexar_equipo(self, equipo):
+        with transaction.atomic():
+            self.eliminar(TrigramaBusqueda.ENTIDAD_EQUIPO, equipo.pk)
+            TrigramaBusqueda.objects.bulk_create(
+                self._filas(TrigramaBusqueda.ENTIDAD_EQUIPO, equipo.pk, equipo.cliente_id, campos_equipo(equipo))
+            )
+
+    def eliminar(self, entidad, objeto_id):
+        TrigramaBusqueda.objects.filter(entidad=entidad, objeto_id=objeto_id).delete()
+
+    def indexar_nuevos(self, clientes=(), equipos=()):
+        """
+        Indexa en bloque objetos recién creados (importación masiva): no hay
+        trigramas previos que borrar. Son decenas de filas por objeto, así que
+        se insertan como tuplas con executemany en lugar de instancias del modelo.
+        """
+        filas = []
+        for entidad, objetos, campos in (
+            (TrigramaBusqueda.ENTIDAD_CLIENTE, clientes, campos_cliente),
+            (TrigramaBusqueda.ENTIDAD_EQUIPO, equipos, campos_equipo),
+        ):
+            for objeto in objetos:
+                cliente_id = objeto.pk if entidad == TrigramaBusqueda.ENTIDAD_CLIENTE else objeto.cliente_id
+                for campo, valor in campos(objeto).items():
+                    tris = trigramas(valor)
+                    filas.extend((tri, entidad, objeto.pk, cliente_id, campo, len(tris)) for tri in tris)
+        if filas:
+            tabla = connection.ops.quote_name(TrigramaBusqueda._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {tabla} (trigrama, entidad, objeto_id, cliente_id, campo, total) "
+                    "VALUES (%s, %s, %s, %s, %s, %s)",
+                    filas,
+                )
+        return len(filas)
+
+    def reconstruir(self, lote=2000):
+        """Vuelve a generar el índice completo. Devuelve el número de filas creadas."""
+        total = 0
+        with transaction.atomic():
+            TrigramaBusqueda.objects.all().delete()
+            clientes = Cliente.objects.only('id', 'nombre_completo', 'telefono').iterator(chunk_size=lote)
+            while grupo := list(itertools.islice(clientes, lote)):
+                total += self.indexar_nuevos(clientes=grupo)
+            equipos = Equipo.objects.only('id', 'cliente_id', 'numero_serie', 'modelo').iterator(chunk_size=lote)
+            while grupo := list(itertools.islice(equipos, lote)):
+                total += self.indexar_nuevos(equipos=grupo)
+        return total
+
+    def _separar_frecuentes(self, tris_query, minimo):
+        """
+        Divide los trigramas de lo buscado en (raros, frecuentes). Cada
+        frecuencia se cuenta sólo hasta frecuencia_maxima + 1 filas, así que
+        averiguarla cuesta lo mismo con 10 mil que con 10 millones de clientes.
+
+        Los candidatos se buscan sólo con los raros: un objeto que alcanza
+        `minimo` trigramas comunes tiene al menos minimo - len(frecuentes)
+        entre ellos. Mientras eso no sea al menos 1 se pasan frecuentes a
+        raros, para que ningún objeto que alcanza el umbral quede excluido por
+        la separación. Sí puede quedar fuera por el tope de buscar(): de los
+        candidatos sólo se evalúan los CANDIDATOS_MAXIMOS con más raros en
+        común, antes de sumar los frecuentes.
+        """
+        tris = sorted(tris_query)
+        if self.frecuencia_maxima is None:
+            return tris, []
+        tabla = connection.ops.quote_name(TrigramaBusqueda._meta.db_table)
+        sql = ' UNION ALL '.join(
+            f"SELECT %s, COUNT(*) FROM (SELECT 1 FROM {tabla} WHERE trigrama = %s LIMIT %s) f{i}"
+            for i in range(len(tris))
+        )
+        parametros = [p for tri in tris for p in (tri, tri, self.frecuencia_maxima + 1)]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, parametros)
+            frecuencias = dict(cursor.fetchall())
+        raros = [tri for tri in tris if frecuencias[tri] <= self.frecuencia_maxima]
+        frecuentes = [tri for tri in tris if frecuencias[tri] > self.frecuencia_maxima]
+        while frecuentes and minimo - len(frecuentes) < 1:
+            raros.append(frecuentes.pop())
+        return raros, frecuentes
+
+    def buscar(self, query, limite=LIMITE_RESULTADOS):
+        """Devuelve [(cliente_id, similitud)] ordenados de mayor a menor similitud."""
+        tris_query = trigramas(query)
+        if not tris_query:
+            return []
+        minimo = math.ceil(UMBRAL_SIMILITUD * len(tris_query))
+        raros, frecuentes = self._separar_frecuentes(tris_query, minimo)
+
+        candidatos = {
+            (c['entidad'], c['objeto_id'], c['campo']): c
+            for c in TrigramaBusqueda.objects.filter(trigrama__in=raros)
+            .values('entidad', 'objeto_id', 'campo', 'cliente_id')
+            .annotate(comunes=Count('id'), total=Max('total'))
+            .filter(comunes__gte=minimo - len(frecuentes))
+            .order_by('-comunes')[:CANDIDATOS_MAXIMOS]
+        }
+        if frecuentes:
+            # Los trigramas frecuentes se cuentan sólo en los candidatos (ya
+            # recortados a CANDIDATOS_MAXIMOS), con el índice (trigrama, entidad, objeto_id)
+            por_entidad = defaultdict(set)
+            for entidad, objeto_id, _campo in candidatos:
+                por_entidad[entidad].add(objeto_id)
+            for entidad, ids in por_entidad.items():
+                for f in (TrigramaBusqueda.objects.filter(trigrama__in=frecuentes, entidad=entidad, objeto_id__in=ids)
+                          .values('objeto_id', 'campo').annotate(comunes=Count('id'))):
+                    candidato = candidatos.get((entidad, f['objeto_id'], f['campo']))
+                    if candidato:
+                        candidato['comunes'] += f['comunes']
+
+        mejores = {}
+        for c in candidatos.values():
+            if c['comunes'] < minimo:
+                continue
+            similitud = c['comunes'] / len(tris_query)
+            # Desempate: preferimos el campo más parecido en conjunto (Jaccard)
+            jaccard = c['comunes'] / (len(tris_query) + c['total'] - c['comunes'])
+            puntaje = (similitud, jaccard)
+            if puntaje > mejores.get(c['cliente_id'], (0, 0)):
+                mejores[c['cliente_id']] = puntaje
+
+        ordenados = sorted(mejores.items(), key=lambda item: item[1], reverse=True)[:limite]
+        return [(cliente_id, puntaje[0]) for cliente_id, puntaje in ordenados]
+
+
+class BackendPgTrgm:
+    """Búsqueda difusa con la extensión pg_trgm de PostgreSQL."""
+
+    SQL = """
+        SELECT cliente_id, MAX(similitud) AS similitud FROM (
+            SELECT id AS cliente_id,
+                   GREATEST(word_similarity(%(q)s, nombre_normalizado),
+                            word_similarity(%(d)s, telefono_normalizado)) AS similitud
+            FROM gestion_clientes_cliente
+            WHERE %(q)s <%% nombre_normalizado OR %(d)s <%% telefono_normalizado
+            UNION ALL
+            SELECT cliente_id,
+                   GREATEST(word_similarity(%(q)s, lower(coalesce(numero_serie, ''))),
+                            word_similarity(%(q)s, lower(modelo))) AS similitud
+            FROM gestion_clientes_equipo
+            WHERE %(q)s <%% lower(coalesce(numero_serie, '')) OR %(q)s <%% lower(modelo)
+        ) AS coincidencias
+        GROUP BY cliente_id
+        ORDER BY similitud DESC
+        LIMIT %(limite)s
+    """
+
+    # pg_trgm mantiene sus índices GIN por sí mismo
+    def indexar_cliente(self, cliente):
+        pass
+
+    def indexar_equipo(self, equipo):
+        pass
+
+    def eliminar(self, entidad, objeto_id):
+        pass
+
+    def indexar_nuevos(self, clientes=(), equipos=()):
+        return 0
+
+    def reconstruir(self, lote=2000):
+        return 0
+
+    def buscar(self, query, limite=LIMITE_RESULTADOS):
+        q_norm = normalizar_texto(query)
+        if not q_norm:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(self.SQL, {'q': q_norm, 'd': solo_digitos(q_norm) or q_norm, 'limite': limite})
+            return [(cliente_id, similitud) for cliente_id, similitud in cursor.fetchall()]
+
+
+@lru_cache(maxsize=None)
+def _backend(ruta, vendor):
+    if ruta:
+        return import_string(ruta)()
+    if vendor == 'postgresql':
+        return BackendPgTrgm()
+    return BackendTrigramasSQL()
+
+
+def obtener_backend():
+    return _backend(getattr(settings, 'BUSQUEDA_DIFUSA_BACKEND', None), connection.vendor)
+
+
+def buscar_clientes_similares(query, limite=LIMITE_RESULTADOS):
+    """
+    Clientes cuyo nombre, teléfono o alguno de sus equipos (serie, modelo) se
+    parece al texto buscado, ordenados por similitud.
+    """
+    coincidencias = obtener_backend().buscar(query, limite)
+    clientes = Cliente.objects.in_bulk([cliente_id for cliente_id, _ in coincidencias])
+    return [clientes[cliente_id] for cliente_id, _ in coincidencias if cliente_id in clientes]
@@ -0,0 +1,257 @@
+"""
+Importación masiva de clientes y equipos desde CSV o XLSX.
+
+La usan el comando importar_clientes y la vista "Importar" del admin de
+clientes. Los archivos se leen fila por fila y se procesan en lotes:
+
+1. Cada fila se valida con las reglas de los campos del modelo (longitudes,
+   email, opciones de tipo de equipo), sin consultas por fila.
+2. Se descartan los duplicados contra la base (teléfono y email únicos de
+   Cliente, y (cliente, numero_serie) de Equipo) con una consulta por lote,
+   y contra las filas anteriores del mismo archivo.
+3. Se insertan con bulk_create, un lote por transacción, y en la misma
+   transacción se agregan sus trigramas de búsqueda difusa.
+
+bulk_create no pasa por save() ni por las señales, así que aquí se repite lo
+que hacen: vaciar los opcionales ('' -> None), cifrar las contraseñas (con la
+clave derivada una sola vez), indexar los trigramas y limpiar el caché del
+autocompletado.
+
+Los equipos indican a su cliente por teléfono (columna telefono_cliente): un
+cliente del mismo lote de importación o uno que ya exista.
+"""
+import csv
+import io
+import os
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from reportes.xlsx import leer_xlsx
+from .autocompletado import cache_autocompletado
+from .busqueda_difusa import obtener_backend
+from .models import Cliente, Equipo, normalizar_texto, obtener_fernet
+
+LOTE = 2000
+MAX_ERRORES = 1000
+
+COLUMNAS_CLIENTE = [
+    'nombre_completo', 'telefono', 'email', 'rfc', 'calle', 'numero_exterior',
+    'numero_interior', 'colonia', 'codigo_postal', 'ciudad', 'estado',
+]
+COLUMNAS_EQUIPO = ['telefono_cliente', 'tipo_equipo', 'marca', 'modelo', 'numero_serie', 'contrasena']
+# Campos que Cliente.save() / Equipo.save() guardan como NULL si vienen vacíos
+OPCIONALES_CLIENTE = [
+    'email', 'rfc', 'calle', 'numero_exterior', 'numero_interior',
+    'colonia', 'codigo_postal', 'ciudad', 'estado',
+]
+
+# 'laptop', 'LAPTOP', 'Impresora ' -> valor de TIPO_EQUIPO_OPCIONES
+_TIPOS_EQUIPO = {normalizar_texto(valor): valor for valor, _ in Equipo.TIPO_EQUIPO_OPCIONES}
+_TIPOS_EQUIPO.update({normalizar_texto(etiqueta): valor for valor, etiqueta in Equipo.TIPO_EQUIPO_OPCIONES})
+
+
+class ResultadoImportacion:
+    """Conteos de la importación y errores por fila (archivo, número de fila, mensaje)."""
+
+    def __init__(self):
+        self.clientes = 0
+        self.equipos = 0
+        self.duplicados = 0
+        self.errores = []
+        self.total_errores = 0
+
+    def error(self, archivo, fila, mensaje):
+        self.total_errores += 1
+        # Se cuentan todos, pero sólo se conservan los primeros
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append((archivo, fila, mensaje))
+
+    def ordenar_desde(self, inicio):
+        """Ordena por número de fila los errores de un lote (validación y duplicados se detectan en pasos distintos)."""
+        self.errores[inicio:] = sorted(self.errores[inicio:], key=lambda error: error[1])
+
+
+# --- LECTURA DE ARCHIVOS ---
+
+def _columna(encabezado):
+    return normalizar_texto(encabezado).strip().replace(' ', '_')
+
+
+def leer_filas(origen, nombre=None):
+    """
+    Genera (número de fila, {columna: valor}) de un CSV o XLSX con encabezados
+    en la primera fila. El formato se deduce de la extensión de `nombre` (o de
+    `origen` si es una ruta). Los encabezados no distinguen mayúsculas ni acentos.
+    """
+    nombre = nombre or str(origen)
+    texto = None
+    if os.path.splitext(nombre)[1].lower() == '.xlsx':
+        filas = leer_xlsx(origen)
+    elif isinstance(origen, (str, os.PathLike)):
+        texto = open(origen, encoding='utf-8-sig', newline='')
+        filas = csv.reader(texto)
+    else:
+        # Archivo subido (UploadedFile): se lee el archivo binario que envuelve
+        filas = csv.reader(io.TextIOWrapper(getattr(origen, 'file', origen), encoding='utf-8-sig', newline=''))
+
+    try:
+        encabezados = [_columna(columna) for columna in next(filas, [])]
+        for numero, fila in enumerate(filas, start=2):
+            if any(valor.strip() for valor in fila):
+                yield numero, {columna: valor.strip() for columna, valor in zip(encabezados, fila)}
+    finally:
+        if texto:
+            texto.close()
+
+
+def _lotes(filas, tamano=LOTE):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _validar(modelo, datos, columnas):
+    """Limpia `columnas` con las reglas de cada campo. Devuelve (valores, mensajes de error)."""
+    valores, errores = {}, []
+    for columna in columnas:
+        campo = modelo._meta.get_field(columna)
+        try:
+            valores[columna] = campo.clean(datos.get(columna, ''), None)
+        except ValidationError as error:
+            errores.append(f"{columna}: {' '.join(error.messages)}")
+    return valores, errores
+
+
+# --- CLIENTES ---
+
+def _importar_clientes(filas, archivo, resultado, telefonos_importados, backend):
+    vistos_email = set()
+    for lote in _lotes(filas):
+        errores_previos = len(resultado.errores)
+        validas = []
+        for numero, datos in lote:
+            valores, errores = _validar(Cliente, datos, COLUMNAS_CLIENTE)
+            if errores:
+                resultado.error(archivo, numero, '; '.join(errores))
+                continue
+            for campo in OPCIONALES_CLIENTE:
+                valores[campo] = valores[campo] or None
+            validas.append((numero, valores))
+
+        # Duplicados contra la base: una consulta por columna única
+        telefonos = {valores['telefono'] for _, valores in validas}
+        emails = {valores['email'] for _, valores in validas if valores['email']}
+        telefonos_existentes = set(Cliente.objects.filter(telefono__in=telefonos).values_list('telefono', flat=True))
+        emails_existentes = set(Cliente.objects.filter(email__in=emails).values_list('email', flat=True))
+
+        nuevos = []
+        for numero, valores in validas:
+            if valores['telefono'] in telefonos_existentes or valores['telefono'] in telefonos_importados:
+                resultado.duplicados += 1
+                resultado.error(archivo, numero, f"Ya existe un cliente con el teléfono {valores['telefono']}.")
+            elif valores['email'] and (valores['email'] in emails_existentes or valores['email'] in vistos_email):
+                resultado.duplicados += 1
+                resultado.error(archivo, numero, f"Ya existe un cliente con el email {valores['email']}.")
+            else:
+                # Se marca desde ya: una fila repetida más abajo en el mismo lote es duplicado
+                telefonos_importados[valores['telefono']] = None
+                if valores['email']:
+                    vistos_email.add(valores['email'])
+                nuevos.append(Cliente(**valores))
+
+        with transaction.atomic():
+            # ClienteQuerySet.bulk_create llena las columnas de búsqueda normalizadas
+            creados = Cliente.objects.bulk_create(nuevos)
+            if backend:
+                backend.indexar_nuevos(clientes=creados)
+        for cliente in creados:
+            telefonos_importados[cliente.telefono] = cliente.pk
+        resultado.clientes += len(creados)
+        resultado.ordenar_desde(errores_previos)
+
+
+# --- EQUIPOS ---
+
+def _importar_equipos(filas, archivo, resultado, telefonos_importados, backend):
+    fernet = obtener_fernet()
+    vistos = set()
+    for lote in _lotes(filas):
+        errores_previos = len(resultado.errores)
+        validas = []
+        for numero, datos in lote:
+            datos = {**datos, 'tipo_equipo': _TIPOS_EQUIPO.get(normalizar_texto(datos.get('tipo_equipo')), datos.get('tipo_equipo', ''))}
+            valores, errores = _validar(Equipo, datos, ['tipo_equipo', 'marca', 'modelo', 'numero_serie'])
+            if not datos.get('telefono_cliente'):
+                errores.append("telefono_cliente: Este campo no puede estar en blanco.")
+            if errores:
+                resultado.error(archivo, numero, '; '.join(errores))
+                continue
+            valores['numero_serie'] = valores['numero_serie'] or None
+            validas.append((numero, datos['telefono_cliente'], datos.get('contrasena', ''), valores))
+
+        # Clientes que no se importaron en esta corrida: una consulta por lote
+        faltantes = {telefono for _, telefono, _, _ in validas if not telefonos_importados.get(telefono)}
+        clientes = dict(Cliente.objects.filter(telefono__in=faltantes).values_list('telefono', 'id'))
+
+        for fila in validas:
+            fila[3]['cliente_id'] = telefonos_importados.get(fila[1]) or clientes.get(fila[1])
+        series = {valores['numero_serie'] for *_, valores in validas if valores['numero_serie']}
+        existentes = set(Equipo.objects.filter(
+            cliente_id__in={valores['cliente_id'] for *_, valores in validas if valores['cliente_id']},
+            numero_serie__in=series,
+        ).values_list('cliente_id', 'numero_serie'))
+
+        nuevos = []
+        for numero, telefono, contrasena, valores in validas:
+            clave = (valores['cliente_id'], valores['numero_serie'])
+            if not valores['cliente_id']:
+                resultado.error(archivo, numero, f"No existe un cliente con el teléfono {telefono}.")
+            elif valores['numero_serie'] and (clave in existentes or clave in vistos):
+                resultado.duplicados += 1
+                resultado.error(archivo, numero, f"El cliente ya tiene un equipo con el número de serie {valores['numero_serie']}.")
+            else:
+                vistos.add(clave)
+                # Igual que Equipo.set_password(), con la clave derivada una sola vez
+                valores['contrasena_equipo'] = fernet.encrypt(contrasena.encode('utf-8')).decode('utf-8') if contrasena else None
+                nuevos.append(Equipo(**valores))
+
+        with transaction.atomic():
+            creados = Equipo.objects.bulk_create(nuevos)
+            if backend:
+                backend.indexar_nuevos(equipos=creados)
+        resultado.equipos += len(creados)
+        resultado.ordenar_desde(errores_previos)
+
+
+def importar(clientes=None, equipos=None, nombre_clientes=None, nombre_equipos=None, indexar=True):
+    """
+    Importa un archivo de clientes y/o uno de equipos (rutas o archivos
+    binarios; para archivos sin ruta se indica el nombre para saber el
+    formato). Los clientes se importan primero para que los equipos puedan
+    referirse a ellos. Devuelve un ResultadoImportacion.
+
+    Con indexar=False no se escriben los trigramas de búsqueda difusa (en
+    SQLite son la parte más costosa de una importación grande); hay que correr
+    después reconstruir_trigramas.
+    """
+    resultado = ResultadoImportacion()
+    backend = obtener_backend() if indexar else None
+    # teléfono -> id de los clientes creados en esta corrida
+    telefonos_importados = {}
+    try:
+        if clientes is not None:
+            nombre = nombre_clientes or str(clientes)
+            _importar_clientes(leer_filas(clientes, nombre), os.path.basename(nombre), resultado, telefonos_importados, backend)
+        if equipos is not None:
+            nombre = nombre_equipos or str(equipos)
+            _importar_equipos(leer_filas(equipos, nombre), os.path.basename(nombre), resultado, telefonos_importados, backend)
+    finally:
+        # Lo mismo que hace la señal post_save de Cliente/Equipo
+        cache_autocompletado.invalidar()
+    return resultado
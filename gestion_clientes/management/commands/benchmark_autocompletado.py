@@ -0,0 +1,95 @@
+"""
+Mide la latencia por petición de buscar_cliente_api (autocompletado de la
+nueva orden) con 200k clientes, como al teclear: cada nombre o teléfono se
+pide letra por letra desde LONGITUD_MINIMA.
+
+- frío: se vacía el caché LRU antes de cada petición (una consulta por tecla).
+- caliente: las teclas siguientes reutilizan el prefijo anterior en caché.
+
+Los clientes se agregan dentro de una transacción que se revierte: la base
+queda igual.
+
+    python manage.py benchmark_autocompletado --clientes 200000
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from gestion_clientes.autocompletado import LONGITUD_MINIMA, cache_autocompletado
+from gestion_clientes.models import Cliente
+from reportes.datos_prueba import _cliente
+
+LOTE = 5000
+
+
+class Command(BaseCommand):
+    help = "Mide p50/p95 del autocompletado de clientes con caché frío y caliente (transacción revertida)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=200000)
+        parser.add_argument('--busquedas', type=int, default=100,
+                            help="Nombres y teléfonos tecleados letra por letra.")
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        azar = random.Random(options['semilla'])
+        self.stdout.write(f"motor: {connection.vendor}")
+        with transaction.atomic():
+            try:
+                self._llenar(options['clientes'], azar)
+                self._medir(options['busquedas'], azar)
+            finally:
+                transaction.set_rollback(True)
+
+    def _llenar(self, total, azar):
+        faltan = total - Cliente.objects.count()
+        primero = (Cliente.objects.aggregate(ultimo=Max('pk'))['ultimo'] or 0) + 1
+        ahora = timezone.now()
+        for inicio in range(0, max(0, faltan), LOTE):
+            Cliente.objects.bulk_create(
+                _cliente(azar, primero + i, ahora, 2) for i in range(inicio, min(faltan, inicio + LOTE))
+            )
+
+    def _teclas(self, busquedas, azar):
+        """Lo que se teclea: prefijos crecientes de nombres y teléfonos reales."""
+        ultimo = Cliente.objects.aggregate(ultimo=Max('pk'))['ultimo']
+        textos = []
+        for _ in range(busquedas):
+            nombre, telefono = (Cliente.objects.filter(pk__gte=azar.randint(1, ultimo)).order_by('pk')
+                                .values_list('nombre_completo', 'telefono').first())
+            textos.append(' '.join(nombre.split()[:2]))
+            textos.append(telefono[:8])
+        return [[texto[:i] for i in range(LONGITUD_MINIMA, len(texto) + 1)] for texto in textos]
+
+    def _medir(self, busquedas, azar):
+        usuario = User.objects.create_user('benchmark autocompletado', is_superuser=True)
+        navegador = Client(HTTP_HOST='localhost')
+        navegador.force_login(usuario)
+        url = reverse('buscar_cliente_api')
+        teclas = self._teclas(busquedas, azar)
+        self.stdout.write(f"{Cliente.objects.count()} clientes, {sum(map(len, teclas))} peticiones por escenario")
+
+        for nombre, vaciar in [('frío', True), ('caliente', False)]:
+            tiempos = []
+            for prefijos in teclas:
+                cache_autocompletado.limpiar()
+                for prefijo in prefijos:
+                    if vaciar:
+                        cache_autocompletado.limpiar()
+                    inicio = time.perf_counter()
+                    respuesta = navegador.get(url, {'q': prefijo})
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                    assert respuesta.status_code == 200, respuesta.status_code
+            tiempos.sort()
+            self.stdout.write(
+                f"{nombre:<9} p50 {statistics.median(tiempos):6.2f} ms | "
+                f"p95 {tiempos[int(len(tiempos) * 0.95) - 1]:6.2f} ms | max {tiempos[-1]:6.2f} ms"
+            )
@@ -0,0 +1,96 @@
+"""
+Mide la búsqueda de lista_clientes (Cliente.objects.buscar) con 10k, 100k y
+1M clientes: el conteo y la primera página, como los pide el Paginator.
+
+Compara el "contiene" resuelto con el índice de trigramas (actual: FTS5 en
+SQLite, pg_trgm en PostgreSQL) con el LIKE '%...%' sin índice, que recorre
+la tabla. Los clientes se agregan por etapas hasta cada tamaño dentro de una
+transacción que se revierte: la base queda igual.
+
+    python manage.py benchmark_busqueda_clientes --tamanos 10000,100000,1000000
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from gestion_clientes.models import Cliente, normalizar_texto, solo_digitos
+from reportes.datos_prueba import _cliente
+
+LOTE = 5000
+POR_PAGINA = 10
+
+
+def buscar_contiene(clientes, query):
+    """La búsqueda anterior: LIKE '%...%' en las cuatro columnas (en SQLite no usa índices)."""
+    query_norm = normalizar_texto(query)
+    condicion = (Q(nombre_normalizado__contains=query_norm) | Q(email_normalizado__contains=query_norm) |
+                 Q(rfc_normalizado__contains=query_norm))
+    if solo_digitos(query):
+        condicion |= Q(telefono_normalizado__contains=solo_digitos(query))
+    return clientes.filter(condicion)
+
+
+class Command(BaseCommand):
+    help = "Mide la búsqueda de clientes (\"contiene\" con índice de trigramas contra LIKE) a varios tamaños (transacción revertida)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='10000,100000,1000000',
+                            help="Clientes totales en cada etapa, separados por comas.")
+        parser.add_argument('--repeticiones', type=int, default=10)
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        tamanos = sorted(int(tamano) for tamano in options['tamanos'].split(','))
+        azar = random.Random(options['semilla'])
+        self.stdout.write(f"motor: {connection.vendor}")
+        with transaction.atomic():
+            try:
+                for tamano in tamanos:
+                    self._llenar(tamano, azar)
+                    self._medir(tamano, options['repeticiones'])
+            finally:
+                transaction.set_rollback(True)
+
+    def _llenar(self, tamano, azar):
+        faltan = tamano - Cliente.objects.count()
+        primero = (Cliente.objects.aggregate(ultimo=Max('pk'))['ultimo'] or 0) + 1
+        ahora = timezone.now()
+        for inicio in range(0, max(0, faltan), LOTE):
+            Cliente.objects.bulk_create(
+                _cliente(azar, primero + i, ahora, 2) for i in range(inicio, min(faltan, inicio + LOTE))
+            )
+
+    def _consultas(self):
+        muestra = Cliente.objects.order_by('-pk').values_list('nombre_completo', 'telefono', 'email')[:50]
+        nombre, telefono, _ = muestra[0]
+        email = next((email for _, _, email in muestra if email), 'sin-email')
+        return [
+            ('nombre', ' '.join(nombre.split()[:2])),
+            ('apellido', nombre.split()[1] if len(nombre.split()) > 1 else nombre),
+            ('teléfono', telefono[:6]),
+            ('fin teléfono', telefono[-5:]),
+            ('email', email.split('@')[0][:8]),
+            ('sin resultados', 'xochiquetzal'),
+        ]
+
+    def _medir(self, tamano, repeticiones):
+        self.stdout.write(f"--- {Cliente.objects.count()} clientes (etapa {tamano}) ---")
+        clientes = Cliente.objects.order_by('-fecha_registro')
+        for nombre, query in self._consultas():
+            linea = f"{nombre:<15} {query!r:<22}"
+            for etiqueta, buscar in [('índice', lambda: clientes.buscar(query)),
+                                     ('LIKE', lambda: buscar_contiene(clientes, query))]:
+                tiempos = []
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    resultados = buscar()
+                    total = resultados.count()
+                    list(resultados[:POR_PAGINA])
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                linea += f" | {etiqueta} {statistics.median(tiempos):8.1f} ms ({total})"
+            self.stdout.write(linea)
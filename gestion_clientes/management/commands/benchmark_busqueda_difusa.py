@@ -0,0 +1,133 @@
+"""
+Mide latencia y recall de la búsqueda difusa (busqueda_difusa) contra la
+búsqueda de "contiene" que hacía lista_clientes, con nombres y números de
+serie mal capturados: un carácter cambiado, quitado o sin acentos.
+
+- contiene: LIKE '%...%' sobre las columnas normalizadas (recorre la tabla).
+- trigramas: BackendTrigramasSQL sin tope de frecuencia (cada trigrama de lo
+  buscado lee todas sus filas del índice).
+- trigramas con tope: BackendTrigramasSQL con FRECUENCIA_MAXIMA (actual).
+
+Recall: fracción de las búsquedas en las que alguno de los primeros
+LIMITE_RESULTADOS es un cliente con el valor original (los nombres
+sintéticos se repiten; los números de serie son únicos).
+
+Los clientes, equipos y trigramas se agregan dentro de una transacción que se
+revierte: la base queda igual.
+
+    python manage.py benchmark_busqueda_difusa --clientes 200000
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from gestion_clientes.busqueda_difusa import LIMITE_RESULTADOS, BackendTrigramasSQL
+from gestion_clientes.models import Cliente, Equipo, normalizar_texto
+from reportes.datos_prueba import MARCAS, _cliente
+
+from .benchmark_busqueda_clientes import buscar_contiene
+
+LOTE = 2000
+
+
+def mal_capturado(azar, texto):
+    """Un error de captura: sin acentos, o un carácter cambiado o quitado."""
+    if texto != normalizar_texto(texto) and azar.random() < 0.3:
+        return normalizar_texto(texto)
+    posiciones = [i for i, c in enumerate(texto) if c.isalnum()]
+    i = azar.choice(posiciones[1:])
+    if azar.random() < 0.5:
+        return texto[:i] + texto[i + 1:]
+    reemplazo = azar.choice('0123456789' if texto[i].isdigit() else 'aeioulnrst')
+    return texto[:i] + reemplazo + texto[i + 1:]
+
+
+class Command(BaseCommand):
+    help = "Mide latencia y recall de la búsqueda difusa contra \"contiene\" (transacción revertida)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=200000)
+        parser.add_argument('--busquedas', type=int, default=100)
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        azar = random.Random(options['semilla'])
+        self.stdout.write(f"motor: {connection.vendor}")
+        with transaction.atomic():
+            try:
+                self._llenar(options['clientes'], azar)
+                self._medir(options['busquedas'], azar)
+            finally:
+                transaction.set_rollback(True)
+
+    def _llenar(self, total, azar):
+        backend = BackendTrigramasSQL()
+        faltan = total - Cliente.objects.count()
+        primero = (Cliente.objects.aggregate(ultimo=Max('pk'))['ultimo'] or 0) + 1
+        ahora = timezone.now()
+        tipos = list(MARCAS)
+        for inicio in range(0, max(0, faltan), LOTE):
+            clientes = Cliente.objects.bulk_create(
+                _cliente(azar, primero + i, ahora, 2) for i in range(inicio, min(faltan, inicio + LOTE))
+            )
+            equipos = []
+            for cliente in clientes:
+                tipo = azar.choice(tipos)
+                equipos.append(Equipo(
+                    cliente=cliente, tipo_equipo=tipo, marca=azar.choice(MARCAS[tipo]),
+                    modelo=f"{tipo[:3].upper()}-{azar.randint(100, 999)}", numero_serie=f"SN{cliente.pk:07d}-1",
+                ))
+            backend.indexar_nuevos(clientes=clientes, equipos=Equipo.objects.bulk_create(equipos))
+
+    def _busquedas(self, cantidad, azar):
+        """[(tipo, texto mal capturado, ids de los clientes con el valor original)]"""
+        ultimo = Cliente.objects.aggregate(ultimo=Max('pk'))['ultimo']
+        busquedas = []
+        for _ in range(cantidad):
+            cliente = Cliente.objects.filter(pk__gte=azar.randint(1, ultimo)).order_by('pk').first()
+            nombre = ' '.join(cliente.nombre_completo.split()[:2])
+            iguales = set(Cliente.objects.filter(
+                nombre_normalizado__startswith=normalizar_texto(nombre)).values_list('pk', flat=True))
+            busquedas.append(('nombre', mal_capturado(azar, nombre), iguales))
+            serie = cliente.equipos.values_list('numero_serie', flat=True).first()
+            busquedas.append(('serie', mal_capturado(azar, serie), {cliente.pk}))
+        return busquedas
+
+    def _medir(self, cantidad, azar):
+        busquedas = self._busquedas(cantidad, azar)
+        self.stdout.write(f"{Cliente.objects.count()} clientes, {len(busquedas)} búsquedas")
+        clientes = Cliente.objects.order_by('-fecha_registro')
+        sin_tope, con_tope = BackendTrigramasSQL(frecuencia_maxima=None), BackendTrigramasSQL()
+
+        def contiene(query):
+            # Como lista_clientes antes: "contiene" en el cliente; se agrega la serie del equipo
+            q_norm = normalizar_texto(query)
+            encontrados = buscar_contiene(clientes, query) | clientes.filter(
+                Q(equipos__numero_serie__icontains=q_norm))
+            return list(encontrados.values_list('pk', flat=True).distinct()[:LIMITE_RESULTADOS])
+
+        metodos = [
+            ('contiene', contiene),
+            ('trigramas', lambda query: [pk for pk, _ in sin_tope.buscar(query)]),
+            ('trigramas con tope', lambda query: [pk for pk, _ in con_tope.buscar(query)]),
+        ]
+        for tipo in ['nombre', 'serie']:
+            for nombre, buscar in metodos:
+                tiempos, aciertos = [], 0
+                for tipo_busqueda, query, esperados in busquedas:
+                    if tipo_busqueda != tipo:
+                        continue
+                    inicio = time.perf_counter()
+                    encontrados = buscar(query)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                    aciertos += bool(esperados & set(encontrados))
+                tiempos.sort()
+                self.stdout.write(
+                    f"{tipo:<7} {nombre:<19} p50 {statistics.median(tiempos):8.2f} ms | "
+                    f"p95 {tiempos[int(len(tiempos) * 0.95) - 1]:8.2f} ms | recall {aciertos / len(tiempos):5.1%}"
+                )
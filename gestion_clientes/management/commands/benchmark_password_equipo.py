@@ -0,0 +1,65 @@
+"""
+Mide la latencia por petición de la API de contraseña de equipo
+(obtener_password_equipo_api), que desencripta con obtener_fernet().
+
+- sin caché: se vacía la caché de claves antes de cada petición, como
+  antes de guardar la clave derivada (PBKDF2 en cada get_password).
+- con caché: la clave se deriva una vez y se reutiliza.
+
+Todo corre dentro de una transacción que se revierte: la base queda igual.
+
+    python manage.py benchmark_password_equipo --peticiones 200
+"""
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from gestion_clientes import models as modelos_clientes
+from gestion_clientes.models import Cliente, Equipo
+
+MARCA = 'Benchmark password'
+
+
+class Command(BaseCommand):
+    help = "Mide la API de contraseña de equipo con y sin la caché de la clave Fernet derivada."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            try:
+                self._comparar(options['peticiones'])
+            finally:
+                transaction.set_rollback(True)
+
+    def _comparar(self, peticiones):
+        usuario = User.objects.create_user(f'{MARCA} usuario', is_superuser=True)
+        cliente = Cliente.objects.create(nombre_completo=MARCA, telefono='0000000002')
+        equipo = Equipo(cliente=cliente, tipo_equipo='Laptop', marca=MARCA, modelo='N/A')
+        equipo.set_password('contraseña de prueba')
+        equipo.save()
+
+        navegador = Client(HTTP_HOST='localhost')
+        navegador.force_login(usuario)
+        url = reverse('api_password_equipo', args=[equipo.pk])
+
+        for nombre, vaciar in [('sin caché', True), ('con caché', False)]:
+            tiempos = []
+            for _ in range(peticiones):
+                if vaciar:
+                    modelos_clientes._fernet_cache.clear()
+                inicio = time.perf_counter()
+                respuesta = navegador.get(url)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+                assert respuesta.status_code == 200, respuesta.status_code
+            tiempos.sort()
+            self.stdout.write(
+                f"{nombre:<10} p50 {statistics.median(tiempos):6.2f} ms | "
+                f"p95 {tiempos[int(len(tiempos) * 0.95) - 1]:6.2f} ms | {peticiones} peticiones"
+            )
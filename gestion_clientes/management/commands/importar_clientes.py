@@ -0,0 +1,45 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_clientes.importacion import COLUMNAS_CLIENTE, COLUMNAS_EQUIPO, importar
+
+
+class Command(BaseCommand):
+    help = ("Importa clientes y equipos desde archivos CSV o XLSX con encabezados. "
+            f"Clientes: {', '.join(COLUMNAS_CLIENTE)}. Equipos: {', '.join(COLUMNAS_EQUIPO)} "
+            "(telefono_cliente es el teléfono de un cliente importado o existente).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', help="Archivo .csv o .xlsx de clientes.")
+        parser.add_argument('--equipos', help="Archivo .csv o .xlsx de equipos.")
+        parser.add_argument('--errores', help="Escribe aquí (CSV) las filas rechazadas y el motivo.")
+        parser.add_argument(
+            '--sin-indice', action='store_true',
+            help="No indexa la búsqueda difusa durante la importación (correr reconstruir_trigramas al terminar).",
+        )
+
+    def handle(self, *args, **options):
+        if not options['clientes'] and not options['equipos']:
+            raise CommandError("Indica --clientes y/o --equipos.")
+
+        resultado = importar(
+            clientes=options['clientes'], equipos=options['equipos'], indexar=not options['sin_indice'],
+        )
+
+        for archivo, fila, mensaje in resultado.errores[:20]:
+            self.stdout.write(self.style.WARNING(f"{archivo}, fila {fila}: {mensaje}"))
+        if resultado.total_errores > 20:
+            self.stdout.write(self.style.WARNING(f"... y {resultado.total_errores - 20} errores más."))
+        if options['errores'] and resultado.errores:
+            with open(options['errores'], 'w', encoding='utf-8', newline='') as salida:
+                escritor = csv.writer(salida)
+                escritor.writerow(['archivo', 'fila', 'error'])
+                escritor.writerows(resultado.errores)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Importados {resultado.clientes} clientes y {resultado.equipos} equipos; "
+            f"{resultado.total_errores} filas rechazadas ({resultado.duplicados} duplicadas)."
+        ))
+        if options['sin_indice']:
+            self.stdout.write("Recuerda correr reconstruir_trigramas para la búsqueda difusa.")
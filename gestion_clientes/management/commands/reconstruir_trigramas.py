@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from gestion_clientes.busqueda_difusa import obtener_backend
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de trigramas de la búsqueda difusa de clientes y equipos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help="Filas por lote de inserción.")
+
+    def handle(self, *args, **options):
+        backend = obtener_backend()
+        total = backend.reconstruir(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice reconstruido con {backend.__class__.__name__}: {total} trigramas."
+        ))
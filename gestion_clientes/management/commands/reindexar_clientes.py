@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from gestion_clientes.models import Cliente
+
+
+class Command(BaseCommand):
+    help = "Recalcula las columnas normalizadas de búsqueda de todos los clientes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help="Clientes por lote de actualización.")
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        campos = list(Cliente.CAMPOS_BUSQUEDA.values())
+        pendientes = []
+        total = 0
+
+        # bulk_update del ClienteQuerySet recalcula las columnas antes de guardar
+        for cliente in Cliente.objects.order_by('pk').iterator(chunk_size=lote):
+            pendientes.append(cliente)
+            if len(pendientes) >= lote:
+                Cliente.objects.bulk_update(pendientes, campos)
+                total += len(pendientes)
+                pendientes = []
+        if pendientes:
+            Cliente.objects.bulk_update(pendientes, campos)
+            total += len(pendientes)
+
+        self.stdout.write(self.style.SUCCESS(f"{total} clientes reindexados."))
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:00
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Copias de gestion_clientes.models al escribir esta migración: si cambian
+# allí, la migración debe seguir dando el mismo resultado.
+def normalizar_texto(texto):
+    if not texto:
+        return ''
+    return ''.join(c for c in unicodedata.normalize('NFD', str(texto).lower()) if unicodedata.category(c) != 'Mn')
+
+
+def solo_digitos(texto):
+    if not texto:
+        return ''
+    return ''.join(c for c in str(texto) if c.isdigit())
+
+
+def llenar_campos_busqueda(apps, schema_editor):
+    Cliente = apps.get_model('gestion_clientes', 'Cliente')
+    clientes = []
+    for cliente in Cliente.objects.all().iterator(chunk_size=2000):
+        cliente.nombre_normalizado = normalizar_texto(cliente.nombre_completo)
+        cliente.telefono_normalizado = solo_digitos(cliente.telefono)
+        cliente.email_normalizado = normalizar_texto(cliente.email)
+        cliente.rfc_normalizado = normalizar_texto(cliente.rfc)
+        clientes.append(cliente)
+        if len(clientes) >= 2000:
+            Cliente.objects.bulk_update(clientes, ['nombre_normalizado', 'telefono_normalizado', 'email_normalizado', 'rfc_normalizado'])
+            clientes = []
+    if clientes:
+        Cliente.objects.bulk_update(clientes, ['nombre_normalizado', 'telefono_normalizado', 'email_normalizado', 'rfc_normalizado'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_clientes', '0004_alter_cliente_email_alter_cliente_telefono_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='email_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='rfc_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=13),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='telefono_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='cliente',
+            name='fecha_registro',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha de registro'),
+        ),
+        migrations.RunPython(llenar_campos_busqueda, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:02
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copias de gestion_clientes (models y busqueda_difusa) al escribir esta
+# migración: si cambian allí, la migración debe seguir dando el mismo resultado.
+def normalizar_texto(texto):
+    if not texto:
+        return ''
+    return ''.join(c for c in unicodedata.normalize('NFD', str(texto).lower()) if unicodedata.category(c) != 'Mn')
+
+
+def solo_digitos(texto):
+    if not texto:
+        return ''
+    return ''.join(c for c in str(texto) if c.isdigit())
+
+
+def trigramas(texto):
+    resultado = set()
+    for palabra in re.findall(r'[a-z0-9]+', normalizar_texto(texto)):
+        relleno = f'  {palabra} '
+        for i in range(len(relleno) - 2):
+            resultado.add(relleno[i:i + 3])
+    return resultado
+
+
+# En PostgreSQL la búsqueda difusa usa pg_trgm con índices GIN sobre las columnas originales
+SQL_PG_TRGM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS cliente_nombre_trgm_idx ON gestion_clientes_cliente USING gin (nombre_normalizado gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS cliente_telefono_trgm_idx ON gestion_clientes_cliente USING gin (telefono_normalizado gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS equipo_serie_trgm_idx ON gestion_clientes_equipo USING gin (lower(coalesce(numero_serie, '')) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS equipo_modelo_trgm_idx ON gestion_clientes_equipo USING gin (lower(modelo) gin_trgm_ops)",
+]
+SQL_PG_TRGM_REVERSA = [
+    "DROP INDEX IF EXISTS cliente_nombre_trgm_idx",
+    "DROP INDEX IF EXISTS cliente_telefono_trgm_idx",
+    "DROP INDEX IF EXISTS equipo_serie_trgm_idx",
+    "DROP INDEX IF EXISTS equipo_modelo_trgm_idx",
+]
+
+
+def crear_indices_pg_trgm(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in SQL_PG_TRGM:
+            schema_editor.execute(sql)
+
+
+def eliminar_indices_pg_trgm(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in SQL_PG_TRGM_REVERSA:
+            schema_editor.execute(sql)
+
+
+def llenar_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    Cliente = apps.get_model('gestion_clientes', 'Cliente')
+    Equipo = apps.get_model('gestion_clientes', 'Equipo')
+    TrigramaBusqueda = apps.get_model('gestion_clientes', 'TrigramaBusqueda')
+
+    def filas(entidad, objeto_id, cliente_id, campos):
+        for campo, valor in campos.items():
+            tris = trigramas(valor)
+            for tri in tris:
+                yield TrigramaBusqueda(trigrama=tri, entidad=entidad, objeto_id=objeto_id,
+                                       cliente_id=cliente_id, campo=campo, total=len(tris))
+
+    pendientes = []
+    for c in Cliente.objects.all().iterator(chunk_size=2000):
+        pendientes.extend(filas('cliente', c.pk, c.pk, {'nombre_completo': c.nombre_completo, 'telefono': solo_digitos(c.telefono)}))
+        if len(pendientes) >= 5000:
+            TrigramaBusqueda.objects.bulk_create(pendientes)
+            pendientes = []
+    for e in Equipo.objects.all().iterator(chunk_size=2000):
+        pendientes.extend(filas('equipo', e.pk, e.cliente_id, {'numero_serie': e.numero_serie, 'modelo': e.modelo}))
+        if len(pendientes) >= 5000:
+            TrigramaBusqueda.objects.bulk_create(pendientes)
+            pendientes = []
+    TrigramaBusqueda.objects.bulk_create(pendientes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_clientes', '0005_cliente_campos_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrigramaBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrama', models.CharField(max_length=3)),
+                ('entidad', models.CharField(choices=[('cliente', 'Cliente'), ('equipo', 'Equipo')], max_length=10)),
+                ('objeto_id', models.BigIntegerField()),
+                ('campo', models.CharField(max_length=30)),
+                ('total', models.PositiveSmallIntegerField()),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_clientes.cliente')),
+            ],
+            options={
+                'verbose_name': 'Trigrama de búsqueda',
+                'verbose_name_plural': 'Trigramas de búsqueda',
+                'indexes': [models.Index(fields=['trigrama', 'entidad', 'objeto_id', 'campo'], name='trigrama_busqueda_idx'), models.Index(fields=['entidad', 'objeto_id'], name='trigrama_objeto_idx')],
+            },
+        ),
+        migrations.RunPython(crear_indices_pg_trgm, eliminar_indices_pg_trgm),
+        migrations.RunPython(llenar_trigramas, migrations.RunPython.noop),
+    ]
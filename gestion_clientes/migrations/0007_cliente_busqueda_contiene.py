@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:10
+
+from django.db import migrations
+
+
+# Copia de gestion_clientes.models al escribir esta migración: si cambia allí,
+# la migración debe seguir dando el mismo resultado.
+TABLA_CONTIENE = 'gestion_clientes_cliente_contiene'
+
+# SQLite: tabla FTS5 con tokenizador trigram (SQLite 3.34+) sobre las columnas
+# normalizadas de la tabla de clientes (content=, no duplica el texto). Un
+# MATCH de una cadena de 3+ caracteres la encuentra en cualquier posición.
+# Los triggers la mantienen al día por cualquier vía: save(), bulk_create,
+# bulk_update, update() o SQL directo. Ojo: si una migración posterior rehace
+# la tabla de clientes en SQLite (ej. AlterField), se pierden los triggers y
+# hay que volver a crearlos.
+SQL_FTS5 = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_CONTIENE} USING fts5("
+    f"nombre_normalizado, telefono_normalizado, email_normalizado, rfc_normalizado, "
+    f"content = 'gestion_clientes_cliente', content_rowid = 'id', tokenize = 'trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLA_CONTIENE}_ai AFTER INSERT ON gestion_clientes_cliente BEGIN "
+    f"INSERT INTO {TABLA_CONTIENE} (rowid, nombre_normalizado, telefono_normalizado, email_normalizado, rfc_normalizado) "
+    f"VALUES (new.id, new.nombre_normalizado, new.telefono_normalizado, new.email_normalizado, new.rfc_normalizado); END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLA_CONTIENE}_ad AFTER DELETE ON gestion_clientes_cliente BEGIN "
+    f"INSERT INTO {TABLA_CONTIENE} ({TABLA_CONTIENE}, rowid, nombre_normalizado, telefono_normalizado, email_normalizado, rfc_normalizado) "
+    f"VALUES ('delete', old.id, old.nombre_normalizado, old.telefono_normalizado, old.email_normalizado, old.rfc_normalizado); END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLA_CONTIENE}_au AFTER UPDATE OF "
+    f"nombre_normalizado, telefono_normalizado, email_normalizado, rfc_normalizado ON gestion_clientes_cliente BEGIN "
+    f"INSERT INTO {TABLA_CONTIENE} ({TABLA_CONTIENE}, rowid, nombre_normalizado, telefono_normalizado, email_normalizado, rfc_normalizado) "
+    f"VALUES ('delete', old.id, old.nombre_normalizado, old.telefono_normalizado, old.email_normalizado, old.rfc_normalizado); "
+    f"INSERT INTO {TABLA_CONTIENE} (rowid, nombre_normalizado, telefono_normalizado, email_normalizado, rfc_normalizado) "
+    f"VALUES (new.id, new.nombre_normalizado, new.telefono_normalizado, new.email_normalizado, new.rfc_normalizado); END",
+    # Indexa los clientes que ya existen
+    f"INSERT INTO {TABLA_CONTIENE} ({TABLA_CONTIENE}) VALUES ('rebuild')",
+]
+SQL_FTS5_REVERSA = [
+    f"DROP TRIGGER IF EXISTS {TABLA_CONTIENE}_ai",
+    f"DROP TRIGGER IF EXISTS {TABLA_CONTIENE}_ad",
+    f"DROP TRIGGER IF EXISTS {TABLA_CONTIENE}_au",
+    f"DROP TABLE IF EXISTS {TABLA_CONTIENE}",
+]
+
+# PostgreSQL: nombre y teléfono ya tienen índice GIN de pg_trgm (0006); faltan
+# email y RFC para que el LIKE '%...%' de la búsqueda no recorra la tabla
+SQL_PG_TRGM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS cliente_email_trgm_idx ON gestion_clientes_cliente USING gin (email_normalizado gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS cliente_rfc_trgm_idx ON gestion_clientes_cliente USING gin (rfc_normalizado gin_trgm_ops)",
+]
+SQL_PG_TRGM_REVERSA = [
+    "DROP INDEX IF EXISTS cliente_email_trgm_idx",
+    "DROP INDEX IF EXISTS cliente_rfc_trgm_idx",
+]
+
+
+def crear_indices(apps, schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor == 'sqlite' and conexion.Database.sqlite_version_info >= (3, 34):
+        for sql in SQL_FTS5:
+            schema_editor.execute(sql)
+    elif conexion.vendor == 'postgresql':
+        for sql in SQL_PG_TRGM:
+            schema_editor.execute(sql)
+
+
+def eliminar_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for sql in SQL_FTS5_REVERSA:
+            schema_editor.execute(sql)
+    elif vendor == 'postgresql':
+        for sql in SQL_PG_TRGM_REVERSA:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_clientes', '0006_trigramabusqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
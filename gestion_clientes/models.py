@@ -1,28 +1,185 @@
 import base64
-from django.db import models
+import re
+import threading
+import unicodedata
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
 from django.conf import settings
-from cryptography.fernet import Fernet
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from cryptography.fernet import Fernet, MultiFernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 # --- UTILERÍA DE ENCRIPTACIÓN ---
-def obtener_fernet():
-    """
-    Genera una instancia de Fernet usando la SECRET_KEY de Django.
-    Esto asegura que la clave sea única para tu proyecto y persistente.
-    """
-    # Usamos la llave secreta del proyecto como base
-    key = settings.SECRET_KEY.encode()
-    # Salt fijo para que la clave derivada sea siempre la misma para esta instancia
-    salt = b'django_crm_pacs_salt' 
+
+# Salt fijo para que la clave derivada sea siempre la misma para esta instancia
+FERNET_SALT = b'django_crm_pacs_salt'
+FERNET_ITERACIONES = 100000
+
+# Caché de proceso: PBKDF2 con 100,000 iteraciones cuesta decenas de ms de CPU,
+# así que la derivación se hace una sola vez por worker y por juego de llaves.
+_fernet_cache = {}
+_fernet_lock = threading.Lock()
+
+
+def _derivar_clave(secret_key, salt):
+    """Deriva una clave Fernet (base64) a partir de una llave secreta de Django."""
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
         salt=salt,
-        iterations=100000,
+        iterations=FERNET_ITERACIONES,
     )
-    key_b64 = base64.urlsafe_b64encode(kdf.derive(key))
-    return Fernet(key_b64)
+    return base64.urlsafe_b64encode(kdf.derive(secret_key.encode()))
+
+
+def obtener_fernet():
+    """
+    Genera una instancia de MultiFernet usando la SECRET_KEY de Django.
+    Esto asegura que la clave sea única para tu proyecto y persistente.
+
+    La primera llave (SECRET_KEY) se usa para encriptar; las de
+    SECRET_KEY_FALLBACKS sólo para desencriptar, lo que permite rotar la
+    SECRET_KEY sin perder las contraseñas ya guardadas.
+    El resultado se cachea por (llaves, salt): si la configuración cambia,
+    la siguiente llamada vuelve a derivar las claves.
+    """
+    llaves = (settings.SECRET_KEY, *getattr(settings, 'SECRET_KEY_FALLBACKS', ()))
+    cache_key = (llaves, FERNET_SALT)
+
+    fernet = _fernet_cache.get(cache_key)
+    if fernet is None:
+        with _fernet_lock:
+            fernet = _fernet_cache.get(cache_key)
+            if fernet is None:
+                fernet = MultiFernet([Fernet(_derivar_clave(llave, FERNET_SALT)) for llave in llaves])
+                # Sólo conservamos el juego de llaves vigente
+                _fernet_cache.clear()
+                _fernet_cache[cache_key] = fernet
+    return fernet
+
+
+@receiver(setting_changed)
+def limpiar_cache_fernet(sender, setting, **kwargs):
+    """Invalida las claves derivadas cuando cambia la llave secreta (ej. override_settings)."""
+    if setting in ('SECRET_KEY', 'SECRET_KEY_FALLBACKS'):
+        with _fernet_lock:
+            _fernet_cache.clear()
+
+# --- UTILIDADES PARA BÚSQUEDA INTELIGENTE ---
+
+def normalizar_texto(texto):
+    """
+    Convierte el texto a minúsculas y elimina acentos (tildes).
+    Ejemplo: 'García' -> 'garcia', 'Árbol' -> 'arbol', 'Ana' -> 'ana'
+    """
+    if not texto:
+        return ''
+    # NFD separa los caracteres de sus tildes. 'Mn' es la categoría de marcas de acento.
+    return ''.join(c for c in unicodedata.normalize('NFD', str(texto).lower()) if unicodedata.category(c) != 'Mn')
+
+_TELEFONO = re.compile(r'[\d\s()+\-./]+')
+
+
+def solo_digitos(texto):
+    """Deja únicamente los dígitos. Ejemplo: '(55) 1234-5678' -> '5512345678'"""
+    if not texto:
+        return ''
+    return ''.join(c for c in str(texto) if c.isdigit())
+
+
+def es_telefono(texto):
+    """Si el texto es sólo dígitos y separadores de teléfono. Ejemplo: '(55) 1234-5678'."""
+    return bool(_TELEFONO.fullmatch(texto.strip())) and any(c.isdigit() for c in texto)
+
+
+def filtro_prefijo(campo, prefijo):
+    """
+    Q de "campo empieza con prefijo" que usa el índice B-tree del campo: el
+    rango [prefijo, prefijo con el último carácter + 1) lo resuelve el índice
+    y el LIKE confirma. El LIKE solo no usa el índice (en SQLite no distingue
+    mayúsculas; en PostgreSQL depende de la colación).
+    """
+    siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+    return models.Q(**{f'{campo}__gte': prefijo, f'{campo}__lt': siguiente, f'{campo}__startswith': prefijo})
+
+
+# Columnas normalizadas que se comparan con el texto buscado (el teléfono, con los dígitos)
+COLUMNAS_TEXTO = ['nombre_normalizado', 'email_normalizado', 'rfc_normalizado']
+# Tabla FTS5 con tokenizador trigram sobre las columnas normalizadas (migración
+# 0007): resuelve el "contiene" en SQLite sin recorrer la tabla. En PostgreSQL
+# lo resuelven los índices GIN de pg_trgm sobre las mismas columnas.
+TABLA_CONTIENE = 'gestion_clientes_cliente_contiene'
+# El tokenizador trigram no encuentra cadenas de menos de 3 caracteres
+MINIMO_TRIGRAMA = 3
+
+
+def _fts5_trigram(conexion):
+    return conexion.vendor == 'sqlite' and conexion.Database.sqlite_version_info >= (3, 34)
+
+
+def filtro_contiene(buscadas, conexion):
+    """
+    Q de "alguna de las columnas contiene el texto" para cada (columnas, texto)
+    de `buscadas`. En SQLite los textos de 3+ caracteres van a un solo MATCH
+    sobre TABLA_CONTIENE; los más cortos (y los otros motores) usan __contains.
+    """
+    condicion = models.Q(pk__in=[])
+    match = []
+    for columnas, texto in buscadas:
+        if not texto:
+            continue
+        if _fts5_trigram(conexion) and len(texto) >= MINIMO_TRIGRAMA:
+            # Entre comillas (las comillas dobles se duplican): nada de lo buscado es sintaxis de FTS5
+            frase = texto.replace('"', '""')
+            match.append(f'{{{" ".join(columnas)}}} : "{frase}"')
+        else:
+            for columna in columnas:
+                condicion |= models.Q(**{f'{columna}__contains': texto})
+    if match:
+        condicion |= models.Q(pk__in=RawSQL(
+            f"SELECT rowid FROM {TABLA_CONTIENE} WHERE {TABLA_CONTIENE} MATCH %s", [' OR '.join(match)],
+        ))
+    return condicion
+
+
+class ClienteQuerySet(models.QuerySet):
+    """
+    Mantiene sincronizadas las columnas de búsqueda también en las rutas
+    masivas (bulk_create / bulk_update), que no pasan por Cliente.save().
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for cliente in objs:
+            cliente.actualizar_campos_busqueda()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = Cliente.agregar_campos_busqueda(fields)
+        for cliente in objs:
+            cliente.actualizar_campos_busqueda()
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def buscar(self, query):
+        """
+        Búsqueda insensible a acentos y mayúsculas resuelta en SQL sobre las
+        columnas normalizadas: nombre, email o RFC que contienen lo buscado
+        (en cualquier posición: "lopez" encuentra a "García López") y, si lo
+        buscado parece teléfono, teléfono que contiene esos dígitos. Para
+        nombres con errores está la búsqueda difusa.
+        """
+        query_norm = normalizar_texto(query.strip())
+        if not query_norm:
+            return self
+        buscadas = [(COLUMNAS_TEXTO, query_norm)]
+        # "ana1@gmail.com" o un RFC llevan dígitos pero no son teléfonos
+        if es_telefono(query):
+            buscadas.append((['telefono_normalizado'], solo_digitos(query)))
+        return self.filter(filtro_contiene(buscadas, connections[self.db]))
+
 
 class Cliente(models.Model):
     """Almacena la información completa de los clientes."""
@@ -41,7 +198,23 @@ class Cliente(models.Model):
     ciudad = models.CharField(max_length=100, blank=True, null=True)
     estado = models.CharField(max_length=100, blank=True, null=True)
     
-    fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de registro")
+    fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de registro", db_index=True)
+
+    # --- COLUMNAS DE BÚSQUEDA (Derivadas, se llenan en save()) ---
+    nombre_normalizado = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True)
+    telefono_normalizado = models.CharField(max_length=20, blank=True, default='', editable=False, db_index=True)
+    email_normalizado = models.CharField(max_length=254, blank=True, default='', editable=False, db_index=True)
+    rfc_normalizado = models.CharField(max_length=13, blank=True, default='', editable=False, db_index=True)
+
+    # Campo fuente -> columna normalizada que depende de él
+    CAMPOS_BUSQUEDA = {
+        'nombre_completo': 'nombre_normalizado',
+        'telefono': 'telefono_normalizado',
+        'email': 'email_normalizado',
+        'rfc': 'rfc_normalizado',
+    }
+
+    objects = ClienteQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Cliente"
@@ -64,9 +237,30 @@ class Cliente(models.Model):
         self.codigo_postal = self.codigo_postal or None
         self.ciudad = self.ciudad or None
         self.estado = self.estado or None
+
+        self.actualizar_campos_busqueda()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = self.agregar_campos_busqueda(update_fields)
         
         super().save(*args, **kwargs)
 
+    def actualizar_campos_busqueda(self):
+        """Recalcula las columnas normalizadas a partir de los campos originales."""
+        self.nombre_normalizado = normalizar_texto(self.nombre_completo)
+        self.telefono_normalizado = solo_digitos(self.telefono)
+        self.email_normalizado = normalizar_texto(self.email)
+        self.rfc_normalizado = normalizar_texto(self.rfc)
+
+    @classmethod
+    def agregar_campos_busqueda(cls, fields):
+        """Agrega a una lista de campos las columnas normalizadas que dependen de ellos."""
+        fields = list(fields)
+        for fuente, normalizado in cls.CAMPOS_BUSQUEDA.items():
+            if fuente in fields and normalizado not in fields:
+                fields.append(normalizado)
+        return fields
+
 
 class Equipo(models.Model):
     """Representa un dispositivo perteneciente a un cliente."""
@@ -140,4 +334,36 @@ class Equipo(models.Model):
             except Exception:
                 # Si falla (ej. clave cambió), retornamos algo seguro o vacío
                 return "Error desencriptando"
-        return None
\ No newline at end of file
+        return None
+
+class TrigramaBusqueda(models.Model):
+    """
+    Índice invertido de trigramas para la búsqueda difusa (ver busqueda_difusa.py).
+    Una fila por (objeto, campo, trigrama). Sólo se usa en bases sin pg_trgm.
+    """
+    ENTIDAD_CLIENTE = 'cliente'
+    ENTIDAD_EQUIPO = 'equipo'
+    ENTIDAD_OPCIONES = [
+        (ENTIDAD_CLIENTE, 'Cliente'),
+        (ENTIDAD_EQUIPO, 'Equipo'),
+    ]
+
+    trigrama = models.CharField(max_length=3)
+    entidad = models.CharField(max_length=10, choices=ENTIDAD_OPCIONES)
+    objeto_id = models.BigIntegerField()
+    # Cliente al que pertenece el objeto (el propio cliente o el dueño del equipo)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name="+")
+    campo = models.CharField(max_length=30)
+    # Número de trigramas distintos del campo, para calcular la similitud
+    total = models.PositiveSmallIntegerField()
+
+    class Meta:
+        verbose_name = "Trigrama de búsqueda"
+        verbose_name_plural = "Trigramas de búsqueda"
+        indexes = [
+            models.Index(fields=['trigrama', 'entidad', 'objeto_id', 'campo'], name='trigrama_busqueda_idx'),
+            models.Index(fields=['entidad', 'objeto_id'], name='trigrama_objeto_idx'),
+        ]
+
+    def __str__(self):
+        return f"'{self.trigrama}' en {self.entidad} #{self.objeto_id} ({self.campo})"
@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .autocompletado import cache_autocompletado
+from .busqueda_difusa import obtener_backend
+from .models import Cliente, Equipo, TrigramaBusqueda
+
+
+@receiver([post_save, post_delete], sender=Cliente)
+@receiver([post_save, post_delete], sender=Equipo)
+def invalidar_autocompletado(sender, **kwargs):
+    """
+    Cualquier alta, cambio o baja puede alterar los resultados en caché. Al
+    confirmarse: antes, otra petición aún lee lo anterior y lo guardaría con
+    la generación nueva.
+    """
+    transaction.on_commit(cache_autocompletado.invalidar)
+
+
+# --- ÍNDICE DE BÚSQUEDA DIFUSA (incremental) ---
+
+@receiver(post_save, sender=Cliente)
+def indexar_cliente(sender, instance, raw=False, **kwargs):
+    if not raw:
+        obtener_backend().indexar_cliente(instance)
+
+
+@receiver(post_save, sender=Equipo)
+def indexar_equipo(sender, instance, raw=False, **kwargs):
+    if not raw:
+        obtener_backend().indexar_equipo(instance)
+
+
+@receiver(post_delete, sender=Equipo)
+def desindexar_equipo(sender, instance, **kwargs):
+    # Los trigramas de un cliente eliminado se borran en cascada
+    obtener_backend().eliminar(TrigramaBusqueda.ENTIDAD_EQUIPO, instance.pk)
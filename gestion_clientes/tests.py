@@ -1,3 +1,267 @@
+import io
+import zipfile
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from reportes.xlsx import leer_xlsx
+
+from . import autocompletado, importacion
+from .autocompletado import LLAVE_GENERACION, buscar_clientes, cache_autocompletado
+from .busqueda_difusa import BackendTrigramasSQL
+from .models import Cliente, Equipo
+
+
+class BusquedaClientesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.garcia = Cliente.objects.create(
+            nombre_completo='García López Ana', telefono='(55) 1234-5678', email='ana1@gmail.com', rfc='GALA800101ABC',
+        )
+        cls.otro = Cliente.objects.create(nombre_completo='Pedro Ruiz', telefono='33 8001 0111')
+
+    def _ids(self, query):
+        return set(Cliente.objects.buscar(query).values_list('pk', flat=True))
+
+    def test_contiene_sin_acentos(self):
+        self.assertEqual(self._ids('garcia lo'), {self.garcia.pk})
+        self.assertEqual(self._ids('GARCÍA'), {self.garcia.pk})
+        self.assertEqual(self._ids('ana1@'), {self.garcia.pk})
+        self.assertEqual(self._ids('gala80'), {self.garcia.pk})
+        # A media cadena: apellido, dominio del correo, parte del RFC
+        self.assertEqual(self._ids('lopez'), {self.garcia.pk})
+        self.assertEqual(self._ids('López Ana'), {self.garcia.pk})
+        self.assertEqual(self._ids('gmail'), {self.garcia.pk})
+        self.assertEqual(self._ids('0101abc'), {self.garcia.pk})
+        self.assertEqual(self._ids('ruiz'), {self.otro.pk})
+        # Menos de 3 caracteres: no hay trigramas, se resuelve con LIKE
+        self.assertEqual(self._ids('uí'), {self.otro.pk})
+        self.assertEqual(self._ids('"lopez'), set())
+
+    def test_sigue_los_cambios(self):
+        Cliente.objects.filter(pk=self.otro.pk).update(nombre_normalizado='pedro ruiz lopez')
+        self.assertEqual(self._ids('lopez'), {self.garcia.pk, self.otro.pk})
+        Cliente.objects.bulk_update([Cliente(pk=self.otro.pk, nombre_completo='Pedro Sáenz', telefono='33 8001 0111')],
+                                    ['nombre_completo'])
+        self.assertEqual(self._ids('lopez'), {self.garcia.pk})
+        self.assertEqual(self._ids('saenz'), {self.otro.pk})
+        self.otro.delete()
+        self.assertEqual(self._ids('saenz'), set())
+
+    def test_telefono_solo_si_parece_telefono(self):
+        self.assertEqual(self._ids('55 12-34'), {self.garcia.pk})
+        self.assertEqual(self._ids('(33) 8001'), {self.otro.pk})
+        # A media cadena
+        self.assertEqual(self._ids('1234-5678'), {self.garcia.pk})
+        self.assertEqual(self._ids('01 0111'), {self.otro.pk})
+        # Llevan dígitos, pero no son teléfonos: no se comparan con el teléfono de Pedro
+        self.assertEqual(self._ids('ana1@gmail.com'), {self.garcia.pk})
+        self.assertEqual(self._ids('GALA800101ABC'), {self.garcia.pk})
+
+
+class AutocompletadoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = Cliente.objects.create(nombre_completo='Ana García', telefono='55 1234 5678')
+        cls.andres = Cliente.objects.create(nombre_completo='Andrés Pérez', telefono='55 9999 0000')
+        cls.pedro = Cliente.objects.create(nombre_completo='Pedro 55', telefono='33 5512 0000')
+
+    def setUp(self):
+        cache_autocompletado.limpiar()
+
+    def _ids(self, query):
+        return {r['id'] for r in buscar_clientes(query)}
+
+    def test_prefijo_de_nombre_y_telefono(self):
+        self.assertEqual(self._ids('and'), {self.andres.pk})
+        self.assertEqual(self._ids('ANA G'), {self.ana.pk})
+        self.assertEqual(self._ids('garcia'), set())
+        self.assertEqual(self._ids('55 12'), {self.ana.pk})
+        self.assertEqual(self._ids('(55) 1234'), {self.ana.pk})
+
+    def test_digitos_en_texto_no_buscan_telefono(self):
+        # 'pedro 55' no parece teléfono: no debe traer a quien tiene teléfono 55...
+        self.assertEqual(self._ids('pedro 55'), {self.pedro.pk})
+        # y al extender un prefijo en caché tampoco
+        self.assertEqual(self._ids('ped'), {self.pedro.pk})
+        self.assertEqual(self._ids('pedro 5'), {self.pedro.pk})
+
+    def test_prefijo_en_cache_se_filtra_sin_consultar(self):
+        self.assertEqual(self._ids('an'), set())
+        self.assertEqual(self._ids('ana'), {self.ana.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(self._ids('ana ga'), {self.ana.pk})
+
+    def test_escritura_invalida_al_confirmar(self):
+        self.assertEqual(self._ids('ana'), {self.ana.pk})
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            nueva = Cliente.objects.create(nombre_completo='Ana Torres', telefono='81 0000 0000')
+        # Antes de confirmar, el caché sigue sirviendo lo anterior
+        self.assertEqual(self._ids('ana'), {self.ana.pk})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._ids('ana'), {self.ana.pk, nueva.pk})
+
+    def test_generacion_compartida_invalida_otros_procesos(self):
+        self.assertEqual(self._ids('ana'), {self.ana.pk})
+        Cliente.objects.filter(pk=self.ana.pk).update(nombre_completo='Beatriz', nombre_normalizado='beatriz')
+        # Otro worker incrementó la generación: este proceso no tocó su LRU
+        cache.add(LLAVE_GENERACION, 0, timeout=None)
+        cache.incr(LLAVE_GENERACION)
+        self.assertEqual(self._ids('ana'), set())
+
+    def test_entradas_caducan(self):
+        self.assertEqual(self._ids('ana'), {self.ana.pk})
+        Cliente.objects.filter(pk=self.ana.pk).update(nombre_completo='Beatriz', nombre_normalizado='beatriz')
+        self.assertEqual(self._ids('ana'), {self.ana.pk})
+        with mock.patch.object(autocompletado.time, 'monotonic', return_value=autocompletado.time.monotonic() + 3600):
+            self.assertEqual(self._ids('ana'), set())
+
+
+class BusquedaDifusaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gonzalez = Cliente.objects.create(nombre_completo='Ana González Ruiz', telefono='55 1234 5678')
+        cls.otros = [
+            Cliente.objects.create(nombre_completo=f'Ana {apellido}', telefono=f'33 0000 00{i:02d}')
+            for i, apellido in enumerate(['Gómez', 'Gutiérrez', 'Galván', 'Ortiz', 'Ochoa', 'Gonzaga'])
+        ]
+        Equipo.objects.create(cliente=cls.otros[0], tipo_equipo='Laptop', marca='HP', modelo='LAP-100',
+                              numero_serie='SN0004321-1')
+
+    def _ids(self, backend, query):
+        return [cliente_id for cliente_id, _ in backend.buscar(query)]
+
+    def test_errores_de_captura(self):
+        backend = BackendTrigramasSQL()
+        self.assertEqual(self._ids(backend, 'gonzales ruiz')[0], self.gonzalez.pk)
+        self.assertEqual(self._ids(backend, 'SN0004351-1')[0], self.otros[0].pk)
+
+    def test_tope_de_frecuencia_no_cambia_resultados(self):
+        # Con tope 1, los trigramas repetidos ('  a', 'ana', ' go'...) sólo se
+        # cuentan en los candidatos que dan los demás
+        sin_tope, con_tope = BackendTrigramasSQL(frecuencia_maxima=None), BackendTrigramasSQL(frecuencia_maxima=1)
+        for query in ['ana gonzales', 'ana', 'ana gomes', 'SN0004351-1', 'ochoa']:
+            self.assertEqual(sin_tope.buscar(query), con_tope.buscar(query), query)
+
+
+def _csv(*filas):
+    return io.BytesIO('\n'.join(','.join(fila) for fila in filas).encode('utf-8'))
+
+
+def _xlsx(filas):
+    """XLSX como lo guarda Excel: textos en sharedStrings, números como <v> y celdas vacías omitidas."""
+    compartidas, hoja = [], []
+    for r, fila in enumerate(filas, start=1):
+        celdas = []
+        for c, valor in enumerate(fila):
+            referencia = f'{chr(65 + c)}{r}'
+            if valor == '':
+                continue
+            if isinstance(valor, (int, float)):
+                celdas.append(f'<c r="{referencia}"><v>{valor}</v></c>')
+            else:
+                compartidas.append(valor)
+                celdas.append(f'<c r="{referencia}" t="s"><v>{len(compartidas) - 1}</v></c>')
+        hoja.append(f'<row r="{r}">{"".join(celdas)}</row>')
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    archivo = io.BytesIO()
+    with zipfile.ZipFile(archivo, 'w') as xlsx:
+        xlsx.writestr('xl/workbook.xml', (
+            f'<workbook {ns} xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Clientes" sheetId="1" r:id="rId7"/></sheets></workbook>'))
+        xlsx.writestr('xl/_rels/workbook.xml.rels', (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId7" Type="worksheet" Target="worksheets/hoja.xml"/></Relationships>'))
+        xlsx.writestr('xl/sharedStrings.xml', f'<sst {ns}>' + ''.join(
+            f'<si><t>{texto}</t></si>' for texto in compartidas) + '</sst>')
+        xlsx.writestr('xl/worksheets/hoja.xml', f'<worksheet {ns}><sheetData>{"".join(hoja)}</sheetData></worksheet>')
+    archivo.seek(0)
+    return archivo
+
+
+class ImportacionTests(TestCase):
+
+    ENCABEZADO_CLIENTES = ('Nombre completo', 'Teléfono', 'Email')
+    ENCABEZADO_EQUIPOS = ('telefono_cliente', 'tipo_equipo', 'marca', 'modelo', 'numero_serie', 'contrasena')
+
+    def test_duplicados_en_el_archivo_y_en_la_base(self):
+        Cliente.objects.create(nombre_completo='Ya Existe', telefono='5500000001', email='existe@correo.com')
+        resultado = importacion.importar(_csv(
+            self.ENCABEZADO_CLIENTES,
+            ('Ana Pérez', '5500000001', ''),                    # 2: teléfono en la base
+            ('Luis Gómez', '5500000002', 'luis@correo.com'),    # 3
+            ('Luis Repetido', '5500000002', ''),                # 4: teléfono de la fila 3
+            ('Eva Ruiz', '5500000003', 'existe@correo.com'),    # 5: email en la base
+            ('Eva Repetida', '5500000004', 'luis@correo.com'),  # 6: email de la fila 3
+            ('Sara Díaz', '5500000005', ''),                    # 7
+        ), nombre_clientes='clientes.csv')
+
+        self.assertEqual((resultado.clientes, resultado.duplicados), (2, 4))
+        self.assertEqual([fila for _, fila, _ in resultado.errores], [2, 4, 5, 6])
+        self.assertEqual(set(Cliente.objects.values_list('nombre_completo', flat=True)),
+                         {'Ya Existe', 'Luis Gómez', 'Sara Díaz'})
+        # Las columnas de búsqueda se llenan aunque bulk_create no pase por save()
+        self.assertEqual(set(Cliente.objects.buscar('sara').values_list('telefono', flat=True)), {'5500000005'})
+
+    def test_errores_por_fila(self):
+        resultado = importacion.importar(_csv(
+            self.ENCABEZADO_CLIENTES,
+            ('', '5500000001', ''),                       # 2: sin nombre
+            ('Ana Pérez', '5500000002', 'no-es-email'),   # 3
+            ('Luis Gómez', '1' * 25, ''),                 # 4: teléfono demasiado largo
+            ('Eva Ruiz', '5500000003', ''),
+        ), nombre_clientes='clientes.csv')
+
+        self.assertEqual((resultado.clientes, resultado.total_errores, resultado.duplicados), (1, 3, 0))
+        self.assertEqual([(archivo, fila) for archivo, fila, _ in resultado.errores],
+                         [('clientes.csv', 2), ('clientes.csv', 3), ('clientes.csv', 4)])
+        self.assertIn('nombre_completo', resultado.errores[0][2])
+        self.assertIn('email', resultado.errores[1][2])
+        self.assertIn('telefono', resultado.errores[2][2])
+
+    def test_equipos_de_clientes_importados_en_la_misma_corrida(self):
+        existente = Cliente.objects.create(nombre_completo='Ya Existe', telefono='5500000001')
+        resultado = importacion.importar(
+            clientes=_csv(self.ENCABEZADO_CLIENTES, ('Ana Pérez', '5500000002', '')),
+            equipos=_csv(
+                self.ENCABEZADO_EQUIPOS,
+                ('5500000002', 'laptop', 'HP', 'ProBook', 'SN-1', 'secreta'),  # 2: cliente de este archivo
+                ('5500000001', 'Impresora', 'Epson', 'L3150', 'SN-2', ''),     # 3: cliente que ya existía
+                ('5500000002', 'Laptop', 'HP', 'ProBook', 'SN-1', ''),         # 4: serie repetida
+                ('5599999999', 'Laptop', 'HP', 'ProBook', '', ''),             # 5: cliente inexistente
+                ('5500000002', 'Tostador', 'X', 'Y', '', ''),                  # 6: tipo inválido
+            ),
+            nombre_clientes='clientes.csv', nombre_equipos='equipos.csv',
+        )
+
+        self.assertEqual((resultado.clientes, resultado.equipos, resultado.duplicados), (1, 2, 1))
+        self.assertEqual([(archivo, fila) for archivo, fila, _ in resultado.errores],
+                         [('equipos.csv', 4), ('equipos.csv', 5), ('equipos.csv', 6)])
+        ana = Cliente.objects.get(telefono='5500000002')
+        equipo = ana.equipos.get()
+        self.assertEqual((equipo.tipo_equipo, equipo.numero_serie), (Equipo.TIPO_EQUIPO_LAPTOP, 'SN-1'))
+        self.assertEqual(equipo.get_password(), 'secreta')
+        self.assertEqual(existente.equipos.get().contrasena_equipo, None)
+
+    def test_xlsx(self):
+        archivo = _xlsx([
+            ['Nombre completo', 'Teléfono', 'Email', 'Ciudad'],
+            ['Ana Pérez', 5500000001.0, '', 'Puebla'],     # número con ".0"; email vacío: la celda no se escribe
+            ['Luis Gómez', '5500000002', 'luis@correo.com'],
+        ])
+        self.assertEqual(list(leer_xlsx(archivo)), [
+            ['Nombre completo', 'Teléfono', 'Email', 'Ciudad'],
+            ['Ana Pérez', '5500000001', '', 'Puebla'],
+            ['Luis Gómez', '5500000002', 'luis@correo.com'],
+        ])
+
+        archivo.seek(0)
+        resultado = importacion.importar(archivo, nombre_clientes='clientes.xlsx')
+        self.assertEqual((resultado.clientes, resultado.errores), (2, []))
+        ana = Cliente.objects.get(telefono='5500000001')
+        self.assertEqual((ana.email, ana.ciudad), (None, 'Puebla'))
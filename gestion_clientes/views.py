@@ -1,4 +1,3 @@
-import unicodedata
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
 from django.core.paginator import Paginator
@@ -6,76 +5,54 @@ from django.db.models import ProtectedError
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
 from django.urls import reverse
+from sistema_crm_pacscomputacion.metricas import presupuesto_consultas
+from sistema_crm_pacscomputacion.replicas import lectura_en_replica
 from .models import Cliente, Equipo
-
-# --- UTILIDADES PARA BÚSQUEDA INTELIGENTE ---
-
-def normalizar_texto(texto):
-    """
-    Convierte el texto a minúsculas y elimina acentos (tildes).
-    Ejemplo: 'García' -> 'garcia', 'Árbol' -> 'arbol', 'Ana' -> 'ana'
-    """
-    if not texto:
-        return ''
-    # NFD separa los caracteres de sus tildes. 'Mn' es la categoría de marcas de acento.
-    return ''.join(c for c in unicodedata.normalize('NFD', str(texto).lower()) if unicodedata.category(c) != 'Mn')
+from .busqueda_difusa import buscar_clientes_similares
 
 # --- VISTAS ---
 
 @login_required
+@lectura_en_replica
+@presupuesto_consultas(10)
 def lista_clientes(request):
     """
-    Vista para listar clientes con búsqueda "Inteligente" en Python.
-    Resuelve inconsistencias de acentos y mayúsculas.
+    Vista para listar clientes con búsqueda "Inteligente".
+    Resuelve inconsistencias de acentos y mayúsculas comparando contra las
+    columnas normalizadas de Cliente, de modo que el filtro y la paginación
+    se resuelven en la base de datos.
+    Si no hay coincidencias exactas, sugiere clientes con nombre, teléfono o
+    equipos parecidos (errores de captura como "Gonzales" / "González").
     """
     query = request.GET.get('q', '').strip()
     
-    # Obtenemos todos los clientes base (optimizamos trayendo solo lo necesario si fuera mucha data, 
-    # pero para un CRM de residencia, traer los objetos completos está bien)
-    todos_clientes = Cliente.objects.all().order_by('-fecha_registro')
-    
-    # Lista para almacenar los resultados filtrados
-    clientes_filtrados = []
+    clientes = Cliente.objects.all().order_by('-fecha_registro')
 
     if query:
-        # 1. Normalizamos el término de búsqueda (input del usuario)
-        query_norm = normalizar_texto(query)
-        
-        # 2. Iteramos y comparamos con datos normalizados
-        # Esto asegura que "garcia" coincida con "García" almacenado en BD.
-        for cliente in todos_clientes:
-            # Normalizamos los campos del cliente para la comparación
-            nombre_norm = normalizar_texto(cliente.nombre_completo)
-            telefono_norm = normalizar_texto(cliente.telefono)
-            email_norm = normalizar_texto(cliente.email)
-            rfc_norm = normalizar_texto(cliente.rfc)
-            
-            # Verificamos si el término buscado está en alguno de los campos clave
-            if (query_norm in nombre_norm or 
-                query_norm in telefono_norm or 
-                query_norm in email_norm or 
-                query_norm in rfc_norm):
-                clientes_filtrados.append(cliente)
-    else:
-        # Si no hay búsqueda, mostramos todos
-        clientes_filtrados = todos_clientes
+        # "garcia" coincide con "García" porque ambos lados están normalizados
+        clientes = clientes.buscar(query)
 
-    # 3. Paginación (Usamos la lista filtrada)
-    paginator = Paginator(clientes_filtrados, 10)
+    paginator = Paginator(clientes, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
+    sugerencias = []
+    if query and paginator.count == 0:
+        sugerencias = buscar_clientes_similares(query)
+
     context = {
         'page_obj': page_obj,
         'query': query,
+        'sugerencias': sugerencias,
     }
     return render(request, 'gestion_clientes/lista_clientes.html', context)
 
 @login_required
+@presupuesto_consultas(10)
 def detalle_cliente(request, id):
     cliente = get_object_or_404(Cliente, pk=id)
     # Ordenar historial de más reciente a más antiguo
-    historial_ordenes = cliente.ordenes.all().order_by('-fecha_creacion')
+    historial_ordenes = cliente.ordenes.select_related('equipo', 'tecnico_asignado').order_by('-fecha_creacion')
     equipos = cliente.equipos.all()
 
     context = {
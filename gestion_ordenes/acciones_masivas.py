@@ -0,0 +1,171 @@
+"""
+Acciones sobre varias órdenes a la vez, desde lista_ordenes: asignar técnico,
+cambiar prioridad o cambiar estado (incluido el cierre).
+
+Las órdenes se validan juntas antes de escribir: si alguna no admite el cambio
+no se modifica ninguna, y el error lista las que fallan agrupadas por motivo.
+Los cambios de estado siguen la máquina de estados (estados.ORDEN) y el
+técnico y la prioridad las reglas de editar_orden. Después, en una transacción:
+
+1. un solo UPDATE ... WHERE id IN (...) con el nuevo valor,
+2. las entradas de bitácora con bulk_create (mismos textos que las vistas de
+   una orden, que transiciones.interpretar sabe leer),
+3. las señales ordenes_actualizadas_en_bloque y bitacora_creada_en_bloque
+   (gestion_ordenes/signals.py), que hacen por el bloque lo que post_save hace
+   por cada orden: transiciones de estado, KPIs, caché de dashboards, días
+   pendientes de la tabla de hechos y eventos en vivo.
+
+Las órdenes que ya tienen el valor pedido se omiten (sin UPDATE ni bitácora).
+"""
+from collections import defaultdict, namedtuple
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import estados
+from .models import BitacoraOrden, OrdenServicio
+from .signals import bitacora_creada_en_bloque, ordenes_actualizadas_en_bloque
+
+ACCION_TECNICO = 'asignar_tecnico'
+ACCION_PRIORIDAD = 'cambiar_prioridad'
+ACCION_ESTADO = 'cambiar_estado'
+ACCIONES = {
+    ACCION_TECNICO: 'Asignar técnico',
+    ACCION_PRIORIDAD: 'Cambiar prioridad',
+    ACCION_ESTADO: 'Cambiar estado',
+}
+MAXIMO_ORDENES = 5000
+# Folios que se muestran por cada motivo de error; el resto sólo se cuenta
+MAXIMO_FOLIOS = 20
+
+# Lo que cambió en una orden. anterior/actual: (estado, tecnico_id), como en dashboard.kpis
+CambioOrden = namedtuple(
+    'CambioOrden', ['orden_id', 'anterior', 'actual', 'fecha_creacion', 'fecha_cierre_anterior', 'fecha_cierre'],
+)
+
+
+def _error_de_orden(orden, accion, valor, contexto):
+    """Motivo por el que `orden` no admite la acción, o None."""
+    if accion == ACCION_ESTADO:
+        return estados.error_orden(orden.estado, orden.fecha_cierre, valor, contexto)
+    if orden.fecha_cierre:
+        return "La orden ya está cerrada."
+    if orden.estado == OrdenServicio.ESTADO_FINALIZADA_TECNICO:
+        return "La orden ya fue finalizada por el técnico: no se puede cambiar su técnico ni su prioridad."
+    return None
+
+
+def _agrupar_errores(errores):
+    """[(orden_id, motivo)] -> un mensaje por motivo con los folios que lo tienen."""
+    por_motivo = defaultdict(list)
+    for orden_id, motivo in errores:
+        por_motivo[motivo].append(orden_id)
+    mensajes = []
+    for motivo, orden_ids in por_motivo.items():
+        folios = ', '.join(f"#{orden_id}" for orden_id in orden_ids[:MAXIMO_FOLIOS])
+        restantes = len(orden_ids) - MAXIMO_FOLIOS
+        mensajes.append(f"{motivo} Órdenes: {folios}{f' y {restantes} más' if restantes > 0 else ''}.")
+    return mensajes
+
+
+def _valor(accion, valor):
+    """Valida y convierte el valor de la acción (el técnico llega como id; '' lo desasigna)."""
+    if accion == ACCION_TECNICO:
+        if not valor:
+            return None
+        tecnico = User.objects.filter(pk=valor, groups__name='Técnico').first() if str(valor).isdigit() else None
+        if tecnico is None:
+            raise ValidationError("El técnico seleccionado no existe.")
+        return tecnico
+    if accion == ACCION_PRIORIDAD:
+        if valor not in dict(OrdenServicio.PRIORIDAD_OPCIONES):
+            raise ValidationError("Selecciona una prioridad válida.")
+        return valor
+    if accion == ACCION_ESTADO:
+        if valor not in estados.ORDEN.etiquetas:
+            raise ValidationError("Selecciona un estado válido.")
+        return valor
+    raise ValidationError("Acción no reconocida.")
+
+
+def _ids(orden_ids):
+    try:
+        ids = sorted({int(orden_id) for orden_id in orden_ids})
+    except (TypeError, ValueError):
+        raise ValidationError("La selección de órdenes no es válida.")
+    if not ids:
+        raise ValidationError("Selecciona al menos una orden.")
+    if len(ids) > MAXIMO_ORDENES:
+        raise ValidationError(f"Se pueden modificar hasta {MAXIMO_ORDENES} órdenes a la vez.")
+    return ids
+
+
+def aplicar(accion, orden_ids, usuario, valor):
+    """
+    Aplica la acción a las órdenes `orden_ids` en nombre de `usuario`.
+    `valor`: id del técnico ('' para desasignar), prioridad o estado.
+    Devuelve cuántas órdenes cambiaron. Lanza ValidationError (un mensaje por
+    motivo, con los folios que no lo admiten) sin modificar nada.
+    """
+    ids = _ids(orden_ids)
+    valor = _valor(accion, valor)
+    # Las guardas (ej. permiso de cierre) se evalúan una vez para todo el bloque
+    contexto = estados.ContextoTransicion(usuario)
+    ahora = timezone.now()
+
+    with transaction.atomic():
+        ordenes = list(
+            OrdenServicio.objects.select_for_update().filter(pk__in=ids).only(
+                'id', 'estado', 'tecnico_asignado_id', 'prioridad', 'fecha_creacion', 'fecha_cierre',
+            ).order_by('pk')
+        )
+        errores = [(orden_id, "No existe.") for orden_id in sorted(set(ids) - {orden.pk for orden in ordenes})]
+        for orden in ordenes:
+            error = _error_de_orden(orden, accion, valor, contexto)
+            if error:
+                errores.append((orden.pk, error))
+        if errores:
+            raise ValidationError(_agrupar_errores(errores))
+
+        if accion == ACCION_TECNICO:
+            tecnico_id = valor.pk if valor else None
+            ordenes = [orden for orden in ordenes if orden.tecnico_asignado_id != tecnico_id]
+            campos = {'tecnico_asignado_id': tecnico_id}
+            texto = f"Edición administrativa: Técnico: {valor.username}" if valor else "Edición administrativa: Técnico desasignado"
+            descripcion = lambda orden: texto
+        elif accion == ACCION_PRIORIDAD:
+            ordenes = [orden for orden in ordenes if orden.prioridad != valor]
+            campos = {'prioridad': valor}
+            descripcion = lambda orden: f"Edición administrativa: Prioridad: {valor}"
+        else:
+            ordenes = [orden for orden in ordenes if orden.estado != valor]
+            campos = {'estado': valor}
+            # A los estados finales sólo se llega cerrando la orden
+            if valor in estados.ORDEN.finales:
+                campos['fecha_cierre'] = ahora
+            descripcion = lambda orden: estados.texto_bitacora(orden.estado, valor)
+        if not ordenes:
+            return 0
+
+        # update() calcula también prioridad_peso (OrdenServicioQuerySet)
+        OrdenServicio.objects.filter(pk__in=[orden.pk for orden in ordenes]).update(**campos)
+        entradas = BitacoraOrden.objects.bulk_create([
+            BitacoraOrden(orden=orden, usuario=usuario, descripcion=descripcion(orden)) for orden in ordenes
+        ])
+
+        cambios = [
+            CambioOrden(
+                orden_id=orden.pk,
+                anterior=(orden.estado, orden.tecnico_asignado_id),
+                actual=(campos.get('estado', orden.estado), campos.get('tecnico_asignado_id', orden.tecnico_asignado_id)),
+                fecha_creacion=orden.fecha_creacion,
+                fecha_cierre_anterior=orden.fecha_cierre,
+                fecha_cierre=campos.get('fecha_cierre', orden.fecha_cierre),
+            )
+            for orden in ordenes
+        ]
+        ordenes_actualizadas_en_bloque.send(sender=OrdenServicio, cambios=cambios, usuario=usuario)
+        bitacora_creada_en_bloque.send(sender=BitacoraOrden, entradas=entradas)
+    return len(ordenes)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import OrdenServicio, Cotizacion, Transferencia, ItemTransferido, BitacoraOrden
+from .models import OrdenServicio, Cotizacion, Transferencia, ItemTransferido, BitacoraOrden, OrdenEstadoTransicion
 
 # Register your models here.
 admin.site.register(OrdenServicio)
@@ -7,3 +7,4 @@ admin.site.register(Cotizacion)
 admin.site.register(Transferencia)
 admin.site.register(ItemTransferido)
 admin.site.register(BitacoraOrden)
+admin.site.register(OrdenEstadoTransicion)
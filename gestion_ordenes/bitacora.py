@@ -0,0 +1,185 @@
+"""
+Entradas automáticas de bitácora (auditoría): "Orden creada", cambios de
+estado, cotizaciones, transferencias, servicios. Las vistas llaman a
+registrar() en lugar de BitacoraOrden.objects.create().
+
+Dos modos, según settings.BITACORA_ASINCRONA (CRM_BITACORA_ASINCRONA=1):
+
+- Síncrono (por defecto y siempre en las pruebas): la entrada se inserta en
+  el acto, dentro de la transacción de la vista.
+- Asíncrono: la entrada se arma en memoria con su fecha_hora y, al
+  confirmarse la transacción de la vista (on_commit), pasa a la cola del
+  proceso. Un hilo la escribe con bulk_create al juntar BITACORA_LOTE
+  entradas o al pasar BITACORA_INTERVALO segundos, y envía
+  bitacora_creada_en_bloque (feed de recepción y eventos en vivo). La
+  transacción de la vista es más corta (un INSERT menos por petición) y una
+  vista revertida no deja entradas. Al salir el proceso (atexit) se escribe
+  lo pendiente.
+
+En modo asíncrono una entrada tarda hasta BITACORA_INTERVALO segundos en
+verse, y si el proceso muere sin salir (kill -9) se pierde lo que estaba en
+cola. Las notas que escribe el usuario (detalle_orden) siguen siendo
+síncronas. Si el hilo no arranca o muere por un error, el escritor pasa a
+escribir cada entrada en el acto (lo que quedaba en cola incluido).
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import BitacoraOrden
+from .signals import bitacora_creada_en_bloque
+
+logger = logging.getLogger(__name__)
+
+_DETENER = object()
+
+
+class _Vaciar:
+    """Marca en la cola: el hilo escribe lo pendiente y avisa con `listo`."""
+
+    def __init__(self):
+        self.listo = threading.Event()
+
+
+class EscritorBitacora:
+    """Cola de entradas del proceso y el hilo que las escribe por lotes."""
+
+    def __init__(self, lote=None, intervalo=None):
+        self.lote = lote
+        self.intervalo = intervalo
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._candado = threading.Lock()
+        self._atexit = False
+        # Sin hilo (no arrancó o murió): las entradas se escriben en el acto
+        self._sincrono = False
+
+    def encolar(self, entrada):
+        if not self._sincrono:
+            self._iniciar()
+        if self._sincrono:
+            self._escribir([entrada])
+            return
+        self._cola.put(entrada)
+        if self._sincrono:
+            # El hilo murió mientras se encolaba: nadie más leerá la cola
+            self._escribir(self._sacar_pendientes())
+
+    def vaciar(self, timeout=None):
+        """Espera a que se escriba todo lo encolado hasta ahora. False si vence el timeout."""
+        if self._hilo is None or not self._hilo.is_alive():
+            return True
+        marca = _Vaciar()
+        self._cola.put(marca)
+        return marca.listo.wait(timeout)
+
+    def detener(self, timeout=10):
+        """Escribe lo pendiente y termina el hilo (se registra en atexit)."""
+        with self._candado:
+            hilo, self._hilo = self._hilo, None
+        if hilo is not None and hilo.is_alive():
+            self._cola.put(_DETENER)
+            hilo.join(timeout)
+
+    def _iniciar(self):
+        with self._candado:
+            if self._hilo is not None and self._hilo.is_alive():
+                return
+            self._hilo = threading.Thread(target=self._trabajar, name='escritor-bitacora', daemon=True)
+            try:
+                self._hilo.start()
+            except RuntimeError:
+                # Ej. "can't start new thread" (límite de hilos del proceso)
+                logger.exception("No arrancó el hilo de la bitácora; se escribe de forma síncrona.")
+                self._hilo = None
+                self._sincrono = True
+                return
+            if not self._atexit:
+                atexit.register(self.detener)
+                self._atexit = True
+
+    def _trabajar(self):
+        lote = self.lote or settings.BITACORA_LOTE
+        intervalo = self.intervalo or settings.BITACORA_INTERVALO
+        pendientes = []
+        limite = None
+        try:
+            while True:
+                espera = max(0, limite - time.monotonic()) if pendientes else None
+                try:
+                    elemento = self._cola.get(timeout=espera)
+                except queue.Empty:
+                    elemento = None  # Venció el intervalo
+
+                if isinstance(elemento, BitacoraOrden):
+                    pendientes.append(elemento)
+                    if len(pendientes) == 1:
+                        limite = time.monotonic() + intervalo
+                    if len(pendientes) < lote:
+                        continue
+                if pendientes:
+                    self._escribir(pendientes)
+                    pendientes = []
+                    # Como al terminar una petición: CONN_MAX_AGE decide si la conexión sigue abierta
+                    close_old_connections()
+                if isinstance(elemento, _Vaciar):
+                    elemento.listo.set()
+                elif elemento is _DETENER:
+                    return
+        except Exception:
+            # _escribir no lanza: esto es un error del propio hilo
+            logger.exception("El hilo de la bitácora terminó por un error; se escribe de forma síncrona.")
+            self._sincrono = True
+            self._escribir(pendientes + self._sacar_pendientes())
+            close_old_connections()
+
+    def _sacar_pendientes(self):
+        """Vacía la cola sin esperar: las entradas que tenía (y libera a quien espera en vaciar())."""
+        entradas = []
+        while True:
+            try:
+                elemento = self._cola.get_nowait()
+            except queue.Empty:
+                return entradas
+            if isinstance(elemento, BitacoraOrden):
+                entradas.append(elemento)
+            elif isinstance(elemento, _Vaciar):
+                elemento.listo.set()
+
+    def _escribir(self, entradas):
+        """Escribe un lote; nunca lanza (el hilo debe seguir vivo)."""
+        if not entradas:
+            return
+        try:
+            with transaction.atomic():
+                creadas = BitacoraOrden.objects.bulk_create(entradas)
+                bitacora_creada_en_bloque.send(sender=BitacoraOrden, entradas=creadas)
+        except Exception:
+            # Ej. una orden borrada mientras su entrada esperaba, o un receptor
+            # de la señal que falla: que no tumbe el lote ni el hilo
+            logger.exception("No se pudo escribir un lote de %s entradas de bitácora; se reintenta una por una.", len(entradas))
+            for entrada in entradas:
+                try:
+                    with transaction.atomic():
+                        entrada.pk = None
+                        entrada.save()
+                except Exception:
+                    logger.exception("Entrada de bitácora perdida (orden %s): %s", entrada.orden_id, entrada.descripcion)
+
+
+escritor = EscritorBitacora()
+
+
+def registrar(orden, usuario, descripcion):
+    """Agrega una entrada automática a la bitácora de `orden` (síncrona o en cola, ver arriba)."""
+    if not settings.BITACORA_ASINCRONA:
+        return BitacoraOrden.objects.create(orden=orden, usuario=usuario, descripcion=descripcion)
+    entrada = BitacoraOrden(orden_id=orden.pk, usuario=usuario, descripcion=descripcion, fecha_hora=timezone.now())
+    transaction.on_commit(lambda: escritor.encolar(entrada))
+    return entrada
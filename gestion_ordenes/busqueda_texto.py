@@ -0,0 +1,350 @@
+"""
+Búsqueda de texto completo en las órdenes: falla reportada
+(OrdenServicio.descripcion_falla), bitácora (BitacoraOrden.descripcion) y
+cotizaciones (Cotizacion.concepto y notas). Sirve para encontrar reparaciones
+anteriores por síntoma: "no enciende", "bisagra".
+
+Hay dos backends, con la misma interfaz, elegidos por el motor de la base
+(o con el setting BUSQUEDA_TEXTO_BACKEND), como en busqueda_difusa:
+- BackendFts5 (SQLite): una tabla virtual FTS5 por tipo de documento, con
+  rowid = id del objeto, así que actualizar o borrar un documento es una
+  búsqueda por llave. El tokenizador unicode61 quita acentos y mayúsculas
+  igual que normalizar_texto, que se aplica a lo buscado.
+- BackendTsvector (PostgreSQL): una tabla con el tsvector del texto ya
+  normalizado con normalizar_texto e índice GIN.
+Las tablas las crea la migración 0012 según el motor. Las señales de
+gestion_ordenes/signals.py las mantienen al día; reconstruir_busqueda_texto
+las vuelve a generar.
+
+Se buscan documentos con todas las palabras. Por defecto son palabras
+completas; con * al final ("ventil*") la última es prefijo, que en SQLite
+cuesta más (FTS5 junta las listas de todos los términos con ese prefijo).
+
+Tiempo acotado con millones de entradas: el backend sólo devuelve, por tipo,
+las CANDIDATOS_POR_TIPO coincidencias más recientes (FTS5 las lee en orden
+de rowid sin recorrer todas), y la relevancia se calcula en Python sobre
+ellas con la fórmula de BM25 sin IDF (frecuencia de cada palabra, saturada y
+ajustada por longitud). bm25() de FTS5 no sirve aquí: cuenta en todo el
+índice los documentos de cada palabra, cientos de ms con un término común.
+Con un término muy común lo más antiguo puede no aparecer: se agregan
+palabras para afinar. Puntaje y fragmentos resaltados son iguales en los dos
+backends.
+"""
+import re
+import unicodedata
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+from gestion_clientes.models import normalizar_texto
+
+from .models import BitacoraOrden, Cotizacion, OrdenServicio
+
+TIPO_FALLA = 'falla'
+TIPO_BITACORA = 'bitacora'
+TIPO_COTIZACION = 'cotizacion'
+TIPOS = {
+    TIPO_FALLA: 'Falla reportada',
+    TIPO_BITACORA: 'Bitácora',
+    TIPO_COTIZACION: 'Cotización',
+}
+LIMITE_RESULTADOS = 20
+CANDIDATOS_POR_TIPO = 2000
+MAXIMO_TERMINOS = 8
+# Un prefijo de una o dos letras coincide con casi todo el índice
+MINIMO_PREFIJO = 3
+ANCHO_FRAGMENTO = 160
+# Parámetros de BM25
+K1 = 1.2
+B = 0.75
+
+# Tablas FTS5 (SQLite) por tipo
+TABLAS_FTS5 = {
+    TIPO_FALLA: 'gestion_ordenes_fts_falla',
+    TIPO_BITACORA: 'gestion_ordenes_fts_bitacora',
+    TIPO_COTIZACION: 'gestion_ordenes_fts_cotizacion',
+}
+TABLA_TSVECTOR = 'gestion_ordenes_busqueda_texto'
+
+_PALABRA = re.compile(r'[a-z0-9]+')
+
+Consulta = namedtuple('Consulta', ['palabras', 'prefijo'])
+Resultado = namedtuple('Resultado', ['tipo', 'objeto_id', 'orden_id', 'puntaje', 'texto'])
+
+
+# --- TEXTO DE CADA DOCUMENTO ---
+
+def texto_falla(orden):
+    return orden.descripcion_falla or ''
+
+
+def texto_bitacora(entrada):
+    return entrada.descripcion or ''
+
+
+def texto_cotizacion(cotizacion):
+    return '\n'.join(parte for parte in (cotizacion.concepto, cotizacion.notas) if parte)
+
+
+def documentos(tipo, objetos):
+    """[(objeto_id, orden_id, texto)] de objetos del modelo de `tipo`."""
+    if tipo == TIPO_FALLA:
+        return [(orden.pk, orden.pk, texto_falla(orden)) for orden in objetos]
+    texto = texto_bitacora if tipo == TIPO_BITACORA else texto_cotizacion
+    return [(objeto.pk, objeto.orden_id, texto(objeto)) for objeto in objetos]
+
+
+def _fuente(tipo):
+    """Queryset con lo necesario para indexar todos los objetos de `tipo`."""
+    if tipo == TIPO_FALLA:
+        return OrdenServicio.objects.only('id', 'descripcion_falla')
+    if tipo == TIPO_BITACORA:
+        return BitacoraOrden.objects.only('id', 'orden_id', 'descripcion')
+    return Cotizacion.objects.only('id', 'orden_id', 'concepto', 'notas')
+
+
+# --- NORMALIZACIÓN ---
+
+class _Plegado(dict):
+    """Tabla para str.translate: cada carácter como lo deja normalizar_texto (se calcula la primera vez)."""
+
+    def __missing__(self, codigo):
+        # Los acentos sueltos (texto en NFD) desaparecen, como en normalizar_texto
+        self[codigo] = normalizar_texto(chr(codigo)) or None
+        return self[codigo]
+
+
+_PLEGADO = _Plegado()
+
+
+def plegar(texto):
+    """normalizar_texto() con str.translate: lo mismo, mucho más rápido para miles de textos."""
+    return (texto or '').translate(_PLEGADO)
+
+
+def consulta(query):
+    """
+    Palabras normalizadas de lo buscado (como las parte el tokenizador) y si
+    la última es prefijo (termina en * y tiene al menos MINIMO_PREFIJO letras).
+    """
+    palabras = _PALABRA.findall(normalizar_texto(query))[:MAXIMO_TERMINOS]
+    prefijo = bool(palabras) and query.rstrip().endswith('*') and len(palabras[-1]) >= MINIMO_PREFIJO
+    return Consulta(palabras, prefijo)
+
+
+def _patron(consulta_):
+    sufijo = r'[a-z0-9]*' if consulta_.prefijo else ''
+    alternativas = [re.escape(palabra) for palabra in consulta_.palabras[:-1]]
+    alternativas.append(re.escape(consulta_.palabras[-1]) + sufijo)
+    return re.compile(r'(?<![a-z0-9])(?:' + '|'.join(alternativas) + r')(?![a-z0-9])')
+
+
+def _normalizar_alineado(texto):
+    # Un carácter normalizado por carácter original: las posiciones coinciden
+    return ''.join((_PLEGADO[ord(caracter)] or ' ')[0] for caracter in texto)
+
+
+def fragmento(texto, consulta_, ancho=ANCHO_FRAGMENTO):
+    """
+    Trozo de `texto` alrededor de la primera coincidencia, con las palabras
+    de `consulta_` (ver consulta()) entre <mark>. HTML escapado.
+    """
+    texto = unicodedata.normalize('NFC', texto or '')
+    if not consulta_.palabras:
+        return escape(texto[:ancho])
+    coincidencias = list(_patron(consulta_).finditer(_normalizar_alineado(texto)))
+    inicio = max(0, coincidencias[0].start() - ancho // 3) if coincidencias else 0
+    fin = min(len(texto), inicio + ancho)
+
+    partes = ['…' if inicio else '']
+    posicion = inicio
+    for coincidencia in coincidencias:
+        if coincidencia.start() < posicion or coincidencia.end() > fin:
+            continue
+        partes += [escape(texto[posicion:coincidencia.start()]), '<mark>',
+                   escape(texto[coincidencia.start():coincidencia.end()]), '</mark>']
+        posicion = coincidencia.end()
+    partes += [escape(texto[posicion:fin]), '…' if fin < len(texto) else '']
+    return mark_safe(''.join(partes))
+
+
+# --- RELEVANCIA ---
+
+def puntuar(tipo, candidatos, consulta_):
+    """
+    [Resultado] de los candidatos [(objeto_id, orden_id, texto)] de un tipo.
+    Puntaje: suma por palabra de f·(K1+1) / (f + K1·(1 - B + B·largo/promedio)),
+    con el largo promedio de los candidatos.
+    """
+    if not candidatos:
+        return []
+    palabras = [_PALABRA.findall(plegar(texto)) for _, _, texto in candidatos]
+    promedio = sum(len(lista) for lista in palabras) / len(palabras) or 1
+    exactas = consulta_.palabras[:-1] if consulta_.prefijo else consulta_.palabras
+    resultados = []
+    for (objeto_id, orden_id, texto), lista in zip(candidatos, palabras):
+        frecuencias = Counter(lista)
+        buscadas = [frecuencias[palabra] for palabra in exactas]
+        if consulta_.prefijo:
+            buscadas.append(sum(n for palabra, n in frecuencias.items() if palabra.startswith(consulta_.palabras[-1])))
+        ajuste = K1 * (1 - B + B * len(lista) / promedio)
+        puntaje = sum(f * (K1 + 1) / (f + ajuste) for f in buscadas if f)
+        resultados.append(Resultado(tipo, objeto_id, orden_id, puntaje, texto))
+    return resultados
+
+
+# --- BACKENDS ---
+
+class BackendFts5:
+    """Tablas virtuales FTS5 de SQLite, una por tipo (rowid = id del objeto)."""
+
+    def indexar(self, tipo, filas, nuevos=False):
+        """Reemplaza los documentos [(objeto_id, orden_id, texto)] de `tipo` (nuevos: sólo inserta)."""
+        if not filas:
+            return 0
+        tabla = TABLAS_FTS5[tipo]
+        with connection.cursor() as cursor:
+            if not nuevos:
+                cursor.executemany(f"DELETE FROM {tabla} WHERE rowid = %s", [(fila[0],) for fila in filas])
+            cursor.executemany(f"INSERT INTO {tabla} (rowid, orden_id, texto) VALUES (%s, %s, %s)", filas)
+        return len(filas)
+
+    def eliminar(self, tipo, objeto_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLAS_FTS5[tipo]} WHERE rowid = %s", [objeto_id])
+
+    def reconstruir(self, lote=5000):
+        """Vuelve a llenar las tablas con un INSERT ... SELECT por tipo. Devuelve los documentos."""
+        fuentes = {
+            TIPO_FALLA: (OrdenServicio, 'id', 'descripcion_falla'),
+            TIPO_BITACORA: (BitacoraOrden, 'orden_id', 'descripcion'),
+            TIPO_COTIZACION: (Cotizacion, 'orden_id', "concepto || coalesce(char(10) || notas, '')"),
+        }
+        total = 0
+        with connection.cursor() as cursor:
+            for tipo, (modelo, orden_id, texto) in fuentes.items():
+                tabla = TABLAS_FTS5[tipo]
+                cursor.execute(f"DELETE FROM {tabla}")
+                cursor.execute(
+                    f"INSERT INTO {tabla} (rowid, orden_id, texto) "
+                    f"SELECT id, {orden_id}, {texto} FROM {modelo._meta.db_table}"
+                )
+                total += cursor.rowcount
+                # Junta los segmentos del índice: consultas más rápidas
+                cursor.execute(f"INSERT INTO {tabla} ({tabla}) VALUES ('optimize')")
+        return total
+
+    def candidatos(self, tipo, consulta_, limite):
+        """[(objeto_id, orden_id, texto)] de los `limite` documentos más recientes que coinciden."""
+        # Cada palabra entre comillas: nada de lo que escriba el usuario es sintaxis de FTS5
+        match = ' '.join(f'"{palabra}"' for palabra in consulta_.palabras) + ('*' if consulta_.prefijo else '')
+        tabla = TABLAS_FTS5[tipo]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, orden_id, texto FROM {tabla} WHERE {tabla} MATCH %s ORDER BY rowid DESC LIMIT %s",
+                [match, limite],
+            )
+            return cursor.fetchall()
+
+
+class BackendTsvector:
+    """Tabla con tsvector e índice GIN en PostgreSQL."""
+
+    def indexar(self, tipo, filas, nuevos=False):
+        if not filas:
+            return 0
+        with connection.cursor() as cursor:
+            # INSERT ... ON CONFLICT sirve para documentos nuevos y modificados (nuevos no cambia nada)
+            cursor.executemany(
+                f"INSERT INTO {TABLA_TSVECTOR} (tipo, objeto_id, orden_id, texto, documento) "
+                f"VALUES (%s, %s, %s, %s, to_tsvector('simple', %s)) "
+                f"ON CONFLICT (tipo, objeto_id) DO UPDATE SET "
+                f"orden_id = EXCLUDED.orden_id, texto = EXCLUDED.texto, documento = EXCLUDED.documento",
+                [(tipo, objeto_id, orden_id, texto, normalizar_texto(texto)) for objeto_id, orden_id, texto in filas],
+            )
+        return len(filas)
+
+    def eliminar(self, tipo, objeto_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLA_TSVECTOR} WHERE tipo = %s AND objeto_id = %s", [tipo, objeto_id])
+
+    def reconstruir(self, lote=5000):
+        # normalizar_texto corre en Python: se recorre cada fuente por bloques
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {TABLA_TSVECTOR}")
+        total = 0
+        for tipo in TIPOS:
+            bloque = []
+            for objeto in _fuente(tipo).order_by('pk').iterator(chunk_size=lote):
+                bloque.append(objeto)
+                if len(bloque) >= lote:
+                    total += self.indexar(tipo, documentos(tipo, bloque))
+                    bloque = []
+            total += self.indexar(tipo, documentos(tipo, bloque))
+        return total
+
+    def candidatos(self, tipo, consulta_, limite):
+        # to_tsquery con palabras ya normalizadas (sólo [a-z0-9]): sin sintaxis del usuario
+        tsquery = ' & '.join(consulta_.palabras) + (':*' if consulta_.prefijo else '')
+        with connection.cursor() as cursor:
+            # Con un término común el planificador recorre la llave (tipo, objeto_id) hacia atrás
+            cursor.execute(
+                f"SELECT objeto_id, orden_id, texto FROM {TABLA_TSVECTOR} "
+                f"WHERE tipo = %s AND documento @@ to_tsquery('simple', %s) ORDER BY objeto_id DESC LIMIT %s",
+                [tipo, tsquery, limite],
+            )
+            return cursor.fetchall()
+
+
+@lru_cache(maxsize=None)
+def _backend(ruta, vendor):
+    if ruta:
+        return import_string(ruta)()
+    if vendor == 'postgresql':
+        return BackendTsvector()
+    return BackendFts5()
+
+
+def obtener_backend():
+    return _backend(getattr(settings, 'BUSQUEDA_TEXTO_BACKEND', None), connection.vendor)
+
+
+# --- SINCRONIZACIÓN (la usan las señales) ---
+
+def indexar(tipo, objetos, nuevos=False):
+    """Indexa (o reindexa) `objetos` del modelo de `tipo`. nuevos=True si se acaban de crear."""
+    return obtener_backend().indexar(tipo, documentos(tipo, objetos), nuevos=nuevos)
+
+
+def eliminar(tipo, objeto_id):
+    obtener_backend().eliminar(tipo, objeto_id)
+
+
+def reconstruir(lote=5000):
+    """Vuelve a generar el índice completo (tras bulk_create o update() que no pasan por las señales)."""
+    return obtener_backend().reconstruir(lote=lote)
+
+
+# --- BÚSQUEDA ---
+
+def buscar(query, tipos=None, limite=LIMITE_RESULTADOS, candidatos=CANDIDATOS_POR_TIPO):
+    """
+    Documentos con todas las palabras de `query` (ver consulta()), de los
+    `tipos` indicados (todos por defecto), del más relevante al menos; a
+    igual puntaje, el más reciente. [Resultado] con el texto completo.
+    """
+    consulta_ = consulta(query)
+    if not consulta_.palabras:
+        return []
+    backend = obtener_backend()
+    resultados = []
+    for tipo in TIPOS:
+        if tipos is None or tipo in tipos:
+            resultados += puntuar(tipo, backend.candidatos(tipo, consulta_, candidatos), consulta_)
+    resultados.sort(key=lambda resultado: (resultado.puntaje, resultado.objeto_id), reverse=True)
+    return resultados[:limite]
@@ -0,0 +1,193 @@
+"""
+Máquinas de estados de las órdenes y de las cotizaciones.
+
+Cada máquina se declara como una lista de reglas (estados de origen, estados
+de destino, guardas, si cierra) y al importarse se compila a un diccionario
+{origen: {destino: Transicion}}: validar un cambio es una búsqueda O(1).
+
+- ORDEN: el recorrido de una OrdenServicio. Entregada y Cancelada son
+  finales; llegar a ellas cierra la orden (fecha_cierre) y requiere permiso
+  de cierre (guarda puede_cerrar).
+- COTIZACION: Pendiente -> Enviada -> Autorizada / Rechazada.
+
+Las guardas se evalúan con un ContextoTransicion, que guarda su resultado:
+en una acción en bloque, puede_cerrar se consulta una vez y no por orden.
+
+cambiar_estado() aplica un cambio a una orden con sus efectos (fecha_cierre,
+entrada de bitácora, OrdenEstadoTransicion con el usuario que lo hizo, vía la
+señal post_save). Para muchas órdenes, acciones_masivas.aplicar (o
+cambiar_estado_en_bloque) usa las mismas reglas con un solo UPDATE.
+"""
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import bitacora
+from .models import Cotizacion, OrdenServicio
+
+Guarda = namedtuple('Guarda', ['nombre', 'evaluar', 'mensaje'])
+Transicion = namedtuple('Transicion', ['origen', 'destino', 'guardas', 'cierra'])
+
+GRUPOS_CIERRE = ('Gerente Servicio', 'Asistente Recepción')
+
+
+def puede_cerrar(usuario):
+    """Si el usuario puede entregar o cancelar órdenes."""
+    return usuario.is_superuser or usuario.groups.filter(name__in=GRUPOS_CIERRE).exists()
+
+
+PUEDE_CERRAR = Guarda('puede_cerrar', puede_cerrar, "No tienes permisos para cerrar órdenes.")
+
+
+class ContextoTransicion:
+    """Con qué se evalúan las guardas. Cada guarda se evalúa una sola vez por contexto."""
+
+    def __init__(self, usuario=None):
+        self.usuario = usuario
+        self._resultados = {}
+
+    def cumple(self, guarda):
+        if guarda.nombre not in self._resultados:
+            self._resultados[guarda.nombre] = self.usuario is not None and guarda.evaluar(self.usuario)
+        return self._resultados[guarda.nombre]
+
+
+class MaquinaEstados:
+    """
+    `opciones`: choices del campo de estado. `reglas`: (orígenes, destinos,
+    guardas, cierra); cada origen puede ir a cada destino (salvo a sí mismo).
+    Los estados `finales` no tienen salida.
+    """
+
+    def __init__(self, opciones, reglas, finales=()):
+        self.etiquetas = dict(opciones)
+        self.finales = frozenset(finales)
+        self._tabla = {estado: {} for estado in self.etiquetas}
+        for origenes, destinos, guardas, cierra in reglas:
+            for origen in origenes:
+                for destino in destinos:
+                    if origen not in self.etiquetas or destino not in self.etiquetas:
+                        raise ValueError(f"Estado desconocido en la regla {origen} -> {destino}.")
+                    if origen in self.finales:
+                        raise ValueError(f"{origen} es final y no puede tener salidas.")
+                    if origen != destino:
+                        self._tabla[origen][destino] = Transicion(origen, destino, tuple(guardas), cierra)
+
+    def transicion(self, origen, destino):
+        """La Transicion de `origen` a `destino`, o None si no está permitida."""
+        return self._tabla.get(origen, {}).get(destino)
+
+    def destinos(self, origen, cierra=None):
+        """Estados a los que se puede pasar desde `origen`, en el orden de las opciones."""
+        salidas = self._tabla.get(origen, {})
+        return [
+            destino for destino in self.etiquetas
+            if destino in salidas and (cierra is None or salidas[destino].cierra == cierra)
+        ]
+
+    def error(self, origen, destino, contexto):
+        """
+        Motivo por el que no se puede pasar de `origen` a `destino`, o None.
+        Quedarse en el mismo estado no es error (el llamador lo omite).
+        """
+        if destino not in self.etiquetas:
+            return f"'{destino}' no es un estado válido."
+        if origen == destino:
+            return None
+        if origen in self.finales:
+            return f"El estado {origen} es final: no se puede cambiar."
+        transicion = self.transicion(origen, destino)
+        if transicion is None:
+            return f"No se puede pasar de {origen} a {destino}."
+        for guarda in transicion.guardas:
+            if not contexto.cumple(guarda):
+                return guarda.mensaje
+        return None
+
+
+# --- ÓRDENES ---
+
+EN_PROCESO = [
+    OrdenServicio.ESTADO_NUEVA,
+    OrdenServicio.ESTADO_DIAGNOSTICO,
+    OrdenServicio.ESTADO_ESPERANDO_AUTORIZACION,
+    OrdenServicio.ESTADO_ESPERANDO_REFACCION,
+    OrdenServicio.ESTADO_EN_REPARACION,
+]
+# A dónde manda el técnico una orden (Nueva sólo es el estado inicial)
+TRABAJO = EN_PROCESO[1:]
+
+ORDEN = MaquinaEstados(
+    OrdenServicio.ESTADO_OPCIONES,
+    [
+        (EN_PROCESO, TRABAJO + [OrdenServicio.ESTADO_FINALIZADA_TECNICO], (), False),
+        # Una orden finalizada se puede reabrir si falta trabajo
+        ([OrdenServicio.ESTADO_FINALIZADA_TECNICO], TRABAJO, (), False),
+        # Sólo se entrega lo que el técnico finalizó; lo ya realizado no se cancela
+        ([OrdenServicio.ESTADO_FINALIZADA_TECNICO], [OrdenServicio.ESTADO_ENTREGADA], (PUEDE_CERRAR,), True),
+        (EN_PROCESO, [OrdenServicio.ESTADO_CANCELADA], (PUEDE_CERRAR,), True),
+    ],
+    finales=[OrdenServicio.ESTADO_ENTREGADA, OrdenServicio.ESTADO_CANCELADA],
+)
+
+
+def error_orden(estado, fecha_cierre, destino, contexto):
+    """error() de ORDEN más la regla de las órdenes cerradas, que ya no cambian."""
+    if fecha_cierre is not None:
+        return "La orden ya está cerrada."
+    return ORDEN.error(estado, destino, contexto)
+
+
+def texto_bitacora(origen, destino):
+    """Entrada de bitácora de un cambio de estado (transiciones.interpretar la sabe leer)."""
+    if ORDEN.transicion(origen, destino).cierra:
+        return f"*** ORDEN CERRADA - ESTADO: {destino.upper()} ***"
+    return f"Cambio de estado: {origen} -> {destino}"
+
+
+def cambiar_estado(orden, destino, usuario):
+    """
+    Pasa `orden` a `destino` con sus efectos: fecha_cierre si cierra, entrada
+    de bitácora y la transición (con `usuario`). Devuelve la Transicion, o
+    None si la orden ya estaba en ese estado. ValidationError si no se puede.
+    """
+    error = error_orden(orden.estado, orden.fecha_cierre, destino, ContextoTransicion(usuario))
+    if error:
+        raise ValidationError(error)
+    if orden.estado == destino:
+        return None
+
+    transicion = ORDEN.transicion(orden.estado, destino)
+    with transaction.atomic():
+        orden.estado = destino
+        if transicion.cierra:
+            orden.fecha_cierre = timezone.now()
+        # Lo lee la señal registrar_transicion
+        orden._usuario_transicion = usuario
+        orden.save()
+        bitacora.registrar(orden, usuario, texto_bitacora(transicion.origen, destino))
+    return transicion
+
+
+def cambiar_estado_en_bloque(ordenes, destino, usuario):
+    """cambiar_estado() para un queryset (o ids) de órdenes, todas o ninguna. Devuelve cuántas cambiaron."""
+    # acciones_masivas importa este módulo
+    from . import acciones_masivas
+
+    if hasattr(ordenes, 'values_list'):
+        ordenes = ordenes.values_list('pk', flat=True)
+    return acciones_masivas.aplicar(acciones_masivas.ACCION_ESTADO, ordenes, usuario, destino)
+
+
+# --- COTIZACIONES ---
+
+COTIZACION = MaquinaEstados(
+    Cotizacion.ESTADO_COTIZACION,
+    [
+        ([Cotizacion.ESTADO_PENDIENTE], [Cotizacion.ESTADO_ENVIADA], (), False),
+        ([Cotizacion.ESTADO_ENVIADA], [Cotizacion.ESTADO_AUTORIZADA, Cotizacion.ESTADO_RECHAZADA], (), False),
+    ],
+    finales=[Cotizacion.ESTADO_AUTORIZADA, Cotizacion.ESTADO_RECHAZADA],
+)
@@ -0,0 +1,105 @@
+"""
+Filtros y ordenamientos del listado de órdenes (?estado=, ?tecnico=,
+?fecha_inicio=, ?ordenar=...), compartidos por lista_ordenes, la exportación
+(reportes/exportacion.py) y verificar_indices.
+
+filtrar_ordenes ignora los valores que no se pueden interpretar, como hacía
+lista_ordenes; errores_filtros los reporta para quien prefiera rechazarlos
+(ej. una exportación que ya empezó a enviarse no puede devolver un error).
+"""
+import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+FILTROS_ORDENES = ['estado', 'tecnico', 'prioridad', 'fecha_inicio', 'fecha_fin', 'monto_min', 'monto_max', 'ordenar']
+# ?ordenar=...: (etiqueta, order_by). Por monto usa el índice orden_total_autorizado_idx
+ORDENAMIENTOS_ORDENES = {
+    '': ('Más recientes', ('-fecha_creacion', '-id')),
+    'monto': ('Mayor monto autorizado', ('-total_autorizado', '-fecha_creacion', '-id')),
+    'monto_asc': ('Menor monto autorizado', ('total_autorizado', 'fecha_creacion', 'id')),
+}
+
+
+def _monto(valor):
+    """Decimal de un filtro de monto, o None si viene vacío o no es un número."""
+    try:
+        monto = Decimal(valor) if valor else None
+    except InvalidOperation:
+        return None
+    return monto if monto is not None and monto.is_finite() else None
+
+
+def _fecha(valor):
+    """date de un filtro de fecha (AAAA-MM-DD), o None si viene vacío o no es una fecha válida."""
+    try:
+        return parse_date(valor) if valor else None
+    except ValueError:
+        # Bien formada pero inexistente, ej. 2024-02-30
+        return None
+
+
+def _tecnico(valor):
+    """id de un filtro de técnico, o None si no son sólo dígitos ASCII ('²' pasa isdigit() pero int() lo rechaza)."""
+    return int(valor) if valor and valor.isascii() and valor.isdigit() else None
+
+
+def _inicio_del_dia(fecha):
+    """Medianoche local de `fecha` (datetime con zona horaria)."""
+    return timezone.make_aware(datetime.datetime.combine(fecha, datetime.time.min))
+
+
+def errores_filtros(params):
+    """Mensajes por cada filtro de `params` que trae un valor que no se puede interpretar."""
+    errores = []
+    for campo, interpretar, descripcion in [
+        ('tecnico', _tecnico, 'un id de técnico'),
+        ('fecha_inicio', _fecha, 'una fecha AAAA-MM-DD'),
+        ('fecha_fin', _fecha, 'una fecha AAAA-MM-DD'),
+        ('monto_min', _monto, 'un monto'),
+        ('monto_max', _monto, 'un monto'),
+    ]:
+        valor = params.get(campo)
+        if valor and interpretar(str(valor)) is None:
+            errores.append(f"{campo}={valor!r} no es {descripcion}.")
+    ordenar = params.get('ordenar', '')
+    if ordenar not in ORDENAMIENTOS_ORDENES:
+        errores.append(f"ordenar={ordenar!r} no es un ordenamiento válido.")
+    return errores
+
+
+def ordenar_ordenes(ordenes, params):
+    """Aplica el ?ordenar= de lista_ordenes (por defecto, las más recientes primero)."""
+    _, campos = ORDENAMIENTOS_ORDENES.get(params.get('ordenar', ''), ORDENAMIENTOS_ORDENES[''])
+    return ordenes.order_by(*campos)
+
+
+def filtrar_ordenes(ordenes, params):
+    """Aplica los filtros de lista_ordenes (estado, técnico, prioridad, rango de fechas, monto autorizado)."""
+    filtro_estado = params.get('estado')
+    filtro_tecnico = _tecnico(str(params.get('tecnico') or ''))
+    filtro_prioridad = params.get('prioridad')
+    fecha_inicio = _fecha(params.get('fecha_inicio'))
+    fecha_fin = _fecha(params.get('fecha_fin'))
+    monto_min = _monto(params.get('monto_min'))
+    monto_max = _monto(params.get('monto_max'))
+
+    if filtro_estado:
+        ordenes = ordenes.filter(estado=filtro_estado)
+    if filtro_tecnico is not None:
+        ordenes = ordenes.filter(tecnico_asignado__id=filtro_tecnico)
+    if filtro_prioridad:
+        ordenes = ordenes.filter(prioridad=filtro_prioridad)
+    # Rango de fechas locales como rango de datetimes: __date aplica una
+    # función a la columna y la consulta ya no puede usar el índice
+    if fecha_inicio:
+        ordenes = ordenes.filter(fecha_creacion__gte=_inicio_del_dia(fecha_inicio))
+    # 9999-12-31 no tiene día siguiente (date.max): no limita nada
+    if fecha_fin and fecha_fin < datetime.date.max:
+        ordenes = ordenes.filter(fecha_creacion__lt=_inicio_del_dia(fecha_fin + datetime.timedelta(days=1)))
+    if monto_min is not None:
+        ordenes = ordenes.filter(total_autorizado__gte=monto_min)
+    if monto_max is not None:
+        ordenes = ordenes.filter(total_autorizado__lte=monto_max)
+    return ordenes
@@ -1,4 +1,5 @@
 from django import forms
+from . import estados
 from .models import BitacoraOrden, Cotizacion, Transferencia, ItemTransferido
 from catalogo.models import TipoServicio
 
@@ -53,33 +54,15 @@ class CotizacionForm(forms.ModelForm):
                 del self.fields['estado']
         else:
             # MODO EDICIÓN:
-            # Filtramos las opciones según el estado actual
+            # El estado actual (para que el campo no aparezca vacío) y a los que
+            # puede pasar según estados.COTIZACION: Pendiente -> Enviada ->
+            # Autorizada / Rechazada; los finales sólo muestran el actual.
             estado_actual = self.instance.estado
-            opciones_validas = []
-
-            # Mapa de transiciones permitidas
-            # 1. Pendiente -> Puede pasar a Enviada (o quedarse igual)
-            if estado_actual == Cotizacion.ESTADO_PENDIENTE:
-                opciones_validas = [
-                    (Cotizacion.ESTADO_PENDIENTE, 'Pendiente de Enviar'),
-                    (Cotizacion.ESTADO_ENVIADA, 'Enviada al Cliente')
-                ]
-            
-            # 2. Enviada -> Puede ser Autorizada o Rechazada (o corregir a Pendiente si hubo error, opcionalmente)
-            # Aquí seguimos la regla estricta: Solo a Autorizada/Rechazada
-            elif estado_actual == Cotizacion.ESTADO_ENVIADA:
-                opciones_validas = [
-                    (Cotizacion.ESTADO_ENVIADA, 'Enviada al Cliente'),
-                    (Cotizacion.ESTADO_AUTORIZADA, 'Autorizada'),
-                    (Cotizacion.ESTADO_RECHAZADA, 'Rechazada')
-                ]
-            
-            # 3. Estados Finales (Autorizada/Rechazada) -> Normalmente no se mueven, 
-            # pero permitimos ver su estado actual para que el campo no aparezca vacío o roto.
-            else:
-                # Obtenemos la etiqueta legible del modelo
-                label = dict(Cotizacion.ESTADO_COTIZACION).get(estado_actual, estado_actual)
-                opciones_validas = [(estado_actual, label)]
+            etiquetas = estados.COTIZACION.etiquetas
+            opciones_validas = [
+                (estado, etiquetas.get(estado, estado))
+                for estado in [estado_actual] + estados.COTIZACION.destinos(estado_actual)
+            ]
 
             self.fields['estado'].choices = opciones_validas
 
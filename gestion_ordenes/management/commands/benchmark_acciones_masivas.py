@@ -0,0 +1,101 @@
+"""
+Compara las acciones en bloque de lista_ordenes (acciones_masivas) con hacer
+lo mismo orden por orden, como editar_orden y actualizar_estado_orden (save()
+con sus señales + BitacoraOrden.objects.create()).
+
+Crea --ordenes órdenes nuevas y por cada acción (asignar técnico, cambiar
+prioridad, cambiar estado) mide tiempo y consultas SQL de las dos formas. Al
+final comprueba que el snapshot de KPIs cuadra con la tabla de órdenes.
+Todo corre dentro de una transacción que se revierte: la base queda igual.
+
+    python manage.py benchmark_acciones_masivas --ordenes 1000
+"""
+import time
+from contextlib import ExitStack
+
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+
+from dashboard import kpis
+from gestion_clientes.models import Cliente, Equipo
+from gestion_ordenes import acciones_masivas
+from gestion_ordenes.models import BitacoraOrden, OrdenServicio
+from sistema_crm_pacscomputacion.metricas import Medicion
+
+MARCA = 'Benchmark acciones masivas'
+
+
+class Command(BaseCommand):
+    help = "Mide asignar técnico, cambiar prioridad y cambiar estado para muchas órdenes: en bloque contra una por una."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ordenes', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{options['ordenes']} órdenes por acción | motor: {connection.vendor}")
+        with transaction.atomic():
+            try:
+                self._comparar(options['ordenes'])
+            finally:
+                transaction.set_rollback(True)
+
+    def _medir(self, funcion):
+        medicion = Medicion()
+        with ExitStack() as envolturas:
+            for alias in connections:
+                envolturas.enter_context(connections[alias].execute_wrapper(medicion))
+            inicio = time.perf_counter()
+            funcion()
+        return time.perf_counter() - inicio, medicion.consultas
+
+    def _comparar(self, cantidad):
+        usuario = User.objects.create_user(f'{MARCA} usuario', is_superuser=True)
+        grupo, _ = Group.objects.get_or_create(name='Técnico')
+        tecnicos = [User.objects.create_user(f'{MARCA} tecnico {i}') for i in range(2)]
+        grupo.user_set.add(*tecnicos)
+        cliente = Cliente.objects.create(nombre_completo=MARCA, telefono='0000000001')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca=MARCA, modelo='N/A')
+        # Dos grupos iguales: uno se modifica orden por orden y el otro en bloque
+        grupos = []
+        for _ in range(2):
+            ordenes = OrdenServicio.objects.bulk_create(
+                OrdenServicio(cliente=cliente, equipo=equipo, descripcion_falla=MARCA) for _ in range(cantidad)
+            )
+            grupos.append(ordenes)
+        # bulk_create no pasa por las señales de KPIs
+        kpis.reconstruir()
+
+        pruebas = [
+            (acciones_masivas.ACCION_TECNICO, str(tecnicos[0].pk), 'tecnico_asignado', tecnicos[0]),
+            (acciones_masivas.ACCION_PRIORIDAD, OrdenServicio.PRIORIDAD_ALTA, 'prioridad', OrdenServicio.PRIORIDAD_ALTA),
+            (acciones_masivas.ACCION_ESTADO, OrdenServicio.ESTADO_DIAGNOSTICO, 'estado', OrdenServicio.ESTADO_DIAGNOSTICO),
+        ]
+        for accion, valor, campo, nuevo in pruebas:
+            una_por_una = self._medir(lambda: self._una_por_una(grupos[0], usuario, campo, nuevo))
+            en_bloque = self._medir(lambda: acciones_masivas.aplicar(
+                accion, [orden.pk for orden in grupos[1]], usuario, valor,
+            ))
+            self.stdout.write(
+                f"  {accion:<18} una por una: {una_por_una[0]:6.2f} s {una_por_una[1]:>6} consultas | "
+                f"en bloque: {en_bloque[0]:6.2f} s {en_bloque[1]:>4} consultas | x{una_por_una[0] / en_bloque[0]:.0f}"
+            )
+
+        diferencias = kpis.diferencias()
+        if diferencias:
+            self.stdout.write(self.style.ERROR(f"El snapshot de KPIs no cuadra: {diferencias}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Snapshot de KPIs consistente."))
+
+    def _una_por_una(self, ordenes, usuario, campo, nuevo):
+        # Lo que hacen las vistas de una orden, cada una en su petición
+        for orden in ordenes:
+            anterior = orden.estado
+            with transaction.atomic():
+                setattr(orden, campo, nuevo)
+                orden.save()
+                BitacoraOrden.objects.create(
+                    orden=orden, usuario=usuario,
+                    descripcion=f"Cambio de estado: {anterior} -> {nuevo}" if campo == 'estado'
+                    else f"Edición administrativa: {campo}",
+                )
@@ -0,0 +1,93 @@
+"""
+Rendimiento de escritura con la bitácora síncrona y con la asíncrona
+(gestion_ordenes/bitacora.py) bajo carga concurrente.
+
+Corre dos veces el ciclo de prueba_concurrencia (crear orden, agregar
+servicio, cambiar estado y cancelar, cada petición con su entrada de
+bitácora): primero con la bitácora síncrona y luego con la asíncrona. Compara
+peticiones por segundo, latencias y bloqueos. En modo asíncrono el tiempo
+total incluye esperar a que el escritor vacíe la cola, y al final se
+comprueba que estén todas las entradas.
+
+Escribe en la base configurada (CRM_DB_PERFIL): no usar en producción. Lo
+creado se borra al terminar.
+
+    CRM_DB_PERFIL=sqlite-produccion python manage.py benchmark_bitacora --hilos 8
+"""
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_ordenes import bitacora
+from gestion_ordenes.models import BitacoraOrden
+
+from .prueba_concurrencia import Command as PruebaConcurrencia, Trabajador
+
+# Entradas de bitácora por ciclo: crear, servicio, estado y cierre
+ENTRADAS_POR_CICLO = 4
+
+
+class Command(BaseCommand):
+    help = "Compara escrituras concurrentes con la bitácora síncrona y con la asíncrona (por lotes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--operaciones', type=int, default=25, help="Ciclos de orden por hilo (4 peticiones cada uno).")
+        parser.add_argument('--usuario', help="Usuario que hace las peticiones (por defecto, el primer superusuario).")
+
+    def handle(self, *args, **options):
+        prueba = PruebaConcurrencia(stdout=self.stdout, stderr=self.stderr)
+        usuario = prueba._usuario(options['usuario'])
+        original = settings.BITACORA_ASINCRONA
+        self.stdout.write(
+            f"{options['hilos']} hilos x {options['operaciones']} ciclos | "
+            f"lote={settings.BITACORA_LOTE} intervalo={settings.BITACORA_INTERVALO} s"
+        )
+        problemas = []
+        try:
+            for asincrona in (False, True):
+                settings.BITACORA_ASINCRONA = asincrona
+                datos = prueba._preparar()
+                try:
+                    problemas += self._correr('asíncrona' if asincrona else 'síncrona', usuario, datos, options)
+                finally:
+                    prueba._limpiar(datos)
+        finally:
+            settings.BITACORA_ASINCRONA = original
+            bitacora.escritor.detener()
+        if problemas:
+            raise CommandError('; '.join(problemas))
+
+    def _correr(self, modo, usuario, datos, options):
+        inicio = threading.Event()
+        hilos = [Trabajador(i, usuario, datos, options['operaciones'], inicio) for i in range(options['hilos'])]
+        for hilo in hilos:
+            hilo.start()
+        reloj = time.perf_counter()
+        inicio.set()
+        for hilo in hilos:
+            hilo.join()
+        peticiones_listas = time.perf_counter() - reloj
+        bitacora.escritor.vaciar(timeout=60)
+        total = time.perf_counter() - reloj
+
+        latencias = sorted(valor for hilo in hilos for valores in hilo.latencias.values() for valor in valores)
+        bloqueos = sum(hilo.bloqueos for hilo in hilos)
+        fallas = sum(len(hilo.fallas) for hilo in hilos)
+        ciclos = options['hilos'] * options['operaciones']
+        escritas = BitacoraOrden.objects.filter(orden__cliente=datos['cliente']).count()
+        self.stdout.write(
+            f"  {modo:<10} {len(latencias) / total:7.0f} peticiones/s | p50={statistics.median(latencias):6.1f} ms "
+            f"p95={latencias[int(len(latencias) * 0.95) - 1]:6.1f} ms | peticiones {peticiones_listas:.2f} s, "
+            f"con bitácora escrita {total:.2f} s | bloqueos={bloqueos} fallas={fallas} | "
+            f"bitácora {escritas}/{ciclos * ENTRADAS_POR_CICLO}"
+        )
+        problemas = []
+        if bloqueos or fallas:
+            problemas.append(f"{modo}: {bloqueos} bloqueos y {fallas} fallas")
+        elif escritas != ciclos * ENTRADAS_POR_CICLO:
+            problemas.append(f"{modo}: se escribieron {escritas} entradas de {ciclos * ENTRADAS_POR_CICLO}")
+        return problemas
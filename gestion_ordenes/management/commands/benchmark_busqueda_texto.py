@@ -0,0 +1,91 @@
+"""
+Mide la búsqueda de texto (busqueda_texto.buscar) con muchas entradas de
+bitácora.
+
+Agrega --documentos entradas sintéticas (notas de reparación con acentos) al
+índice de bitácora, con ids por encima de los existentes, y mide la mediana y
+el p95 de varias consultas: término común, raro, dos términos, prefijo y con
+acentos. Todo corre dentro de una transacción que se revierte: la base queda
+igual.
+
+    python manage.py benchmark_busqueda_texto --documentos 5000000
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+
+from gestion_ordenes import busqueda_texto
+from gestion_ordenes.models import BitacoraOrden, OrdenServicio
+
+LOTE = 20000
+PALABRAS = (
+    "equipo no revisión cliente diagnóstico pantalla batería cargador teclado bisagra ventilador "
+    "limpieza pasta térmica disco sólido memoria actualización sistema operativo respaldo "
+    "información garantía refacción pedido proveedor llegó autorizó cotización llamada "
+    "enciende apaga reinicia calienta ruido golpe humedad derrame líquido puerto usb hdmi "
+    "audio micrófono cámara wifi bluetooth tarjeta madre corto fuente poder voltaje "
+    "entregado recoger mostrador técnico pruebas estrés funciona correctamente"
+).split()
+CONSULTAS = [
+    ('común', "equipo"),
+    ('dos términos', "no enciende bateria"),
+    ('prefijo', "ventil*"),
+    ('con acentos', "Diagnóstico pantalla"),
+    ('raro', "tarjeta madre corto"),
+    ('sin resultados', "xilofono"),
+]
+
+
+class Command(BaseCommand):
+    help = "Mide la búsqueda de texto con --documentos entradas de bitácora sintéticas (transacción revertida)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documentos', type=int, default=1_000_000)
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        backend = busqueda_texto.obtener_backend()
+        self.stdout.write(
+            f"{options['documentos']} entradas sintéticas | backend: {backend.__class__.__name__} | motor: {connection.vendor}"
+        )
+        with transaction.atomic():
+            try:
+                self._llenar(backend, options['documentos'], random.Random(options['semilla']))
+                self._medir(options['repeticiones'])
+            finally:
+                transaction.set_rollback(True)
+
+    def _llenar(self, backend, cantidad, azar):
+        orden_ids = list(OrdenServicio.objects.values_list('pk', flat=True)[:1000]) or [0]
+        inicio_id = (BitacoraOrden.objects.aggregate(maximo=Max('pk'))['maximo'] or 0) + 1
+        # Frecuencia tipo Zipf: unas palabras muy comunes y muchas raras
+        pesos = [1 / (posicion + 1) for posicion in range(len(PALABRAS))]
+        inicio = time.perf_counter()
+        for desde in range(0, cantidad, LOTE):
+            filas = [
+                (inicio_id + desde + i, azar.choice(orden_ids),
+                 ' '.join(azar.choices(PALABRAS, pesos, k=azar.randint(4, 18))).capitalize() + '.')
+                for i in range(min(LOTE, cantidad - desde))
+            ]
+            backend.indexar(busqueda_texto.TIPO_BITACORA, filas)
+        self.stdout.write(f"Índice lleno en {time.perf_counter() - inicio:.1f} s")
+
+    def _medir(self, repeticiones):
+        for nombre, query in CONSULTAS:
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                resultados = busqueda_texto.buscar(query)
+                for resultado in resultados:
+                    busqueda_texto.fragmento(resultado.texto, busqueda_texto.consulta(query))
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            tiempos.sort()
+            self.stdout.write(
+                f"{nombre:<15} {query!r:<26} p50 {statistics.median(tiempos):7.1f} ms | "
+                f"p95 {tiempos[int(len(tiempos) * 0.95) - 1]:7.1f} ms | {len(resultados)} resultados"
+            )
@@ -0,0 +1,106 @@
+"""
+Mide lista_ordenes en la página 1 y en la página 5000, paginando por número
+de página (COUNT(*) + OFFSET) y por cursor (?modo=cursor&despues=...).
+
+Con OFFSET la base recorre y descarta todas las filas anteriores a la página;
+con cursor la consulta empieza en la llave (fecha_creacion, id) de la última
+fila vista, así que la página 5000 cuesta lo mismo que la primera.
+
+Las órdenes se agregan (con fechas repartidas en dos años) dentro de una
+transacción que se revierte: la base queda igual.
+
+    python manage.py benchmark_paginacion --ordenes 100000 --paginas 1,5000
+"""
+import datetime
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from gestion_clientes.models import Cliente, Equipo
+from gestion_ordenes.models import OrdenServicio
+from gestion_ordenes.paginacion import codificar_cursor
+from reportes.datos_prueba import _fechas_explicitas
+
+LOTE = 5000
+POR_PAGINA = 10
+
+
+class Command(BaseCommand):
+    help = "Mide lista_ordenes en páginas cercanas y lejanas, por OFFSET y por cursor (transacción revertida)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ordenes', type=int, default=100000)
+        parser.add_argument('--paginas', default='1,5000', help="Números de página a medir, separados por comas.")
+        parser.add_argument('--repeticiones', type=int, default=30)
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        paginas = [int(pagina) for pagina in options['paginas'].split(',')]
+        self.stdout.write(f"motor: {connection.vendor}")
+        with transaction.atomic():
+            try:
+                self._llenar(options['ordenes'], random.Random(options['semilla']))
+                total = OrdenServicio.objects.count()
+                if (max(paginas) - 1) * POR_PAGINA >= total:
+                    raise CommandError(f"Con {total} órdenes no hay página {max(paginas)}: usa más --ordenes.")
+                self._medir(paginas, options['repeticiones'], total)
+            finally:
+                transaction.set_rollback(True)
+
+    def _llenar(self, cantidad, azar):
+        ahora = timezone.now()
+        cliente = Cliente.objects.create(nombre_completo='Cliente Benchmark paginación', telefono='0000000003')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='Marca', modelo='Modelo')
+        estados = [estado for estado, _ in OrdenServicio.ESTADO_OPCIONES]
+        with _fechas_explicitas(OrdenServicio._meta.get_field('fecha_creacion')):
+            for inicio in range(0, cantidad, LOTE):
+                OrdenServicio.objects.bulk_create(
+                    OrdenServicio(
+                        cliente=cliente, equipo=equipo, descripcion_falla="Falla de prueba",
+                        estado=azar.choice(estados),
+                        fecha_creacion=ahora - datetime.timedelta(seconds=azar.randint(0, 2 * 365 * 86400)),
+                    )
+                    for _ in range(min(LOTE, cantidad - inicio))
+                )
+
+    def _cursor(self, pagina):
+        """Cursor ?despues= que lleva a `pagina`: la llave de la última fila de la anterior."""
+        if pagina == 1:
+            return {}
+        fecha, pk = OrdenServicio.objects.order_by('-fecha_creacion', '-id').values_list(
+            'fecha_creacion', 'id')[(pagina - 1) * POR_PAGINA - 1]
+        return {'despues': codificar_cursor(fecha, pk)}
+
+    def _medir(self, paginas, repeticiones, total):
+        usuario = User.objects.create_user('benchmark paginacion', is_superuser=True)
+        navegador = Client(HTTP_HOST='localhost')
+        navegador.force_login(usuario)
+        url = reverse('lista_ordenes')
+        self.stdout.write(f"{total} órdenes, {POR_PAGINA} por página")
+
+        for pagina in paginas:
+            for modo, parametros in [('offset', {'page': pagina}),
+                                     ('cursor', {'modo': 'cursor', **self._cursor(pagina)})]:
+                # La primera petición llena el total aproximado que el cursor
+                # guarda en caché (como al llegar a la lista); no se mide
+                cache.clear()
+                navegador.get(url, parametros)
+                tiempos = []
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    respuesta = navegador.get(url, parametros)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                    assert respuesta.status_code == 200, respuesta.status_code
+                tiempos.sort()
+                self.stdout.write(
+                    f"página {pagina:<6} {modo:<7} p50 {statistics.median(tiempos):8.2f} ms | "
+                    f"p95 {tiempos[int(len(tiempos) * 0.95) - 1]:8.2f} ms"
+                )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from gestion_ordenes import transiciones
+
+
+class Command(BaseCommand):
+    help = ("Recupera el historial de estados (OrdenEstadoTransicion) de las órdenes a partir de "
+            "las entradas \"Cambio de estado\" y de cierre de la bitácora. Se puede correr más de una vez.")
+
+    def handle(self, *args, **options):
+        ordenes, creadas = transiciones.recuperar_de_bitacora()
+        self.stdout.write(self.style.SUCCESS(
+            f"{creadas} transiciones recuperadas en {ordenes} órdenes."
+        ))
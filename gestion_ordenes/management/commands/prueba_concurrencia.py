@@ -0,0 +1,201 @@
+"""
+Prueba de concurrencia de escrituras sobre la base configurada.
+
+Varios hilos hacen a la vez lo que hacen recepción y los técnicos, pasando por
+las vistas reales (con sus señales: KPIs, transiciones, hechos, eventos):
+
+1. crear una orden (crear_orden: orden + entrada de bitácora),
+2. agregarle un servicio (agregar_servicio_orden: entrada de bitácora),
+3. cambiar su estado (actualizar_estado_orden: orden + bitácora),
+4. cancelarla (editar_orden, cierre dentro de transaction.atomic).
+
+Después de cada petición se llama a close_old_connections(), como al terminar
+una petición real, así que CONN_MAX_AGE decide si la conexión se reutiliza.
+Se cuentan los errores "database is locked" y las conexiones abiertas.
+
+Escribe en la base configurada (CRM_DB_PERFIL): no usar en producción. Los
+datos creados se borran al terminar, salvo con --conservar.
+
+    CRM_DB_PERFIL=sqlite-produccion python manage.py prueba_concurrencia --hilos 8
+"""
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import reverse
+
+from catalogo.models import TipoServicio
+from gestion_clientes.models import Cliente, Equipo
+from gestion_ordenes.models import OrdenServicio
+
+MARCA = 'Prueba de concurrencia'
+
+
+class Trabajador(threading.Thread):
+    """Un usuario haciendo el ciclo completo de una orden `operaciones` veces."""
+
+    def __init__(self, numero, usuario, datos, operaciones, inicio):
+        super().__init__(name=f'concurrencia-{numero}')
+        self.usuario = usuario
+        self.datos = datos
+        self.operaciones = operaciones
+        self.inicio = inicio
+        self.latencias = defaultdict(list)
+        self.bloqueos = 0
+        self.fallas = []
+        self.conexiones = 0
+
+    def run(self):
+        def contar(sender, connection, **kwargs):
+            if threading.current_thread() is self:
+                self.conexiones += 1
+
+        connection_created.connect(contar, weak=False, dispatch_uid=self.name)
+        try:
+            # localhost: permitido por ALLOWED_HOSTS con DEBUG (testserver no)
+            cliente = Client(HTTP_HOST='localhost')
+            cliente.force_login(self.usuario)
+            close_old_connections()
+            self.inicio.wait()
+            for _ in range(self.operaciones):
+                self._ciclo(cliente)
+        finally:
+            connection_created.disconnect(dispatch_uid=self.name)
+            connections.close_all()
+
+    def _peticion(self, nombre, cliente, url, datos):
+        inicio = time.perf_counter()
+        try:
+            respuesta = cliente.post(url, datos)
+        except OperationalError as error:
+            if 'locked' in str(error):
+                self.bloqueos += 1
+            else:
+                self.fallas.append(f"{nombre}: {error}")
+            return None
+        finally:
+            # Lo mismo que la señal request_finished al terminar una petición
+            close_old_connections()
+            self.latencias[nombre].append((time.perf_counter() - inicio) * 1000)
+        if respuesta.status_code != 302:
+            # crear_orden atrapa sus excepciones y vuelve a mostrar el formulario
+            self.fallas.append(f"{nombre}: HTTP {respuesta.status_code}")
+            return None
+        return respuesta
+
+    def _ciclo(self, cliente):
+        respuesta = self._peticion('crear', cliente, reverse('crear_orden'), {
+            'cliente_id': self.datos['cliente'].pk,
+            'equipo_id': self.datos['equipo'].pk,
+            'descripcion_falla': f'{MARCA}: no enciende',
+            'prioridad': 'Normal',
+        })
+        if respuesta is None:
+            return
+        orden_id = int(respuesta.url.rstrip('/').rsplit('/', 1)[1])
+        self._peticion('servicio', cliente, reverse('agregar_servicio_orden', args=[orden_id]), {
+            'servicio_id': self.datos['servicio'].pk,
+        })
+        self._peticion('estado', cliente, reverse('actualizar_estado_orden', args=[orden_id]), {
+            'nuevo_estado': OrdenServicio.ESTADO_DIAGNOSTICO,
+        })
+        self._peticion('cerrar', cliente, reverse('editar_orden', args=[orden_id]), {
+            'accion': 'cerrar_orden', 'estado_cierre': OrdenServicio.ESTADO_CANCELADA,
+        })
+
+
+class Command(BaseCommand):
+    help = "Escrituras concurrentes (órdenes y bitácora) para comprobar que no hay 'database is locked'."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--operaciones', type=int, default=25, help="Ciclos de orden por hilo (4 peticiones cada uno).")
+        parser.add_argument('--usuario', help="Usuario que hace las peticiones (por defecto, el primer superusuario).")
+        parser.add_argument('--conservar', action='store_true', help="No borrar las órdenes creadas.")
+
+    def handle(self, *args, **options):
+        usuario = self._usuario(options['usuario'])
+        base = connection.settings_dict
+        self.stdout.write(
+            f"Base: {base['NAME']} | CONN_MAX_AGE={base['CONN_MAX_AGE']} | "
+            f"OPTIONS={sorted(base.get('OPTIONS', {}))}"
+        )
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.stdout.write(f"journal_mode={cursor.fetchone()[0]}")
+
+        datos = self._preparar()
+        inicio = threading.Event()
+        hilos = [Trabajador(i, usuario, datos, options['operaciones'], inicio) for i in range(options['hilos'])]
+        for hilo in hilos:
+            hilo.start()
+        reloj = time.perf_counter()
+        inicio.set()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - reloj
+
+        try:
+            self._reportar(hilos, duracion)
+        finally:
+            if not options['conservar']:
+                self._limpiar(datos)
+
+    def _usuario(self, username):
+        User = get_user_model()
+        usuario = User.objects.filter(username=username).first() if username else \
+            User.objects.filter(is_superuser=True).order_by('pk').first()
+        if usuario is None:
+            raise CommandError("No hay usuario para las peticiones: usa --usuario o crea un superusuario.")
+        return usuario
+
+    def _preparar(self):
+        cliente, _ = Cliente.objects.get_or_create(telefono='0000000000', defaults={'nombre_completo': MARCA})
+        equipo, _ = Equipo.objects.get_or_create(
+            cliente=cliente, numero_serie='CONCURRENCIA',
+            defaults={'tipo_equipo': Equipo.TIPO_EQUIPO_LAPTOP, 'marca': MARCA, 'modelo': 'N/A'},
+        )
+        servicio, servicio_creado = TipoServicio.objects.get_or_create(
+            nombre_servicio=MARCA, defaults={'costo_estandar': 0},
+        )
+        return {'cliente': cliente, 'equipo': equipo, 'servicio': servicio, 'servicio_creado': servicio_creado}
+
+    def _limpiar(self, datos):
+        # Borrar uno por uno pasa por las señales (KPIs, hechos) igual que en la aplicación
+        for orden in OrdenServicio.objects.filter(cliente=datos['cliente']):
+            orden.delete()
+        datos['cliente'].delete()
+        if datos['servicio_creado']:
+            datos['servicio'].delete()
+
+    def _reportar(self, hilos, duracion):
+        latencias = defaultdict(list)
+        for hilo in hilos:
+            for nombre, valores in hilo.latencias.items():
+                latencias[nombre].extend(valores)
+        peticiones = sum(len(valores) for valores in latencias.values())
+
+        self.stdout.write(f"{len(hilos)} hilos, {peticiones} peticiones en {duracion:.2f} s ({peticiones / duracion:.0f}/s)")
+        for nombre, valores in latencias.items():
+            ordenados = sorted(valores)
+            self.stdout.write(
+                f"  {nombre:<9} n={len(valores):<5} p50={statistics.median(ordenados):6.1f} ms "
+                f"p95={ordenados[int(len(ordenados) * 0.95) - 1]:6.1f} ms max={ordenados[-1]:6.1f} ms"
+            )
+
+        bloqueos = sum(hilo.bloqueos for hilo in hilos)
+        fallas = [falla for hilo in hilos for falla in hilo.fallas]
+        self.stdout.write(f"Conexiones abiertas: {sum(hilo.conexiones for hilo in hilos)}")
+        self.stdout.write(f"Errores 'database is locked': {bloqueos}")
+        for falla in fallas[:10]:
+            self.stdout.write(f"  {falla}")
+        if bloqueos or fallas:
+            raise CommandError(f"{bloqueos} bloqueos y {len(fallas)} otras fallas.")
+        self.stdout.write(self.style.SUCCESS("OK"))
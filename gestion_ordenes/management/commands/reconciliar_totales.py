@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_ordenes import totales
+
+MAXIMO_LISTADAS = 50
+
+
+class Command(BaseCommand):
+    help = "Compara los totales de cotizaciones guardados en cada orden contra las cotizaciones (y los corrige con --reparar)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reparar', action='store_true', help="Recalcula los totales de las órdenes desfasadas.")
+        parser.add_argument('--todas', action='store_true', help="Recalcula todas las órdenes sin comparar (tras cargas masivas).")
+
+    def handle(self, *args, **options):
+        if options['todas']:
+            total = totales.reconciliar()
+            self.stdout.write(self.style.SUCCESS(f"Totales recalculados: {total} órdenes."))
+            return
+
+        diferencias = totales.diferencias()
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("Los totales de todas las órdenes cuadran con sus cotizaciones."))
+            return
+
+        for orden_id, campos in list(diferencias.items())[:MAXIMO_LISTADAS]:
+            detalle = ', '.join(f"{campo}: guardado={guardado} real={vivo}" for campo, (guardado, vivo) in campos.items())
+            self.stdout.write(self.style.WARNING(f"Orden #{orden_id}: {detalle}"))
+        if len(diferencias) > MAXIMO_LISTADAS:
+            self.stdout.write(f"... y {len(diferencias) - MAXIMO_LISTADAS} órdenes más.")
+
+        if options['reparar']:
+            totales.reconciliar(diferencias)
+            self.stdout.write(self.style.SUCCESS(f"Totales corregidos en {len(diferencias)} órdenes."))
+        else:
+            raise CommandError(f"{len(diferencias)} orden(es) desfasadas. Usa --reparar.")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from gestion_ordenes import busqueda_texto
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de texto de fallas, bitácora y cotizaciones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help="Documentos por lote (PostgreSQL).")
+
+    def handle(self, *args, **options):
+        backend = busqueda_texto.obtener_backend()
+        total = backend.reconstruir(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice reconstruido con {backend.__class__.__name__}: {total} documentos."
+        ))
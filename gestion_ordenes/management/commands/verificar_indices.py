@@ -0,0 +1,132 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from gestion_ordenes.models import OrdenServicio, BitacoraOrden
+from gestion_ordenes.filtros import filtrar_ordenes, ordenar_ordenes
+
+TABLAS_VIGILADAS = [OrdenServicio._meta.db_table, BitacoraOrden._meta.db_table]
+
+
+def consultas_a_revisar():
+    """
+    Las consultas de lista_ordenes y de los dashboards, armadas igual que en
+    las vistas. Los valores concretos no importan: sólo interesa el plan.
+    """
+    ahora = timezone.now()
+    tecnico_id = 1
+    base_lista = OrdenServicio.objects.select_related('cliente', 'tecnico_asignado', 'equipo')
+    activas = OrdenServicio.objects.abiertas()
+    # Los .count() de las vistas descartan el ordenamiento por defecto
+    sin_orden = OrdenServicio.objects.order_by()
+
+    def lista(**params):
+        return ordenar_ordenes(filtrar_ordenes(base_lista, params), params)[:10]
+
+    return {
+        # lista_ordenes (sin filtros y con cada filtro)
+        'lista_ordenes': lista(),
+        'lista_ordenes?estado': lista(estado=OrdenServicio.ESTADO_NUEVA),
+        'lista_ordenes?tecnico': lista(tecnico=tecnico_id),
+        'lista_ordenes?prioridad': lista(prioridad=OrdenServicio.PRIORIDAD_ALTA),
+        'lista_ordenes?ordenar=monto': lista(ordenar='monto'),
+        'lista_ordenes?monto_min': lista(monto_min='500'),
+        'lista_ordenes?fechas': lista(
+            fecha_inicio=(ahora - timedelta(days=30)).date().isoformat(), fecha_fin=ahora.date().isoformat(),
+        ),
+
+        # dashboard_recepcion
+        'recepcion.abiertas': sin_orden.abiertas().values('id'),
+        'recepcion.cerradas_hoy': sin_orden.filter(fecha_cierre__range=(ahora - timedelta(days=1), ahora)).values('id'),
+        'recepcion.para_entrega': OrdenServicio.objects.filter(
+            estado=OrdenServicio.ESTADO_FINALIZADA_TECNICO
+        ).select_related('cliente', 'equipo').order_by('-fecha_creacion')[:5],
+        'recepcion.sin_asignar': OrdenServicio.objects.filter(
+            estado=OrdenServicio.ESTADO_NUEVA, tecnico_asignado__isnull=True
+        ).select_related('cliente', 'equipo').order_by('-fecha_creacion')[:5],
+        'recepcion.feed': BitacoraOrden.objects.select_related('orden', 'usuario').order_by('-fecha_hora')[:8],
+
+        # dashboard_tecnico
+        'tecnico.mis_ordenes': OrdenServicio.objects.filter(tecnico_asignado=tecnico_id).exclude(
+            estado__in=[OrdenServicio.ESTADO_FINALIZADA_TECNICO] + OrdenServicio.ESTADOS_CERRADOS
+        ).select_related('cliente', 'equipo').order_by('prioridad_peso', 'fecha_creacion'),
+
+        # dashboard_gerente
+        'gerente.activas_por_estado': activas.values('estado').annotate(count=Count('id')).order_by('-count'),
+        'gerente.activas_por_tecnico': activas.exclude(tecnico_asignado__isnull=True).values(
+            'tecnico_asignado__first_name', 'tecnico_asignado__username'
+        ).annotate(count=Count('id')).order_by('-count'),
+        'gerente.alertas': activas.filter(
+            prioridad=OrdenServicio.PRIORIDAD_ALTA, fecha_creacion__lte=ahora - timedelta(days=3)
+        ).select_related('cliente', 'tecnico_asignado')[:10],
+        'gerente.sin_asignar': sin_orden.abiertas().filter(tecnico_asignado__isnull=True).values('id'),
+
+        # detalle_orden
+        'detalle.bitacora': BitacoraOrden.objects.filter(orden_id=1).order_by('-fecha_hora'),
+    }
+
+
+def _nodos_postgresql(plan):
+    """Cada nodo del plan de texto de PostgreSQL con sus líneas de detalle."""
+    return re.split(r'\n\s*->\s*', plan)
+
+
+def escaneos_completos(plan, vendor, limitada=False):
+    """
+    Tablas vigiladas que el plan recorre completas: la tabla o un índice sin
+    condición de búsqueda. Se permite recorrer un índice en orden sólo si la
+    consulta tiene LIMIT y no ordena aparte (se detiene al juntar la página,
+    como la primera página de lista_ordenes).
+    """
+    ordena_aparte = re.search(r'USE TEMP B-TREE FOR ORDER BY|\bSort\b', plan)
+    encontrados = []
+    for tabla in TABLAS_VIGILADAS:
+        if vendor == 'sqlite':
+            # "SEARCH tabla ..." usa una condición; "SCAN tabla" recorre la
+            # tabla o, con "USING [COVERING] INDEX", el índice completo
+            recorridos = re.findall(rf'\bSCAN {tabla}\b( USING (?:COVERING )?INDEX)?', plan)
+            completo = any(not por_indice or not limitada or ordena_aparte for por_indice in recorridos)
+        elif vendor == 'postgresql':
+            completo = False
+            for nodo in _nodos_postgresql(plan):
+                if re.search(rf'Seq Scan on {tabla}\b', nodo):
+                    completo = True
+                elif re.search(rf'Index (Only )?Scan (Backward )?using \S+ on {tabla}\b', nodo) and 'Index Cond' not in nodo:
+                    completo = completo or not limitada or bool(ordena_aparte)
+        else:
+            completo = bool(re.search(rf'\b(ALL|index)\b.*\b{tabla}\b', plan))
+        if completo:
+            encontrados.append(tabla)
+    return encontrados
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta EXPLAIN sobre las consultas de lista_ordenes y de los dashboards "
+        "y falla si alguna recorre completa la tabla de órdenes o de bitácora, o uno de sus índices."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mostrar-planes', action='store_true', help="Imprime el plan de cada consulta.")
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        fallidas = []
+
+        for nombre, queryset in consultas_a_revisar().items():
+            plan = queryset.explain()
+            tablas = escaneos_completos(plan, vendor, limitada=queryset.query.high_mark is not None)
+            if tablas:
+                fallidas.append(nombre)
+                self.stdout.write(self.style.ERROR(f"[SCAN] {nombre}: {', '.join(tablas)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"[OK]   {nombre}"))
+            if options['mostrar_planes'] or tablas:
+                self.stdout.write(plan + "\n")
+
+        if fallidas:
+            raise CommandError(f"{len(fallidas)} consulta(s) sin índice: {', '.join(fallidas)}")
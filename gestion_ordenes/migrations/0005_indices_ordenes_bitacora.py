@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0002_alter_proveedor_nombre_empresa_and_more'),
+        ('gestion_ordenes', '0004_alter_bitacoraorden_contenido_original'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bitacoraorden',
+            index=models.Index(fields=['-fecha_hora'], name='bitacora_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacoraorden',
+            index=models.Index(fields=['orden', '-fecha_hora'], name='bitacora_orden_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(fields=['-fecha_creacion'], name='orden_fecha_creacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(fields=['estado', '-fecha_creacion'], name='orden_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(fields=['tecnico_asignado', 'estado', 'prioridad'], name='orden_tecnico_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(fields=['prioridad', 'fecha_creacion'], name='orden_prioridad_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(fields=['fecha_cierre'], name='orden_fecha_cierre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(condition=models.Q(('estado__in', ['Entregada', 'Cancelada']), _negated=True), fields=['estado', 'tecnico_asignado'], name='orden_abiertas_idx'),
+        ),
+    ]
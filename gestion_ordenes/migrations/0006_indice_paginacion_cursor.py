@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0002_alter_proveedor_nombre_empresa_and_more'),
+        ('gestion_clientes', '0006_trigramabusqueda'),
+        ('gestion_ordenes', '0005_indices_ordenes_bitacora'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ordenservicio',
+            name='orden_fecha_creacion_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(fields=['-fecha_creacion', '-id'], name='orden_fecha_id_idx'),
+        ),
+    ]
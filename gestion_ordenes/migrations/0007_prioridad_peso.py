@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Copia de OrdenServicio.PRIORIDAD_PESOS al momento de la migración
+PESOS = {'Alta': 1, 'Normal': 2, 'Baja': 3}
+PESO_DESCONOCIDA = 4
+
+
+def llenar_prioridad_peso(apps, schema_editor):
+    OrdenServicio = apps.get_model('gestion_ordenes', 'OrdenServicio')
+    # Un UPDATE por prioridad, sin recorrer las órdenes en Python
+    for prioridad, peso in PESOS.items():
+        OrdenServicio.objects.filter(prioridad=prioridad).update(prioridad_peso=peso)
+    OrdenServicio.objects.exclude(prioridad__in=PESOS).update(prioridad_peso=PESO_DESCONOCIDA)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0002_alter_proveedor_nombre_empresa_and_more'),
+        ('gestion_clientes', '0006_trigramabusqueda'),
+        ('gestion_ordenes', '0006_indice_paginacion_cursor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordenservicio',
+            name='prioridad_peso',
+            field=models.PositiveSmallIntegerField(default=2, editable=False),
+        ),
+        migrations.RunPython(llenar_prioridad_peso, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(fields=['tecnico_asignado', 'prioridad_peso', 'fecha_creacion'], name='orden_tecnico_prioridad_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_ordenes', '0007_prioridad_peso'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrdenEstadoTransicion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado_anterior', models.CharField(blank=True, max_length=50, null=True)),
+                ('estado_nuevo', models.CharField(max_length=50)),
+                ('fecha', models.DateTimeField(verbose_name='Fecha del cambio')),
+                ('recuperada', models.BooleanField(default=False, verbose_name='Recuperada de la bitácora')),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transiciones', to='gestion_ordenes.ordenservicio')),
+                ('tecnico', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transiciones_atendidas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Transición de Estado',
+                'verbose_name_plural': 'Transiciones de Estado',
+                'ordering': ['orden', 'fecha', 'id'],
+                'indexes': [models.Index(fields=['orden', 'fecha', 'id'], name='transicion_orden_fecha_idx'), models.Index(fields=['fecha'], name='transicion_fecha_idx')],
+            },
+        ),
+    ]
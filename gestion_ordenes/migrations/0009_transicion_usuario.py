@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_ordenes', '0008_orden_estado_transicion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordenestadotransicion',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transiciones_realizadas', to=settings.AUTH_USER_MODEL, verbose_name='Usuario que hizo el cambio'),
+        ),
+    ]
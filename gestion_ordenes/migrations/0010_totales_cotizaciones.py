@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+MONTO = DecimalField(max_digits=12, decimal_places=2)
+
+
+def llenar_totales(apps, schema_editor):
+    # Lo mismo que totales.en_vivo() con los modelos históricos: un UPDATE para todas las órdenes
+    OrdenServicio = apps.get_model('gestion_ordenes', 'OrdenServicio')
+    Cotizacion = apps.get_model('gestion_ordenes', 'Cotizacion')
+
+    def por_orden(**filtros):
+        return Cotizacion.objects.filter(orden=OuterRef('pk'), **filtros).order_by().values('orden')
+
+    def suma(estados):
+        totales = por_orden(estado__in=estados).annotate(total=Sum(F('costo_refacciones') + F('costo_mano_obra')))
+        return Coalesce(Subquery(totales.values('total'), output_field=MONTO), Value(0), output_field=MONTO)
+
+    OrdenServicio.objects.filter(cotizaciones__isnull=False).update(
+        total_autorizado=suma(['Autorizada']),
+        total_pendiente=suma(['Pendiente', 'Enviada']),
+        num_cotizaciones=Subquery(por_orden().annotate(n=Count('id')).values('n')),
+        estado_ultima_cotizacion=Subquery(
+            Cotizacion.objects.filter(orden=OuterRef('pk')).order_by('-fecha_creacion', '-id').values('estado')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0002_alter_proveedor_nombre_empresa_and_more'),
+        ('gestion_clientes', '0006_trigramabusqueda'),
+        ('gestion_ordenes', '0009_transicion_usuario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordenservicio',
+            name='estado_ultima_cotizacion',
+            field=models.CharField(blank=True, editable=False, max_length=50, null=True, verbose_name='Estado de la última cotización'),
+        ),
+        migrations.AddField(
+            model_name='ordenservicio',
+            name='num_cotizaciones',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Número de cotizaciones'),
+        ),
+        migrations.AddField(
+            model_name='ordenservicio',
+            name='total_autorizado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Total autorizado'),
+        ),
+        migrations.AddField(
+            model_name='ordenservicio',
+            name='total_pendiente',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Total pendiente de autorizar'),
+        ),
+        migrations.RunPython(llenar_totales, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(fields=['-total_autorizado', '-fecha_creacion', '-id'], name='orden_total_autorizado_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_ordenes', '0010_totales_cotizaciones'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bitacoraorden',
+            name='fecha_hora',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Fecha y Hora'),
+        ),
+    ]
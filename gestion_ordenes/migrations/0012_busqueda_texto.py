@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:30
+
+import unicodedata
+
+from django.db import migrations
+
+
+# Copias de gestion_clientes.models y gestion_ordenes.busqueda_texto al
+# escribir esta migración: si cambian allí, la migración debe seguir dando el
+# mismo resultado.
+def normalizar_texto(texto):
+    if not texto:
+        return ''
+    return ''.join(c for c in unicodedata.normalize('NFD', str(texto).lower()) if unicodedata.category(c) != 'Mn')
+
+
+TABLAS_FTS5 = {
+    'falla': 'gestion_ordenes_fts_falla',
+    'bitacora': 'gestion_ordenes_fts_bitacora',
+    'cotizacion': 'gestion_ordenes_fts_cotizacion',
+}
+TABLA_TSVECTOR = 'gestion_ordenes_busqueda_texto'
+
+# SQLite: una tabla virtual FTS5 por tipo. rowid = id del objeto; el
+# tokenizador quita acentos y mayúsculas como normalizar_texto.
+SQL_FTS5 = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabla} USING fts5("
+    f"texto, orden_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+    for tabla in TABLAS_FTS5.values()
+]
+SQL_FTS5_LLENAR = [
+    f"INSERT INTO {TABLAS_FTS5['falla']} (rowid, orden_id, texto) "
+    f"SELECT id, id, descripcion_falla FROM gestion_ordenes_ordenservicio",
+    f"INSERT INTO {TABLAS_FTS5['bitacora']} (rowid, orden_id, texto) "
+    f"SELECT id, orden_id, descripcion FROM gestion_ordenes_bitacoraorden",
+    f"INSERT INTO {TABLAS_FTS5['cotizacion']} (rowid, orden_id, texto) "
+    f"SELECT id, orden_id, concepto || coalesce(char(10) || notas, '') FROM gestion_ordenes_cotizacion",
+]
+SQL_FTS5_REVERSA = [f"DROP TABLE IF EXISTS {tabla}" for tabla in TABLAS_FTS5.values()]
+
+# PostgreSQL: tsvector del texto ya normalizado, con índice GIN
+SQL_PG = [
+    f"CREATE TABLE IF NOT EXISTS {TABLA_TSVECTOR} ("
+    f"tipo varchar(10) NOT NULL, objeto_id bigint NOT NULL, orden_id bigint NOT NULL, "
+    f"texto text NOT NULL, documento tsvector NOT NULL, PRIMARY KEY (tipo, objeto_id))",
+    f"CREATE INDEX IF NOT EXISTS busqueda_texto_documento_idx ON {TABLA_TSVECTOR} USING gin (documento)",
+]
+SQL_PG_REVERSA = [f"DROP TABLE IF EXISTS {TABLA_TSVECTOR}"]
+
+
+def crear_tablas(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for sql in SQL_FTS5 + SQL_FTS5_LLENAR:
+            schema_editor.execute(sql)
+    elif vendor == 'postgresql':
+        for sql in SQL_PG:
+            schema_editor.execute(sql)
+        llenar_tsvector(apps, schema_editor)
+
+
+def llenar_tsvector(apps, schema_editor):
+    # normalizar_texto corre en Python, así que se recorre cada modelo
+    OrdenServicio = apps.get_model('gestion_ordenes', 'OrdenServicio')
+    BitacoraOrden = apps.get_model('gestion_ordenes', 'BitacoraOrden')
+    Cotizacion = apps.get_model('gestion_ordenes', 'Cotizacion')
+    fuentes = [
+        ('falla', OrdenServicio.objects.values_list('id', 'id', 'descripcion_falla')),
+        ('bitacora', BitacoraOrden.objects.values_list('id', 'orden_id', 'descripcion')),
+        ('cotizacion', (
+            (pk, orden_id, '\n'.join(parte for parte in (concepto, notas) if parte))
+            for pk, orden_id, concepto, notas in Cotizacion.objects.values_list('id', 'orden_id', 'concepto', 'notas')
+        )),
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        for tipo, filas in fuentes:
+            cursor.executemany(
+                f"INSERT INTO {TABLA_TSVECTOR} (tipo, objeto_id, orden_id, texto, documento) "
+                f"VALUES (%s, %s, %s, %s, to_tsvector('simple', %s))",
+                [(tipo, pk, orden_id, texto or '', normalizar_texto(texto)) for pk, orden_id, texto in filas],
+            )
+
+
+def eliminar_tablas(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for sql in SQL_FTS5_REVERSA:
+            schema_editor.execute(sql)
+    elif vendor == 'postgresql':
+        for sql in SQL_PG_REVERSA:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_ordenes', '0011_bitacora_fecha_hora_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_tablas, eliminar_tablas),
+    ]
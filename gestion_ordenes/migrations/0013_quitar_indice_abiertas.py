@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:38
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_ordenes', '0012_busqueda_texto'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ordenservicio',
+            name='orden_abiertas_idx',
+        ),
+    ]
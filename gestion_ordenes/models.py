@@ -1,9 +1,54 @@
 from django.db import models
 from django.conf import settings # Para referenciar al modelo User
+from django.utils import timezone
 # Importar modelos de otras apps
 from gestion_clientes.models import Cliente, Equipo
 from catalogo.models import Proveedor, TipoServicio
 
+class OrdenServicioQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create no pasa por save(): calculamos el peso aquí
+        objs = list(objs)
+        for obj in objs:
+            obj.prioridad_peso = obj.peso_de_prioridad(obj.prioridad)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if 'prioridad' in fields:
+            for obj in objs:
+                obj.prioridad_peso = obj.peso_de_prioridad(obj.prioridad)
+            fields = [*fields, 'prioridad_peso']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        if isinstance(kwargs.get('prioridad'), str):
+            kwargs['prioridad_peso'] = OrdenServicio.peso_de_prioridad(kwargs['prioridad'])
+        return super().update(**kwargs)
+
+    def abiertas(self):
+        """Órdenes no entregadas ni canceladas (con índice sobre estado)."""
+        return self.filter(estado__in=OrdenServicio.ESTADOS_ABIERTOS)
+
+    def con_detalle(self):
+        """
+        Carga todo lo que muestra el expediente de la orden (detalle_orden.html)
+        en un número fijo de consultas, sin importar cuántas cotizaciones o
+        transferencias existan.
+        La bitácora no se precarga: se pagina aparte (ver vista bitacora_orden).
+        """
+        return self.select_related(
+            'cliente', 'equipo', 'tecnico_asignado', 'asistente_receptor'
+        ).prefetch_related(
+            models.Prefetch('cotizaciones', queryset=Cotizacion.objects.select_related('proveedor', 'usuario_creador').order_by('-fecha_creacion')),
+            models.Prefetch('transferencias', queryset=Transferencia.objects.select_related(
+                'usuario_solicitante', 'usuario_autoriza'
+            ).prefetch_related('items').order_by('-fecha_transferencia')),
+            'servicios',
+        )
+
+
 class OrdenServicio(models.Model):
     """La tabla central que representa una orden de servicio."""
     # Opciones para el campo 'estado'
@@ -25,6 +70,13 @@ class OrdenServicio(models.Model):
         (ESTADO_ENTREGADA, 'Entregada'),
         (ESTADO_CANCELADA, 'Cancelada'),
     ]
+    ESTADOS_CERRADOS = [ESTADO_ENTREGADA, ESTADO_CANCELADA]
+    # Se filtran con IN sobre la lista (no con NOT IN de las cerradas): así la
+    # consulta busca en el índice por estado en vez de recorrerlo completo
+    ESTADOS_ABIERTOS = [
+        ESTADO_NUEVA, ESTADO_DIAGNOSTICO, ESTADO_ESPERANDO_AUTORIZACION,
+        ESTADO_ESPERANDO_REFACCION, ESTADO_EN_REPARACION, ESTADO_FINALIZADA_TECNICO,
+    ]
 
     # Opciones para Prioridad
     PRIORIDAD_BAJA = 'Baja'
@@ -35,6 +87,16 @@ class OrdenServicio(models.Model):
         (PRIORIDAD_NORMAL, 'Normal'),
         (PRIORIDAD_ALTA, 'Alta'),
     ]
+    # Orden de atención (menor = más urgente). Se guarda en prioridad_peso
+    # para poder ordenar por índice en lugar de un CASE calculado.
+    PRIORIDAD_PESOS = {
+        PRIORIDAD_ALTA: 1,
+        PRIORIDAD_NORMAL: 2,
+        PRIORIDAD_BAJA: 3,
+    }
+    PRIORIDAD_PESO_DESCONOCIDA = 4
+    # Totales de cotizaciones: sólo los escribe gestion_ordenes/totales.py
+    CAMPOS_TOTALES = ('total_autorizado', 'total_pendiente', 'num_cotizaciones', 'estado_ultima_cotizacion')
 
     # No es necesario id_orden, Django lo crea automáticamente como 'id' (AutoField PK)
     cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name="ordenes")
@@ -69,13 +131,34 @@ class OrdenServicio(models.Model):
     contrasena_equipo = models.CharField(max_length=255, blank=True, null=True, verbose_name="Contraseña del equipo (Encriptada)") # Recordar encriptar/desencriptar en las vistas <-------------------
     estado = models.CharField(max_length=50, choices=ESTADO_OPCIONES, default=ESTADO_NUEVA)
     prioridad = models.CharField(max_length=20, choices=PRIORIDAD_OPCIONES, default=PRIORIDAD_NORMAL)
+    prioridad_peso = models.PositiveSmallIntegerField(default=2, editable=False)
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     fecha_cierre = models.DateTimeField(blank=True, null=True, verbose_name="Fecha de cierre")
+    # Desnormalizados desde Cotizacion (ver totales.py)
+    total_autorizado = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, verbose_name="Total autorizado")
+    total_pendiente = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, verbose_name="Total pendiente de autorizar")
+    num_cotizaciones = models.PositiveIntegerField(default=0, editable=False, verbose_name="Número de cotizaciones")
+    estado_ultima_cotizacion = models.CharField(max_length=50, blank=True, null=True, editable=False, verbose_name="Estado de la última cotización")
+
+    objects = OrdenServicioQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Orden de Servicio"
         verbose_name_plural = "Órdenes de Servicio"
         ordering = ['-fecha_creacion']
+        # Índices para lista_ordenes y los dashboards (ver comando verificar_indices)
+        indexes = [
+            # (fecha_creacion, id) es también la llave de la paginación por cursor
+            models.Index(fields=['-fecha_creacion', '-id'], name='orden_fecha_id_idx'),
+            models.Index(fields=['estado', '-fecha_creacion'], name='orden_estado_fecha_idx'),
+            models.Index(fields=['tecnico_asignado', 'estado', 'prioridad'], name='orden_tecnico_estado_idx'),
+            models.Index(fields=['prioridad', 'fecha_creacion'], name='orden_prioridad_fecha_idx'),
+            # Cola del técnico (dashboard_tecnico): urgentes primero, luego las más antiguas
+            models.Index(fields=['tecnico_asignado', 'prioridad_peso', 'fecha_creacion'], name='orden_tecnico_prioridad_idx'),
+            models.Index(fields=['fecha_cierre'], name='orden_fecha_cierre_idx'),
+            # lista_ordenes filtrada u ordenada por monto autorizado
+            models.Index(fields=['-total_autorizado', '-fecha_creacion', '-id'], name='orden_total_autorizado_idx'),
+        ]
 
     def __str__(self):
         return f"Orden #{self.id} - {self.cliente} ({self.estado})"
@@ -83,8 +166,24 @@ class OrdenServicio(models.Model):
     def save(self, *args, **kwargs):
         # MEJORA DE INTEGRIDAD
         self.contrasena_equipo = self.contrasena_equipo or None
+
+        self.prioridad_peso = self.peso_de_prioridad(self.prioridad)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'prioridad' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'prioridad_peso'}
+        elif update_fields is None and not self._state.adding:
+            # Una orden cargada antes de cambiar sus cotizaciones no debe pisar los totales
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_TOTALES
+            ]
+
         super().save(*args, **kwargs)
 
+    @classmethod
+    def peso_de_prioridad(cls, prioridad):
+        return cls.PRIORIDAD_PESOS.get(prioridad, cls.PRIORIDAD_PESO_DESCONOCIDA)
+
 
 class Cotizacion(models.Model):
     """Almacena las cotizaciones asociadas a una orden de servicio."""
@@ -217,7 +316,8 @@ class BitacoraOrden(models.Model):
     # No es necesario id_entrada, Django lo crea automáticamente como 'id' (AutoField PK)
     orden = models.ForeignKey(OrdenServicio, on_delete=models.CASCADE, related_name="bitacora")
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="entradas_bitacora")
-    fecha_hora = models.DateTimeField(auto_now_add=True, verbose_name="Fecha y Hora")
+    # default en lugar de auto_now_add: la bitácora asíncrona guarda la hora del evento, no la de escritura
+    fecha_hora = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Fecha y Hora")
     descripcion = models.TextField()
 
     # --- CAMPOS DE AUDITORÍA (NUEVOS) ---
@@ -229,6 +329,10 @@ class BitacoraOrden(models.Model):
         verbose_name = "Entrada de Bitácora"
         verbose_name_plural = "Bitácora de Órdenes" # Ajustado para claridad
         ordering = ['-fecha_hora'] # Mostrar lo más reciente primero 
+        indexes = [
+            models.Index(fields=['-fecha_hora'], name='bitacora_fecha_idx'),
+            models.Index(fields=['orden', '-fecha_hora'], name='bitacora_orden_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Nota en Orden #{self.orden.id} por {self.usuario}"
@@ -236,4 +340,47 @@ class BitacoraOrden(models.Model):
     def save(self, *args, **kwargs):
         # MEJORA DE INTEGRIDAD
         self.contenido_original = self.contenido_original or None
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class OrdenEstadoTransicion(models.Model):
+    """
+    Un cambio de estado de una orden (o su estado inicial, con estado_anterior
+    vacío). Lo escribe la señal de gestion_ordenes/signals.py en cada save()
+    que cambia el estado; el histórico previo se recupera de la bitácora con
+    el comando cargar_transiciones.
+    """
+    orden = models.ForeignKey(OrdenServicio, on_delete=models.CASCADE, related_name="transiciones")
+    estado_anterior = models.CharField(max_length=50, blank=True, null=True)
+    estado_nuevo = models.CharField(max_length=50)
+    fecha = models.DateTimeField(verbose_name="Fecha del cambio")
+    # Técnico asignado al entrar al estado: los tiempos por etapa se atribuyen a él
+    tecnico = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="transiciones_atendidas",
+    )
+    # Quién hizo el cambio (vacío en las recuperadas de la bitácora y en el estado inicial)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="transiciones_realizadas",
+        verbose_name="Usuario que hizo el cambio",
+    )
+    recuperada = models.BooleanField(default=False, verbose_name="Recuperada de la bitácora")
+
+    class Meta:
+        verbose_name = "Transición de Estado"
+        verbose_name_plural = "Transiciones de Estado"
+        ordering = ['orden', 'fecha', 'id']
+        indexes = [
+            # Recorrido por orden en el cálculo de tiempos por etapa (reportes/tiempos.py)
+            models.Index(fields=['orden', 'fecha', 'id'], name='transicion_orden_fecha_idx'),
+            models.Index(fields=['fecha'], name='transicion_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"Orden #{self.orden_id}: {self.estado_anterior or '(inicio)'} -> {self.estado_nuevo}"
@@ -0,0 +1,98 @@
+"""
+Paginación por cursor (keyset) para listados largos (órdenes, bitácora).
+
+En lugar de COUNT(*) + OFFSET, cada página se pide "después de" o "antes de"
+la última/primera fila vista, usando la llave (fecha, id). El costo de
+cualquier página es el mismo que el de la primera.
+"""
+import base64
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CONTEO_TTL = 300  # segundos
+
+
+def codificar_cursor(fecha, pk):
+    valor = f"{fecha.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha, id) o None si el cursor no es válido."""
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, pk = base64.urlsafe_b64decode(cursor + relleno).decode().split('|')
+        fecha = parse_datetime(fecha)
+        return (fecha, int(pk)) if fecha else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class PaginaCursor:
+    """Página de resultados ordenada por (-campo, -id), de lo más reciente a lo más antiguo."""
+
+    def __init__(self, queryset, por_pagina, despues=None, antes=None, campo='fecha_creacion'):
+        self.por_pagina = por_pagina
+        self.campo = campo
+        llave_despues = decodificar_cursor(despues)
+        llave_antes = decodificar_cursor(antes)
+
+        if llave_antes and not llave_despues:
+            # Hacia atrás: recorremos en orden ascendente y luego invertimos
+            fecha, pk = llave_antes
+            qs = queryset.filter(
+                Q(**{f'{campo}__gt': fecha}) | Q(**{campo: fecha, 'id__gt': pk}), **{f'{campo}__gte': fecha}
+            )
+            filas = list(qs.order_by(campo, 'id')[:por_pagina + 1])
+            self.has_previous = len(filas) > por_pagina
+            self.has_next = True
+            self.object_list = list(reversed(filas[:por_pagina]))
+        else:
+            qs = queryset
+            if llave_despues:
+                fecha, pk = llave_despues
+                # El __lte redundante le da a la base el inicio del rango en el
+                # índice: sin él recorre el índice desde el principio
+                # descartando filas, y la página N cuesta N veces la primera
+                qs = qs.filter(
+                    Q(**{f'{campo}__lt': fecha}) | Q(**{campo: fecha, 'id__lt': pk}), **{f'{campo}__lte': fecha}
+                )
+            filas = list(qs.order_by(f'-{campo}', '-id')[:por_pagina + 1])
+            self.has_next = len(filas) > por_pagina
+            self.has_previous = llave_despues is not None
+            self.object_list = filas[:por_pagina]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_other_pages(self):
+        return self.has_previous or self.has_next
+
+    def _cursor(self, obj):
+        return codificar_cursor(getattr(obj, self.campo), obj.id)
+
+    @property
+    def cursor_siguiente(self):
+        return self._cursor(self.object_list[-1]) if self.has_next and self.object_list else None
+
+    @property
+    def cursor_anterior(self):
+        return self._cursor(self.object_list[0]) if self.has_previous and self.object_list else None
+
+
+def conteo_aproximado(queryset, clave):
+    """
+    Total del queryset cacheado unos minutos: sirve para el encabezado
+    ("~N órdenes") sin pagar un COUNT(*) en cada cambio de página.
+    """
+    clave_cache = 'conteo_ordenes:' + hashlib.md5(clave.encode()).hexdigest()
+    return cache.get_or_set(clave_cache, lambda: queryset.count(), CONTEO_TTL)
@@ -0,0 +1,140 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from . import busqueda_texto, totales
+from .models import BitacoraOrden, Cotizacion, OrdenServicio, OrdenEstadoTransicion
+
+# --- SEÑALES DE LAS ACCIONES EN BLOQUE ---
+# acciones_masivas escribe con update() y bulk_create, que no disparan
+# pre_save/post_save. En su lugar envía estas señales, una por bloque, y cada
+# app hace por el bloque lo que hace por una orden en post_save.
+
+# sender=OrdenServicio, cambios=[acciones_masivas.CambioOrden], usuario
+ordenes_actualizadas_en_bloque = Signal()
+# sender=BitacoraOrden, entradas=[BitacoraOrden ya creadas]
+bitacora_creada_en_bloque = Signal()
+
+# --- TRANSICIONES DE ESTADO ---
+# update() masivos no pasan por aquí: quien los use registra sus transiciones
+# (acciones_masivas, con ordenes_actualizadas_en_bloque).
+
+
+# Valores previos que necesitan los post_save de OrdenServicio: esta app
+# (transiciones, búsqueda de texto), dashboard (KPIs) y reportes (días de la
+# tabla de hechos).
+CAMPOS_ANTERIORES = ('estado', 'tecnico_asignado_id', 'descripcion_falla', 'fecha_cierre')
+
+
+@receiver(pre_save, sender=OrdenServicio)
+def recordar_valores_anteriores(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Lee la fila guardada una sola vez por save() y deja los valores previos en
+    instance._anterior ({campo: valor}, o None si la orden es nueva). Los
+    campos que este save() no escribe (update_fields) conservan el valor del
+    objeto: para quien compara, no cambiaron.
+    """
+    instance._anterior = None
+    if raw or not instance.pk:
+        return
+    actuales = {campo: getattr(instance, campo) for campo in CAMPOS_ANTERIORES}
+    campos = [
+        campo for campo in CAMPOS_ANTERIORES
+        if update_fields is None or campo in update_fields or campo.removesuffix('_id') in update_fields
+    ]
+    if not campos:
+        instance._anterior = actuales
+        return
+    anteriores = OrdenServicio.objects.filter(pk=instance.pk).order_by().values(*campos).first()
+    if anteriores is not None:
+        instance._anterior = {**actuales, **anteriores}
+
+
+def valor_anterior(instance, campo):
+    """Valor de `campo` antes del save() en curso (None si la orden es nueva)."""
+    anterior = getattr(instance, '_anterior', None)
+    return anterior[campo] if anterior else None
+
+
+@receiver(post_save, sender=OrdenServicio)
+def registrar_transicion(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'estado' not in update_fields):
+        return
+    anterior = valor_anterior(instance, 'estado')
+    if not created and anterior == instance.estado:
+        return
+    OrdenEstadoTransicion.objects.create(
+        orden=instance,
+        estado_anterior=None if created else anterior,
+        estado_nuevo=instance.estado,
+        fecha=instance.fecha_creacion if created else timezone.now(),
+        tecnico_id=instance.tecnico_asignado_id,
+        # Lo pone estados.cambiar_estado
+        usuario=getattr(instance, '_usuario_transicion', None),
+    )
+
+
+@receiver(ordenes_actualizadas_en_bloque, sender=OrdenServicio)
+def registrar_transiciones_en_bloque(sender, cambios, usuario=None, **kwargs):
+    ahora = timezone.now()
+    OrdenEstadoTransicion.objects.bulk_create([
+        OrdenEstadoTransicion(
+            orden_id=cambio.orden_id, estado_anterior=cambio.anterior[0], estado_nuevo=cambio.actual[0],
+            fecha=ahora, tecnico_id=cambio.actual[1], usuario=usuario,
+        )
+        for cambio in cambios if cambio.anterior[0] != cambio.actual[0]
+    ])
+
+
+# --- TOTALES DE COTIZACIONES ---
+# Se recalculan en la transacción que crea, edita o borra la cotización.
+
+
+@receiver(post_save, sender=Cotizacion)
+@receiver(post_delete, sender=Cotizacion)
+def recalcular_totales_orden(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    totales.recalcular(instance.orden_id)
+
+
+# --- BÚSQUEDA DE TEXTO ---
+# Cada documento se reindexa en la transacción que lo modifica. Lo que no pasa
+# por aquí (bulk_create, update() masivos) se corrige con reconstruir_busqueda_texto.
+
+
+@receiver(post_save, sender=OrdenServicio)
+def indexar_falla(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'descripcion_falla' not in update_fields):
+        return
+    if created or valor_anterior(instance, 'descripcion_falla') != instance.descripcion_falla:
+        busqueda_texto.indexar(busqueda_texto.TIPO_FALLA, [instance], nuevos=created)
+
+
+@receiver(post_save, sender=BitacoraOrden)
+def indexar_bitacora(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        busqueda_texto.indexar(busqueda_texto.TIPO_BITACORA, [instance], nuevos=created)
+
+
+@receiver(bitacora_creada_en_bloque, sender=BitacoraOrden)
+def indexar_bitacora_en_bloque(sender, entradas, **kwargs):
+    busqueda_texto.indexar(busqueda_texto.TIPO_BITACORA, entradas, nuevos=True)
+
+
+@receiver(post_save, sender=Cotizacion)
+def indexar_cotizacion(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        busqueda_texto.indexar(busqueda_texto.TIPO_COTIZACION, [instance], nuevos=created)
+
+
+@receiver(post_delete, sender=OrdenServicio)
+@receiver(post_delete, sender=BitacoraOrden)
+@receiver(post_delete, sender=Cotizacion)
+def desindexar(sender, instance, **kwargs):
+    tipo = {
+        OrdenServicio: busqueda_texto.TIPO_FALLA,
+        BitacoraOrden: busqueda_texto.TIPO_BITACORA,
+        Cotizacion: busqueda_texto.TIPO_COTIZACION,
+    }[sender]
+    busqueda_texto.eliminar(tipo, instance.pk)
@@ -1,3 +1,652 @@
-from django.test import TestCase
+import datetime
+import math
+import random
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from dashboard import kpis
+from gestion_clientes.models import Cliente, Equipo, normalizar_texto
+from reportes.models import DiaPendienteHechos
+from . import acciones_masivas, bitacora, busqueda_texto, estados, totales, transiciones
+from .management.commands.verificar_indices import escaneos_completos
+from .models import BitacoraOrden, Cotizacion, OrdenEstadoTransicion, OrdenServicio
+from .paginacion import PaginaCursor, codificar_cursor
+from .filtros import filtrar_ordenes
+
+
+class AccionesMasivasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gerente = User.objects.create_superuser('gerente', password='x')
+        grupo = Group.objects.create(name='Técnico')
+        cls.tecnico = User.objects.create_user('tecnico1', password='x')
+        cls.otro_tecnico = User.objects.create_user('tecnico2', password='x')
+        grupo.user_set.add(cls.tecnico, cls.otro_tecnico)
+        cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+        # Con save(): las señales dejan el snapshot de KPIs al día
+        cls.ordenes = [
+            OrdenServicio.objects.create(
+                cliente=cliente, equipo=equipo, descripcion_falla=f'Falla {i}', tecnico_asignado=cls.tecnico,
+            )
+            for i in range(6)
+        ]
+        cls.ids = [orden.pk for orden in cls.ordenes]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.gerente)
+
+    def test_asignar_tecnico_en_bloque(self):
+        acciones_masivas.aplicar(acciones_masivas.ACCION_TECNICO, self.ids[:1], self.gerente, str(self.otro_tecnico.pk))
+        # Las mismas consultas con 1 o 1000 órdenes: un UPDATE, un INSERT de bitácora (y su índice de
+        # búsqueda), uno de días y los KPIs
+        with self.assertNumQueries(12):
+            modificadas = acciones_masivas.aplicar(
+                acciones_masivas.ACCION_TECNICO, self.ids, self.gerente, str(self.otro_tecnico.pk),
+            )
+        self.assertEqual(modificadas, 5)
+        self.assertEqual(OrdenServicio.objects.filter(tecnico_asignado=self.otro_tecnico).count(), 6)
+        self.assertEqual(
+            BitacoraOrden.objects.filter(descripcion='Edición administrativa: Técnico: tecnico2').count(), 6,
+        )
+        self.assertEqual(kpis.diferencias(), {})
+        # Otra vez: ya tienen ese técnico
+        self.assertEqual(
+            acciones_masivas.aplicar(acciones_masivas.ACCION_TECNICO, self.ids, self.gerente, str(self.otro_tecnico.pk)), 0,
+        )
+
+    def test_cambiar_estado_y_cerrar(self):
+        acciones_masivas.aplicar(
+            acciones_masivas.ACCION_ESTADO, self.ids, self.gerente, OrdenServicio.ESTADO_FINALIZADA_TECNICO,
+        )
+        self.assertEqual(
+            OrdenEstadoTransicion.objects.filter(estado_nuevo=OrdenServicio.ESTADO_FINALIZADA_TECNICO).count(), 6,
+        )
+        DiaPendienteHechos.objects.all().delete()
+
+        acciones_masivas.aplicar(acciones_masivas.ACCION_ESTADO, self.ids, self.gerente, OrdenServicio.ESTADO_ENTREGADA)
+        self.assertFalse(OrdenServicio.objects.filter(pk__in=self.ids, fecha_cierre__isnull=True).exists())
+        self.assertEqual(BitacoraOrden.objects.filter(descripcion='*** ORDEN CERRADA - ESTADO: ENTREGADA ***').count(), 6)
+        self.assertTrue(DiaPendienteHechos.objects.exists())
+        self.assertEqual(kpis.diferencias(), {})
+
+    def test_se_valida_el_bloque_completo(self):
+        OrdenServicio.objects.filter(pk=self.ids[0]).update(estado=OrdenServicio.ESTADO_FINALIZADA_TECNICO)
+        response = self.client.post(reverse('acciones_masivas_ordenes'), {
+            'accion': acciones_masivas.ACCION_PRIORIDAD, 'prioridad': OrdenServicio.PRIORIDAD_ALTA,
+            'ordenes': self.ids, 'siguiente': 'estado=Nueva',
+        })
+        self.assertRedirects(response, reverse('lista_ordenes') + '?estado=Nueva', fetch_redirect_response=False)
+        # Una orden no lo admite: no se modifica ninguna
+        self.assertFalse(OrdenServicio.objects.filter(prioridad=OrdenServicio.PRIORIDAD_ALTA).exists())
+
+        response = self.client.post(reverse('acciones_masivas_ordenes'), {
+            'accion': acciones_masivas.ACCION_PRIORIDAD, 'prioridad': OrdenServicio.PRIORIDAD_ALTA,
+            'ordenes': self.ids[1:],
+        })
+        self.assertEqual(
+            set(OrdenServicio.objects.filter(prioridad=OrdenServicio.PRIORIDAD_ALTA).values_list('prioridad_peso', flat=True)),
+            {OrdenServicio.PRIORIDAD_PESOS[OrdenServicio.PRIORIDAD_ALTA]},
+        )
+
+    def test_cerrar_requiere_permiso(self):
+        recepcion = User.objects.create_user('recepcion', password='x')
+        with self.assertRaisesMessage(ValidationError, 'No tienes permisos para cerrar órdenes.'):
+            acciones_masivas.aplicar(acciones_masivas.ACCION_ESTADO, self.ids, recepcion, OrdenServicio.ESTADO_CANCELADA)
+
+
+# --- MÁQUINA DE ESTADOS ---
+
+# Referencia independiente de la tabla de estados.ORDEN, escrita a partir de las
+# reglas de negocio y no de la tabla: si alguna de las dos cambia, las pruebas lo notan.
+_FINALIZADA = OrdenServicio.ESTADO_FINALIZADA_TECNICO
+_FINALES = {OrdenServicio.ESTADO_ENTREGADA, OrdenServicio.ESTADO_CANCELADA}
+
+
+def _permitida(origen, destino, puede_cerrar):
+    if origen in _FINALES or destino == OrdenServicio.ESTADO_NUEVA or origen == destino:
+        return False
+    if destino == OrdenServicio.ESTADO_ENTREGADA:
+        return origen == _FINALIZADA and puede_cerrar
+    if destino == OrdenServicio.ESTADO_CANCELADA:
+        return origen != _FINALIZADA and puede_cerrar
+    return True
+
+
+class MaquinaEstadosTests(TestCase):
+    """
+    Recorridos aleatorios (con semilla fija, reproducibles) por la máquina de
+    estados: miles de secuencias en memoria y unas decenas contra la base.
+    """
+    SECUENCIAS = 3000
+    PASOS = 12
+
+    def test_tabla_igual_a_la_referencia(self):
+        estados_orden = list(estados.ORDEN.etiquetas)
+        for puede in (True, False):
+            contexto = estados.ContextoTransicion()
+            contexto._resultados['puede_cerrar'] = puede
+            for origen in estados_orden:
+                for destino in estados_orden:
+                    error = estados.ORDEN.error(origen, destino, contexto)
+                    if origen == destino:
+                        self.assertIsNone(error)
+                    else:
+                        self.assertEqual(error is None, _permitida(origen, destino, puede), (origen, destino, puede))
+                # destinos() ofrece exactamente lo que transicion() acepta
+                self.assertEqual(
+                    estados.ORDEN.destinos(origen),
+                    [destino for destino in estados_orden if estados.ORDEN.transicion(origen, destino)],
+                )
+
+    def test_recorridos_aleatorios(self):
+        azar = random.Random(2024)
+        estados_orden = list(estados.ORDEN.etiquetas)
+        for _ in range(self.SECUENCIAS):
+            contexto = estados.ContextoTransicion()
+            contexto._resultados['puede_cerrar'] = azar.random() < 0.5
+            actual, recorrido = OrdenServicio.ESTADO_NUEVA, [OrdenServicio.ESTADO_NUEVA]
+            for _ in range(self.PASOS):
+                destino = azar.choice(estados_orden)
+                if estados.ORDEN.error(actual, destino, contexto) is None and destino != actual:
+                    actual = destino
+                    recorrido.append(actual)
+            # Invariantes del recorrido completo
+            self.assertTrue(all(estado not in _FINALES for estado in recorrido[:-1]), recorrido)
+            if actual == OrdenServicio.ESTADO_ENTREGADA:
+                self.assertEqual(recorrido[-2], _FINALIZADA)
+            if actual == OrdenServicio.ESTADO_CANCELADA:
+                self.assertNotEqual(recorrido[-2], _FINALIZADA)
+            if not contexto.cumple(estados.PUEDE_CERRAR):
+                self.assertNotIn(actual, _FINALES)
+            self.assertNotIn(OrdenServicio.ESTADO_NUEVA, recorrido[1:])
+
+    def test_recorridos_aleatorios_en_la_base(self):
+        gerente = User.objects.create_superuser('gerente', password='x')
+        tecnico = User.objects.create_user('tecnico', password='x')
+        cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+        ordenes = [
+            OrdenServicio.objects.create(cliente=cliente, equipo=equipo, descripcion_falla=f'Falla {i}')
+            for i in range(8)
+        ]
+        azar = random.Random(7)
+        estados_orden = list(estados.ORDEN.etiquetas)
+        for _ in range(40):
+            destino = azar.choice(estados_orden)
+            usuario = azar.choice([gerente, tecnico])
+            if azar.random() < 0.5:
+                orden = OrdenServicio.objects.get(pk=azar.choice(ordenes).pk)
+                esperado = _permitida(orden.estado, destino, usuario == gerente)
+                try:
+                    estados.cambiar_estado(orden, destino, usuario)
+                    self.assertTrue(esperado or orden.estado == destino, (orden.estado, destino))
+                except ValidationError:
+                    self.assertFalse(esperado)
+            else:
+                ids = [orden.pk for orden in azar.sample(ordenes, 3)]
+                antes = dict(OrdenServicio.objects.filter(pk__in=ids).values_list('pk', 'estado'))
+                esperado = all(
+                    origen == destino or _permitida(origen, destino, usuario == gerente) for origen in antes.values()
+                )
+                try:
+                    estados.cambiar_estado_en_bloque(OrdenServicio.objects.filter(pk__in=ids), destino, usuario)
+                    self.assertTrue(esperado)
+                except ValidationError:
+                    self.assertFalse(esperado)
+                    # Todas o ninguna
+                    self.assertEqual(dict(OrdenServicio.objects.filter(pk__in=ids).values_list('pk', 'estado')), antes)
+
+        for orden in OrdenServicio.objects.filter(pk__in=[orden.pk for orden in ordenes]):
+            # fecha_cierre sólo (y siempre) en estados finales
+            self.assertEqual(orden.fecha_cierre is not None, orden.estado in _FINALES)
+            # Las transiciones forman una cadena desde Nueva hasta el estado actual
+            cadena = list(orden.transiciones.order_by('fecha', 'id'))
+            self.assertIsNone(cadena[0].estado_anterior)
+            for previa, siguiente in zip(cadena, cadena[1:]):
+                self.assertEqual(siguiente.estado_anterior, previa.estado_nuevo)
+                self.assertIsNotNone(siguiente.usuario_id)
+            self.assertEqual(cadena[-1].estado_nuevo, orden.estado)
+        self.assertEqual(kpis.diferencias(), {})
+
+    def test_cotizacion(self):
+        self.assertEqual(estados.COTIZACION.destinos(Cotizacion.ESTADO_PENDIENTE), [Cotizacion.ESTADO_ENVIADA])
+        self.assertEqual(
+            estados.COTIZACION.destinos(Cotizacion.ESTADO_ENVIADA),
+            [Cotizacion.ESTADO_AUTORIZADA, Cotizacion.ESTADO_RECHAZADA],
+        )
+        self.assertEqual(estados.COTIZACION.destinos(Cotizacion.ESTADO_AUTORIZADA), [])
+
+
+# --- ÍNDICES DEL LISTADO ---
+
+class IndicesTests(TestCase):
+
+    def test_verificar_indices(self):
+        call_command('verificar_indices', stdout=StringIO())
+
+    def test_recorrido_de_indice(self):
+        tabla = OrdenServicio._meta.db_table
+        recorrido = f"SCAN {tabla} USING COVERING INDEX orden_estado_fecha_idx"
+        self.assertEqual(escaneos_completos(f"SCAN {tabla}", 'sqlite', limitada=True), [tabla])
+        self.assertEqual(escaneos_completos(recorrido, 'sqlite'), [tabla])
+        # Con LIMIT el recorrido en orden se detiene al juntar la página...
+        self.assertEqual(escaneos_completos(recorrido, 'sqlite', limitada=True), [])
+        # ...salvo que haya que ordenar aparte
+        self.assertEqual(escaneos_completos(f"{recorrido}\nUSE TEMP B-TREE FOR ORDER BY", 'sqlite', limitada=True), [tabla])
+        self.assertEqual(escaneos_completos(f"SEARCH {tabla} USING INDEX orden_estado_fecha_idx (estado=?)", 'sqlite'), [])
+
+    def test_cursor_busca_desde_la_llave(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("EXPLAIN QUERY PLAN es de SQLite")
+        despues = codificar_cursor(timezone.now(), 5)
+        with CaptureQueriesContext(connection) as consultas:
+            list(PaginaCursor(OrdenServicio.objects.all(), 10, despues=despues))
+            list(PaginaCursor(OrdenServicio.objects.all(), 10, antes=despues))
+        for consulta in consultas.captured_queries:
+            plan = '\n'.join(fila[-1] for fila in connection.cursor().execute('EXPLAIN QUERY PLAN ' + consulta['sql']))
+            self.assertEqual(escaneos_completos(plan, connection.vendor), [], plan)
+
+    def test_filtro_de_fechas_en_hora_local(self):
+        cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+        orden = OrdenServicio.objects.create(cliente=cliente, equipo=equipo, descripcion_falla='Falla')
+        # 23:30 del 1 de marzo en hora local es ya 2 de marzo en UTC
+        creada = timezone.make_aware(datetime.datetime(2024, 3, 1, 23, 30))
+        OrdenServicio.objects.filter(pk=orden.pk).update(fecha_creacion=creada)
+
+        def ids(**params):
+            return list(filtrar_ordenes(OrdenServicio.objects.all(), params).values_list('pk', flat=True))
+
+        self.assertEqual(ids(fecha_inicio='2024-03-01', fecha_fin='2024-03-01'), [orden.pk])
+        self.assertEqual(ids(fecha_inicio='2024-03-02'), [])
+        self.assertEqual(ids(fecha_fin='2024-02-29'), [])
+        # Extremos del calendario: sin día siguiente, o antes del cambio de horario
+        self.assertEqual(ids(fecha_inicio='0001-01-01', fecha_fin='9999-12-31'), [orden.pk])
+        self.assertEqual(ids(fecha_inicio='9999-12-31'), [])
+
+    def test_tecnico_invalido_se_ignora(self):
+        sin_filtros = str(OrdenServicio.objects.all().query)
+        for valor in ['²', '٣', '-1', ' 1']:
+            self.assertEqual(str(filtrar_ordenes(OrdenServicio.objects.all(), {'tecnico': valor}).query), sin_filtros, valor)
+
+
+# --- DETALLE DE LA ORDEN ---
+
+class DetalleOrdenTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gerente = User.objects.create_superuser('gerente', password='x')
+        cls.tecnico = User.objects.create_user('tecnico1', password='x')
+        cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+        cls.vacia, cls.llena = [
+            OrdenServicio.objects.create(cliente=cliente, equipo=equipo, descripcion_falla='Falla')
+            for _ in range(2)
+        ]
+        BitacoraOrden.objects.filter(orden=cls.vacia).delete()
+        BitacoraOrden.objects.bulk_create(
+            BitacoraOrden(orden=cls.llena, usuario=(cls.gerente, cls.tecnico, None)[i % 3], descripcion=f'Nota {i}')
+            for i in range(200)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.gerente)
+
+    def test_consultas_no_dependen_de_la_bitacora(self):
+        self.client.get(reverse('detalle_orden', args=[self.vacia.pk]))
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('detalle_orden', args=[self.vacia.pk]))
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(len(consultas)):
+            response = self.client.get(reverse('detalle_orden', args=[self.llena.pk]))
+        self.assertEqual(len(response.context['bitacora_entradas']), 20)
+        self.assertTrue(response.context['bitacora_entradas'].has_next)
+
+    def _bitacora(self, **params):
+        response = self.client.get(reverse('bitacora_orden', args=[self.llena.pk]), {'formato': 'json', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_bitacora_fragmento_html(self):
+        response = self.client.get(reverse('bitacora_orden', args=[self.llena.pk]))
+        self.assertTemplateUsed(response, 'gestion_ordenes/bitacora_entradas.html')
+        self.assertContains(response, 'class="timeline-item"', count=20)
+        siguiente = response.context['entradas'].cursor_siguiente
+        self.assertContains(response, f'?despues={siguiente}')
+
+        # La última página no pide más
+        response = self.client.get(reverse('bitacora_orden', args=[self.vacia.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'timeline-item')
+        self.assertNotContains(response, 'bitacora-mas')
+
+    def test_bitacora_json_por_cursor(self):
+        esperadas = list(BitacoraOrden.objects.filter(orden=self.llena)
+                         .order_by('-fecha_hora', '-id').values_list('id', flat=True))
+        vistas, cursor, paginas = [], None, 0
+        while True:
+            datos = self._bitacora(**({'despues': cursor} if cursor else {}))
+            self.assertLessEqual(len(datos['entradas']), 20)
+            vistas += [entrada['id'] for entrada in datos['entradas']]
+            paginas += 1
+            cursor = datos['siguiente']
+            if cursor is None:
+                break
+        self.assertEqual(vistas, esperadas)
+        self.assertEqual(paginas, math.ceil(len(esperadas) / 20))
+
+        primera = self._bitacora()['entradas'][0]
+        self.assertEqual(set(primera), {'id', 'usuario', 'fecha_hora', 'descripcion', 'editado'})
+
+    def test_bitacora_cursor_invalido_da_la_primera_pagina(self):
+        primera = self._bitacora()
+        for cursor in ['basura', '!!!', 'MjAyNC0wMi0zMFQxMDowMHwx']:  # el último: 2024-02-30T10:00|1
+            self.assertEqual(self._bitacora(despues=cursor), primera, cursor)
+
+
+# --- TOTALES DE COTIZACIONES ---
+
+class TotalesCotizacionesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gerente = User.objects.create_superuser('gerente', password='x')
+        cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        cls.equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+        cls.orden = OrdenServicio.objects.create(cliente=cliente, equipo=cls.equipo, descripcion_falla='Falla')
+
+    def setUp(self):
+        self.client.force_login(self.gerente)
+
+    def _cotizacion(self, **datos):
+        return {
+            'concepto': 'Pantalla', 'tipo_cotizacion': Cotizacion.TIPO_COTIZACION_INTERNA,
+            'fuente_refaccion': Cotizacion.FUENTE_STOCK, 'costo_refacciones': '800.00', 'costo_mano_obra': '200.00',
+            **datos,
+        }
+
+    def test_crear_editar_eliminar(self):
+        self.client.post(reverse('crear_cotizacion', args=[self.orden.pk]), self._cotizacion())
+        cotizacion = self.orden.cotizaciones.get()
+        self.orden.refresh_from_db()
+        self.assertEqual(
+            (self.orden.total_autorizado, self.orden.total_pendiente, self.orden.num_cotizaciones,
+             self.orden.estado_ultima_cotizacion),
+            (0, 1000, 1, Cotizacion.ESTADO_PENDIENTE),
+        )
+
+        for estado in (Cotizacion.ESTADO_ENVIADA, Cotizacion.ESTADO_AUTORIZADA):
+            self.client.post(
+                reverse('editar_cotizacion', args=[self.orden.pk, cotizacion.pk]), self._cotizacion(estado=estado),
+            )
+        self.orden.refresh_from_db()
+        self.assertEqual((self.orden.total_autorizado, self.orden.total_pendiente), (1000, 0))
+        self.assertEqual(self.orden.estado_ultima_cotizacion, Cotizacion.ESTADO_AUTORIZADA)
+
+        self.client.post(reverse('eliminar_cotizacion', args=[self.orden.pk, cotizacion.pk]))
+        self.orden.refresh_from_db()
+        self.assertEqual((self.orden.total_autorizado, self.orden.num_cotizaciones), (0, 0))
+        self.assertIsNone(self.orden.estado_ultima_cotizacion)
+        self.assertEqual(totales.diferencias(), {})
+
+    def test_save_de_la_orden_no_pisa_los_totales(self):
+        cargada_antes = OrdenServicio.objects.get(pk=self.orden.pk)
+        Cotizacion.objects.create(
+            orden=self.orden, concepto='RAM', costo_refacciones=300, costo_mano_obra=0, estado=Cotizacion.ESTADO_AUTORIZADA,
+        )
+        cargada_antes.prioridad = OrdenServicio.PRIORIDAD_ALTA
+        cargada_antes.save()
+        self.orden.refresh_from_db()
+        self.assertEqual((self.orden.total_autorizado, self.orden.prioridad), (300, OrdenServicio.PRIORIDAD_ALTA))
+
+    def test_reconciliar_y_lista_por_monto(self):
+        # bulk_create no pasa por las señales: los totales quedan desfasados
+        ordenes = OrdenServicio.objects.bulk_create(
+            OrdenServicio(cliente=self.orden.cliente, equipo=self.equipo, descripcion_falla=f'Falla {i}') for i in range(3)
+        )
+        Cotizacion.objects.bulk_create(
+            Cotizacion(orden=orden, concepto='Disco', costo_refacciones=100 * (i + 1), costo_mano_obra=50,
+                       estado=Cotizacion.ESTADO_AUTORIZADA)
+            for i, orden in enumerate(ordenes)
+        )
+        self.assertEqual(set(totales.diferencias()), {orden.pk for orden in ordenes})
+        with self.assertRaises(CommandError):
+            call_command('reconciliar_totales', stdout=StringIO())
+        call_command('reconciliar_totales', reparar=True, stdout=StringIO())
+        self.assertEqual(totales.diferencias(), {})
+
+        response = self.client.get(reverse('lista_ordenes'), {'ordenar': 'monto', 'monto_min': '200'})
+        self.assertEqual([orden.pk for orden in response.context['page_obj']], [ordenes[2].pk, ordenes[1].pk])
+        self.assertFalse(response.context['modo_cursor'])
+
+
+# --- TRANSICIONES RECUPERADAS DE LA BITÁCORA ---
+
+class TransicionesTests(TestCase):
+
+    def test_interpretar(self):
+        N, D, R = OrdenServicio.ESTADO_NUEVA, OrdenServicio.ESTADO_DIAGNOSTICO, OrdenServicio.ESTADO_EN_REPARACION
+        self.assertEqual(transiciones.interpretar(f'Cambio de estado: {N} -> {D}'), (N, D))
+        self.assertEqual(transiciones.interpretar(f'Cambio de estado: {D} -> {R}  '), (D, R))
+        # Estado anterior desconocido: se deduce de la cadena al recuperar
+        self.assertEqual(transiciones.interpretar(f'Cambio de estado: Otro -> {D}'), (None, D))
+        self.assertEqual(transiciones.interpretar('*** ORDEN CERRADA - ESTADO: ENTREGADA ***'),
+                         (None, OrdenServicio.ESTADO_ENTREGADA))
+        for texto in [f'Cambio de estado: {N} -> Otro', '*** ORDEN CERRADA - ESTADO: OTRO ***',
+                      f'Nota: Cambio de estado: {N} -> {D}', '', None]:
+            self.assertIsNone(transiciones.interpretar(texto), texto)
+
+    def test_recuperar_dos_veces_no_duplica(self):
+        cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+        orden = OrdenServicio.objects.create(cliente=cliente, equipo=equipo, descripcion_falla='Falla')
+        # Como antes de que existiera la tabla: sólo queda el texto de la bitácora
+        OrdenEstadoTransicion.objects.all().delete()
+        creada = orden.fecha_creacion
+        textos = [
+            'Cambio de estado: Nueva -> En diagnóstico',
+            'Nota del técnico',
+            'Cambio de estado: En diagnóstico -> En reparación',
+            '*** ORDEN CERRADA - ESTADO: ENTREGADA ***',
+        ]
+        BitacoraOrden.objects.bulk_create(
+            BitacoraOrden(orden=orden, descripcion=texto, fecha_hora=creada + datetime.timedelta(hours=i + 1))
+            for i, texto in enumerate(textos)
+        )
+
+        self.assertEqual(transiciones.recuperar_de_bitacora(), (1, 4))
+        cadena = list(orden.transiciones.order_by('fecha', 'id').values_list('estado_anterior', 'estado_nuevo'))
+        self.assertEqual(cadena, [
+            (None, OrdenServicio.ESTADO_NUEVA),
+            (OrdenServicio.ESTADO_NUEVA, OrdenServicio.ESTADO_DIAGNOSTICO),
+            (OrdenServicio.ESTADO_DIAGNOSTICO, OrdenServicio.ESTADO_EN_REPARACION),
+            (OrdenServicio.ESTADO_EN_REPARACION, OrdenServicio.ESTADO_ENTREGADA),
+        ])
+        self.assertFalse(orden.transiciones.filter(recuperada=False).exists())
+
+        self.assertEqual(transiciones.recuperar_de_bitacora(), (0, 0))
+        self.assertEqual(orden.transiciones.count(), 4)
+
+
+# --- BITÁCORA ASÍNCRONA ---
+
+class BitacoraAsincronaTests(TransactionTestCase):
+    """El hilo escritor usa su propia conexión: necesita datos confirmados (TransactionTestCase)."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('tecnico', password='x')
+        cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+        self.orden = OrdenServicio.objects.create(cliente=cliente, equipo=equipo, descripcion_falla='Falla')
+        self.escritor = bitacora.EscritorBitacora(lote=3, intervalo=0.05)
+        self.addCleanup(self.escritor.detener)
+
+    @override_settings(BITACORA_ASINCRONA=True)
+    def test_solo_entradas_confirmadas_y_por_lotes(self):
+        with mock.patch.object(bitacora, 'escritor', self.escritor):
+            with transaction.atomic():
+                entrada = bitacora.registrar(self.orden, self.usuario, 'Confirmada')
+                # Todavía no está en la cola: espera al commit
+                self.assertIsNone(entrada.pk)
+            with self.assertRaises(ValueError), transaction.atomic():
+                bitacora.registrar(self.orden, self.usuario, 'Revertida')
+                raise ValueError
+            for i in range(4):
+                bitacora.registrar(self.orden, self.usuario, f'Lote {i}')
+            self.assertTrue(self.escritor.vaciar(timeout=5))
+
+        escritas = dict(BitacoraOrden.objects.values_list('descripcion', 'fecha_hora'))
+        self.assertEqual(set(escritas), {'Confirmada', 'Lote 0', 'Lote 1', 'Lote 2', 'Lote 3'})
+        # La hora es la del evento, no la de escritura
+        self.assertEqual(escritas['Confirmada'], entrada.fecha_hora)
+
+    def test_modo_sincrono(self):
+        with mock.patch.object(bitacora, 'escritor', self.escritor):
+            entrada = bitacora.registrar(self.orden, self.usuario, 'En el acto')
+        self.assertIsNotNone(entrada.pk)
+        self.assertIsNone(self.escritor._hilo)
+
+    @override_settings(BITACORA_ASINCRONA=True)
+    def test_error_al_escribir_no_detiene_el_hilo(self):
+        # Un receptor de bitacora_creada_en_bloque que falla revierte el lote: se reintenta una por una
+        with mock.patch.object(bitacora, 'escritor', self.escritor), \
+                mock.patch.object(bitacora.bitacora_creada_en_bloque, 'send', side_effect=RuntimeError('receptor')), \
+                self.assertLogs('gestion_ordenes.bitacora', 'ERROR'):
+            for i in range(3):
+                bitacora.registrar(self.orden, self.usuario, f'Lote {i}')
+            self.assertTrue(self.escritor.vaciar(timeout=5))
+        self.assertTrue(self.escritor._hilo.is_alive())
+
+        with mock.patch.object(bitacora, 'escritor', self.escritor):
+            bitacora.registrar(self.orden, self.usuario, 'Después')
+            self.assertTrue(self.escritor.vaciar(timeout=5))
+        self.assertEqual(set(BitacoraOrden.objects.values_list('descripcion', flat=True)),
+                         {'Lote 0', 'Lote 1', 'Lote 2', 'Después'})
+
+    @override_settings(BITACORA_ASINCRONA=True)
+    def test_si_el_hilo_muere_se_escribe_en_el_acto(self):
+        with mock.patch.object(bitacora, 'escritor', self.escritor), \
+                mock.patch.object(bitacora, 'time') as reloj, \
+                self.assertLogs('gestion_ordenes.bitacora', 'ERROR'):
+            reloj.monotonic.side_effect = RuntimeError('falla del hilo')
+            bitacora.registrar(self.orden, self.usuario, 'En cola')
+            self.escritor._hilo.join(5)
+            self.assertFalse(self.escritor._hilo.is_alive())
+
+            entrada = bitacora.registrar(self.orden, self.usuario, 'Sin hilo')
+            self.assertIsNotNone(entrada.pk)
+        # Lo que estaba en cola cuando murió el hilo también se escribió
+        self.assertEqual(set(BitacoraOrden.objects.values_list('descripcion', flat=True)), {'En cola', 'Sin hilo'})
+
+
+# --- BÚSQUEDA DE TEXTO ---
+
+class BusquedaTextoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gerente = User.objects.create_superuser('gerente', password='x')
+        cls.cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        cls.equipo = Equipo.objects.create(cliente=cls.cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+
+    def setUp(self):
+        self.client.force_login(self.gerente)
+
+    def _orden(self, falla='Falla'):
+        return OrdenServicio.objects.create(cliente=self.cliente, equipo=self.equipo, descripcion_falla=falla)
+
+    def _encontrados(self, query, **kwargs):
+        return {(resultado.tipo, resultado.objeto_id) for resultado in busqueda_texto.buscar(query, **kwargs)}
+
+    def test_senales_mantienen_el_indice(self):
+        orden = self._orden('Pantalla rota, no enciende')
+        nota = BitacoraOrden.objects.create(orden=orden, usuario=self.gerente, descripcion='Se cambia el inversor')
+        cotizacion = Cotizacion.objects.create(
+            orden=orden, concepto='Display 14 pulgadas', notas='Proveedor confirma existencia',
+            costo_refacciones=900, costo_mano_obra=300,
+        )
+        self.assertEqual(self._encontrados('no enciende'), {('falla', orden.pk)})
+        self.assertEqual(self._encontrados('inversor'), {('bitacora', nota.pk)})
+        self.assertEqual(self._encontrados('existencia'), {('cotizacion', cotizacion.pk)})
+        self.assertEqual(self._encontrados('inversor', tipos=['falla']), set())
+
+        orden.descripcion_falla = 'Bisagra rota'
+        orden.save()
+        nota.descripcion = 'Se cambia el flex de video'
+        nota.save()
+        self.assertEqual(self._encontrados('enciende'), set())
+        self.assertEqual(self._encontrados('inversor'), set())
+        self.assertEqual(self._encontrados('flex'), {('bitacora', nota.pk)})
+
+        cotizacion.delete()
+        self.assertEqual(self._encontrados('display'), set())
+        orden.delete()
+        self.assertEqual(self._encontrados('bisagra') | self._encontrados('flex'), set())
+
+    def test_acentos_como_normalizar_texto(self):
+        orden = self._orden('Diagnóstico: la batería no carga')
+        sin_acentos = self._orden('Diagnostico de teclado')
+        self.assertEqual(self._encontrados('DIAGNOSTICO bateria'), {('falla', orden.pk)})
+        self.assertEqual(self._encontrados('diagnóstico'), {('falla', orden.pk), ('falla', sin_acentos.pk)})
+
+        # Texto en NFD, ñ, mayúsculas con acento: plegar() da lo mismo que normalizar_texto()
+        texto = 'Año ÉXITO café Ünico — 100%'
+        self.assertEqual(busqueda_texto.plegar(texto), normalizar_texto(texto))
+
+    def test_relevancia_prefijo_y_fragmento(self):
+        orden = self._orden()
+        una_vez = BitacoraOrden.objects.create(
+            orden=orden, descripcion='Se revisa la bisagra junto con teclado, pantalla, batería y ventilador del equipo',
+        )
+        dos_veces = BitacoraOrden.objects.create(orden=orden, descripcion='Bisagra floja; bisagra nueva <pedida>')
+        self.assertEqual([r.objeto_id for r in busqueda_texto.buscar('bisagra')], [dos_veces.pk, una_vez.pk])
+
+        self.assertEqual(self._encontrados('bisag'), set())
+        self.assertEqual(self._encontrados('bisag*'), {('bitacora', una_vez.pk), ('bitacora', dos_veces.pk)})
+
+        fragmento = busqueda_texto.fragmento(dos_veces.descripcion, busqueda_texto.consulta('bisagra'))
+        self.assertEqual(fragmento, '<mark>Bisagra</mark> floja; <mark>bisagra</mark> nueva &lt;pedida&gt;')
+        fragmento = busqueda_texto.fragmento('Batería dañada', busqueda_texto.consulta('bateria'))
+        self.assertEqual(fragmento, '<mark>Batería</mark> dañada')
+
+    def test_bitacora_en_bloque_y_reconstruir(self):
+        orden = self._orden()
+        acciones_masivas.aplicar(
+            acciones_masivas.ACCION_PRIORIDAD, [orden.pk], self.gerente, OrdenServicio.PRIORIDAD_ALTA,
+        )
+        self.assertEqual(len(busqueda_texto.buscar('edicion administrativa prioridad')), 1)
+
+        # bulk_create no pasa por las señales: lo corrige el comando
+        BitacoraOrden.objects.bulk_create([BitacoraOrden(orden=orden, descripcion='Respaldo de información')])
+        self.assertEqual(self._encontrados('respaldo'), set())
+        salida = StringIO()
+        call_command('reconstruir_busqueda_texto', stdout=salida)
+        self.assertEqual(len(self._encontrados('respaldo')), 1)
+        self.assertIn('documentos', salida.getvalue())
+
+    def test_vista(self):
+        orden = self._orden('No enciende <b>nada</b>')
+        Cotizacion.objects.create(orden=orden, concepto='Fuente que no enciende', costo_refacciones=500, costo_mano_obra=0)
+        response = self.client.get(reverse('buscar_texto_ordenes'), {'q': 'enciende'})
+        self.assertEqual(len(response.context['resultados']), 2)
+        self.assertContains(response, 'No <mark>enciende</mark> &lt;b&gt;nada&lt;/b&gt;', html=False)
+        self.assertContains(response, reverse('detalle_orden', args=[orden.pk]))
+
+        response = self.client.get(reverse('buscar_texto_ordenes'), {'q': 'enciende', 'en': 'cotizacion'})
+        self.assertEqual([r['tipo'] for r in response.context['resultados']], ['Cotización'])
@@ -0,0 +1,101 @@
+"""
+Totales de cotizaciones guardados en cada OrdenServicio: total autorizado,
+total pendiente (cotizaciones pendientes o enviadas), número de cotizaciones
+y estado de la más reciente.
+
+Así lista_ordenes, la exportación y los detalles leen columnas de la orden
+(filtrables y ordenables por índice) en lugar de agregar Cotizacion.
+
+Las señales de Cotizacion (gestion_ordenes/signals.py) llaman a recalcular()
+en la misma transacción que la modificó. recalcular() vuelve a calcular los
+totales desde las cotizaciones con un solo UPDATE (no suma ni resta deltas),
+así que un desfase no se arrastra. Lo que no pasa por las señales
+(bulk_create, update() masivos) se corrige con reconciliar(), que usa el
+comando reconciliar_totales.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Cotizacion, OrdenServicio
+
+CAMPOS = OrdenServicio.CAMPOS_TOTALES
+ESTADOS_PENDIENTES = [Cotizacion.ESTADO_PENDIENTE, Cotizacion.ESTADO_ENVIADA]
+TAMANO_BLOQUE = 2000
+CENTAVO = Decimal('0.01')
+
+_MONTO = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _por_orden(**filtros):
+    return Cotizacion.objects.filter(orden=OuterRef('pk'), **filtros).order_by().values('orden')
+
+
+def _suma(estados):
+    totales = _por_orden(estado__in=estados).annotate(
+        total=Sum(F('costo_refacciones') + F('costo_mano_obra'))
+    ).values('total')
+    return Coalesce(Subquery(totales, output_field=_MONTO), Value(Decimal('0.00')), output_field=_MONTO)
+
+
+def en_vivo():
+    """{campo: expresión} con el valor de cada total calculado desde Cotizacion (subconsultas correlacionadas)."""
+    return {
+        'total_autorizado': _suma([Cotizacion.ESTADO_AUTORIZADA]),
+        'total_pendiente': _suma(ESTADOS_PENDIENTES),
+        'num_cotizaciones': Coalesce(
+            Subquery(_por_orden().annotate(n=Count('id')).values('n'), output_field=IntegerField()), 0,
+        ),
+        'estado_ultima_cotizacion': Subquery(
+            Cotizacion.objects.filter(orden=OuterRef('pk')).order_by('-fecha_creacion', '-id').values('estado')[:1]
+        ),
+    }
+
+
+def recalcular(*orden_ids):
+    """Recalcula los totales de las órdenes indicadas desde sus cotizaciones."""
+    orden_ids = [orden_id for orden_id in orden_ids if orden_id is not None]
+    if not orden_ids:
+        return
+    with transaction.atomic():
+        # Bloquea las órdenes: dos cambios simultáneos a sus cotizaciones se
+        # aplican en serie y el segundo ve lo que escribió el primero
+        list(OrdenServicio.objects.select_for_update().filter(pk__in=orden_ids).order_by('pk').values_list('pk'))
+        OrdenServicio.objects.filter(pk__in=orden_ids).update(**en_vivo())
+
+
+# --- RECONCILIACIÓN ---
+
+def _normalizar(valor):
+    # En SQLite las sumas de la subconsulta llegan con residuos de punto flotante
+    return valor.quantize(CENTAVO) if isinstance(valor, Decimal) else valor
+
+
+def diferencias(tamano_bloque=TAMANO_BLOQUE):
+    """{orden_id: {campo: (guardado, en_vivo)}} de las órdenes cuyos totales no cuadran."""
+    vivo = {f'vivo_{campo}': expresion for campo, expresion in en_vivo().items()}
+    filas = OrdenServicio.objects.order_by('pk').values('pk', *CAMPOS, **vivo)
+    desfasadas = {}
+    for fila in filas.iterator(chunk_size=tamano_bloque):
+        distintos = {
+            campo: (fila[campo], _normalizar(fila[f'vivo_{campo}']))
+            for campo in CAMPOS if _normalizar(fila[campo]) != _normalizar(fila[f'vivo_{campo}'])
+        }
+        if distintos:
+            desfasadas[fila['pk']] = distintos
+    return desfasadas
+
+
+def reconciliar(orden_ids=None, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Recalcula los totales de `orden_ids` (o de todas las órdenes), en bloques
+    de `tamano_bloque`. Devuelve cuántas órdenes se recalcularon.
+    """
+    if orden_ids is None:
+        orden_ids = OrdenServicio.objects.order_by('pk').values_list('pk', flat=True)
+    orden_ids = list(orden_ids)
+    for inicio in range(0, len(orden_ids), tamano_bloque):
+        OrdenServicio.objects.filter(pk__in=orden_ids[inicio:inicio + tamano_bloque]).update(**en_vivo())
+    return len(orden_ids)
@@ -0,0 +1,145 @@
+"""
+Recuperación de OrdenEstadoTransicion a partir del texto de la bitácora.
+
+Antes de que existiera la tabla, los cambios de estado sólo quedaban como
+texto en BitacoraOrden, escrito por actualizar_estado_orden y por el cierre
+en editar_orden:
+
+    "Cambio de estado: En diagnóstico -> En reparación"
+    "*** ORDEN CERRADA - ESTADO: ENTREGADA ***"
+
+Por cada orden se recupera el estado inicial (en fecha_creacion) y cada cambio
+anterior a su primera transición registrada, así que correrlo de nuevo no
+duplica nada. El técnico de las transiciones recuperadas es el asignado hoy:
+la bitácora no guarda el técnico de cada momento de forma confiable.
+"""
+import itertools
+import re
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import BitacoraOrden, OrdenEstadoTransicion, OrdenServicio
+
+TAMANO_LOTE = 5000
+
+_CAMBIO = re.compile(r'^Cambio de estado: (?P<anterior>.+?) -> (?P<nuevo>.+?)\s*$')
+_CIERRE = re.compile(r'^\*\*\* ORDEN CERRADA - ESTADO: (?P<nuevo>.+?) \*\*\*\s*$')
+_PREFIJOS = ('Cambio de estado:', '*** ORDEN CERRADA')
+
+_ESTADOS = {estado for estado, _ in OrdenServicio.ESTADO_OPCIONES}
+# El cierre escribe el estado en mayúsculas
+_ESTADOS_CIERRE = {estado.upper(): estado for estado in _ESTADOS}
+
+
+def interpretar(texto):
+    """(anterior, nuevo) de una entrada de cambio de estado, o None si no lo es."""
+    texto = texto or ''
+    coincidencia = _CAMBIO.match(texto)
+    if coincidencia:
+        anterior, nuevo = coincidencia.group('anterior', 'nuevo')
+        if nuevo in _ESTADOS:
+            return (anterior if anterior in _ESTADOS else None), nuevo
+        return None
+    coincidencia = _CIERRE.match(texto)
+    if coincidencia and coincidencia.group('nuevo') in _ESTADOS_CIERRE:
+        return None, _ESTADOS_CIERRE[coincidencia.group('nuevo')]
+    return None
+
+
+def _cambios_en_bitacora():
+    """
+    Entradas de cambio de estado ordenadas por orden y fecha, agrupadas por
+    orden: (orden_id, [(fecha, anterior, nuevo), ...]).
+    Si la entrada se editó, vale el texto original.
+    """
+    filtro = Q()
+    for prefijo in _PREFIJOS:
+        filtro |= Q(descripcion__startswith=prefijo) | Q(contenido_original__startswith=prefijo)
+    entradas = BitacoraOrden.objects.filter(filtro).order_by('orden_id', 'fecha_hora', 'id').values_list(
+        'orden_id', 'fecha_hora', 'descripcion', 'contenido_original'
+    ).iterator(chunk_size=TAMANO_LOTE)
+
+    for orden_id, grupo in itertools.groupby(entradas, key=lambda entrada: entrada[0]):
+        cambios = []
+        for _, fecha, descripcion, original in grupo:
+            cambio = interpretar(original or descripcion)
+            if cambio:
+                cambios.append((fecha, *cambio))
+        yield orden_id, cambios
+
+
+def _primeras_registradas():
+    """{orden_id: (fecha, estado_anterior)} de la primera transición ya guardada de cada orden."""
+    primeras = {}
+    for orden_id, fecha, anterior in OrdenEstadoTransicion.objects.order_by('orden_id', 'fecha', 'id').values_list(
+        'orden_id', 'fecha', 'estado_anterior'
+    ).iterator(chunk_size=TAMANO_LOTE):
+        primeras.setdefault(orden_id, (fecha, anterior))
+    return primeras
+
+
+def _transiciones_de(orden, cambios, primera):
+    orden_id, fecha_creacion, tecnico_id = orden
+    if primera:
+        fecha_limite, anterior_registrado = primera
+        if anterior_registrado is None:
+            return []  # ya tiene su estado inicial: historia completa
+        cambios = [cambio for cambio in cambios if cambio[0] < fecha_limite]
+
+    if cambios and cambios[0][1]:
+        estado = cambios[0][1]
+    elif primera and not cambios:
+        estado = primera[1]
+    else:
+        # Las órdenes se crean como "Nueva" (crear_orden)
+        estado = OrdenServicio.ESTADO_NUEVA
+
+    nuevas = [OrdenEstadoTransicion(
+        orden_id=orden_id, estado_anterior=None, estado_nuevo=estado,
+        fecha=fecha_creacion, tecnico_id=tecnico_id, recuperada=True,
+    )]
+    for fecha, anterior, nuevo in cambios:
+        nuevas.append(OrdenEstadoTransicion(
+            orden_id=orden_id, estado_anterior=anterior or estado, estado_nuevo=nuevo,
+            fecha=fecha, tecnico_id=tecnico_id, recuperada=True,
+        ))
+        estado = nuevo
+    return nuevas
+
+
+def recuperar_de_bitacora():
+    """
+    Crea las transiciones que faltan a partir de la bitácora. Recorre órdenes y
+    bitácora en paralelo (ambas ordenadas por orden) e inserta por lotes.
+    Devuelve (órdenes completadas, transiciones creadas).
+    """
+    primeras = _primeras_registradas()
+    cambios_por_orden = _cambios_en_bitacora()
+    pendiente = next(cambios_por_orden, None)
+
+    ordenes = OrdenServicio.objects.order_by('id').values_list(
+        'id', 'fecha_creacion', 'tecnico_asignado_id'
+    ).iterator(chunk_size=TAMANO_LOTE)
+
+    completadas = creadas = 0
+    lote = []
+    with transaction.atomic():
+        for orden in ordenes:
+            # Entradas de órdenes que ya no existen no pueden quedar; por si acaso se saltan
+            while pendiente and pendiente[0] < orden[0]:
+                pendiente = next(cambios_por_orden, None)
+            cambios = []
+            if pendiente and pendiente[0] == orden[0]:
+                cambios = pendiente[1]
+                pendiente = next(cambios_por_orden, None)
+
+            nuevas = _transiciones_de(orden, cambios, primeras.get(orden[0]))
+            if nuevas:
+                completadas += 1
+                lote.extend(nuevas)
+            if len(lote) >= TAMANO_LOTE:
+                creadas += len(OrdenEstadoTransicion.objects.bulk_create(lote))
+                lote = []
+        creadas += len(OrdenEstadoTransicion.objects.bulk_create(lote))
+    return completadas, creadas
@@ -5,6 +5,12 @@ urlpatterns = [
     # UI-OM-01: Lista general de órdenes
     path('', views.lista_ordenes, name='lista_ordenes'),
 
+    # Acciones en bloque desde la lista (técnico, prioridad, estado)
+    path('acciones-masivas/', views.acciones_masivas_ordenes, name='acciones_masivas_ordenes'),
+
+    # Búsqueda de texto en fallas, bitácora y cotizaciones
+    path('buscar/', views.buscar_texto_ordenes, name='buscar_texto_ordenes'),
+
     # UI-OM-03: Formulario de creación de orden
     path('crear/', views.crear_orden, name='crear_orden'),
 
@@ -36,6 +42,7 @@ urlpatterns = [
     path('orden/<int:orden_id>/estado/', views.actualizar_estado_orden, name='actualizar_estado_orden'),
 
     # Gestión de Bitácora
+    path('orden/<int:orden_id>/bitacora/', views.bitacora_orden, name='bitacora_orden'),
     path('orden/<int:orden_id>/bitacora/<int:entrada_id>/editar/', views.editar_bitacora, name='editar_bitacora'),
     path('orden/<int:orden_id>/bitacora/<int:entrada_id>/eliminar/', views.eliminar_bitacora, name='eliminar_bitacora'),
 ]
\ No newline at end of file
@@ -1,99 +1,127 @@
-import unicodedata
+import functools
+from urllib.parse import parse_qsl
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.views.decorators.http import require_POST
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
-from django.utils.dateparse import parse_date
 from django.utils import timezone
 from django.db import transaction
 from django.forms import inlineformset_factory
+from django.utils.http import urlencode
+from django.urls import reverse
 
 from gestion_clientes.models import Cliente, Equipo
+from gestion_clientes.autocompletado import buscar_clientes
+from sistema_crm_pacscomputacion.metricas import presupuesto_consultas
+from sistema_crm_pacscomputacion.replicas import lectura_en_replica
 from catalogo.models import TipoServicio
+from reportes.exportacion import puede_exportar
 from .models import OrdenServicio, BitacoraOrden, Cotizacion, Transferencia, ItemTransferido
+from . import acciones_masivas, bitacora, busqueda_texto, estados
+from .filtros import FILTROS_ORDENES, ORDENAMIENTOS_ORDENES, filtrar_ordenes, ordenar_ordenes
+from .paginacion import PaginaCursor, conteo_aproximado
 from .forms import (
     BitacoraForm, CotizacionForm, 
     TransferenciaForm, ItemTransferidoForm
 )
 
-# --- UTILIDADES ---
-def normalizar_texto(texto):
-    if not texto:
-        return ''
-    return ''.join(c for c in unicodedata.normalize('NFD', str(texto).lower()) if unicodedata.category(c) != 'Mn')
+BITACORA_POR_PAGINA = 20
+ETIQUETAS_CIERRE = {OrdenServicio.ESTADO_ENTREGADA: 'Entregada al Cliente'}
 
 # --- VISTAS GENERALES ---
 
 @login_required
+@lectura_en_replica
+@presupuesto_consultas(10)
 def lista_ordenes(request):
-    ordenes = OrdenServicio.objects.all().select_related('cliente', 'tecnico_asignado', 'equipo').order_by('-fecha_creacion')
-    filtro_estado = request.GET.get('estado')
-    filtro_tecnico = request.GET.get('tecnico')
-    filtro_prioridad = request.GET.get('prioridad')
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-
-    if filtro_estado:
-        ordenes = ordenes.filter(estado=filtro_estado)
-    if filtro_tecnico:
-        ordenes = ordenes.filter(tecnico_asignado__id=filtro_tecnico)
-    if filtro_prioridad:
-        ordenes = ordenes.filter(prioridad=filtro_prioridad)
-    if fecha_inicio:
-        ordenes = ordenes.filter(fecha_creacion__date__gte=parse_date(fecha_inicio))
-    if fecha_fin:
-        ordenes = ordenes.filter(fecha_creacion__date__lte=parse_date(fecha_fin))
-
-    paginator = Paginator(ordenes, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    """
+    UI-OM-01: Lista general de órdenes con filtros.
+    Con ?modo=cursor pagina por (fecha_creacion, id) en lugar de número de
+    página, para que las páginas profundas cuesten lo mismo que la primera.
+    Ordenada por monto (?ordenar=monto) se pagina por número de página.
+    """
+    ordenes = OrdenServicio.objects.all().select_related('cliente', 'tecnico_asignado', 'equipo')
+    ordenes = ordenar_ordenes(filtrar_ordenes(ordenes, request.GET), request.GET)
+
+    # Filtros activos como query string, para armar los enlaces de paginación
+    filtros_query = urlencode({k: request.GET[k] for k in FILTROS_ORDENES if request.GET.get(k)})
+
+    # El cursor es (fecha_creacion, id): sólo sirve con el orden por fecha
+    modo_cursor = request.GET.get('modo') == 'cursor' and not request.GET.get('ordenar')
+    if modo_cursor:
+        page_obj = PaginaCursor(
+            ordenes, 10,
+            despues=request.GET.get('despues'),
+            antes=request.GET.get('antes'),
+        )
+        total_aproximado = conteo_aproximado(ordenes, filtros_query)
+    else:
+        paginator = Paginator(ordenes, 10)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
+        total_aproximado = None
 
     tecnicos = User.objects.filter(groups__name='Técnico') 
     
     context = {
         'page_obj': page_obj,
-        'tecnicos': tecnicos,
-        'estados': OrdenServicio.ESTADO_OPCIONES,
-        'prioridades': OrdenServicio.PRIORIDAD_OPCIONES,
-        'current_filters': request.GET
+        'modo_cursor': modo_cursor,
+        'total_aproximado': total_aproximado,
+        'filtros_query': filtros_query,
+        'tecnicos_list': tecnicos,
+        'estados_opciones': OrdenServicio.ESTADO_OPCIONES,
+        'prioridades_opciones': OrdenServicio.PRIORIDAD_OPCIONES,
+        'ordenamientos': [(clave, etiqueta) for clave, (etiqueta, _) in ORDENAMIENTOS_ORDENES.items()],
+        'current_filters': request.GET,
+        'acciones_masivas': acciones_masivas,
+        # Se evalúa al mostrar los botones de exportación
+        'puede_exportar': functools.partial(puede_exportar, request.user),
     }
     return render(request, 'gestion_ordenes/lista_ordenes.html', context)
 
+@login_required
+@permission_required('gestion_ordenes.change_ordenservicio', raise_exception=True)
+@require_POST
+def acciones_masivas_ordenes(request):
+    """
+    Asigna técnico, cambia prioridad o cambia estado de las órdenes marcadas
+    en lista_ordenes, todas en una transacción (ver acciones_masivas).
+    """
+    accion = request.POST.get('accion')
+    # Cada botón de la barra de acciones manda su propio select
+    valor = request.POST.get({
+        acciones_masivas.ACCION_TECNICO: 'tecnico_asignado',
+        acciones_masivas.ACCION_PRIORIDAD: 'prioridad',
+        acciones_masivas.ACCION_ESTADO: 'estado',
+    }.get(accion, ''), '')
+    try:
+        modificadas = acciones_masivas.aplicar(accion, request.POST.getlist('ordenes'), request.user, valor)
+    except ValidationError as error:
+        for mensaje in error.messages:
+            messages.error(request, mensaje)
+    else:
+        if modificadas:
+            messages.success(request, f"{acciones_masivas.ACCIONES[accion]}: {modificadas} órdenes actualizadas.")
+        else:
+            messages.info(request, "Las órdenes seleccionadas ya tenían ese valor.")
+
+    # De vuelta a la misma página y filtros de la lista
+    siguiente = request.POST.get('siguiente', '')
+    return redirect(reverse('lista_ordenes') + (f'?{urlencode(dict(parse_qsl(siguiente)))}' if siguiente else ''))
+
 @login_required
 def buscar_cliente_api(request):
+    """
+    Autocompletado de clientes (nombre o teléfono) para crear_orden.
+    Busca en toda la base y devuelve una lista acotada con sus equipos.
+    """
     query = request.GET.get('q', '').strip()
-    if len(query) < 3:
-        return JsonResponse({'resultados': []})
-    
-    q_norm = normalizar_texto(query)
-    todos = Cliente.objects.all()[:50] 
-    resultados = []
-
-    for c in todos:
-        if (q_norm in normalizar_texto(c.nombre_completo) or 
-            q_norm in normalizar_texto(c.telefono)):
-            
-            equipos_data = []
-            for eq in c.equipos.all():
-                equipos_data.append({
-                    'id': eq.id,
-                    'tipo_equipo': eq.get_tipo_equipo_display(),
-                    'marca': eq.marca,
-                    'modelo': eq.modelo,
-                    'numero_serie': eq.numero_serie
-                })
-
-            resultados.append({
-                'id': c.id,
-                'nombre': c.nombre_completo,
-                'telefono': c.telefono,
-                'equipos': equipos_data
-            })
-    
-    return JsonResponse({'resultados': resultados})
+    return JsonResponse({'resultados': buscar_clientes(query)})
 
 @login_required
 def crear_orden(request):
@@ -141,11 +169,7 @@ def crear_orden(request):
                 
                 orden.save()
                 
-                BitacoraOrden.objects.create(
-                    orden=orden,
-                    usuario=request.user,
-                    descripcion="Orden creada exitosamente."
-                )
+                bitacora.registrar(orden, request.user, "Orden creada exitosamente.")
 
                 messages.success(request, f'Orden #{orden.id} creada exitosamente.')
                 return redirect('detalle_orden', orden_id=orden.id)
@@ -165,31 +189,36 @@ def crear_orden(request):
     return render(request, 'gestion_ordenes/crear_orden.html', context)
 
 @login_required
+@presupuesto_consultas(15)
 def detalle_orden(request, orden_id):
-    orden = get_object_or_404(OrdenServicio, pk=orden_id)
+    # con_detalle() precarga cotizaciones, transferencias y servicios
+    orden = get_object_or_404(OrdenServicio.objects.con_detalle(), pk=orden_id)
     es_cerrada = (orden.fecha_cierre is not None)
     
     bitacora_form = BitacoraForm()
     
-    cotizaciones = orden.cotizaciones.all().order_by('-fecha_creacion')
-    transferencias = orden.transferencias.all().order_by('-fecha_transferencia')
+    # Sólo las notas más recientes; las anteriores se cargan al hacer scroll
+    bitacora_entradas = PaginaCursor(orden.bitacora.select_related('usuario'), BITACORA_POR_PAGINA, campo='fecha_hora')
+
+    # .all() sobre relaciones precargadas no vuelve a consultar la BD
+    cotizaciones = orden.cotizaciones.all()
+    transferencias = orden.transferencias.all()
     servicios_aplicados = orden.servicios.all()
     
     # CORRECCIÓN: Agregar catálogo de servicios al contexto
     servicios_catalogo = TipoServicio.objects.all().order_by('nombre_servicio')
     
-    total_cotizado = sum(
-        c.costo_total for c in cotizaciones 
-        if c.estado == Cotizacion.ESTADO_AUTORIZADA
-    )
-    
+    # Lo mantienen las señales de Cotizacion (totales.py)
+    total_cotizado = orden.total_autorizado
+
     if request.method == 'POST' and 'btn_bitacora' in request.POST:
         form = BitacoraForm(request.POST)
         if form.is_valid():
-            bitacora = form.save(commit=False)
-            bitacora.orden = orden
-            bitacora.usuario = request.user
-            bitacora.save()
+            # Las notas del usuario se guardan en el acto (no pasan por bitacora.registrar)
+            nota = form.save(commit=False)
+            nota.orden = orden
+            nota.usuario = request.user
+            nota.save()
             messages.success(request, 'Nota agregada a la bitácora.')
             return redirect('detalle_orden', orden_id=orden.id)
 
@@ -197,14 +226,77 @@ def detalle_orden(request, orden_id):
         'orden': orden,
         'es_cerrada': es_cerrada,
         'bitacora_form': bitacora_form,
+        'bitacora_entradas': bitacora_entradas,
         'cotizaciones': cotizaciones,
         'transferencias': transferencias,
         'servicios_aplicados': servicios_aplicados,
         'servicios_catalogo': servicios_catalogo, # Ahora sí disponible
-        'total_cotizado': total_cotizado
+        'total_cotizado': total_cotizado,
+        # El cierre (Entregada / Cancelada) se hace desde editar_orden
+        'estados_siguientes': estados.ORDEN.destinos(orden.estado, cierra=False),
     }
     return render(request, 'gestion_ordenes/detalle_orden.html', context)
 
+@login_required
+@presupuesto_consultas(8)
+def bitacora_orden(request, orden_id):
+    """
+    Página de la bitácora de una orden, de la más reciente a la más antigua,
+    a partir del cursor ?despues=. Por defecto devuelve el fragmento HTML que
+    detalle_orden.html inserta al hacer scroll; con ?formato=json, los datos.
+    """
+    orden = get_object_or_404(OrdenServicio, pk=orden_id)
+    entradas = PaginaCursor(
+        orden.bitacora.select_related('usuario'), BITACORA_POR_PAGINA,
+        despues=request.GET.get('despues'), campo='fecha_hora',
+    )
+
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({
+            'entradas': [{
+                'id': evento.id,
+                'usuario': evento.usuario.username if evento.usuario else None,
+                'fecha_hora': evento.fecha_hora.isoformat(),
+                'descripcion': evento.descripcion,
+                'editado': evento.editado,
+            } for evento in entradas],
+            'siguiente': entradas.cursor_siguiente,
+        })
+
+    return render(request, 'gestion_ordenes/bitacora_entradas.html', {'orden': orden, 'entradas': entradas})
+
+@login_required
+@presupuesto_consultas(8)
+def buscar_texto_ordenes(request):
+    """
+    Búsqueda de texto completo en fallas, bitácora y cotizaciones (?q=; con *
+    al final, la última palabra es prefijo).
+    ?en= limita a un tipo de documento. Resultados por relevancia, con el
+    fragmento donde aparecen las palabras buscadas.
+    """
+    query = request.GET.get('q', '').strip()
+    tipo = request.GET.get('en', '')
+    encontrados = busqueda_texto.buscar(query, tipos=[tipo] if tipo in busqueda_texto.TIPOS else None)
+
+    ordenes = OrdenServicio.objects.select_related('cliente', 'equipo').in_bulk(
+        {resultado.orden_id for resultado in encontrados}
+    )
+    consulta = busqueda_texto.consulta(query)
+    resultados = [
+        {
+            'orden': ordenes[resultado.orden_id],
+            'tipo': busqueda_texto.TIPOS[resultado.tipo],
+            'fragmento': busqueda_texto.fragmento(resultado.texto, consulta),
+        }
+        for resultado in encontrados if resultado.orden_id in ordenes
+    ]
+    return render(request, 'gestion_ordenes/buscar_texto.html', {
+        'query': query,
+        'tipo': tipo,
+        'tipos': busqueda_texto.TIPOS,
+        'resultados': resultados,
+    })
+
 # --- VISTA DE EDICIÓN ---
 
 @login_required
@@ -259,10 +351,7 @@ def editar_orden(request, orden_id):
 
             if cambios:
                 orden.save()
-                BitacoraOrden.objects.create(
-                    orden=orden, usuario=request.user, 
-                    descripcion=f"Edición administrativa: {', '.join(cambios)}"
-                )
+                bitacora.registrar(orden, request.user, f"Edición administrativa: {', '.join(cambios)}")
                 messages.success(request, f"Detalles de la orden #{orden.id} actualizados.")
             else:
                 messages.info(request, "No se detectaron cambios en los detalles.")
@@ -270,34 +359,27 @@ def editar_orden(request, orden_id):
             return redirect('lista_ordenes')
 
         elif accion == 'cerrar_orden':
-            user_groups = request.user.groups.values_list('name', flat=True)
-            if not ('Gerente Servicio' in user_groups or 'Asistente Recepción' in user_groups or request.user.is_superuser):
-                messages.error(request, "No tienes permisos para cerrar órdenes.")
-                return redirect('editar_orden', orden_id=orden.id)
-
+            # La máquina de estados valida permiso y origen (sólo se entrega lo finalizado)
             nuevo_estado = request.POST.get('estado_cierre')
-            if nuevo_estado == OrdenServicio.ESTADO_ENTREGADA and not es_finalizada:
-                messages.error(request, "No se puede entregar. El técnico no ha finalizado.")
-            elif nuevo_estado == OrdenServicio.ESTADO_CANCELADA and es_finalizada:
-                messages.error(request, "No se puede cancelar. El servicio ya fue realizado.")
-            elif nuevo_estado in [OrdenServicio.ESTADO_ENTREGADA, OrdenServicio.ESTADO_CANCELADA]:
-                with transaction.atomic():
-                    orden.estado = nuevo_estado
-                    orden.fecha_cierre = timezone.now()
-                    orden.save()
-                    BitacoraOrden.objects.create(
-                        orden=orden, usuario=request.user,
-                        descripcion=f"*** ORDEN CERRADA - ESTADO: {nuevo_estado.upper()} ***"
-                    )
-                messages.success(request, f"Orden #{orden.id} cerrada exitosamente ({nuevo_estado}).")
-                return redirect('lista_ordenes')
+            if nuevo_estado not in estados.ORDEN.finales:
+                messages.error(request, "Selecciona un estado de cierre válido.")
+                return redirect('editar_orden', orden_id=orden.id)
+            try:
+                estados.cambiar_estado(orden, nuevo_estado, request.user)
+            except ValidationError as error:
+                messages.error(request, ' '.join(error.messages))
+                return redirect('editar_orden', orden_id=orden.id)
+            messages.success(request, f"Orden #{orden.id} cerrada exitosamente ({nuevo_estado}).")
+            return redirect('lista_ordenes')
 
     if orden.contrasena_equipo:
          orden.contrasena_equipo = orden.equipo.get_password()
 
     tecnicos_list = User.objects.filter(groups__name='Técnico')
     prioridades = OrdenServicio.PRIORIDAD_OPCIONES
-    estados_cierre = [(OrdenServicio.ESTADO_ENTREGADA, 'Entregada al Cliente')] if es_finalizada else [(OrdenServicio.ESTADO_CANCELADA, 'Cancelada')]
+    estados_cierre = [
+        (estado, ETIQUETAS_CIERRE.get(estado, estado)) for estado in estados.ORDEN.destinos(orden.estado, cierra=True)
+    ]
 
     return render(request, 'gestion_ordenes/editar_orden.html', {
         'orden': orden, 'tecnicos_list': tecnicos_list, 'prioridades': prioridades,
@@ -327,10 +409,7 @@ def agregar_servicio_orden(request, orden_id):
         if servicio_id:
             servicio = get_object_or_404(TipoServicio, pk=servicio_id)
             orden.servicios.add(servicio)
-            BitacoraOrden.objects.create(
-                orden=orden, usuario=request.user,
-                descripcion=f"Se agregó servicio: {servicio.nombre_servicio}"
-            )
+            bitacora.registrar(orden, request.user, f"Se agregó servicio: {servicio.nombre_servicio}")
             messages.success(request, 'Servicio agregado.')
         return redirect('detalle_orden', orden_id=orden.id)
     
@@ -343,10 +422,7 @@ def eliminar_servicio_orden(request, orden_id, servicio_id):
     
     servicio = get_object_or_404(TipoServicio, pk=servicio_id)
     orden.servicios.remove(servicio)
-    BitacoraOrden.objects.create(
-        orden=orden, usuario=request.user,
-        descripcion=f"Se eliminó servicio: {servicio.nombre_servicio}"
-    )
+    bitacora.registrar(orden, request.user, f"Se eliminó servicio: {servicio.nombre_servicio}")
     messages.warning(request, 'Servicio eliminado de la orden.')
     return redirect('detalle_orden', orden_id=orden.id)
 
@@ -361,13 +437,12 @@ def crear_cotizacion(request, orden_id):
             cotizacion = form.save(commit=False)
             cotizacion.orden = orden
             cotizacion.usuario_creador = request.user
-            cotizacion.save()
-            
-            # CORRECCIÓN: Usar .costo_total (propiedad) en lugar de .total
-            BitacoraOrden.objects.create(
-                orden=orden, usuario=request.user,
-                descripcion=f"Nueva cotización creada por ${cotizacion.costo_total}"
-            )
+            # La cotización, los totales de la orden y la bitácora, juntos o nada
+            with transaction.atomic():
+                cotizacion.save()
+
+                # CORRECCIÓN: Usar .costo_total (propiedad) en lugar de .total
+                bitacora.registrar(orden, request.user, f"Nueva cotización creada por ${cotizacion.costo_total}")
             messages.success(request, 'Cotización creada exitosamente.')
             return redirect('detalle_orden', orden_id=orden.id)
     else:
@@ -383,11 +458,9 @@ def editar_cotizacion(request, orden_id, cotizacion_id):
     if request.method == 'POST':
         form = CotizacionForm(request.POST, instance=cotizacion)
         if form.is_valid():
-            form.save()
-            BitacoraOrden.objects.create(
-                orden=orden, usuario=request.user,
-                descripcion=f"Actualización de cotización #{cotizacion.id}"
-            )
+            with transaction.atomic():
+                form.save()
+                bitacora.registrar(orden, request.user, f"Actualización de cotización #{cotizacion.id}")
             messages.success(request, 'Cotización actualizada.')
             return redirect('detalle_orden', orden_id=orden.id)
     else:
@@ -401,8 +474,9 @@ def eliminar_cotizacion(request, orden_id, cotizacion_id):
     cotizacion = get_object_or_404(Cotizacion, pk=cotizacion_id, orden=orden)
     
     if request.method == 'POST':
-        cotizacion.delete()
-        BitacoraOrden.objects.create(orden=orden, usuario=request.user, descripcion="Cotización eliminada")
+        with transaction.atomic():
+            cotizacion.delete()
+            bitacora.registrar(orden, request.user, "Cotización eliminada")
         messages.success(request, 'Cotización eliminada.')
         return redirect('detalle_orden', orden_id=orden.id)
         
@@ -429,9 +503,9 @@ def crear_transferencia(request, orden_id):
                 formset.instance = transferencia
                 formset.save()
                 
-                BitacoraOrden.objects.create(
-                    orden=orden, usuario=request.user,
-                    descripcion=f"Solicitud de transferencia (Ref: {transferencia.documento_referencia})"
+                bitacora.registrar(
+                    orden, request.user,
+                    f"Solicitud de transferencia (Ref: {transferencia.documento_referencia})"
                 )
             
             messages.success(request, 'Transferencia registrada.')
@@ -472,9 +546,9 @@ def editar_transferencia(request, orden_id, transferencia_id):
                 transferencia.fecha_autorizacion = timezone.now()
                 transferencia.save()
                 
-                BitacoraOrden.objects.create(
-                    orden=orden, usuario=request.user,
-                    descripcion=f"Transferencia #{transferencia.id} AUTORIZADA por {request.user.username}"
+                bitacora.registrar(
+                    orden, request.user,
+                    f"Transferencia #{transferencia.id} AUTORIZADA por {request.user.username}"
                 )
             
             messages.success(request, f"Transferencia #{transferencia.id} autorizada correctamente.")
@@ -488,10 +562,7 @@ def editar_transferencia(request, orden_id, transferencia_id):
             with transaction.atomic():
                 form.save()
                 formset.save()
-                BitacoraOrden.objects.create(
-                    orden=orden, usuario=request.user,
-                    descripcion=f"Edición de transferencia #{transferencia.id}"
-                )
+                bitacora.registrar(orden, request.user, f"Edición de transferencia #{transferencia.id}")
             messages.success(request, 'Transferencia actualizada.')
             return redirect('detalle_orden', orden_id=orden.id)
     else:
@@ -509,11 +580,7 @@ def eliminar_transferencia(request, orden_id, transferencia_id):
     orden = get_object_or_404(OrdenServicio, pk=orden_id)
     transferencia = get_object_or_404(Transferencia, pk=transferencia_id, orden=orden)
     
-    BitacoraOrden.objects.create(
-        orden=orden,
-        usuario=request.user,
-        descripcion=f"Se eliminó/canceló la Transferencia #{transferencia.id}"
-    )
+    bitacora.registrar(orden, request.user, f"Se eliminó/canceló la Transferencia #{transferencia.id}")
     
     transferencia.delete()
     messages.success(request, 'Transferencia eliminada.')
@@ -527,15 +594,11 @@ def actualizar_estado_orden(request, orden_id):
     if orden.fecha_cierre: return redirect('detalle_orden', orden_id=orden.id)
     
     nuevo_estado = request.POST.get('nuevo_estado')
-    if nuevo_estado in dict(OrdenServicio.ESTADO_OPCIONES):
-        anterior = orden.estado
-        orden.estado = nuevo_estado
-        orden.save()
-        BitacoraOrden.objects.create(
-            orden=orden, usuario=request.user,
-            descripcion=f"Cambio de estado: {anterior} -> {nuevo_estado}"
-        )
-        messages.success(request, f'Estado actualizado a: {nuevo_estado}')
+    try:
+        if estados.cambiar_estado(orden, nuevo_estado, request.user):
+            messages.success(request, f'Estado actualizado a: {nuevo_estado}')
+    except ValidationError as error:
+        messages.error(request, ' '.join(error.messages))
     
     return redirect('detalle_orden', orden_id=orden.id)
 
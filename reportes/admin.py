@@ -1,3 +1,6 @@
 from django.contrib import admin
+from .models import HechoDiarioOrdenes, DiaPendienteHechos
 
 # Register your models here.
+admin.site.register(HechoDiarioOrdenes)
+admin.site.register(DiaPendienteHechos)
@@ -0,0 +1,373 @@
+"""
+Datos sintéticos para los comandos de benchmark.
+
+- crear_ordenes / crear_transiciones: volumen de órdenes para los reportes.
+- generar_crm: un CRM completo con volúmenes configurables (técnicos,
+  clientes, equipos, órdenes, bitácora, cotizaciones, transferencias) para
+  generar_datos y benchmark_crm.
+
+Sólo para bases de desarrollo: se insertan con bulk_create (sin señales) y al
+final se recalculan los derivados (KPIs del dashboard, tabla de hechos,
+índices de búsqueda difusa y de texto).
+"""
+import contextlib
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from catalogo.models import TipoServicio
+from gestion_clientes.autocompletado import cache_autocompletado
+from gestion_clientes.busqueda_difusa import obtener_backend
+from gestion_clientes.models import Cliente, Equipo, normalizar_texto
+from gestion_ordenes import busqueda_texto, totales
+from gestion_ordenes.models import (
+    BitacoraOrden, Cotizacion, ItemTransferido, OrdenEstadoTransicion, OrdenServicio, Transferencia,
+)
+
+LOTE_CREACION = 5000
+ESTADOS_CERRADOS = [OrdenServicio.ESTADO_ENTREGADA, OrdenServicio.ESTADO_CANCELADA]
+# Recorrido habitual de una orden, de la recepción a la entrega
+RUTA_ESTADOS = [
+    OrdenServicio.ESTADO_NUEVA,
+    OrdenServicio.ESTADO_DIAGNOSTICO,
+    OrdenServicio.ESTADO_ESPERANDO_AUTORIZACION,
+    OrdenServicio.ESTADO_ESPERANDO_REFACCION,
+    OrdenServicio.ESTADO_EN_REPARACION,
+    OrdenServicio.ESTADO_FINALIZADA_TECNICO,
+    OrdenServicio.ESTADO_ENTREGADA,
+]
+
+
+def crear_ordenes(cantidad, anios=0, semilla=42, salida=None):
+    """
+    Crea `cantidad` órdenes (con clientes, equipos y una cotización autorizada
+    por cada tres órdenes). Con `anios` > 0 las fechas de creación se reparten
+    en ese periodo hacia atrás y las órdenes cerradas reciben fecha de cierre.
+    """
+    azar = random.Random(semilla)
+    ahora = timezone.now()
+    estados = [estado for estado, _ in OrdenServicio.ESTADO_OPCIONES]
+    prioridades = [prioridad for prioridad, _ in OrdenServicio.PRIORIDAD_OPCIONES]
+    tipos = [tipo for tipo, _ in Equipo.TIPO_EQUIPO_OPCIONES]
+
+    with transaction.atomic():
+        clientes = Cliente.objects.bulk_create(
+            Cliente(nombre_completo=f"Cliente Benchmark {i}", telefono=f"55{i:08d}")
+            for i in range(max(1, cantidad // 10))
+        )
+        equipos = Equipo.objects.bulk_create(
+            Equipo(cliente=cliente, tipo_equipo=tipos[cliente.pk % len(tipos)], marca='Marca',
+                   modelo=f"Modelo {cliente.pk % 50}")
+            for cliente in clientes
+        )
+
+        creadas = 0
+        while creadas < cantidad:
+            lote = OrdenServicio.objects.bulk_create(
+                OrdenServicio(
+                    cliente_id=equipos[i % len(equipos)].cliente_id, equipo=equipos[i % len(equipos)],
+                    descripcion_falla="Falla de prueba", estado=estados[i % len(estados)],
+                    prioridad=prioridades[i % len(prioridades)],
+                )
+                for i in range(creadas, min(cantidad, creadas + LOTE_CREACION))
+            )
+            if anios:
+                # auto_now_add no deja fijar la fecha al crear: se ajusta después
+                for orden in lote:
+                    orden.fecha_creacion = ahora - datetime.timedelta(seconds=azar.randint(0, anios * 365 * 86400))
+                    if orden.estado in ESTADOS_CERRADOS:
+                        orden.fecha_cierre = min(ahora, orden.fecha_creacion + datetime.timedelta(hours=azar.randint(1, 240)))
+                OrdenServicio.objects.bulk_update(lote, ['fecha_creacion', 'fecha_cierre'])
+            # Una de cada tres órdenes con una cotización autorizada
+            Cotizacion.objects.bulk_create(
+                Cotizacion(orden=orden, concepto="Refacción", costo_refacciones=500, costo_mano_obra=250,
+                           estado=Cotizacion.ESTADO_AUTORIZADA)
+                for orden in lote[::3]
+            )
+            creadas += len(lote)
+
+    # bulk_create no dispara señales: se recalculan los derivados
+    totales.reconciliar()
+    busqueda_texto.reconstruir()
+    call_command('reconstruir_kpis', stdout=salida)
+    call_command('actualizar_hechos', reconstruir=True, stdout=salida)
+
+
+def crear_transiciones(semilla=42):
+    """
+    Historial de estados para las órdenes que no tienen transiciones: siguen
+    RUTA_ESTADOS hasta su estado actual (las canceladas, hasta un punto al azar)
+    con horas al azar entre cada cambio. Devuelve las transiciones creadas.
+    """
+    azar = random.Random(semilla)
+    ordenes = OrdenServicio.objects.filter(transiciones__isnull=True).order_by('id').values_list(
+        'id', 'estado', 'fecha_creacion', 'tecnico_asignado_id'
+    )
+    creadas = 0
+    with transaction.atomic():
+        lote = []
+        for orden_id, estado, fecha, tecnico_id in ordenes.iterator(chunk_size=LOTE_CREACION):
+            if estado == OrdenServicio.ESTADO_CANCELADA:
+                ruta = RUTA_ESTADOS[:azar.randint(1, 5)] + [estado]
+            else:
+                ruta = RUTA_ESTADOS[:RUTA_ESTADOS.index(estado) + 1]
+            anterior = None
+            for nuevo in ruta:
+                lote.append(OrdenEstadoTransicion(
+                    orden_id=orden_id, estado_anterior=anterior, estado_nuevo=nuevo, fecha=fecha, tecnico_id=tecnico_id,
+                ))
+                anterior = nuevo
+                fecha += datetime.timedelta(seconds=int(azar.expovariate(1 / 86400)) + 60)
+            if len(lote) >= LOTE_CREACION:
+                creadas += len(OrdenEstadoTransicion.objects.bulk_create(lote))
+                lote = []
+        creadas += len(OrdenEstadoTransicion.objects.bulk_create(lote))
+    return creadas
+
+
+# --- CRM COMPLETO ---
+
+NOMBRES = [
+    'José', 'María', 'Juan', 'Guadalupe', 'Luis', 'Ana', 'Carlos', 'Verónica', 'Jorge', 'Sofía',
+    'Miguel Ángel', 'Fernanda', 'Ricardo', 'Mónica', 'Héctor', 'Patricia', 'Raúl', 'Alejandra',
+]
+APELLIDOS = [
+    'Hernández', 'García', 'Martínez', 'López', 'González', 'Pérez', 'Rodríguez', 'Sánchez',
+    'Ramírez', 'Cruz', 'Flores', 'Gómez', 'Morales', 'Vázquez', 'Jiménez', 'Reyes', 'Díaz', 'Ortiz',
+]
+COLONIAS = ['Centro', 'Roma Norte', 'Del Valle', 'Narvarte', 'Coyoacán', 'Polanco', 'Lindavista', 'Escandón']
+MARCAS = {
+    'Laptop': ['HP', 'Dell', 'Lenovo', 'Asus', 'Acer'],
+    'Computadora de escritorio': ['HP', 'Dell', 'Lenovo'],
+    'Impresora': ['Epson', 'HP', 'Brother', 'Canon'],
+    'Proyector': ['Epson', 'BenQ', 'ViewSonic'],
+    'Componente de computadora': ['Kingston', 'Seagate', 'Corsair'],
+}
+FALLAS = [
+    'No enciende', 'Pantalla azul al iniciar', 'Se calienta y se apaga', 'Teclado no responde',
+    'No imprime, marca error de papel', 'Lento, requiere mantenimiento', 'No detecta el disco',
+    'Bisagra rota', 'No carga la batería', 'Manchas en la impresión',
+]
+NOTAS = [
+    'Se revisa el equipo en mesa.', 'Se llama al cliente para confirmar datos.',
+    'Se solicita refacción a almacén.', 'Pruebas de encendido correctas.',
+    'Cliente autoriza por teléfono.', 'Se limpia y se cambia pasta térmica.',
+    'Se respalda información del cliente.', 'Pendiente confirmar disponibilidad de la pieza.',
+]
+SERVICIOS = [
+    ('Diagnóstico', 250), ('Mantenimiento preventivo', 450), ('Formateo e instalación', 600),
+    ('Cambio de pantalla', 900), ('Limpieza de cabezales', 350), ('Respaldo de información', 400),
+]
+PESOS_PRIORIDAD = {OrdenServicio.PRIORIDAD_BAJA: 3, OrdenServicio.PRIORIDAD_NORMAL: 6, OrdenServicio.PRIORIDAD_ALTA: 1}
+# Una orden con más de 30 días casi siempre ya se cerró
+DIAS_ABIERTA = 30
+CLIENTES_POR_LOTE = 1000
+
+
+def _cantidad(azar, promedio):
+    """Entero con el promedio dado: 2.5 -> 2 o 3 (mitad y mitad)."""
+    entero = int(promedio)
+    return entero + (azar.random() < promedio - entero)
+
+
+@contextlib.contextmanager
+def _fechas_explicitas(*campos):
+    """
+    Desactiva auto_now_add mientras se insertan filas con fechas inventadas:
+    con bulk_update después (como crear_ordenes) serían millones de UPDATE.
+    """
+    originales = [campo.auto_now_add for campo in campos]
+    for campo in campos:
+        campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, original in zip(campos, originales):
+            campo.auto_now_add = original
+
+
+def _tecnicos(cantidad):
+    grupo, _ = Group.objects.get_or_create(name='Técnico')
+    tecnicos = list(User.objects.filter(groups=grupo).order_by('id'))
+    for i in range(len(tecnicos), cantidad):
+        tecnico = User.objects.create_user(
+            f'tecnico{i + 1}', first_name=NOMBRES[i % len(NOMBRES)], last_name=APELLIDOS[i % len(APELLIDOS)],
+        )
+        tecnico.groups.add(grupo)
+        tecnicos.append(tecnico)
+    return tecnicos[:cantidad] if cantidad else tecnicos
+
+
+def _servicios():
+    existentes = {servicio.nombre_servicio: servicio for servicio in TipoServicio.objects.all()}
+    TipoServicio.objects.bulk_create(
+        [TipoServicio(nombre_servicio=nombre, costo_estandar=costo) for nombre, costo in SERVICIOS if nombre not in existentes]
+    )
+    return list(TipoServicio.objects.filter(nombre_servicio__in=[nombre for nombre, _ in SERVICIOS]))
+
+
+def _cliente(azar, numero, ahora, anios):
+    nombre = f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}"
+    usuario = normalizar_texto(nombre).replace(' ', '.')
+    return Cliente(
+        nombre_completo=nombre,
+        telefono=f"33{numero:08d}",
+        email=f"{usuario}{numero}@ejemplo.com" if azar.random() < 0.6 else None,
+        calle=f"Calle {azar.randint(1, 200)}", numero_exterior=str(azar.randint(1, 999)),
+        colonia=azar.choice(COLONIAS), codigo_postal=f"{azar.randint(1000, 16999):05d}",
+        ciudad='Ciudad de México', estado='CDMX',
+        fecha_registro=ahora - datetime.timedelta(seconds=azar.randint(0, max(1, anios * 365 * 86400))),
+    )
+
+
+def _orden(azar, equipo, tecnicos, ahora):
+    # Entre el registro del cliente y hoy
+    registro = equipo.cliente.fecha_registro
+    fecha = registro + datetime.timedelta(seconds=azar.randint(0, max(1, int((ahora - registro).total_seconds()))))
+    antiguedad = (ahora - fecha).days
+    if antiguedad > DIAS_ABIERTA or azar.random() < 0.3:
+        estado = OrdenServicio.ESTADO_CANCELADA if azar.random() < 0.1 else OrdenServicio.ESTADO_ENTREGADA
+        cierre = min(ahora, fecha + datetime.timedelta(hours=azar.randint(4, 24 * 15)))
+    else:
+        estado = azar.choice(RUTA_ESTADOS[:-1])
+        cierre = None
+    prioridad = azar.choices(list(PESOS_PRIORIDAD), weights=list(PESOS_PRIORIDAD.values()))[0]
+    return OrdenServicio(
+        cliente_id=equipo.cliente_id, equipo=equipo, descripcion_falla=azar.choice(FALLAS),
+        estado=estado, prioridad=prioridad, fecha_creacion=fecha, fecha_cierre=cierre,
+        # Las nuevas aún pueden no tener técnico
+        tecnico_asignado=None if estado == OrdenServicio.ESTADO_NUEVA and azar.random() < 0.5 else azar.choice(tecnicos),
+    )
+
+
+def _detalle(azar, orden, volumen, servicios, ahora):
+    """Bitácora, cotizaciones, transferencias (con ítems) y servicios de una orden ya creada."""
+    fin = orden.fecha_cierre or ahora
+    segundos = max(1, int((fin - orden.fecha_creacion).total_seconds()))
+    tecnico = orden.tecnico_asignado
+
+    bitacora = [BitacoraOrden(orden=orden, usuario=tecnico, fecha_hora=orden.fecha_creacion,
+                              descripcion='Orden creada exitosamente.')]
+    for _ in range(max(0, _cantidad(azar, volumen['bitacora_por_orden']) - 1)):
+        bitacora.append(BitacoraOrden(
+            orden=orden, usuario=tecnico, descripcion=azar.choice(NOTAS),
+            fecha_hora=orden.fecha_creacion + datetime.timedelta(seconds=azar.randint(60, segundos)),
+        ))
+    if orden.fecha_cierre:
+        bitacora.append(BitacoraOrden(
+            orden=orden, usuario=tecnico, fecha_hora=orden.fecha_cierre,
+            descripcion=f"*** ORDEN CERRADA - ESTADO: {orden.estado.upper()} ***",
+        ))
+
+    cotizaciones = [Cotizacion(
+        orden=orden, usuario_creador=tecnico, concepto=azar.choice(NOTAS),
+        costo_refacciones=Decimal(azar.randint(0, 40) * 50), costo_mano_obra=Decimal(azar.randint(2, 12) * 50),
+        estado=azar.choice(Cotizacion.ESTADO_COTIZACION)[0],
+        fecha_creacion=orden.fecha_creacion + datetime.timedelta(seconds=azar.randint(60, segundos)),
+    ) for _ in range(_cantidad(azar, volumen['cotizaciones_por_orden']))]
+
+    transferencias = [Transferencia(
+        orden=orden, usuario_solicitante=tecnico, usuario_autoriza=tecnico,
+        documento_referencia=f"TR-{orden.pk}-{i + 1}",
+        fecha_transferencia=orden.fecha_creacion + datetime.timedelta(seconds=azar.randint(60, segundos)),
+    ) for i in range(_cantidad(azar, volumen['transferencias_por_orden']))]
+
+    aplicados = azar.sample(servicios, min(len(servicios), azar.randint(0, 2)))
+    return bitacora, cotizaciones, transferencias, aplicados
+
+
+def generar_crm(clientes, equipos_por_cliente=1.5, ordenes_por_equipo=2, bitacora_por_orden=6,
+                cotizaciones_por_orden=0.6, transferencias_por_orden=0.3, items_por_transferencia=2,
+                tecnicos=8, anios=2, semilla=42, indexar=True, salida=None):
+    """
+    Agrega al CRM `clientes` clientes con sus equipos y órdenes completas. Los
+    valores "por_" son promedios (1.5 equipos: la mitad de los clientes tiene
+    uno y la otra mitad dos). Los clientes se registran en los últimos `anios`
+    años y sus órdenes caen entre el registro y hoy; las de más de DIAS_ABIERTA
+    días están cerradas. Se inserta por lotes de CLIENTES_POR_LOTE clientes, uno por
+    transacción. Devuelve {modelo: filas creadas}.
+    """
+    azar = random.Random(semilla)
+    ahora = timezone.now()
+    volumen = {
+        'bitacora_por_orden': bitacora_por_orden,
+        'cotizaciones_por_orden': cotizaciones_por_orden,
+        'transferencias_por_orden': transferencias_por_orden,
+    }
+    lista_tecnicos = _tecnicos(tecnicos)
+    servicios = _servicios()
+    tipos = list(MARCAS)
+    backend = obtener_backend() if indexar else None
+    conteos = dict.fromkeys(['tecnicos', 'clientes', 'equipos', 'ordenes', 'bitacora', 'cotizaciones',
+                             'transferencias', 'items', 'servicios'], 0)
+    conteos['tecnicos'] = len(lista_tecnicos)
+    # Teléfonos y emails a partir del último id: se puede correr varias veces
+    primero = (Cliente.objects.aggregate(ultimo=Max('pk'))['ultimo'] or 0) + 1
+
+    fechas = [campo for modelo, nombre in [
+        (Cliente, 'fecha_registro'), (OrdenServicio, 'fecha_creacion'), (BitacoraOrden, 'fecha_hora'),
+        (Cotizacion, 'fecha_creacion'), (Transferencia, 'fecha_transferencia'),
+    ] for campo in [modelo._meta.get_field(nombre)]]
+
+    with _fechas_explicitas(*fechas):
+        for inicio in range(0, clientes, CLIENTES_POR_LOTE):
+            with transaction.atomic():
+                lote_clientes = Cliente.objects.bulk_create(
+                    _cliente(azar, primero + i, ahora, anios) for i in range(inicio, min(clientes, inicio + CLIENTES_POR_LOTE))
+                )
+                equipos = []
+                for cliente in lote_clientes:
+                    for n in range(max(1, _cantidad(azar, equipos_por_cliente))):
+                        tipo = azar.choice(tipos)
+                        equipos.append(Equipo(
+                            cliente=cliente, tipo_equipo=tipo, marca=azar.choice(MARCAS[tipo]),
+                            modelo=f"{tipo[:3].upper()}-{azar.randint(100, 999)}",
+                            numero_serie=f"SN{cliente.pk:07d}-{n + 1}",
+                        ))
+                equipos = Equipo.objects.bulk_create(equipos)
+
+                ordenes = OrdenServicio.objects.bulk_create(
+                    _orden(azar, equipo, lista_tecnicos, ahora)
+                    for equipo in equipos for _ in range(_cantidad(azar, ordenes_por_equipo))
+                )
+
+                bitacora, cotizaciones, transferencias, aplicados = [], [], [], []
+                for orden in ordenes:
+                    b, c, t, s = _detalle(azar, orden, volumen, servicios, ahora)
+                    bitacora += b
+                    cotizaciones += c
+                    transferencias += t
+                    aplicados += [OrdenServicio.servicios.through(ordenservicio=orden, tiposervicio=servicio) for servicio in s]
+                BitacoraOrden.objects.bulk_create(bitacora, batch_size=LOTE_CREACION)
+                Cotizacion.objects.bulk_create(cotizaciones, batch_size=LOTE_CREACION)
+                transferencias = Transferencia.objects.bulk_create(transferencias, batch_size=LOTE_CREACION)
+                items = ItemTransferido.objects.bulk_create([
+                    ItemTransferido(transferencia=transferencia, descripcion_item=f"Refacción {azar.randint(1, 300)}",
+                                    cantidad=azar.randint(1, 3))
+                    for transferencia in transferencias for _ in range(_cantidad(azar, items_por_transferencia))
+                ], batch_size=LOTE_CREACION)
+                OrdenServicio.servicios.through.objects.bulk_create(aplicados, batch_size=LOTE_CREACION)
+                if backend:
+                    backend.indexar_nuevos(clientes=lote_clientes, equipos=equipos)
+
+            for nombre, filas in [('clientes', lote_clientes), ('equipos', equipos), ('ordenes', ordenes),
+                                  ('bitacora', bitacora), ('cotizaciones', cotizaciones),
+                                  ('transferencias', transferencias), ('items', items), ('servicios', aplicados)]:
+                conteos[nombre] += len(filas)
+            if salida:
+                salida.write(f"  {conteos['clientes']}/{clientes} clientes, {conteos['ordenes']} órdenes")
+
+    # bulk_create no dispara señales: se recalculan los derivados
+    crear_transiciones(semilla)
+    totales.reconciliar()
+    busqueda_texto.reconstruir()
+    call_command('reconstruir_kpis', stdout=salida)
+    call_command('actualizar_hechos', reconstruir=True, stdout=salida)
+    cache_autocompletado.invalidar()
+    return conteos
@@ -0,0 +1,97 @@
+"""
+Exportación de órdenes de servicio (CSV y XLSX) en streaming.
+
+Las filas salen de un solo queryset con values_list (sin instanciar modelos)
+recorrido con iterator(chunk_size=...), y se escriben conforme se leen: la
+memoria usada es la de un bloque, no la del listado completo.
+"""
+import csv
+
+from django.utils import timezone
+
+from gestion_ordenes.filtros import filtrar_ordenes, ordenar_ordenes
+from gestion_ordenes.models import OrdenServicio
+
+from .xlsx import generar_xlsx
+
+TAMANO_BLOQUE = 2000
+
+# (encabezado, campo en values_list)
+COLUMNAS = [
+    ('Orden', 'id'),
+    ('Fecha de creación', 'fecha_creacion'),
+    ('Estado', 'estado'),
+    ('Prioridad', 'prioridad'),
+    ('Cliente', 'cliente__nombre_completo'),
+    ('Teléfono', 'cliente__telefono'),
+    ('Tipo de equipo', 'equipo__tipo_equipo'),
+    ('Marca', 'equipo__marca'),
+    ('Modelo', 'equipo__modelo'),
+    ('Número de serie', 'equipo__numero_serie'),
+    ('Técnico', 'tecnico_asignado__username'),
+    ('Fecha de cierre', 'fecha_cierre'),
+    ('Total autorizado', 'total_autorizado'),
+]
+ENCABEZADOS = [encabezado for encabezado, _ in COLUMNAS]
+CAMPOS_FECHA = {indice for indice, (_, campo) in enumerate(COLUMNAS) if campo.startswith('fecha_')}
+# Un texto que empieza así la hoja de cálculo lo toma como fórmula (ej. un
+# cliente capturado como "=HYPERLINK(...)"): se antepone un apóstrofo
+INICIOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escapar_formula(valor):
+    if isinstance(valor, str) and valor.startswith(INICIOS_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def puede_exportar(user):
+    """Staff, superusuarios y gerentes: el archivo trae datos de todos los clientes."""
+    return user.is_staff or user.is_superuser or user.groups.filter(name='Gerente Servicio').exists()
+
+
+def consulta_exportacion(params):
+    """Mismas órdenes y orden que lista_ordenes con los filtros de `params`."""
+    ordenes = ordenar_ordenes(filtrar_ordenes(OrdenServicio.objects.all(), params), params)
+    # total_autorizado es una columna de la orden (gestion_ordenes/totales.py): sin subconsulta por fila
+    return ordenes.values_list(*(campo for _, campo in COLUMNAS))
+
+
+def filas_exportacion(params, tamano_bloque=TAMANO_BLOQUE):
+    """Tuplas listas para escribir, con las fechas en hora local y los textos sin fórmulas."""
+    for fila in consulta_exportacion(params).iterator(chunk_size=tamano_bloque):
+        fila = [escapar_formula(valor) for valor in fila]
+        for indice in CAMPOS_FECHA:
+            if fila[indice] is not None:
+                fila[indice] = timezone.localtime(fila[indice])
+        yield fila
+
+
+class _Eco:
+    """csv.writer escribe aquí y writerow devuelve la línea en lugar de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(filas):
+    escritor = csv.writer(_Eco())
+    # BOM: Excel abre el archivo como UTF-8 (acentos) sin pasar por el asistente
+    yield '\ufeff' + escritor.writerow(ENCABEZADOS)
+    bloque = []
+    for fila in filas:
+        fila = [valor.strftime('%d/%m/%Y %H:%M') if hasattr(valor, 'strftime') else valor for valor in fila]
+        bloque.append(escritor.writerow(fila))
+        if len(bloque) >= TAMANO_BLOQUE:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+def generar_exportacion(formato, params):
+    """Iterador de fragmentos (str para CSV, bytes para XLSX)."""
+    filas = filas_exportacion(params)
+    if formato == 'xlsx':
+        return generar_xlsx(ENCABEZADOS, filas, nombre_hoja='Órdenes')
+    return generar_csv(filas)
@@ -0,0 +1,252 @@
+"""
+Construcción incremental de la tabla de hechos diaria (HechoDiarioOrdenes).
+
+Las señales (reportes/signals.py) marcan en DiaPendienteHechos los días que
+tocó cada cambio: creación y cierre de la orden (y el cierre anterior si
+cambió), y el día de creación de la orden de una cotización modificada.
+El comando actualizar_hechos recalcula sólo esos días desde las tablas
+fuente y reemplaza sus filas.
+
+Un día se recalcula completo, con filtros por rango de fechas que usan los
+índices de fecha_creacion / fecha_cierre. Los cambios que no pasan por señales
+(update() masivos, cambiar el tipo de un equipo) se corrigen con
+`actualizar_hechos --verificar` / `--reconstruir`.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from gestion_ordenes.models import Cotizacion, OrdenServicio
+from .models import DiaPendienteHechos, HechoDiarioOrdenes
+
+DIMENSIONES = ['estado', 'tecnico_id', 'prioridad', 'tipo_equipo']
+METRICAS = [
+    'abiertas', 'cerradas', 'entregadas', 'canceladas',
+    'segundos_cierre', 'cotizaciones_autorizadas', 'total_autorizado',
+]
+DIAS_POR_LOTE = 31
+
+# Rutas de las dimensiones desde OrdenServicio y desde Cotizacion
+_DIMS_ORDEN = ['estado', 'tecnico_asignado_id', 'prioridad', 'equipo__tipo_equipo']
+_DIMS_COTIZACION = ['orden__' + campo for campo in _DIMS_ORDEN]
+
+
+# --- UTILIDADES DE FECHAS ---
+
+def dia_local(valor):
+    return timezone.localdate(valor) if valor else None
+
+
+def inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.datetime.combine(fecha, datetime.time.min))
+
+
+def _tramos(dias):
+    """Rangos [inicio, fin) en hora local, uno por cada tramo de días consecutivos."""
+    tramos = []
+    for dia in sorted(set(dias)):
+        if tramos and tramos[-1][1] == dia:
+            tramos[-1][1] = dia + datetime.timedelta(days=1)
+        else:
+            tramos.append([dia, dia + datetime.timedelta(days=1)])
+    return [(inicio_del_dia(inicio), inicio_del_dia(fin)) for inicio, fin in tramos]
+
+
+def _lotes(dias, tamano=DIAS_POR_LOTE):
+    dias = sorted(set(dias))
+    for i in range(0, len(dias), tamano):
+        yield dias[i:i + tamano]
+
+
+def _dias_entre(desde, hasta):
+    return [desde + datetime.timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+
+# --- CÁLCULO DESDE LAS TABLAS FUENTE ---
+
+def calcular_dias(dias):
+    """
+    Hechos de los días indicados calculados desde órdenes y cotizaciones:
+    {(fecha, estado, tecnico_id, prioridad, tipo_equipo): {metrica: valor}}.
+    """
+    filas = defaultdict(lambda: dict.fromkeys(METRICAS, 0))
+
+    def clave(fila, dims):
+        return (fila['dia'], *(fila[campo] for campo in dims))
+
+    duracion = ExpressionWrapper(F('fecha_cierre') - F('fecha_creacion'), output_field=DurationField())
+
+    # Una consulta por tramo: un OR de rangos impide usar el índice de fecha
+    for inicio, fin in _tramos(dias):
+        abiertas = OrdenServicio.objects.filter(
+            fecha_creacion__gte=inicio, fecha_creacion__lt=fin
+        ).annotate(dia=TruncDate('fecha_creacion')).order_by().values('dia', *_DIMS_ORDEN).annotate(n=Count('id'))
+        for fila in abiertas:
+            filas[clave(fila, _DIMS_ORDEN)]['abiertas'] = fila['n']
+
+        cerradas = OrdenServicio.objects.filter(
+            fecha_cierre__gte=inicio, fecha_cierre__lt=fin
+        ).annotate(dia=TruncDate('fecha_cierre')).order_by().values('dia', *_DIMS_ORDEN).annotate(
+            n=Count('id'),
+            entregadas=Count('id', filter=Q(estado=OrdenServicio.ESTADO_ENTREGADA)),
+            canceladas=Count('id', filter=Q(estado=OrdenServicio.ESTADO_CANCELADA)),
+            duracion=Sum(duracion),
+        )
+        for fila in cerradas:
+            hecho = filas[clave(fila, _DIMS_ORDEN)]
+            hecho['cerradas'] = fila['n']
+            hecho['entregadas'] = fila['entregadas']
+            hecho['canceladas'] = fila['canceladas']
+            hecho['segundos_cierre'] = int(fila['duracion'].total_seconds()) if fila['duracion'] else 0
+
+        autorizadas = Cotizacion.objects.filter(
+            orden__fecha_creacion__gte=inicio, orden__fecha_creacion__lt=fin, estado=Cotizacion.ESTADO_AUTORIZADA,
+        ).annotate(dia=TruncDate('orden__fecha_creacion')).order_by().values('dia', *_DIMS_COTIZACION).annotate(
+            n=Count('id'),
+            total=Sum(F('costo_refacciones') + F('costo_mano_obra')),
+        )
+        for fila in autorizadas:
+            hecho = filas[clave(fila, _DIMS_COTIZACION)]
+            hecho['cotizaciones_autorizadas'] = fila['n']
+            hecho['total_autorizado'] = Decimal(fila['total'] or 0).quantize(Decimal('0.01'))
+
+    return dict(filas)
+
+
+def _guardar(dias, filas):
+    with transaction.atomic():
+        HechoDiarioOrdenes.objects.filter(fecha__in=dias).delete()
+        return len(HechoDiarioOrdenes.objects.bulk_create(
+            [HechoDiarioOrdenes(
+                **dict(zip(['fecha'] + DIMENSIONES, clave)), **metricas,
+                mes=clave[0].replace(day=1), anio=clave[0].year,
+            ) for clave, metricas in filas.items()],
+            batch_size=1000,
+        ))
+
+
+def procesar_dias(dias):
+    """Recalcula y reemplaza los hechos de `dias`. Devuelve las filas escritas."""
+    return sum(_guardar(lote, calcular_dias(lote)) for lote in _lotes(dias))
+
+
+# --- DÍAS PENDIENTES ---
+
+def marcar_dias(*valores):
+    """Marca como pendientes los días (locales) de las fechas dadas; ignora None."""
+    dias = {dia_local(valor) if isinstance(valor, datetime.datetime) else valor for valor in valores if valor}
+    if dias:
+        DiaPendienteHechos.objects.bulk_create(
+            [DiaPendienteHechos(fecha=dia) for dia in dias],
+            update_conflicts=True, unique_fields=['fecha'], update_fields=['marcado_en'],
+        )
+
+
+def actualizar_pendientes():
+    """Procesa los días marcados desde la última corrida. Devuelve (días, filas)."""
+    inicio = timezone.now()
+    dias = list(DiaPendienteHechos.objects.values_list('fecha', flat=True))
+    filas = procesar_dias(dias)
+    # Un día marcado otra vez mientras se procesaba se queda para la siguiente corrida
+    for lote in _lotes(dias, 500):
+        DiaPendienteHechos.objects.filter(fecha__in=lote, marcado_en__lte=inicio).delete()
+    return len(dias), filas
+
+
+# --- RECONSTRUCCIÓN Y VERIFICACIÓN ---
+
+def rango_fuente():
+    """(primer día, último día) con actividad en órdenes, o None si no hay órdenes."""
+    limites = OrdenServicio.objects.aggregate(
+        creacion_min=Min('fecha_creacion'), creacion_max=Max('fecha_creacion'), cierre_max=Max('fecha_cierre'),
+    )
+    if limites['creacion_min'] is None:
+        return None
+    ultimo = max(filter(None, [limites['creacion_max'], limites['cierre_max']]))
+    return dia_local(limites['creacion_min']), dia_local(ultimo)
+
+
+def reconstruir(desde=None, hasta=None):
+    """Recalcula todo el rango (por defecto, toda la historia). Devuelve las filas escritas."""
+    rango = rango_fuente()
+    with transaction.atomic():
+        hechos = HechoDiarioOrdenes.objects.all()
+        if desde:
+            hechos = hechos.filter(fecha__gte=desde)
+        if hasta:
+            hechos = hechos.filter(fecha__lte=hasta)
+        hechos.delete()
+        if rango is None:
+            return 0
+        filas = procesar_dias(_dias_entre(desde or rango[0], hasta or rango[1]))
+        pendientes = DiaPendienteHechos.objects.all()
+        if desde:
+            pendientes = pendientes.filter(fecha__gte=desde)
+        if hasta:
+            pendientes = pendientes.filter(fecha__lte=hasta)
+        pendientes.delete()
+    return filas
+
+
+def _normalizar(metricas):
+    return {metrica: Decimal(valor).quantize(Decimal('0.01')) if metrica == 'total_autorizado' else valor
+            for metrica, valor in metricas.items()}
+
+
+def diferencias(desde=None, hasta=None):
+    """
+    Compara la tabla de hechos con lo calculado desde las tablas fuente.
+    Devuelve {clave: (guardado, esperado)} con las filas que no coinciden.
+    """
+    rango = rango_fuente()
+    limites_guardados = HechoDiarioOrdenes.objects.aggregate(minimo=Min('fecha'), maximo=Max('fecha'))
+    extremos = [d for d in [rango and rango[0], rango and rango[1], limites_guardados['minimo'], limites_guardados['maximo']] if d]
+    if not extremos:
+        return {}
+
+    resultado = {}
+    for lote in _lotes(_dias_entre(desde or min(extremos), hasta or max(extremos))):
+        esperados = {clave: _normalizar(metricas) for clave, metricas in calcular_dias(lote).items()}
+        guardados = {
+            (fila['fecha'], *(fila[d] for d in DIMENSIONES)): _normalizar({m: fila[m] for m in METRICAS})
+            for fila in HechoDiarioOrdenes.objects.filter(fecha__in=lote).values('fecha', *DIMENSIONES, *METRICAS)
+        }
+        for clave in esperados.keys() | guardados.keys():
+            if esperados.get(clave) != guardados.get(clave):
+                resultado[clave] = (guardados.get(clave), esperados.get(clave))
+    return resultado
+
+
+# --- CONSULTAS DE REPORTE (sólo tabla de hechos) ---
+
+# Columna del periodo en HechoDiarioOrdenes (guardadas para no truncar fechas al consultar)
+AGRUPACIONES = {
+    'dia': 'fecha',
+    'mes': 'mes',
+    'anio': 'anio',
+}
+
+
+def resumen(desde, hasta, agrupacion='mes', dimension=None):
+    """
+    Totales por periodo (y opcionalmente por una dimensión) entre dos fechas,
+    leídos de HechoDiarioOrdenes. Cada fila trae además las horas promedio de
+    cierre.
+    """
+    campos = [AGRUPACIONES[agrupacion]] + ([dimension] if dimension else [])
+    filas = list(
+        HechoDiarioOrdenes.objects.filter(fecha__range=(desde, hasta))
+        .values(*campos).annotate(**{metrica: Sum(metrica) for metrica in METRICAS}).order_by(*campos)
+    )
+    for fila in filas:
+        periodo = fila.pop(AGRUPACIONES[agrupacion])
+        fila['periodo'] = datetime.date(periodo, 1, 1) if agrupacion == 'anio' else periodo
+        fila['horas_promedio_cierre'] = (
+            round(fila['segundos_cierre'] / fila['cerradas'] / 3600, 1) if fila['cerradas'] else None
+        )
+    return filas
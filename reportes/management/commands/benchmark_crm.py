@@ -0,0 +1,273 @@
+"""
+Benchmark de las páginas más visitadas del CRM, para comparar entre commits.
+
+Pasa por las vistas reales con el Client de pruebas (middleware, sesión,
+réplica, caché y plantillas incluidos) y por cada escenario reporta p50, p95 y
+máximo del tiempo de respuesta y las consultas SQL por petición:
+
+- lista_clientes: búsqueda por inicio del nombre, por apellido y con error
+  de dedo (no empiezan así: caen a la búsqueda difusa), por inicio del
+  teléfono y una página profunda sin búsqueda.
+- buscar_cliente_api: prefijos de nombres, con el caché del autocompletado
+  vacío (_frio) y lleno.
+- lista_ordenes: sin filtros, por estado, técnico, prioridad, último mes,
+  combinados, página profunda, paginación por cursor y por monto autorizado
+  (ordenada y filtrada).
+- detalle_orden: órdenes al azar.
+- dashboards de recepción, técnico y gerencia, con el caché de contexto
+  invalidado antes de cada petición (_frio) y sin invalidar.
+
+Corre con DEBUG=False, como en producción. Los datos salen de la base actual
+(generar_datos crea un volumen realista); no escribe nada salvo la sesión.
+
+    python manage.py benchmark_crm --salida antes.json
+    (cambios)
+    python manage.py benchmark_crm --salida despues.json --comparar antes.json
+"""
+import json
+import random
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count, Q
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from dashboard import cache_dashboards
+from gestion_clientes.autocompletado import cache_autocompletado
+from gestion_clientes.models import Cliente, Equipo
+from gestion_ordenes.models import BitacoraOrden, Cotizacion, OrdenServicio, Transferencia
+from reportes.datos_prueba import ESTADOS_CERRADOS
+from sistema_crm_pacscomputacion.metricas import Medicion
+
+ERRORES_DE_DEDO = {'a': 'e', 'e': 'a', 'o': 'u', 'i': 'y', 'n': 'm', 's': 'z', 'r': 'rr'}
+
+
+def _percentil(ordenados, fraccion):
+    # Mismo criterio que metricas.estadisticas()
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * fraccion))]
+
+
+def _error_de_dedo(azar, palabra):
+    posiciones = [i for i, letra in enumerate(palabra) if letra in ERRORES_DE_DEDO]
+    if not posiciones:
+        return palabra + 'z'
+    i = azar.choice(posiciones)
+    return palabra[:i] + ERRORES_DE_DEDO[palabra[i]] + palabra[i + 1:]
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Mide p50/p95 y consultas SQL de las listas, la búsqueda de clientes, el detalle de orden y "
+            "los dashboards sobre la base actual. Guarda el resultado en JSON para comparar entre commits.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=30, help="Peticiones medidas por escenario.")
+        parser.add_argument('--calentamiento', type=int, default=3, help="Peticiones sin medir antes de cada escenario.")
+        parser.add_argument('--usuario', help="Usuario de recepción/gerencia (por defecto, el primer superusuario).")
+        parser.add_argument('--solo', nargs='+', metavar='ESCENARIO', help="Sólo los escenarios que empiezan así.")
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', help="Archivo JSON donde guardar el resultado.")
+        parser.add_argument('--comparar', help="JSON de una corrida anterior: muestra las diferencias.")
+
+    def handle(self, *args, **options):
+        if not OrdenServicio.objects.exists():
+            raise CommandError("No hay órdenes: genera datos con generar_datos.")
+        self.azar = random.Random(options['semilla'])
+        anterior = None
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as archivo:
+                anterior = json.load(archivo)
+
+        # testserver: el host del Client, que ALLOWED_HOSTS rechaza con DEBUG=False
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            escenarios = self._escenarios(self._usuario(options['usuario']))
+            if options['solo']:
+                escenarios = {
+                    nombre: escenario for nombre, escenario in escenarios.items()
+                    if nombre.startswith(tuple(options['solo']))
+                }
+            resultados = {}
+            for nombre, (cliente, urls, antes) in escenarios.items():
+                resultados[nombre] = self._medir(nombre, cliente, urls, antes, options)
+
+        resultado = {
+            'fecha': timezone.now().isoformat(timespec='seconds'),
+            'commit': _commit(),
+            'motor': connection.vendor,
+            'perfil': settings.CRM_DB_PERFIL,
+            'repeticiones': options['repeticiones'],
+            'volumenes': {
+                modelo.__name__: modelo.objects.count()
+                for modelo in (Cliente, Equipo, OrdenServicio, BitacoraOrden, Cotizacion, Transferencia)
+            },
+            'escenarios': resultados,
+        }
+        self._reportar(resultado, anterior)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultado, archivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Guardado en {options['salida']}")
+
+    def _usuario(self, username):
+        User = get_user_model()
+        usuario = User.objects.filter(username=username).first() if username else \
+            User.objects.filter(is_superuser=True).order_by('pk').first()
+        if usuario is None:
+            raise CommandError("No hay usuario para las peticiones: usa --usuario o crea un superusuario.")
+        return usuario
+
+    def _cliente(self, usuario):
+        cliente = Client()
+        cliente.force_login(usuario)
+        return cliente
+
+    # --- ESCENARIOS ---
+
+    def _escenarios(self, usuario):
+        """{nombre: (Client, función que da la siguiente URL, función a llamar antes de cada petición)}."""
+        azar = self.azar
+        recepcion = self._cliente(usuario)
+        nombres = list(Cliente.objects.order_by('?').values_list('nombre_completo', 'telefono')[:200])
+        apellidos = sorted({nombre.split()[-1] for nombre, _ in nombres})
+        orden_ids = list(OrdenServicio.objects.order_by('?').values_list('id', flat=True)[:500])
+        tecnicos = list(
+            get_user_model().objects.filter(groups__name='Técnico').annotate(
+                abiertas=Count('ordenes_asignadas', filter=~Q(ordenes_asignadas__estado__in=ESTADOS_CERRADOS)),
+            ).order_by('-abiertas')
+        )
+        estados = [estado for estado, _ in OrdenServicio.ESTADO_OPCIONES]
+        prioridades = [prioridad for prioridad, _ in OrdenServicio.PRIORIDAD_OPCIONES]
+        hace_un_mes = (timezone.localdate() - timezone.timedelta(days=30)).isoformat()
+        paginas_clientes = max(1, Cliente.objects.count() // 10)
+        paginas_ordenes = max(1, OrdenServicio.objects.count() // 20)
+
+        def url(nombre, **params):
+            def siguiente():
+                valores = {clave: valor() if callable(valor) else valor for clave, valor in params.items()}
+                return reverse(nombre), valores
+            return siguiente
+
+        def sin_cache_autocompletado():
+            cache_autocompletado.limpiar()
+
+        def sin_cache_dashboards():
+            cache_dashboards.invalidar(
+                cache_dashboards.SECCION_RECEPCION, cache_dashboards.SECCION_GERENTE,
+                *(cache_dashboards.seccion_tecnico(tecnico.pk) for tecnico in tecnicos[:1]),
+            )
+
+        lista_ordenes = {
+            'sin_filtros': {},
+            'estado': {'estado': lambda: azar.choice(estados)},
+            'tecnico': {'tecnico': lambda: azar.choice(tecnicos).pk} if tecnicos else None,
+            'prioridad': {'prioridad': lambda: azar.choice(prioridades)},
+            'ultimo_mes': {'fecha_inicio': hace_un_mes},
+            'combinados': {'estado': OrdenServicio.ESTADO_EN_REPARACION, 'prioridad': OrdenServicio.PRIORIDAD_ALTA,
+                           'fecha_inicio': hace_un_mes},
+            'pagina_profunda': {'page': lambda: azar.randint(paginas_ordenes // 2, paginas_ordenes)},
+            'por_monto': {'ordenar': 'monto'},
+            'monto_minimo': {'monto_min': lambda: azar.choice([100, 500, 1000])},
+            'cursor': {'modo': 'cursor'},
+        }
+
+        escenarios = {
+            'lista_clientes_nombre': (recepcion, url(
+                'lista_clientes', q=lambda: ' '.join(azar.choice(nombres)[0].split()[:2])), None),
+            'lista_clientes_apellido': (recepcion, url('lista_clientes', q=lambda: azar.choice(apellidos)), None),
+            'lista_clientes_telefono': (recepcion, url('lista_clientes', q=lambda: azar.choice(nombres)[1][:6]), None),
+            'lista_clientes_error_de_dedo': (recepcion, url(
+                'lista_clientes', q=lambda: _error_de_dedo(azar, azar.choice(apellidos).lower())), None),
+            'lista_clientes_pagina_profunda': (recepcion, url(
+                'lista_clientes', page=lambda: azar.randint(paginas_clientes // 2, paginas_clientes)), None),
+            'buscar_cliente_api_frio': (recepcion, url(
+                'buscar_cliente_api', q=lambda: azar.choice(nombres)[0][:azar.randint(3, 6)]), sin_cache_autocompletado),
+            'buscar_cliente_api': (recepcion, url(
+                'buscar_cliente_api', q=lambda: azar.choice(apellidos)[:4]), None),
+        }
+        escenarios.update({
+            f'lista_ordenes_{nombre}': (recepcion, url('lista_ordenes', **params), None)
+            for nombre, params in lista_ordenes.items() if params is not None
+        })
+        escenarios['detalle_orden'] = (recepcion, lambda: (reverse('detalle_orden', args=[azar.choice(orden_ids)]), {}), None)
+
+        dashboards = [('recepcion', recepcion), ('gerente', recepcion)]
+        if tecnicos:
+            # El técnico con más órdenes abiertas: su tablero es el más pesado
+            dashboards.insert(1, ('tecnico', self._cliente(tecnicos[0])))
+        else:
+            self.stdout.write(self.style.WARNING("No hay usuarios en el grupo Técnico: se omite dashboard_tecnico."))
+        for nombre, cliente in dashboards:
+            escenarios[f'dashboard_{nombre}_frio'] = (cliente, url(f'dashboard_{nombre}'), sin_cache_dashboards)
+            escenarios[f'dashboard_{nombre}'] = (cliente, url(f'dashboard_{nombre}'), None)
+        return escenarios
+
+    # --- MEDICIÓN ---
+
+    def _medir(self, nombre, cliente, siguiente, antes, options):
+        for _ in range(options['calentamiento']):
+            if antes:
+                antes()
+            cliente.get(*siguiente())
+
+        duraciones, consultas = [], []
+        for _ in range(options['repeticiones']):
+            if antes:
+                antes()
+            ruta, params = siguiente()
+            medicion = Medicion()
+            with ExitStack() as envolturas:
+                for alias in connections:
+                    envolturas.enter_context(connections[alias].execute_wrapper(medicion))
+                inicio = time.perf_counter()
+                respuesta = cliente.get(ruta, params)
+                duraciones.append((time.perf_counter() - inicio) * 1000)
+            if respuesta.status_code != 200:
+                raise CommandError(f"{nombre}: {ruta} {params} respondió HTTP {respuesta.status_code}.")
+            consultas.append(medicion.consultas)
+
+        duraciones.sort()
+        return {
+            'n': len(duraciones),
+            'p50_ms': round(statistics.median(duraciones), 2),
+            'p95_ms': round(_percentil(duraciones, 0.95), 2),
+            'max_ms': round(duraciones[-1], 2),
+            'consultas_p50': statistics.median_low(consultas),
+            'consultas_max': max(consultas),
+        }
+
+    def _reportar(self, resultado, anterior):
+        self.stdout.write(
+            f"Commit {resultado['commit'] or '?'} | {resultado['motor']} ({resultado['perfil']}) | "
+            + ', '.join(f"{modelo}={cantidad}" for modelo, cantidad in resultado['volumenes'].items())
+        )
+        previos = anterior['escenarios'] if anterior else {}
+        if anterior:
+            self.stdout.write(f"Comparando con {anterior.get('commit') or '?'} ({anterior.get('fecha')})")
+        self.stdout.write(f"  {'escenario':<32} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'consultas':>9}")
+        for nombre, cifras in resultado['escenarios'].items():
+            linea = (
+                f"  {nombre:<32} {cifras['p50_ms']:>9.1f} {cifras['p95_ms']:>9.1f} {cifras['max_ms']:>9.1f} "
+                f"{cifras['consultas_p50']:>9}"
+            )
+            previo = previos.get(nombre)
+            if previo:
+                cambio = (cifras['p50_ms'] - previo['p50_ms']) / previo['p50_ms'] * 100 if previo['p50_ms'] else 0
+                linea += f"   p50 {cambio:+.0f}%  consultas {cifras['consultas_p50'] - previo['consultas_p50']:+d}"
+            self.stdout.write(linea)
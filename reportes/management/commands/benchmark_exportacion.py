@@ -0,0 +1,65 @@
+import resource
+import time
+
+from django.core.management.base import BaseCommand
+
+from gestion_ordenes.models import OrdenServicio
+from reportes.datos_prueba import crear_ordenes
+from reportes.exportacion import generar_exportacion
+
+
+def rss_actual_mb():
+    """RSS actual del proceso (Linux); si no hay /proc, el pico de getrusage."""
+    try:
+        with open('/proc/self/statm') as statm:
+            paginas = int(statm.read().split()[1])
+        return paginas * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return rss_pico_mb()
+
+
+def rss_pico_mb():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = ("Mide el tiempo y la memoria de la exportación de órdenes en streaming. "
+            "Con --crear agrega órdenes de prueba a la base actual (no usar en producción).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--crear', type=int, default=0, help="Órdenes de prueba a crear antes de medir.")
+        parser.add_argument('--formato', choices=['csv', 'xlsx', 'ambos'], default='ambos')
+
+    def handle(self, *args, **options):
+        if options['crear']:
+            self.stdout.write(f"Creando {options['crear']} órdenes de prueba...")
+            crear_ordenes(options['crear'], salida=self.stdout)
+
+        total_ordenes = OrdenServicio.objects.count()
+        self.stdout.write(f"Órdenes en la base: {total_ordenes}")
+        formatos = ['csv', 'xlsx'] if options['formato'] == 'ambos' else [options['formato']]
+        for formato in formatos:
+            self.medir(formato, total_ordenes)
+
+    def medir(self, formato, total_ordenes):
+        rss_inicial = rss_actual_mb()
+        rss_maximo = rss_inicial
+        total_bytes = 0
+        fragmentos = 0
+        inicio = time.perf_counter()
+
+        # Se consume igual que lo haría StreamingHttpResponse, fragmento por fragmento
+        for fragmento in generar_exportacion(formato, {}):
+            total_bytes += len(fragmento.encode() if isinstance(fragmento, str) else fragmento)
+            fragmentos += 1
+            if fragmentos % 50 == 0:
+                rss_maximo = max(rss_maximo, rss_actual_mb())
+
+        segundos = time.perf_counter() - inicio
+        rss_maximo = max(rss_maximo, rss_actual_mb())
+        self.stdout.write(
+            f"[{formato}] {total_ordenes} filas, {total_bytes / 2 ** 20:.1f} MB en {segundos:.2f} s "
+            f"({total_ordenes / segundos:,.0f} filas/s) | RSS inicial {rss_inicial:.1f} MB, "
+            f"máximo {rss_maximo:.1f} MB (+{rss_maximo - rss_inicial:.1f} MB) | pico del proceso {rss_pico_mb():.1f} MB"
+        )
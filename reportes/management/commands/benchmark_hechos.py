@@ -0,0 +1,83 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from gestion_ordenes.models import OrdenServicio
+from reportes import hechos
+from reportes.datos_prueba import crear_ordenes
+from reportes.models import HechoDiarioOrdenes
+
+
+def cronometrar(funcion, repeticiones):
+    """Mediana en milisegundos y el último resultado."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), resultado
+
+
+class Command(BaseCommand):
+    help = ("Mide la tabla de hechos: reconstrucción, actualización incremental y consultas de "
+            "reporte sobre 3 años contra el cálculo desde las tablas fuente. "
+            "Con --crear agrega órdenes de prueba a la base actual (no usar en producción).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--crear', type=int, default=0, help="Órdenes de prueba a crear antes de medir.")
+        parser.add_argument('--anios', type=int, default=3, help="Años hacia atrás para las órdenes de prueba y las consultas.")
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **options):
+        anios = options['anios']
+        repeticiones = options['repeticiones']
+        if options['crear']:
+            self.stdout.write(f"Creando {options['crear']} órdenes de prueba en {anios} años...")
+            crear_ordenes(options['crear'], anios=anios, salida=self.stdout)
+
+        self.stdout.write(
+            f"Órdenes: {OrdenServicio.objects.count()} | motor: {connection.vendor}"
+        )
+
+        # 1. Reconstrucción completa
+        inicio = time.perf_counter()
+        filas = hechos.reconstruir()
+        self.stdout.write(f"Reconstrucción completa: {filas} filas de hechos en {time.perf_counter() - inicio:.2f} s")
+
+        # 2. Incremental: unas cuantas órdenes modificadas por la aplicación (con señales)
+        ids = list(OrdenServicio.objects.order_by('?').values_list('id', flat=True)[:20])
+        for orden in OrdenServicio.objects.filter(id__in=ids):
+            orden.prioridad = random.choice([p for p, _ in OrdenServicio.PRIORIDAD_OPCIONES])
+            orden.save()
+        inicio = time.perf_counter()
+        dias, filas = hechos.actualizar_pendientes()
+        self.stdout.write(
+            f"Incremental tras {len(ids)} órdenes modificadas: {dias} días, {filas} filas "
+            f"en {(time.perf_counter() - inicio) * 1000:.0f} ms"
+        )
+
+        # 3. Consultas de reporte de 3 años
+        hasta = timezone.localdate()
+        desde = hasta - datetime.timedelta(days=anios * 365)
+        self.stdout.write(
+            f"Rango {desde} a {hasta}: {HechoDiarioOrdenes.objects.filter(fecha__range=(desde, hasta)).count()} filas de hechos"
+        )
+        for agrupacion in ['mes', 'anio']:
+            for dimension in [None, 'estado', 'tecnico_id', 'tipo_equipo']:
+                ms, resultado = cronometrar(lambda: hechos.resumen(desde, hasta, agrupacion, dimension), repeticiones)
+                self.stdout.write(
+                    f"  resumen agrupacion={agrupacion:<4} dimension={dimension or '-':<11} "
+                    f"{len(resultado):>5} filas  {ms:8.1f} ms"
+                )
+
+        # Referencia: los mismos datos calculados desde órdenes y cotizaciones
+        dias_rango = [desde + datetime.timedelta(days=i) for i in range((hasta - desde).days + 1)]
+        ms, _ = cronometrar(
+            lambda: hechos.calcular_dias(dias_rango), 1
+        )
+        self.stdout.write(f"  referencia: mismo rango calculado desde las tablas fuente {ms:8.1f} ms")
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from gestion_ordenes.models import OrdenEstadoTransicion
+from reportes import tiempos
+from reportes.datos_prueba import crear_ordenes, crear_transiciones
+
+
+class Command(BaseCommand):
+    help = ("Mide el cálculo de tiempos por etapa (percentiles por técnico, tipo de equipo y mes). "
+            "Con --crear agrega órdenes de prueba con su historial de estados a la base actual "
+            "(no usar en producción).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--crear', type=int, default=0, help="Órdenes de prueba a crear antes de medir.")
+        parser.add_argument('--anios', type=int, default=3, help="Años hacia atrás para las órdenes de prueba.")
+
+    def handle(self, *args, **options):
+        if options['crear']:
+            self.stdout.write(f"Creando {options['crear']} órdenes de prueba...")
+            crear_ordenes(options['crear'], anios=options['anios'], salida=self.stdout)
+            self.stdout.write(f"Transiciones creadas: {crear_transiciones()}")
+
+        self.stdout.write(
+            f"Transiciones: {OrdenEstadoTransicion.objects.count()} | motor: {connection.vendor}"
+        )
+
+        # Una sola pasada para todas las dimensiones
+        inicio = time.perf_counter()
+        acumulados = tiempos.acumular()
+        lectura = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        filas = {dimension: tiempos.resumir(grupos) for dimension, grupos in acumulados.items()}
+        percentiles = time.perf_counter() - inicio
+        etapas = sum(len(duraciones) for duraciones in acumulados[None].values())
+        self.stdout.write(
+            f"Todas las dimensiones: {etapas} etapas leídas en {lectura:.2f} s, "
+            f"percentiles en {percentiles:.2f} s"
+        )
+        for dimension, resumen in filas.items():
+            self.stdout.write(f"  {dimension or 'total':<12} {len(resumen):>5} filas")
+
+        # Lo que hace la vista: una dimensión por consulta
+        for dimension in (None, *tiempos.DIMENSIONES):
+            inicio = time.perf_counter()
+            resumen = tiempos.tiempos_por_etapa(dimension=dimension)
+            self.stdout.write(
+                f"  tiempos_por_etapa dimension={dimension or '-':<11} {len(resumen):>5} filas "
+                f"en {time.perf_counter() - inicio:.2f} s"
+            )
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from reportes.datos_prueba import generar_crm
+
+
+class Command(BaseCommand):
+    help = ("Agrega al CRM datos sintéticos con volúmenes configurables (técnicos, clientes, equipos, "
+            "órdenes con bitácora, cotizaciones, transferencias y servicios) para benchmark_crm. "
+            "Los valores \"por\" son promedios y aceptan decimales. No usar en producción.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=1000)
+        parser.add_argument('--equipos-por-cliente', type=float, default=1.5)
+        parser.add_argument('--ordenes-por-equipo', type=float, default=2)
+        parser.add_argument('--bitacora-por-orden', type=float, default=6)
+        parser.add_argument('--cotizaciones-por-orden', type=float, default=0.6)
+        parser.add_argument('--transferencias-por-orden', type=float, default=0.3)
+        parser.add_argument('--items-por-transferencia', type=float, default=2)
+        parser.add_argument('--tecnicos', type=int, default=8, help="Usuarios del grupo Técnico (se crean los que falten).")
+        parser.add_argument('--anios', type=int, default=2, help="Años hacia atrás para registros y órdenes.")
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--sin-indice', action='store_true',
+                            help="No escribir los trigramas de búsqueda difusa (correr después reconstruir_trigramas).")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Generando {options['clientes']} clientes en {connection.vendor}...")
+        inicio = time.perf_counter()
+        conteos = generar_crm(
+            options['clientes'],
+            equipos_por_cliente=options['equipos_por_cliente'],
+            ordenes_por_equipo=options['ordenes_por_equipo'],
+            bitacora_por_orden=options['bitacora_por_orden'],
+            cotizaciones_por_orden=options['cotizaciones_por_orden'],
+            transferencias_por_orden=options['transferencias_por_orden'],
+            items_por_transferencia=options['items_por_transferencia'],
+            tecnicos=options['tecnicos'],
+            anios=options['anios'],
+            semilla=options['semilla'],
+            indexar=not options['sin_indice'],
+            salida=self.stdout,
+        )
+        for nombre, cantidad in conteos.items():
+            self.stdout.write(f"  {nombre:<15} {cantidad:>9}")
+        self.stdout.write(self.style.SUCCESS(f"Listo en {time.perf_counter() - inicio:.1f} s"))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiaPendienteHechos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('marcado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Día pendiente de hechos',
+                'verbose_name_plural': 'Días pendientes de hechos',
+            },
+        ),
+        migrations.CreateModel(
+            name='HechoDiarioOrdenes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(max_length=50)),
+                ('tecnico_id', models.IntegerField(blank=True, null=True)),
+                ('prioridad', models.CharField(max_length=20)),
+                ('tipo_equipo', models.CharField(max_length=100)),
+                ('mes', models.DateField(verbose_name='Primer día del mes')),
+                ('anio', models.PositiveSmallIntegerField(verbose_name='Año')),
+                ('abiertas', models.PositiveIntegerField(default=0)),
+                ('cerradas', models.PositiveIntegerField(default=0)),
+                ('entregadas', models.PositiveIntegerField(default=0)),
+                ('canceladas', models.PositiveIntegerField(default=0)),
+                ('segundos_cierre', models.BigIntegerField(default=0, verbose_name='Suma de segundos hasta el cierre')),
+                ('cotizaciones_autorizadas', models.PositiveIntegerField(default=0)),
+                ('total_autorizado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Hecho diario de órdenes',
+                'verbose_name_plural': 'Hechos diarios de órdenes',
+                'unique_together': {('fecha', 'estado', 'tecnico_id', 'prioridad', 'tipo_equipo')},
+            },
+        ),
+    ]
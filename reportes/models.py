@@ -1,3 +1,59 @@
 from django.db import models
 
-# Create your models here.
+
+class HechoDiarioOrdenes(models.Model):
+    """
+    Tabla de hechos diaria para reportes: una fila por día × estado × técnico
+    × prioridad × tipo de equipo. Los reportes leen sólo de aquí, sin recorrer
+    órdenes, cotizaciones ni bitácora.
+
+    - abiertas y total_autorizado se cuentan en el día de creación de la orden.
+    - cerradas, entregadas, canceladas y segundos_cierre en el día de cierre.
+    - estado, técnico, prioridad y tipo de equipo son los valores actuales de
+      la orden.
+    El tiempo promedio de cierre es segundos_cierre / cerradas; guardar la suma
+    permite agregarlo correctamente por semana, mes o año.
+
+    La llena el comando actualizar_hechos (ver reportes/hechos.py).
+    """
+    fecha = models.DateField()
+    estado = models.CharField(max_length=50)
+    # Sin FK: el histórico no depende de que el usuario siga existiendo
+    tecnico_id = models.IntegerField(null=True, blank=True)
+    prioridad = models.CharField(max_length=20)
+    tipo_equipo = models.CharField(max_length=100)
+    # Derivados de fecha, para agrupar por mes o año sin funciones de fecha
+    mes = models.DateField(verbose_name="Primer día del mes")
+    anio = models.PositiveSmallIntegerField(verbose_name="Año")
+
+    abiertas = models.PositiveIntegerField(default=0)
+    cerradas = models.PositiveIntegerField(default=0)
+    entregadas = models.PositiveIntegerField(default=0)
+    canceladas = models.PositiveIntegerField(default=0)
+    segundos_cierre = models.BigIntegerField(default=0, verbose_name="Suma de segundos hasta el cierre")
+    cotizaciones_autorizadas = models.PositiveIntegerField(default=0)
+    total_autorizado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Hecho diario de órdenes"
+        verbose_name_plural = "Hechos diarios de órdenes"
+        unique_together = [['fecha', 'estado', 'tecnico_id', 'prioridad', 'tipo_equipo']]
+
+    def __str__(self):
+        return f"{self.fecha} {self.estado} / {self.prioridad} / {self.tipo_equipo}"
+
+
+class DiaPendienteHechos(models.Model):
+    """
+    Días cuyas filas de HechoDiarioOrdenes hay que recalcular. Las señales de
+    órdenes y cotizaciones los marcan; actualizar_hechos los procesa y borra.
+    """
+    fecha = models.DateField(unique=True)
+    marcado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Día pendiente de hechos"
+        verbose_name_plural = "Días pendientes de hechos"
+
+    def __str__(self):
+        return str(self.fecha)
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from gestion_ordenes.models import OrdenServicio, Cotizacion
+from gestion_ordenes.signals import ordenes_actualizadas_en_bloque, valor_anterior
+from . import hechos
+
+# --- DÍAS PENDIENTES DE LA TABLA DE HECHOS ---
+# Sólo se marcan días; el recálculo lo hace el comando actualizar_hechos.
+
+
+@receiver(post_save, sender=OrdenServicio)
+@receiver(post_delete, sender=OrdenServicio)
+def marcar_dias_orden(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Si la fecha de cierre cambia, el día del cierre anterior también se recalcula
+    hechos.marcar_dias(instance.fecha_creacion, instance.fecha_cierre, valor_anterior(instance, 'fecha_cierre'))
+
+
+@receiver(ordenes_actualizadas_en_bloque, sender=OrdenServicio)
+def marcar_dias_en_bloque(sender, cambios, **kwargs):
+    hechos.marcar_dias(*(
+        fecha for cambio in cambios
+        for fecha in (cambio.fecha_creacion, cambio.fecha_cierre, cambio.fecha_cierre_anterior)
+    ))
+
+
+@receiver(post_save, sender=Cotizacion)
+@receiver(post_delete, sender=Cotizacion)
+def marcar_dia_cotizacion(sender, instance, raw=False, **kwargs):
+    # Los montos autorizados cuentan en el día de creación de la orden
+    if raw:
+        return
+    fecha_orden = OrdenServicio.objects.filter(pk=instance.orden_id).values_list('fecha_creacion', flat=True).first()
+    hechos.marcar_dias(fecha_orden)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def marcar_dias_tecnico(sender, instance, **kwargs):
+    # Sus órdenes pasan a "sin técnico" con un UPDATE masivo (SET_NULL) sin señales
+    ordenes = OrdenServicio.objects.filter(tecnico_asignado=instance).order_by()
+    dias = set(ordenes.annotate(dia=TruncDate('fecha_creacion')).values_list('dia', flat=True).distinct())
+    dias |= set(ordenes.filter(fecha_cierre__isnull=False).annotate(
+        dia=TruncDate('fecha_cierre')
+    ).values_list('dia', flat=True).distinct())
+    hechos.marcar_dias(*dias)
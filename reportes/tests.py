@@ -1,3 +1,159 @@
+import csv
+import datetime
+import io
+
+from django.contrib.auth.models import Group, User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from gestion_clientes.models import Cliente, Equipo
+from gestion_ordenes.models import OrdenServicio
+
+from . import hechos, tiempos
+from .models import DiaPendienteHechos
+from .xlsx import leer_xlsx
+
+
+class ExportacionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gerente = User.objects.create_user('gerente', password='x')
+        cls.gerente.groups.add(Group.objects.create(name='Gerente Servicio'))
+        cls.tecnico = User.objects.create_user('tecnico', password='x')
+        cliente = Cliente.objects.create(nombre_completo='=HYPERLINK("http://x")', telefono='5512345678')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='@Marca', modelo='-1+1')
+        cls.orden = OrdenServicio.objects.create(cliente=cliente, equipo=equipo, descripcion_falla='Falla')
+
+    def setUp(self):
+        self.client.force_login(self.gerente)
+
+    def _descargar(self, formato, **params):
+        respuesta = self.client.get(reverse('exportar_ordenes', args=[formato]), params)
+        self.assertEqual(respuesta.status_code, 200)
+        return b''.join(respuesta.streaming_content)
+
+    def test_csv_escapa_formulas(self):
+        filas = list(csv.reader(io.StringIO(self._descargar('csv').decode('utf-8-sig'))))
+        self.assertEqual(len(filas), 2)
+        fila = dict(zip(filas[0], filas[1]))
+        self.assertEqual(fila['Cliente'], '\'=HYPERLINK("http://x")')
+        self.assertEqual(fila['Marca'], "'@Marca")
+        self.assertEqual(fila['Modelo'], "'-1+1")
+        self.assertEqual(fila['Teléfono'], '5512345678')
+
+    def test_xlsx_escapa_formulas(self):
+        encabezados, fila = leer_xlsx(io.BytesIO(self._descargar('xlsx')))
+        fila = dict(zip(encabezados, fila))
+        self.assertEqual(fila['Orden'], str(self.orden.pk))
+        self.assertEqual(fila['Cliente'], '\'=HYPERLINK("http://x")')
+
+    def test_filtros_invalidos_antes_de_enviar(self):
+        url = reverse('exportar_ordenes', args=['csv'])
+        for params in [{'fecha_inicio': 'abc'}, {'fecha_fin': '2024-02-30'}, {'tecnico': 'x'}, {'tecnico': '²'},
+                       {'monto_min': 'NaN'}, {'ordenar': 'otro'}]:
+            respuesta = self.client.get(url, params)
+            self.assertEqual(respuesta.status_code, 400, params)
+            self.assertFalse(respuesta.streaming)
+
+    def test_lista_ignora_fecha_inexistente(self):
+        respuesta = self.client.get(reverse('lista_ordenes'), {'fecha_inicio': '2024-02-30'})
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_ultimo_dia_del_calendario(self):
+        # 9999-12-31 no tiene día siguiente: antes, 500 en la lista y exportación cortada
+        respuesta = self.client.get(reverse('lista_ordenes'), {'fecha_fin': '9999-12-31', 'tecnico': '²'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.context['page_obj']), 1)
+        filas = list(csv.reader(io.StringIO(self._descargar('csv', fecha_fin='9999-12-31').decode('utf-8-sig'))))
+        self.assertEqual(len(filas), 2)
+
+    def test_solo_staff_y_gerentes(self):
+        self.client.force_login(self.tecnico)
+        respuesta = self.client.get(reverse('exportar_ordenes', args=['csv']))
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertNotContains(self.client.get(reverse('lista_ordenes')), reverse('exportar_ordenes', args=['csv']))
+
+
+class ResumenOrdenesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gerente = User.objects.create_superuser('gerente', password='x')
+        cls.tecnico = User.objects.create_user('tecnico', password='x', first_name='Técnico')
+        cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+        cls.orden = OrdenServicio.objects.create(cliente=cliente, equipo=equipo, descripcion_falla='Falla')
+        cls.creada = timezone.now() - datetime.timedelta(days=10)
+        OrdenServicio.objects.filter(pk=cls.orden.pk).update(fecha_creacion=cls.creada)
+        hechos.reconstruir()
+
+    def setUp(self):
+        self.client.force_login(self.gerente)
+
+    def _filas(self, **params):
+        respuesta = self.client.get(reverse('resumen_ordenes'), {'formato': 'json', 'agrupacion': 'dia', **params})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()['filas']
+
+    def test_fechas_inexistentes_usan_el_rango_por_defecto(self):
+        hoy = timezone.localdate()
+        for params in [{'desde': '2024-02-30'}, {'hasta': '2024-13-01'}, {'desde': 'abc'}]:
+            respuesta = self.client.get(reverse('resumen_ordenes'), params)
+            self.assertEqual(respuesta.status_code, 200, params)
+        self.assertEqual(respuesta.context['hasta'], hoy)
+        self.assertEqual(respuesta.context['desde'], (hoy - datetime.timedelta(days=365)).replace(day=1))
+
+    def test_editar_orden_recalcula_sus_dias(self):
+        dia_creacion = timezone.localdate(self.creada)
+        def resumen():
+            return [(f['periodo'], f['grupo'], f['abiertas'], f['entregadas']) for f in self._filas(dimension='tecnico')]
+
+        self.assertEqual(resumen(), [(dia_creacion.isoformat(), 'Sin asignar', 1, 0)])
+
+        orden = OrdenServicio.objects.get(pk=self.orden.pk)
+        orden.tecnico_asignado = self.tecnico
+        orden.estado = OrdenServicio.ESTADO_ENTREGADA
+        orden.fecha_cierre = timezone.now()
+        orden.save()
+        # La señal marca el día de creación (cambió el técnico) y el del cierre
+        self.assertEqual(set(DiaPendienteHechos.objects.values_list('fecha', flat=True)),
+                         {dia_creacion, timezone.localdate(orden.fecha_cierre)})
+
+        hechos.actualizar_pendientes()
+        self.assertEqual(hechos.diferencias(), {})
+        self.assertFalse(DiaPendienteHechos.objects.exists())
+        self.assertEqual(resumen(), [
+            (dia_creacion.isoformat(), 'Técnico', 1, 0),
+            (timezone.localdate(orden.fecha_cierre).isoformat(), 'Técnico', 0, 1),
+        ])
+
+
+class TiemposEtapaTests(TestCase):
+
+    def test_percentil(self):
+        # Mismos valores que numpy.percentile (interpolación lineal)
+        self.assertEqual(tiempos.percentil([7], 95), 7)
+        self.assertEqual(tiempos.percentil([1, 2, 3, 4], 0), 1)
+        self.assertEqual(tiempos.percentil([1, 2, 3, 4], 100), 4)
+        self.assertEqual(tiempos.percentil([1, 2, 3, 4], 50), 2.5)
+        self.assertAlmostEqual(tiempos.percentil([10, 20, 30, 40, 50], 90), 46)
+        self.assertAlmostEqual(tiempos.percentil(list(range(101)), 95), 95)
+
+    def test_fechas_inexistentes_usan_el_rango_por_defecto(self):
+        self.client.force_login(User.objects.create_superuser('gerente', password='x'))
+        for params in [{'hasta': '2024-13-01'}, {'desde': '2024-02-30'}, {'desde': 'abc', 'formato': 'json'}]:
+            respuesta = self.client.get(reverse('tiempos_etapa'), params)
+            self.assertEqual(respuesta.status_code, 200, params)
+        respuesta = self.client.get(reverse('tiempos_etapa'), {'hasta': '2024-13-01'})
+        self.assertEqual(respuesta.context['hasta'], timezone.localdate())
 
-# Create your tests here.
+    def test_extremos_del_calendario(self):
+        self.client.force_login(User.objects.create_superuser('gerente', password='x'))
+        for params in [{'hasta': '9999-12-31'}, {'hasta': '0001-01-01'}, {'desde': '0001-01-01', 'hasta': '9999-12-31'}]:
+            for vista in ['tiempos_etapa', 'resumen_ordenes']:
+                respuesta = self.client.get(reverse(vista), {**params, 'formato': 'json'})
+                self.assertEqual(respuesta.status_code, 200, (vista, params))
+        respuesta = self.client.get(reverse('tiempos_etapa'), {'hasta': '9999-12-31'})
+        self.assertEqual(respuesta.context['hasta'], datetime.date(9999, 12, 30))
@@ -0,0 +1,138 @@
+"""
+Tiempos de permanencia por etapa (estado) a partir de OrdenEstadoTransicion.
+
+La permanencia en una etapa es el tiempo entre la transición que entra a ella
+y la siguiente transición de la misma orden. Las etapas en curso (sin
+transición siguiente) no cuentan, así que Entregada y Cancelada nunca aparecen.
+
+El cálculo recorre las transiciones una sola vez, ordenadas por
+(orden, fecha) con el índice transicion_orden_fecha_idx y leídas por lotes,
+con la fecha ya convertida a segundos por la base (SegundosEpoch).
+Cada duración se acumula en un array('d') por grupo (8 bytes por valor, sin
+un objeto float por fila) y los percentiles salen de ordenar cada arreglo una
+vez. Todas las dimensiones se llenan en la misma pasada.
+"""
+import datetime
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from operator import itemgetter
+
+from django.db.models import FloatField, Func, Max, Min
+from django.utils import timezone
+
+from gestion_ordenes.models import OrdenEstadoTransicion, OrdenServicio
+
+DIMENSIONES = ('tecnico', 'tipo_equipo', 'mes')
+PERCENTILES = (50, 75, 90, 95)
+TAMANO_LOTE = 10000
+
+_ORDEN_ESTADOS = {estado: i for i, (estado, _) in enumerate(OrdenServicio.ESTADO_OPCIONES)}
+
+
+class SegundosEpoch(Func):
+    """
+    Segundos desde 1970 (UTC) de una fecha, calculados en la base: leer un
+    float es mucho más barato que convertir un datetime por fila en Python.
+    """
+    output_field = FloatField()
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='((julianday(%(expressions)s) - 2440587.5) * 86400.0)', **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='UNIX_TIMESTAMP(%(expressions)s)', **extra_context)
+
+
+class _Meses:
+    """Mes local (primer día) de un instante epoch, con búsqueda binaria sobre los inicios de mes."""
+
+    def __init__(self, desde, hasta, zona):
+        mes = timezone.localtime(desde, zona).date().replace(day=1)
+        ultimo = timezone.localtime(hasta, zona).date()
+        self.meses, self.inicios = [], []
+        while mes <= ultimo:
+            self.meses.append(mes)
+            self.inicios.append(timezone.make_aware(datetime.datetime.combine(mes, datetime.time.min), zona).timestamp())
+            mes = (mes + datetime.timedelta(days=32)).replace(day=1)
+
+    def __call__(self, segundos):
+        return self.meses[max(bisect_right(self.inicios, segundos) - 1, 0)]
+
+
+def _transiciones(desde, con_tipo_equipo):
+    transiciones = OrdenEstadoTransicion.objects.all()
+    if desde:
+        transiciones = transiciones.filter(fecha__gte=desde)
+    campos = ['orden_id', 'estado_nuevo', SegundosEpoch('fecha'), 'tecnico_id']
+    if con_tipo_equipo:
+        # El join con orden y equipo sólo cuando se pide ese desglose
+        campos.append('orden__equipo__tipo_equipo')
+    # Sin límite superior: la transición que cierra una etapa puede caer después de `hasta`
+    return transiciones.order_by('orden_id', 'fecha', 'id').values_list(*campos).iterator(chunk_size=TAMANO_LOTE)
+
+
+def acumular(desde=None, hasta=None, dimensiones=DIMENSIONES):
+    """
+    Duraciones en segundos de las etapas que empezaron en [desde, hasta)
+    (datetimes, opcionales): {dimension: {(grupo, estado): array('d')}}.
+    La dimensión None acumula el total por estado (grupo None).
+    """
+    grupos = {dimension: defaultdict(lambda: array('d')) for dimension in (None, *dimensiones)}
+    extremos = OrdenEstadoTransicion.objects.aggregate(primera=Min('fecha'), ultima=Max('fecha'))
+    if extremos['primera'] is None:
+        return grupos
+
+    meses = _Meses(extremos['primera'], extremos['ultima'], timezone.get_current_timezone())
+    extractores = {
+        None: lambda fila: None,
+        'tecnico': itemgetter(3),
+        'tipo_equipo': itemgetter(4),
+        'mes': lambda fila: meses(fila[2]),
+    }
+    destinos = [(extractores[dimension], acumulados) for dimension, acumulados in grupos.items()]
+    limite = hasta.timestamp() if hasta else float('inf')
+
+    anterior = None
+    for fila in _transiciones(desde, 'tipo_equipo' in grupos):
+        if anterior is not None and anterior[0] == fila[0] and anterior[2] < limite:
+            segundos = fila[2] - anterior[2]
+            estado = anterior[1]
+            for extraer, acumulados in destinos:
+                acumulados[(extraer(anterior), estado)].append(segundos)
+        anterior = fila
+    return grupos
+
+
+def percentil(ordenados, p):
+    """Percentil `p` (0-100) con interpolación lineal, como numpy.percentile."""
+    posicion = (len(ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicion - inferior)
+
+
+def resumir(acumulados):
+    """Una fila por (grupo, estado) con conteo, promedio y percentiles en horas."""
+    filas = []
+    for (grupo, estado), duraciones in acumulados.items():
+        ordenados = sorted(duraciones)
+        fila = {
+            'grupo': grupo,
+            'estado': estado,
+            'n': len(ordenados),
+            'promedio': round(sum(ordenados) / len(ordenados) / 3600, 1),
+        }
+        for p in PERCENTILES:
+            fila[f'p{p}'] = round(percentil(ordenados, p) / 3600, 1)
+        filas.append(fila)
+    filas.sort(key=lambda fila: (
+        fila['grupo'] is None, fila['grupo'], _ORDEN_ESTADOS.get(fila['estado'], len(_ORDEN_ESTADOS))
+    ))
+    return filas
+
+
+def tiempos_por_etapa(desde=None, hasta=None, dimension=None):
+    """Filas de resumir() para una dimensión de DIMENSIONES (o None: sólo por estado)."""
+    return resumir(acumular(desde, hasta, [dimension] if dimension else [])[dimension])
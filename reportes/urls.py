@@ -0,0 +1,13 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    # Exportación de órdenes filtradas (csv | xlsx)
+    path('ordenes/exportar/<str:formato>/', views.exportar_ordenes, name='exportar_ordenes'),
+
+    # Resumen de órdenes (tabla de hechos diaria)
+    path('ordenes/resumen/', views.resumen_ordenes, name='resumen_ordenes'),
+
+    # Tiempos de permanencia por estado (transiciones de estado)
+    path('ordenes/tiempos/', views.tiempos_etapa, name='tiempos_etapa'),
+]
@@ -1,3 +1,156 @@
+import datetime
+
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.models import User
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from sistema_crm_pacscomputacion.metricas import presupuesto_consultas
+from sistema_crm_pacscomputacion.replicas import lectura_en_replica
+from gestion_ordenes.filtros import errores_filtros
+
+from . import hechos, tiempos
+from .exportacion import generar_exportacion, puede_exportar
+
+TIPOS_CONTENIDO = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# --- EXPORTACIONES ---
+
+@login_required
+@user_passes_test(puede_exportar)
+def exportar_ordenes(request, formato):
+    """
+    Descarga las órdenes con los mismos filtros de lista_ordenes
+    (estado, técnico, prioridad, rango de fechas) en CSV o XLSX.
+    El archivo se genera mientras se envía, sin armarlo en memoria.
+    """
+    if formato not in TIPOS_CONTENIDO:
+        raise Http404("Formato de exportación no soportado.")
+    # Se valida antes de empezar a enviar: un error a media respuesta
+    # sólo cortaría el archivo
+    errores = errores_filtros(request.GET)
+    if errores:
+        return HttpResponseBadRequest(' '.join(errores))
+
+    nombre = f"ordenes_{timezone.localtime():%Y%m%d_%H%M}.{formato}"
+    response = StreamingHttpResponse(generar_exportacion(formato, request.GET), content_type=TIPOS_CONTENIDO[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
+
+
+# --- REPORTES (tabla de hechos) ---
+
+# Parámetro ?dimension= -> columna de HechoDiarioOrdenes
+DIMENSIONES_REPORTE = {
+    'estado': 'estado',
+    'tecnico': 'tecnico_id',
+    'prioridad': 'prioridad',
+    'tipo_equipo': 'tipo_equipo',
+}
+
+# Las consultas usan el día siguiente a `hasta` y el rango por defecto empieza
+# un año antes: en los extremos del calendario serían OverflowError
+HASTA_MINIMA = datetime.date.min + datetime.timedelta(days=365)
+HASTA_MAXIMA = datetime.date.max - datetime.timedelta(days=1)
+
+def _fecha(valor):
+    """date de un parámetro AAAA-MM-DD, o None si viene vacío o no es una fecha válida."""
+    try:
+        return parse_date(valor or '')
+    except ValueError:
+        # Bien formada pero inexistente, ej. 2024-02-30
+        return None
+
+def _rango_fechas(params):
+    """
+    (desde, hasta) de ?desde=/?hasta=; por defecto, del inicio del mes de hace
+    un año a hoy. `hasta` se recorta a [HASTA_MINIMA, HASTA_MAXIMA].
+    """
+    hasta = _fecha(params.get('hasta')) or timezone.localdate()
+    hasta = min(max(hasta, HASTA_MINIMA), HASTA_MAXIMA)
+    desde = _fecha(params.get('desde')) or (hasta - datetime.timedelta(days=365)).replace(day=1)
+    return desde, hasta
+
+@login_required
+@lectura_en_replica
+@presupuesto_consultas(6)
+def resumen_ordenes(request):
+    """
+    Órdenes abiertas/cerradas, montos autorizados y tiempo promedio de cierre
+    por día, mes o año, opcionalmente desglosado por una dimensión.
+    Lee únicamente de la tabla de hechos (ver reportes/hechos.py).
+    """
+    desde, hasta = _rango_fechas(request.GET)
+    agrupacion = request.GET.get('agrupacion') if request.GET.get('agrupacion') in hechos.AGRUPACIONES else 'mes'
+    dimension = request.GET.get('dimension') if request.GET.get('dimension') in DIMENSIONES_REPORTE else ''
+    columna = DIMENSIONES_REPORTE.get(dimension)
+
+    filas = hechos.resumen(desde, hasta, agrupacion, columna)
+
+    # Nombres de técnico en una sola consulta
+    if columna == 'tecnico_id':
+        tecnicos = User.objects.in_bulk({fila['tecnico_id'] for fila in filas if fila['tecnico_id']})
+        for fila in filas:
+            tecnico = tecnicos.get(fila['tecnico_id'])
+            fila['tecnico_id'] = (tecnico.get_full_name() or tecnico.username) if tecnico else 'Sin asignar'
+    for fila in filas:
+        fila['grupo'] = fila.get(columna, '') if columna else ''
+
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({'filas': [
+            {**fila, 'periodo': fila['periodo'].isoformat(), 'total_autorizado': str(fila['total_autorizado'])}
+            for fila in filas
+        ]})
+
+    return render(request, 'reportes/resumen_ordenes.html', {
+        'filas': filas,
+        'desde': desde,
+        'hasta': hasta,
+        'agrupacion': agrupacion,
+        'dimension': dimension,
+        'dimensiones': DIMENSIONES_REPORTE,
+    })
+
+
+# --- TIEMPOS POR ETAPA (transiciones de estado) ---
+
+@login_required
+@lectura_en_replica
+@presupuesto_consultas(6)
+def tiempos_etapa(request):
+    """
+    Cuánto tiempo pasan las órdenes en cada estado (promedio y percentiles),
+    en total o desglosado por técnico, tipo de equipo o mes de inicio de la
+    etapa. Ver reportes/tiempos.py.
+    """
+    desde, hasta = _rango_fechas(request.GET)
+    dimension = request.GET.get('dimension') if request.GET.get('dimension') in tiempos.DIMENSIONES else ''
+
+    filas = tiempos.tiempos_por_etapa(
+        hechos.inicio_del_dia(desde), hechos.inicio_del_dia(hasta + datetime.timedelta(days=1)), dimension or None,
+    )
+
+    if dimension == 'tecnico':
+        tecnicos = User.objects.in_bulk({fila['grupo'] for fila in filas if fila['grupo']})
+        for fila in filas:
+            tecnico = tecnicos.get(fila['grupo'])
+            fila['grupo'] = (tecnico.get_full_name() or tecnico.username) if tecnico else 'Sin asignar'
+
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({'filas': [
+            {**fila, 'grupo': fila['grupo'].isoformat() if isinstance(fila['grupo'], datetime.date) else fila['grupo']}
+            for fila in filas
+        ]})
 
-# Create your views here.
+    return render(request, 'reportes/tiempos_etapa.html', {
+        'filas': filas,
+        'desde': desde,
+        'hasta': hasta,
+        'dimension': dimension,
+        'percentiles': tiempos.PERCENTILES,
+    })
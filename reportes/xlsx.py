@@ -0,0 +1,242 @@
+"""
+Escritor (y lector mínimo) XLSX en streaming, sin dependencias externas.
+
+Un .xlsx es un ZIP con unas cuantas partes XML. zipfile sabe escribir sobre un
+flujo no "seekable" (usa descriptores de datos al final de cada entrada), así
+que el ZIP se arma sobre un búfer que se vacía después de cada bloque de
+filas: la memoria usada no depende del número de filas.
+
+Las celdas de texto van como "inlineStr" para no tener que acumular la tabla
+de cadenas compartidas (sharedStrings.xml), que crecería con el archivo.
+
+leer_xlsx() recorre la primera hoja con iterparse, fila por fila; sólo la
+tabla de cadenas compartidas se carga completa (así la escriben Excel y
+LibreOffice).
+"""
+import datetime
+import posixpath
+import re
+import zipfile
+from decimal import Decimal
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+FILAS_POR_BLOQUE = 500
+
+# Caracteres de control que XML 1.0 no admite
+_INVALIDOS_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_EPOCA_EXCEL = datetime.datetime(1899, 12, 30)
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+# Estilos: 0 = general, 1 = fecha y hora, 2 = encabezado en negritas
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+ESTILO_FECHA = 1
+ESTILO_ENCABEZADO = 2
+
+
+def _workbook(nombre_hoja):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(nombre_hoja[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _columna(indice):
+    """0 -> 'A', 25 -> 'Z', 26 -> 'AA'."""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _celda(referencia, valor, estilo=0):
+    atributo_estilo = f' s="{estilo}"' if estilo else ''
+    if valor is None or valor == '':
+        return ''
+    if isinstance(valor, bool):
+        return f'<c r="{referencia}" t="b"{atributo_estilo}><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c r="{referencia}"{atributo_estilo}><v>{valor}</v></c>'
+    if isinstance(valor, datetime.datetime):
+        # Excel no maneja zonas horarias: se guarda la hora tal cual se recibe
+        serial = (valor.replace(tzinfo=None) - _EPOCA_EXCEL).total_seconds() / 86400
+        return f'<c r="{referencia}" s="{ESTILO_FECHA}"><v>{serial:.10f}</v></c>'
+    texto = escape(_INVALIDOS_XML.sub('', str(valor)))
+    return f'<c r="{referencia}" t="inlineStr"{atributo_estilo}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+class _Bufer:
+    """Destino no seekable para zipfile: acumula bytes hasta que se vacía."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def generar_xlsx(encabezados, filas, nombre_hoja='Hoja1', filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Genera los bytes de un libro XLSX de una sola hoja, bloque por bloque.
+    `filas` puede ser cualquier iterable (ej. un queryset.iterator()).
+    """
+    bufer = _Bufer()
+    with zipfile.ZipFile(bufer, mode='w', compression=zipfile.ZIP_DEFLATED) as archivo:
+        archivo.writestr('[Content_Types].xml', CONTENT_TYPES)
+        archivo.writestr('_rels/.rels', RELS)
+        archivo.writestr('xl/workbook.xml', _workbook(nombre_hoja))
+        archivo.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        archivo.writestr('xl/styles.xml', STYLES)
+        yield bufer.vaciar()
+
+        columnas = [_columna(i) for i in range(len(encabezados))]
+        # force_zip64: el tamaño de la hoja no se conoce de antemano
+        with archivo.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as hoja:
+            hoja.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" state="frozen"/></sheetView></sheetViews>'
+                '<sheetData>'
+                '<row r="1">'
+                + ''.join(_celda(f'{col}1', titulo, ESTILO_ENCABEZADO) for col, titulo in zip(columnas, encabezados))
+                + '</row>'
+            ).encode())
+
+            bloque = []
+            for numero, fila in enumerate(filas, start=2):
+                celdas = ''.join(_celda(f'{col}{numero}', valor) for col, valor in zip(columnas, fila))
+                bloque.append(f'<row r="{numero}">{celdas}</row>')
+                if len(bloque) >= filas_por_bloque:
+                    hoja.write(''.join(bloque).encode())
+                    bloque = []
+                    yield bufer.vaciar()
+            hoja.write((''.join(bloque) + '</sheetData></worksheet>').encode())
+    yield bufer.vaciar()
+
+
+# --- LECTURA ---
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_NS_PAQUETE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_FILA, _CELDA, _VALOR, _TEXTO, _CADENA = (f'{_NS}{tag}' for tag in ('row', 'c', 'v', 't', 'si'))
+
+
+def _indice_columna(referencia):
+    """'A1' -> 0, 'AA7' -> 26 (inverso de _columna)."""
+    indice = 0
+    for letra in referencia.rstrip('0123456789'):
+        indice = indice * 26 + ord(letra) - 64
+    return indice - 1
+
+
+def _texto(elemento):
+    # <si>/<is> pueden traer varios fragmentos <r><t> con formato
+    return ''.join(t.text or '' for t in elemento.iter(_TEXTO))
+
+
+def _ruta_primera_hoja(archivo):
+    workbook = ElementTree.fromstring(archivo.read('xl/workbook.xml'))
+    hoja = workbook.find(f'{_NS}sheets/{_NS}sheet')
+    relaciones = ElementTree.fromstring(archivo.read('xl/_rels/workbook.xml.rels'))
+    for relacion in relaciones.iter(f'{_NS_PAQUETE}Relationship'):
+        if relacion.get('Id') == hoja.get(f'{_NS_REL}id'):
+            destino = relacion.get('Target')
+            return destino.lstrip('/') if destino.startswith('/') else posixpath.join('xl', destino)
+    return 'xl/worksheets/sheet1.xml'
+
+
+def leer_xlsx(origen):
+    """
+    Genera las filas de la primera hoja como listas de texto ('' en las celdas
+    vacías). Los números se devuelven como aparecen en el archivo, sin ".0"
+    final (ej. teléfonos capturados como número). `origen` es una ruta o un
+    archivo binario.
+    """
+    with zipfile.ZipFile(origen) as archivo:
+        compartidas = []
+        if 'xl/sharedStrings.xml' in archivo.namelist():
+            with archivo.open('xl/sharedStrings.xml') as xml:
+                for _, elemento in ElementTree.iterparse(xml):
+                    if elemento.tag == _CADENA:
+                        compartidas.append(_texto(elemento))
+                        elemento.clear()
+
+        with archivo.open(_ruta_primera_hoja(archivo)) as xml:
+            for _, elemento in ElementTree.iterparse(xml):
+                if elemento.tag != _FILA:
+                    continue
+                fila = []
+                for celda in elemento:
+                    if celda.tag != _CELDA:
+                        continue
+                    tipo = celda.get('t')
+                    if tipo == 'inlineStr':
+                        valor = _texto(celda)
+                    else:
+                        valor = celda.findtext(_VALOR) or ''
+                        if tipo == 's' and valor:
+                            valor = compartidas[int(valor)]
+                        elif tipo in (None, 'n') and valor.endswith('.0'):
+                            valor = valor[:-2]
+                    referencia = celda.get('r')
+                    if referencia:
+                        # Las celdas vacías no se escriben: se rellenan hasta la columna indicada
+                        faltantes = _indice_columna(referencia) - len(fila)
+                        if faltantes > 0:
+                            fila.extend([''] * faltantes)
+                    fila.append(valor)
+                elemento.clear()
+                yield fila
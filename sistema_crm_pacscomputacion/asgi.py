@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+El feed en vivo de los dashboards (dashboard/eventos.py) necesita este punto
+de entrada: servido por ASGI (ej. `uvicorn sistema_crm_pacscomputacion.asgi:application`)
+cada conexión SSE abierta es una corrutina en espera y no un hilo.
 """
 
 import os
@@ -13,4 +17,29 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_crm_pacscomputacion.settings')
 
-application = get_asgi_application()
+get_asgi_application()  # django.setup()
+
+from django.core.handlers.asgi import ASGIHandler  # noqa: E402  (requiere django.setup())
+from django.urls import reverse  # noqa: E402
+
+# Rutas de conexiones largas (SSE y long-poll)
+RUTAS_CONEXION_LARGA = (reverse('dashboard_eventos'),)
+
+
+class ASGIHandlerConexionesLargas(ASGIHandler):
+    """
+    Django atiende cada petición ASGI dentro de un ThreadSensitiveContext, que
+    reserva un hilo para el código síncrono de esa petición (sesión, usuario)
+    hasta que termina la respuesta. En un stream de minutos eso es un hilo
+    dormido por dashboard abierto. Para estas rutas se omite: su poco código
+    síncrono corre en el hilo síncrono compartido de asgiref.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'].startswith(RUTAS_CONEXION_LARGA):
+            await self.handle(scope, receive, send)
+        else:
+            await super().__call__(scope, receive, send)
+
+
+application = ASGIHandlerConexionesLargas()
@@ -0,0 +1,223 @@
+"""
+Métricas por petición: consultas SQL, tiempo en SQL, tiempo de render de
+plantillas y tiempo total, agrupadas por nombre de URL.
+
+- MetricasMiddleware mide cada petición. Con DEBUG agrega las cifras a la
+  respuesta (Server-Timing y X-Consultas-SQL, visibles en las herramientas
+  del navegador).
+- estadisticas() devuelve los acumulados del proceso (cada worker lleva los
+  suyos); dashboard_estadisticas_peticiones los expone a staff.
+- @presupuesto_consultas(n) declara cuántas consultas puede hacer una vista.
+  Al pasarse se cuenta en las estadísticas; con METRICAS_PRESUPUESTO_ESTRICTO
+  (lo activa el TEST_RUNNER, pruebas.EjecutorPruebas) la petición falla con
+  PresupuestoExcedido, así que una prueba que visite la vista lo detecta.
+
+Las consultas se cuentan con execute_wrapper sobre cada alias de DATABASES y
+el render con el backend de plantillas PlantillasMedidas. Las consultas que se
+hacen al renderizar cuentan en ambos tiempos. En respuestas streaming sólo se
+mide hasta que empieza el envío.
+"""
+import threading
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+# Duraciones recientes que se guardan por vista para los percentiles
+MUESTRAS_POR_VISTA = 500
+SIN_RUTA = '<sin ruta>'
+
+_medicion = ContextVar('medicion', default=None)
+_candado = threading.Lock()
+_acumulados = {}
+
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+def presupuesto_consultas(maximo):
+    """Decorador de vistas: número máximo de consultas SQL por petición."""
+    def decorador(vista):
+        vista.presupuesto_consultas = maximo
+        return vista
+    return decorador
+
+
+class Medicion:
+    """Lo medido en una petición. Se instala como execute_wrapper de cada conexión."""
+    __slots__ = ('consultas', 'sql', 'plantillas', 'en_plantilla', 'total')
+
+    def __init__(self):
+        self.consultas = 0
+        self.sql = self.plantillas = self.total = 0.0
+        self.en_plantilla = False
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += perf_counter() - inicio
+            self.consultas += 1
+
+
+# --- PLANTILLAS ---
+
+class _PlantillaMedida:
+    def __init__(self, plantilla):
+        self.plantilla = plantilla
+
+    def __getattr__(self, nombre):
+        return getattr(self.plantilla, nombre)
+
+    def render(self, context=None, request=None):
+        medicion = _medicion.get()
+        # Sólo la plantilla de más afuera: los render anidados ya están dentro de su tiempo
+        if medicion is None or medicion.en_plantilla:
+            return self.plantilla.render(context, request)
+        medicion.en_plantilla = True
+        inicio = perf_counter()
+        try:
+            return self.plantilla.render(context, request)
+        finally:
+            medicion.plantillas += perf_counter() - inicio
+            medicion.en_plantilla = False
+
+
+class PlantillasMedidas(DjangoTemplates):
+    """Backend DjangoTemplates que suma el tiempo de render a la medición de la petición."""
+
+    def from_string(self, template_code):
+        return _PlantillaMedida(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _PlantillaMedida(super().get_template(template_name))
+
+
+# --- ACUMULADOS ---
+
+class _Acumulado:
+    __slots__ = ('peticiones', 'consultas', 'consultas_max', 'sql', 'plantillas', 'total', 'duraciones', 'excedidas')
+
+    def __init__(self):
+        self.peticiones = self.consultas = self.consultas_max = self.excedidas = 0
+        self.sql = self.plantillas = self.total = 0.0
+        self.duraciones = deque(maxlen=MUESTRAS_POR_VISTA)
+
+    def agregar(self, medicion, excedida):
+        self.peticiones += 1
+        self.consultas += medicion.consultas
+        self.consultas_max = max(self.consultas_max, medicion.consultas)
+        self.sql += medicion.sql
+        self.plantillas += medicion.plantillas
+        self.total += medicion.total
+        self.duraciones.append(medicion.total)
+        self.excedidas += excedida
+
+
+def _registrar(vista, medicion, excedida):
+    with _candado:
+        acumulado = _acumulados.get(vista)
+        if acumulado is None:
+            acumulado = _acumulados[vista] = _Acumulado()
+        acumulado.agregar(medicion, excedida)
+
+
+def _ms(segundos):
+    return round(segundos * 1000, 1)
+
+
+def estadisticas():
+    """{vista: promedios, máximos y percentiles (ms)}, de la vista más costosa en total a la menos."""
+    with _candado:
+        copia = [(vista, acumulado, sorted(acumulado.duraciones)) for vista, acumulado in _acumulados.items()]
+    resultado = {}
+    for vista, acumulado, duraciones in sorted(copia, key=lambda item: -item[1].total):
+        n = acumulado.peticiones
+        resultado[vista] = {
+            'peticiones': n,
+            'consultas_promedio': round(acumulado.consultas / n, 1),
+            'consultas_max': acumulado.consultas_max,
+            'sql_ms_promedio': _ms(acumulado.sql / n),
+            'plantillas_ms_promedio': _ms(acumulado.plantillas / n),
+            'total_ms_promedio': _ms(acumulado.total / n),
+            'total_ms_p50': _ms(duraciones[len(duraciones) // 2]),
+            'total_ms_p95': _ms(duraciones[min(len(duraciones) - 1, int(len(duraciones) * 0.95))]),
+            'total_ms_max': _ms(duraciones[-1]),
+            'presupuesto_excedido': acumulado.excedidas,
+        }
+    return resultado
+
+
+def reiniciar():
+    with _candado:
+        _acumulados.clear()
+
+
+# --- MIDDLEWARE ---
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS_ACTIVAS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @contextmanager
+    def _medir(self):
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        inicio = perf_counter()
+        try:
+            with ExitStack() as envolturas:
+                for alias in connections:
+                    envolturas.enter_context(connections[alias].execute_wrapper(medicion))
+                yield medicion
+        finally:
+            medicion.total = perf_counter() - inicio
+            _medicion.reset(token)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self._medir() as medicion:
+            response = self.get_response(request)
+        return self._terminar(request, response, medicion)
+
+    async def __acall__(self, request):
+        # Con ASGI las vistas síncronas corren en otro hilo, pero con el mismo
+        # contexto: las conexiones (y sus execute_wrapper) son las mismas.
+        with self._medir() as medicion:
+            response = await self.get_response(request)
+        return self._terminar(request, response, medicion)
+
+    def _terminar(self, request, response, medicion):
+        coincidencia = request.resolver_match
+        vista = coincidencia.view_name if coincidencia else SIN_RUTA
+        presupuesto = getattr(coincidencia.func, 'presupuesto_consultas', None) if coincidencia else None
+        excedida = presupuesto is not None and medicion.consultas > presupuesto
+        _registrar(vista, medicion, excedida)
+
+        if settings.DEBUG:
+            response['X-Consultas-SQL'] = str(medicion.consultas)
+            response['Server-Timing'] = (
+                f'sql;dur={_ms(medicion.sql)};desc="{medicion.consultas} consultas", '
+                f'plantillas;dur={_ms(medicion.plantillas)}, total;dur={_ms(medicion.total)}'
+            )
+        if excedida and getattr(settings, 'METRICAS_PRESUPUESTO_ESTRICTO', False):
+            raise PresupuestoExcedido(
+                f"{vista} hizo {medicion.consultas} consultas SQL; su presupuesto es {presupuesto}."
+            )
+        return response
+
@@ -0,0 +1,15 @@
+"""Ejecutor de pruebas del proyecto (TEST_RUNNER)."""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class EjecutorPruebas(DiscoverRunner):
+    """
+    TEST_RUNNER: en las pruebas, pasarse del presupuesto de consultas hace
+    fallar la petición, y la bitácora se escribe en el acto (modo síncrono).
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.METRICAS_PRESUPUESTO_ESTRICTO = True
+        settings.BITACORA_ASINCRONA = False
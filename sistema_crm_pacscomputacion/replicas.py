@@ -0,0 +1,101 @@
+"""
+Lecturas en la réplica de sólo lectura (alias 'replica' de DATABASES).
+
+Sólo van a la réplica las consultas de las vistas marcadas con
+@lectura_en_replica (listas, dashboards, reportes). Todo lo demás, y cualquier
+escritura, va a la primaria. Una vista marcada igual lee de la primaria si:
+
+- la petición no es GET/HEAD,
+- hay una transacción abierta en la primaria (debe ver sus propios cambios),
+- el navegador trae la cookie COOKIE_PRIMARIA: el middleware la pone después
+  de cada petición que escribe y dura REPLICA_RETRASO_MAXIMO segundos, para
+  que al volver a una lista se vea lo recién guardado aunque la réplica vaya
+  atrasada (crear_orden -> detalle_orden -> lista_ordenes),
+- la consulta corre dentro de `with en_primaria():` (ej. lo que se guarda en
+  un caché compartido, ver dashboard/cache_dashboards.py).
+
+Si no hay alias 'replica' configurado, todo va a la primaria.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+COOKIE_PRIMARIA = 'crm_primaria'
+METODOS_LECTURA = ('GET', 'HEAD')
+
+# Verdadero mientras corre una vista marcada con @lectura_en_replica
+_en_replica = contextvars.ContextVar('en_replica', default=False)
+
+
+def replica_disponible():
+    return REPLICA in settings.DATABASES
+
+
+def usar_replica(request):
+    """Si las lecturas de esta petición pueden ir a la réplica."""
+    return (
+        replica_disponible()
+        and request.method in METODOS_LECTURA
+        and COOKIE_PRIMARIA not in request.COOKIES
+    )
+
+
+def lectura_en_replica(vista):
+    """Decorador de vistas de sólo lectura: sus consultas van a la réplica."""
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not usar_replica(request):
+            return vista(request, *args, **kwargs)
+        token = _en_replica.set(True)
+        try:
+            return vista(request, *args, **kwargs)
+        finally:
+            _en_replica.reset(token)
+    return envoltura
+
+
+@contextmanager
+def en_primaria():
+    """Dentro del bloque las lecturas van a la primaria, aunque la vista use @lectura_en_replica."""
+    token = _en_replica.set(False)
+    try:
+        yield
+    finally:
+        _en_replica.reset(token)
+
+
+class RouterReplica:
+    """Router de DATABASE_ROUTERS: escrituras a la primaria, lecturas según la vista."""
+
+    def db_for_read(self, model, **hints):
+        if _en_replica.get() and replica_disponible() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Sin esto, un objeto leído de la réplica se guardaría en la réplica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Son la misma base: los objetos de una y otra se pueden relacionar
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}
+
+
+class PrimariaTrasEscrituraMiddleware:
+    """Después de una petición que escribe, fija las lecturas del navegador a la primaria un rato."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if replica_disponible() and request.method not in METODOS_LECTURA and response.status_code < 500:
+            response.set_cookie(
+                COOKIE_PRIMARIA, '1', max_age=settings.REPLICA_RETRASO_MAXIMO,
+                httponly=True, samesite='Lax',
+            )
+        return response
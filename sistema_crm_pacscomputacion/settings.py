@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 #
+import copy
 import os
 
 
@@ -49,8 +50,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir también lo que hacen los demás middleware (sesión, usuario)
+    'sistema_crm_pacscomputacion.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'sistema_crm_pacscomputacion.replicas.PrimariaTrasEscrituraMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -62,7 +66,8 @@ ROOT_URLCONF = 'sistema_crm_pacscomputacion.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el tiempo de render (metricas.py)
+        'BACKEND': 'sistema_crm_pacscomputacion.metricas.PlantillasMedidas',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -77,17 +82,132 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'sistema_crm_pacscomputacion.wsgi.application'
 
+# Métricas por petición (sistema_crm_pacscomputacion/metricas.py). CRM_METRICAS=0 las apaga.
+METRICAS_ACTIVAS = os.environ.get('CRM_METRICAS', '1') != '0'
+# Con True, una vista que se pasa de su @presupuesto_consultas falla (las pruebas lo activan)
+METRICAS_PRESUPUESTO_ESTRICTO = False
+
+TEST_RUNNER = 'sistema_crm_pacscomputacion.pruebas.EjecutorPruebas'
+
+# Bitácora automática (gestion_ordenes/bitacora.py). CRM_BITACORA_ASINCRONA=1
+# la escribe por lotes desde un hilo: cada BITACORA_LOTE entradas o cada
+# BITACORA_INTERVALO segundos. Las pruebas la fuerzan síncrona.
+BITACORA_ASINCRONA = os.environ.get('CRM_BITACORA_ASINCRONA', '0') == '1'
+BITACORA_LOTE = int(os.environ.get('CRM_BITACORA_LOTE', 200))
+BITACORA_INTERVALO = float(os.environ.get('CRM_BITACORA_INTERVALO', 1.0))
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# Perfil elegido con CRM_DB_PERFIL:
+#   desarrollo (por defecto): SQLite con los valores de Django.
+#   sqlite-produccion: SQLite para varios usuarios escribiendo a la vez
+#     (recepción y técnicos). CRM_DB_NOMBRE cambia la ruta del archivo y
+#     CRM_DB_CONN_MAX_AGE los segundos que se reutiliza cada conexión.
+#   postgres: PostgreSQL con pool de conexiones (requiere psycopg[pool]).
+#     CRM_DB_NOMBRE, CRM_DB_USUARIO, CRM_DB_CONTRASENA, CRM_DB_HOST,
+#     CRM_DB_PUERTO; tamaño del pool con CRM_DB_POOL_MIN / CRM_DB_POOL_MAX.
+#     Con CRM_DB_REPLICA_HOST se agrega la réplica de sólo lectura.
+
+# Se aplican al abrir cada conexión (OPTIONS['init_command'])
+SQLITE_PRAGMAS_PRODUCCION = [
+    'PRAGMA journal_mode=WAL',        # las lecturas no bloquean a quien escribe (y viceversa)
+    'PRAGMA synchronous=NORMAL',      # seguro con WAL; evita un fsync por transacción
+    'PRAGMA mmap_size=268435456',     # 256 MB de lecturas por memoria mapeada
+    'PRAGMA cache_size=-65536',       # 64 MB de caché de páginas por conexión
+    'PRAGMA temp_store=MEMORY',
+]
+
+DATABASE_PERFILES = {
+    'desarrollo': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'sqlite-produccion': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('CRM_DB_NOMBRE', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            # Segundos de espera por el candado de escritura antes de "database is locked"
+            'timeout': 20,
+            # BEGIN IMMEDIATE: la transacción toma el candado de escritura al empezar.
+            # Con DEFERRED, una transacción que lee y luego escribe falla al instante
+            # si otra ya está escribiendo, sin respetar el timeout.
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': '; '.join(SQLITE_PRAGMAS_PRODUCCION),
+        },
+        'CONN_MAX_AGE': int(os.environ.get('CRM_DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('CRM_DB_NOMBRE', 'crm_pacs'),
+        'USER': os.environ.get('CRM_DB_USUARIO', 'crm'),
+        'PASSWORD': os.environ.get('CRM_DB_CONTRASENA', ''),
+        'HOST': os.environ.get('CRM_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('CRM_DB_PUERTO', '5432'),
+        'OPTIONS': {
+            # El pool reutiliza las conexiones, así que CONN_MAX_AGE se queda en 0
+            'pool': {
+                'min_size': int(os.environ.get('CRM_DB_POOL_MIN', 2)),
+                'max_size': int(os.environ.get('CRM_DB_POOL_MAX', 10)),
+                'timeout': 10,
+            },
+        },
+    },
+}
+
+CRM_DB_PERFIL = os.environ.get('CRM_DB_PERFIL', 'desarrollo')
+
+DATABASES = {
+    'default': DATABASE_PERFILES[CRM_DB_PERFIL],
+}
+
+# Réplica de sólo lectura (ver sistema_crm_pacscomputacion/replicas.py)
+if os.environ.get('CRM_DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **copy.deepcopy(DATABASES['default']),
+        'HOST': os.environ['CRM_DB_REPLICA_HOST'],
+        'PORT': os.environ.get('CRM_DB_REPLICA_PUERTO', DATABASES['default'].get('PORT', '')),
+        # En pruebas la réplica es la misma base de prueba que la primaria
+        'TEST': {'MIRROR': 'default'},
+    }
+elif CRM_DB_PERFIL == 'desarrollo':
+    # Sin réplica real: el mismo archivo, para que el ruteo se ejercite igual que
+    # en producción. En pruebas cada alias tiene su propia base en memoria.
+    DATABASES['replica'] = copy.deepcopy(DATABASES['default'])
+
+DATABASE_ROUTERS = ['sistema_crm_pacscomputacion.replicas.RouterReplica']
+
+# Segundos que un navegador lee de la primaria después de escribir (retraso máximo esperado de la réplica)
+REPLICA_RETRASO_MAXIMO = int(os.environ.get('CRM_DB_REPLICA_RETRASO', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Por defecto en memoria del proceso. Para compartirlo entre workers:
+#   CRM_CACHE_BACKEND=file  CRM_CACHE_LOCATION=/var/tmp/crm_cache
+#   CRM_CACHE_BACKEND=redis CRM_CACHE_LOCATION=redis://127.0.0.1:6379/1
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[os.environ.get('CRM_CACHE_BACKEND', 'locmem')],
+        'LOCATION': os.environ.get('CRM_CACHE_LOCATION', 'crm-pacs'),
     }
 }
 
+# Segundos que un dashboard cacheado puede vivir aunque nada lo invalide
+DASHBOARD_CACHE_TTL = 300
+
+# Segundos que un worker reutiliza una búsqueda del autocompletado de clientes
+AUTOCOMPLETADO_CACHE_TTL = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,160 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import ResolverMatch, reverse
+
+from gestion_clientes.models import Cliente, Equipo
+from gestion_ordenes.models import BitacoraOrden, OrdenServicio
+from . import metricas
+from .metricas import MetricasMiddleware, PresupuestoExcedido, presupuesto_consultas
+from .replicas import COOKIE_PRIMARIA, REPLICA, RouterReplica, lectura_en_replica
+
+
+class RuteoReplicaTests(TransactionTestCase):
+    """
+    'default' y 'replica' son dos bases SQLite distintas en las pruebas (sin
+    replicación), así que lo que muestra una vista dice de dónde leyó.
+    TransactionTestCase: dentro de la transacción de TestCase todo se lee de
+    la primaria.
+    """
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    def setUp(self):
+        self.usuario = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(self.usuario)
+        Cliente.objects.create(nombre_completo='Cliente En Primaria', telefono='5500000001')
+        # bulk_create: sin las señales, que escribirían los trigramas en la primaria
+        Cliente.objects.using(REPLICA).bulk_create([Cliente(nombre_completo='Cliente En Replica', telefono='5500000002')])
+
+    def test_router(self):
+        router = RouterReplica()
+        vistas = {}
+
+        @lectura_en_replica
+        def vista(request):
+            vistas['lectura'] = router.db_for_read(Cliente)
+            with transaction.atomic():
+                vistas['en_transaccion'] = router.db_for_read(Cliente)
+            vistas['escritura'] = router.db_for_write(Cliente)
+
+        fabrica = RequestFactory()
+        vista(fabrica.get('/'))
+        self.assertEqual(vistas, {'lectura': REPLICA, 'en_transaccion': DEFAULT_DB_ALIAS, 'escritura': DEFAULT_DB_ALIAS})
+        self.assertEqual(router.db_for_read(Cliente), DEFAULT_DB_ALIAS)
+
+        vista(fabrica.post('/'))
+        self.assertEqual(vistas['lectura'], DEFAULT_DB_ALIAS)
+        peticion = fabrica.get('/')
+        peticion.COOKIES[COOKIE_PRIMARIA] = '1'
+        vista(peticion)
+        self.assertEqual(vistas['lectura'], DEFAULT_DB_ALIAS)
+
+    def test_lista_lee_de_la_replica(self):
+        response = self.client.get(reverse('lista_clientes'))
+        self.assertContains(response, 'Cliente En Replica')
+        self.assertNotContains(response, 'Cliente En Primaria')
+
+    def test_despues_de_escribir_lee_de_la_primaria(self):
+        response = self.client.post(reverse('crear_cliente'), {'nombre_completo': 'Cliente Nuevo', 'telefono': '5500000003'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(COOKIE_PRIMARIA, response.cookies)
+
+        response = self.client.get(reverse('lista_clientes'))
+        self.assertContains(response, 'Cliente Nuevo')
+        self.assertContains(response, 'Cliente En Primaria')
+
+        # Al vencer la cookie se vuelve a la réplica
+        del self.client.cookies[COOKIE_PRIMARIA]
+        self.assertNotContains(self.client.get(reverse('lista_clientes')), 'Cliente Nuevo')
+
+    def test_dashboard_en_cache_se_calcula_en_la_primaria(self):
+        # Sin la cookie la vista lee de la réplica, pero el contexto que se
+        # guarda en caché (y ven todos) no puede venir de una réplica atrasada
+        cache.clear()
+        cliente = Cliente.objects.get(telefono='5500000001')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+        OrdenServicio.objects.create(cliente=cliente, equipo=equipo, descripcion_falla='No enciende')
+        for _ in range(2):
+            response = self.client.get(reverse('dashboard_recepcion'))
+            self.assertEqual(response.context['kpi_abiertas'], 1)
+
+    def test_crear_orden_y_detalle_en_primaria(self):
+        cliente = Cliente.objects.get(telefono='5500000001')
+        equipo = Equipo.objects.create(cliente=cliente, tipo_equipo='Laptop', marca='HP', modelo='ProBook')
+        response = self.client.post(reverse('crear_orden'), {
+            'cliente_id': cliente.pk, 'equipo_id': equipo.pk,
+            'descripcion_falla': 'No enciende', 'prioridad': 'Normal',
+        }, follow=True)
+        self.assertEqual(response.status_code, 200)
+        orden = response.context['orden']
+        self.assertEqual(orden.descripcion_falla, 'No enciende')
+        # La réplica no tiene la orden: la lista sólo la muestra mientras dura la cookie
+        self.assertContains(self.client.get(reverse('lista_ordenes')), reverse('detalle_orden', args=[orden.pk]))
+        del self.client.cookies[COOKIE_PRIMARIA]
+        self.assertNotContains(self.client.get(reverse('lista_ordenes')), reverse('detalle_orden', args=[orden.pk]))
+
+
+class MetricasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('admin', password='x')
+        cls.cliente = Cliente.objects.create(nombre_completo='Cliente Prueba', telefono='5512345678')
+        equipos = [
+            Equipo.objects.create(cliente=cls.cliente, tipo_equipo='Laptop', marca='HP', modelo=f'Modelo {i}')
+            for i in range(5)
+        ]
+        for i in range(20):
+            orden = OrdenServicio.objects.create(
+                cliente=cls.cliente, equipo=equipos[i % 5], descripcion_falla=f'Falla {i}', tecnico_asignado=cls.staff,
+            )
+            BitacoraOrden.objects.create(orden=orden, usuario=cls.staff, descripcion='Orden creada exitosamente.')
+        cls.orden = orden
+
+    def setUp(self):
+        metricas.reiniciar()
+        self.client.force_login(self.staff)
+
+    @override_settings(DEBUG=True)
+    def test_encabezados_con_debug(self):
+        response = self.client.get(reverse('detalle_cliente', args=[self.cliente.pk]))
+        self.assertGreater(int(response['X-Consultas-SQL']), 0)
+        self.assertIn('plantillas;dur=', response['Server-Timing'])
+
+    def test_sin_encabezados_sin_debug(self):
+        response = self.client.get(reverse('detalle_cliente', args=[self.cliente.pk]))
+        self.assertNotIn('X-Consultas-SQL', response)
+
+    def test_paginas_de_detalle_dentro_del_presupuesto(self):
+        # Con el ejecutor de pruebas, pasarse del presupuesto lanza PresupuestoExcedido
+        self.client.get(reverse('detalle_cliente', args=[self.cliente.pk]))
+        self.client.get(reverse('detalle_orden', args=[self.orden.pk]))
+        self.client.get(reverse('lista_ordenes'))
+
+        estadisticas = self.client.get(reverse('dashboard_estadisticas_peticiones')).json()
+        self.assertEqual(estadisticas['detalle_cliente']['peticiones'], 1)
+        self.assertEqual(estadisticas['detalle_cliente']['presupuesto_excedido'], 0)
+        self.assertGreater(estadisticas['detalle_orden']['plantillas_ms_promedio'], 0)
+
+    def test_estadisticas_solo_staff(self):
+        self.client.force_login(User.objects.create_user('recepcion', password='x'))
+        self.assertEqual(self.client.get(reverse('dashboard_estadisticas_peticiones')).status_code, 302)
+
+    def test_presupuesto_excedido(self):
+        @presupuesto_consultas(1)
+        def vista(request):
+            list(User.objects.all())
+            list(Cliente.objects.all())
+            return HttpResponse()
+
+        middleware = MetricasMiddleware(vista)
+        peticion = RequestFactory().get('/')
+        peticion.resolver_match = ResolverMatch(vista, (), {}, url_name='vista_prueba')
+
+        with self.assertRaisesMessage(PresupuestoExcedido, 'vista_prueba hizo 2 consultas SQL'):
+            middleware(peticion)
+        with override_settings(METRICAS_PRESUPUESTO_ESTRICTO=False):
+            self.assertEqual(middleware(peticion).status_code, 200)
+        self.assertEqual(metricas.estadisticas()['vista_prueba']['presupuesto_excedido'], 2)
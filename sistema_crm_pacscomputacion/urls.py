@@ -25,7 +25,7 @@ urlpatterns = [
     path('ordenes/', include('gestion_ordenes.urls')),
     path('catalogos/', include('catalogo.urls')), 
     path('dashboards/', include('dashboard.urls')),
-    # path('reportes/', include('reportes.urls')),
+    path('reportes/', include('reportes.urls')),
 ] 
 
 if settings.DEBUG: